@@ -44,6 +44,9 @@ class ATSMSClient:
         ),
     }
 
+    # Africa's Talking recipient codes for Processed, Sent and Queued.
+    SUCCESS_STATUS_CODES = frozenset({100, 101, 102})
+
     def __init__(self):
         """Initialize Africa's Talking SMS client with API credentials."""
         if settings.DEBUG:
@@ -192,3 +195,73 @@ class ATSMSClient:
             error_msg = f'Africa\'s Talking SMS error: {str(e)}'
             logger.error(error_msg)
             raise ATSMSError(error_msg) from e
+
+    def send_bulk_sms(self, phone_numbers, message):
+        """
+        Send one message to many numbers in a single provider call.
+
+        Args:
+            phone_numbers: Phone numbers to send the message to.
+            message: Message body.
+
+        Returns:
+            list: One dict per input number, in input order, with
+                ``success``, ``status`` and ``message_id`` keys.
+
+        Raises:
+            ATSMSError: If the provider call itself fails.
+        """
+        phone_numbers = list(phone_numbers)
+        if settings.DEBUG:
+            logger.info(
+                '[DEBUG MODE] Bulk SMS for %s recipients: %s',
+                len(phone_numbers),
+                message,
+            )
+            return [
+                {'success': True, 'status': 'Success', 'message_id': ''}
+                for _ in phone_numbers
+            ]
+
+        normalized = [self._normalize_phone(phone) for phone in phone_numbers]
+        try:
+            response = self.sms.send(
+                message=message,
+                recipients=list(dict.fromkeys(normalized)),
+            )
+        except Exception as e:
+            error_msg = f'Africa\'s Talking SMS error: {str(e)}'
+            logger.error(error_msg)
+            raise ATSMSError(error_msg) from e
+
+        recipients = {
+            recipient.get('number'): recipient
+            for recipient in (
+                (response or {}).get('SMSMessageData', {}).get(
+                    'Recipients',
+                    [],
+                )
+            )
+        }
+        results = []
+        for number in normalized:
+            recipient = recipients.get(number)
+            if recipient is None:
+                results.append({
+                    'success': False,
+                    'status': 'No provider response for recipient',
+                    'message_id': '',
+                })
+                continue
+            results.append({
+                'success': (
+                    recipient.get('statusCode') in self.SUCCESS_STATUS_CODES
+                ),
+                'status': str(recipient.get('status', '')),
+                'message_id': recipient.get('messageId', ''),
+            })
+        logger.info(
+            'Bulk SMS sent to %s recipients.',
+            sum(result['success'] for result in results),
+        )
+        return results
@@ -1,5 +1,6 @@
 from rest_framework.permissions import BasePermission
 
+from saccomanagement.access import get_authorization_context
 from saccomanagement.models import Role
 from services.models import Guarantor, Saving
 
@@ -58,7 +59,7 @@ class IsSaccoAdmin(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        return user.roles.filter(name=Role.SACCO_ADMIN).exists()
+        return get_authorization_context(request).is_sacco_admin
 
     def has_object_permission(self, request, view, obj):
         """
@@ -78,10 +79,7 @@ class IsSaccoAdmin(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        return user.roles.filter(
-            name=Role.SACCO_ADMIN,
-            sacco=sacco,
-        ).exists()
+        return get_authorization_context(request).is_admin_of(sacco)
 
 
 class IsSuperAdmin(BasePermission):
@@ -100,10 +98,7 @@ class IsSuperAdmin(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        return (
-            user.is_staff
-            or user.roles.filter(name=Role.SUPER_ADMIN).exists()
-        )
+        return get_authorization_context(request).is_super_admin
 
 
 class IsSaccoAdminOrSuperAdmin(BasePermission):
@@ -124,9 +119,10 @@ class IsSaccoAdminOrSuperAdmin(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
-        return user.roles.filter(
-            name__in=[Role.SACCO_ADMIN, Role.SUPER_ADMIN]
-        ).exists()
+        return get_authorization_context(request).has_role(
+            Role.SACCO_ADMIN,
+            Role.SUPER_ADMIN,
+        )
 
     def has_object_permission(self, request, view, obj):
         """
@@ -140,28 +136,22 @@ class IsSaccoAdminOrSuperAdmin(BasePermission):
         if not user or not user.is_authenticated:
             return False
 
+        access = get_authorization_context(request)
+
         # SUPER_ADMIN always passes at object level
-        if user.roles.filter(name=Role.SUPER_ADMIN).exists():
+        if access.has_role(Role.SUPER_ADMIN):
             return True
 
         # SACCO_ADMIN must have role for the object's SACCO
         if hasattr(obj, 'sacco'):
-            return user.roles.filter(
-                name=Role.SACCO_ADMIN,
-                sacco=obj.sacco,
-            ).exists()
+            return access.is_admin_of(obj.sacco)
 
         if hasattr(obj, 'user'):
             from saccomembership.models import Membership
 
-            admin_sacco_ids = user.roles.filter(
-                name=Role.SACCO_ADMIN,
-                sacco__isnull=False,
-            ).values_list('sacco_id', flat=True)
-
             return Membership.objects.filter(
                 user=obj.user,
-                sacco_id__in=admin_sacco_ids,
+                sacco_id__in=access.admin_sacco_ids,
             ).exists()
 
         return False
@@ -238,10 +228,7 @@ class IsOwnerOrSaccoAdmin(BasePermission):
 
         # SACCO admin can access any resource in their SACCO
         if hasattr(obj, 'sacco'):
-            return user.roles.filter(
-                name=Role.SACCO_ADMIN,
-                sacco=obj.sacco,
-            ).exists()
+            return get_authorization_context(request).is_admin_of(obj.sacco)
 
         return False
 
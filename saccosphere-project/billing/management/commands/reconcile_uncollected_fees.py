@@ -13,6 +13,7 @@ from django.db.models import Sum, Q
 from django.utils import timezone
 
 from billing.models import PlatformRevenue
+from payments.fee_calculator import SaccoInvoiceFeeCalculator
 
 
 class Command(BaseCommand):
@@ -78,18 +79,27 @@ class Command(BaseCommand):
                 uncollected_records.append(record)
                 sacco_name = record.sacco.name if record.sacco else 'Unknown'
                 sacco_breakdown[sacco_name] = sacco_breakdown.get(
-                    sacacco_name,
-                    {'count': 0, 'amount': Decimal('0.00')},
+                    sacco_name,
+                    {
+                        'count': 0,
+                        'amount': Decimal('0.00'),
+                        'quoted': Decimal('0.00'),
+                    },
                 )
                 sacco_breakdown[sacco_name]['count'] += 1
                 sacco_breakdown[sacco_name]['amount'] += record.amount
 
         uncollected_count = len(uncollected_records)
         uncollected_total = sum(r.amount for r in uncollected_records)
+        quoted_total = self._quote_current_fees(
+            uncollected_records,
+            sacco_breakdown,
+        )
 
         self.stdout.write(
             f'\nUncollected fee records identified: {uncollected_count}\n'
             f'Total uncollected amount: KES {uncollected_total:,.2f}\n'
+            f'Fee under current schedule: KES {quoted_total:,.2f}\n'
         )
 
         if uncollected_count == 0:
@@ -104,7 +114,8 @@ class Command(BaseCommand):
         for sacco_name, data in sorted(sacco_breakdown.items()):
             self.stdout.write(
                 f'  {sacco_name}: {data["count"]} records, '
-                f'KES {data["amount"]:,.2f}'
+                f'KES {data["amount"]:,.2f} '
+                f'(current schedule KES {data["quoted"]:,.2f})'
             )
         self.stdout.write('-' * 70)
 
@@ -141,6 +152,35 @@ class Command(BaseCommand):
 
         self.stdout.write('\n' + '=' * 70 + '\n')
 
+    def _quote_current_fees(self, records, sacco_breakdown):
+        """
+        Quote every linked transaction under today's fee schedule.
+
+        All rows go through the calculator in one batch call; records
+        whose transaction type has no fee schedule are left out.
+        """
+        calculator = SaccoInvoiceFeeCalculator()
+        quotable_types = (
+            calculator.INFLOW_TYPES + calculator.OUTFLOW_TYPES
+        )
+        quotable = [
+            record
+            for record in records
+            if (record.transaction.transaction_type or '').lower()
+            in quotable_types
+        ]
+        if not quotable:
+            return Decimal('0.00')
+
+        fees = calculator.calculate_batch(
+            [record.transaction.transaction_type for record in quotable],
+            [record.transaction.amount for record in quotable],
+        )['platform_fee']
+        for record, fee in zip(quotable, fees):
+            sacco_name = record.sacco.name if record.sacco else 'Unknown'
+            sacco_breakdown[sacco_name]['quoted'] += fee
+        return sum(fees, Decimal('0.00'))
+
     def _parse_cutoff(self, cutoff_str):
         """Parse cutoff datetime string or return current time."""
         if cutoff_str:
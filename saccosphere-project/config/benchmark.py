@@ -0,0 +1,105 @@
+"""Shared helpers for synthetic-data benchmark management commands."""
+
+import time
+from contextlib import contextmanager
+from uuid import uuid4
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+
+class _Rollback(Exception):
+    """Raised to discard synthetic benchmark data."""
+
+
+class BenchmarkCommand(BaseCommand):
+    """
+    Base class for commands that time code paths against synthetic data.
+
+    Every scenario runs inside a transaction that is rolled back afterwards,
+    so benchmarks can be pointed at a staging database without leaving rows
+    behind.
+    """
+
+    def run_rolled_back(self, scenario, *args, **kwargs):
+        """Run a scenario in a transaction and roll all of its writes back."""
+        result = None
+        try:
+            with transaction.atomic():
+                result = scenario(*args, **kwargs)
+                raise _Rollback()
+        except _Rollback:
+            pass
+        return result
+
+    @contextmanager
+    def timed(self, timings, label):
+        """Record the wall-clock seconds spent in the block under label."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[label] = time.perf_counter() - started
+
+    def write_timings(self, title, timings, rows=None):
+        """Print one benchmark result table."""
+        self.stdout.write(f'\n{title}')
+        self.stdout.write('-' * 70)
+        for label, seconds in timings.items():
+            line = f'  {label:<40} {seconds:>10.3f}s'
+            if rows:
+                line += f' {rows / seconds if seconds else 0:>12,.0f} rows/s'
+            self.stdout.write(line)
+        self.stdout.write('-' * 70)
+
+
+def seed_sacco(name_prefix='Benchmark SACCO'):
+    """Create a throwaway SACCO for a benchmark run."""
+    from accounts.models import Sacco
+
+    suffix = uuid4().hex[:8].upper()
+    return Sacco.objects.create(
+        name=f'{name_prefix} {suffix}',
+        registration_number=f'BENCH-{suffix}',
+        sector=Sacco.Sector.FINANCE,
+        county='Nairobi',
+    )
+
+
+def seed_members(sacco, count, batch_size=2000):
+    """
+    Bulk create approved members for a SACCO.
+
+    Returns the created Membership rows in member-number order.
+    """
+    from accounts.models import User
+    from saccomembership.models import Membership
+
+    run_id = uuid4().hex[:8]
+    password = make_password(None)
+    users = User.objects.bulk_create(
+        [
+            User(
+                email=f'bench-{run_id}-{index}@saccosphere.test',
+                first_name='Bench',
+                last_name=f'Member {index}',
+                phone_number=f'2547{index:08d}'[:12],
+                password=password,
+            )
+            for index in range(count)
+        ],
+        batch_size=batch_size,
+    )
+    return Membership.objects.bulk_create(
+        [
+            Membership(
+                user=user,
+                sacco=sacco,
+                status=Membership.Status.APPROVED,
+                member_number=f'B{run_id}-{index:06d}',
+            )
+            for index, user in enumerate(users)
+        ],
+        batch_size=batch_size,
+    )
@@ -4,6 +4,7 @@ import os
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_process_init
 from django.conf import settings
 from kombu import Queue
 
@@ -27,6 +28,8 @@ app.conf.task_routes = {
     'payments.tasks.*': {'queue': 'payments'},
     'notifications.tasks.*': {'queue': 'notifications'},
     'ledger.tasks.*': {'queue': 'reports'},
+    'services.tasks.calculate_dividend_chunk': {'queue': 'reports'},
+    'services.tasks.disburse_dividends': {'queue': 'reports'},
 }
 app.conf.beat_schedule = {
     **settings.CELERY_BEAT_SCHEDULE,
@@ -38,6 +41,22 @@ app.conf.beat_schedule = {
         'task': 'services.tasks.check_all_sacco_liquidity',
         'schedule': crontab(minute=0),
     },
+    'daily-sacco-liquidity-snapshot': {
+        'task': 'services.tasks.roll_up_liquidity_snapshots',
+        'schedule': crontab(hour=0, minute=5),
+    },
+    'drain-mpesa-callback-inbox': {
+        'task': 'payments.tasks.drain_mpesa_callback_inbox',
+        'schedule': 10.0,
+    },
+    'reconcile-pending-transactions': {
+        'task': 'payments.tasks.reconcile_pending_transactions',
+        'schedule': 600.0,
+    },
+    'refresh-mpesa-access-token': {
+        'task': 'payments.tasks.refresh_mpesa_access_token',
+        'schedule': 300.0,
+    },
     'daily-npl-arrears-check': {
         'task': 'services.tasks.flag_npl_arrears',
         'schedule': crontab(minute=30, hour=6),
@@ -54,3 +73,11 @@ app.conf.task_annotations = {
 }
 
 app.autodiscover_tasks()
+
+
+@worker_process_init.connect
+def warm_up_payment_providers(**kwargs):
+    """Load PSP providers in each worker process before its first task."""
+    from payments.providers.registry import warm_up_providers
+
+    warm_up_providers()
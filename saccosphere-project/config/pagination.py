@@ -1,7 +1,17 @@
+import base64
+from datetime import datetime
 from math import ceil
 
-from rest_framework.pagination import PageNumberPagination
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    _positive_int,
+)
 from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class SaccoSpherePagination(PageNumberPagination):
@@ -35,3 +45,150 @@ class FinancialPagination(SaccoSpherePagination):
 
 class NotificationPagination(SaccoSpherePagination):
     page_size = 30
+
+
+class SaccoSphereCursorPagination(BasePagination):
+    """
+    Keyset pagination over (created_at, id), newest first.
+
+    Each page is a range scan that starts from the position held in the
+    opaque cursor, so page 5000 costs the same as page 1. No COUNT(*) is
+    run unless ``include_count=true`` is passed, and even then counting
+    stops at ``max_count``; ``count_is_exact`` is false when it did.
+    """
+
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    count_query_param = 'include_count'
+    max_count = 10000
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+
+        self.count = None
+        self.count_is_exact = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count, self.count_is_exact = self.get_count(queryset)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        if cursor:
+            created_at, pk, reverse = self.decode_cursor(cursor, queryset)
+            if reverse:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at)
+                    | Q(created_at=created_at, id__gt=pk)
+                ).order_by('created_at', 'id')
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at)
+                    | Q(created_at=created_at, id__lt=pk)
+                ).order_by('-created_at', '-id')
+        else:
+            queryset = queryset.order_by('-created_at', '-id')
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = bool(cursor)
+
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size,
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_count(self, queryset):
+        """Return (count, is_exact) without counting past max_count."""
+        count = queryset.order_by()[:self.max_count + 1].count()
+        if count > self.max_count:
+            return self.max_count, False
+        return count, True
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link_to(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.request.build_absolute_uri(),
+                self.cursor_query_param,
+            )
+        return self._link_to(self.page[0], reverse=True)
+
+    def encode_cursor(self, instance, reverse=False):
+        """Encode an object's (created_at, id) position."""
+        direction = 'p' if reverse else 'n'
+        value = f'{instance.created_at.isoformat()}|{instance.pk}|{direction}'
+        return base64.urlsafe_b64encode(value.encode()).decode()
+
+    def decode_cursor(self, cursor, queryset):
+        """Decode a cursor into (created_at, pk, reverse)."""
+        try:
+            value = base64.urlsafe_b64decode(cursor.encode()).decode()
+            created_at, pk, direction = value.split('|')
+            if direction not in ('n', 'p'):
+                raise ValueError(direction)
+            return (
+                datetime.fromisoformat(created_at),
+                queryset.model._meta.pk.to_python(pk),
+                direction == 'p',
+            )
+        except (
+            TypeError,
+            ValueError,
+            UnicodeDecodeError,
+            DjangoValidationError,
+        ) as exc:
+            raise NotFound(self.invalid_cursor_message) from exc
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                'success': True,
+                'message': 'Success',
+                'data': {
+                    'count': self.count,
+                    'count_is_exact': self.count_is_exact,
+                    'next': self.get_next_link(),
+                    'previous': self.get_previous_link(),
+                    'results': data,
+                },
+            }
+        )
+
+    def _link_to(self, instance, reverse):
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(instance, reverse=reverse),
+        )
+
+
+class FinancialCursorPagination(SaccoSphereCursorPagination):
+    page_size = 50
+
+
+class NotificationCursorPagination(SaccoSphereCursorPagination):
+    page_size = 30
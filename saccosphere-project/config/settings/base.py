@@ -253,6 +253,35 @@ AT_API_KEY = config('AT_API_KEY', default='')
 AT_USERNAME = config('AT_USERNAME', default='sandbox')
 AT_ENVIRONMENT = config('AT_ENVIRONMENT', default='sandbox' if DEBUG else 'production')
 FCM_SERVER_KEY = config('FCM_SERVER_KEY', default='')
+# Device tokens per FCM multicast call (FCM accepts at most 1000).
+FCM_MULTICAST_BATCH_SIZE = config(
+    'FCM_MULTICAST_BATCH_SIZE',
+    default=500,
+    cast=int,
+)
+# Users whose push/SMS delivery one bulk notification task handles.
+NOTIFICATION_FANOUT_CHUNK_SIZE = config(
+    'NOTIFICATION_FANOUT_CHUNK_SIZE',
+    default=500,
+    cast=int,
+)
+# Recipients sent in one multi-recipient bulk SMS provider call.
+SMS_CAMPAIGN_BATCH_SIZE = config(
+    'SMS_CAMPAIGN_BATCH_SIZE',
+    default=100,
+    cast=int,
+)
+# Bulk SMS provider calls per second one campaign dispatch may make.
+SMS_PROVIDER_RATE_LIMIT = config(
+    'SMS_PROVIDER_RATE_LIMIT',
+    default=5.0,
+    cast=float,
+)
+SMS_CAMPAIGN_MAX_WORKERS = config(
+    'SMS_CAMPAIGN_MAX_WORKERS',
+    default=4,
+    cast=int,
+)
 
 # IPRS Configuration
 IPRS_API_KEY = config('IPRS_API_KEY', default='')
@@ -306,6 +335,14 @@ MPESA_SHORTCODE = config('MPESA_SHORTCODE', default='')
 MPESA_PASSKEY = config('MPESA_PASSKEY', default='')
 MPESA_ENVIRONMENT = config('MPESA_ENVIRONMENT', default='sandbox')
 MPESA_CALLBACK_BASE_URL = config('MPESA_CALLBACK_BASE_URL', default='')
+# Overrides the sandbox/live Daraja host, e.g. to point at a local stub.
+MPESA_BASE_URL = config('MPESA_BASE_URL', default='')
+# Keep-alive connections each process holds open to Daraja.
+MPESA_HTTP_POOL_MAXSIZE = config(
+    'MPESA_HTTP_POOL_MAXSIZE',
+    default=20,
+    cast=int,
+)
 GUARANTOR_RESPONSE_BASE_URL = config(
     'GUARANTOR_RESPONSE_BASE_URL',
     default=MPESA_CALLBACK_BASE_URL,
@@ -362,6 +399,26 @@ WITHDRAWAL_TIERS = [
 ]
 
 PAYMENT_PROVIDER = config('PAYMENT_PROVIDER', default='')
+# Keep-alive connections each PSP provider instance holds open per process.
+PSP_HTTP_POOL_MAXSIZE = config(
+    'PSP_HTTP_POOL_MAXSIZE',
+    default=20,
+    cast=int,
+)
+# Status queries per second the reconciler may send to each PSP.
+PSP_STATUS_QUERY_RATE_LIMITS = {
+    'default': config('PSP_STATUS_QUERY_RATE_LIMIT', default=5.0, cast=float),
+}
+RECONCILE_MAX_WORKERS = config('RECONCILE_MAX_WORKERS', default=8, cast=int)
+# B2C payouts per second the bulk dispatcher may send to each provider.
+B2C_PAYOUT_RATE_LIMITS = {
+    'default': config('B2C_PAYOUT_RATE_LIMIT', default=10.0, cast=float),
+}
+B2C_DISPATCH_MAX_WORKERS = config(
+    'B2C_DISPATCH_MAX_WORKERS',
+    default=8,
+    cast=int,
+)
 
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
@@ -391,6 +448,46 @@ else:
         }
     }
 
+# Seconds a user's cached role graph lives; role changes drop it sooner.
+ROLE_GRAPH_CACHE_TIMEOUT = config(
+    'ROLE_GRAPH_CACHE_TIMEOUT',
+    default=300,
+    cast=int,
+)
+# Seconds a member's cached dashboard portfolio lives; writes rewrite it.
+PORTFOLIO_CACHE_TIMEOUT = config(
+    'PORTFOLIO_CACHE_TIMEOUT',
+    default=300,
+    cast=int,
+)
+# Seconds a request waits for another request building the same portfolio.
+PORTFOLIO_BUILD_WAIT_SECONDS = config(
+    'PORTFOLIO_BUILD_WAIT_SECONDS',
+    default=2.0,
+    cast=float,
+)
+# Minutes a pending or rendering statement export is reused before a new
+# request replaces it as stuck.
+STATEMENT_EXPORT_STALE_MINUTES = config(
+    'STATEMENT_EXPORT_STALE_MINUTES',
+    default=15,
+    cast=int,
+)
+# Minutes a running dividend calculation blocks recalculation before a new
+# request takes it over as stuck.
+DIVIDEND_CALCULATION_STALE_MINUTES = config(
+    'DIVIDEND_CALCULATION_STALE_MINUTES',
+    default=60,
+    cast=int,
+)
+# Largest number of unpaid payouts a dividend disbursement may credit
+# inside the request with mode=sync; anything bigger runs in Celery.
+DIVIDEND_SYNC_DISBURSE_MAX_PAYOUTS = config(
+    'DIVIDEND_SYNC_DISBURSE_MAX_PAYOUTS',
+    default=200,
+    cast=int,
+)
+
 CELERY_BROKER_URL = config(
     'REDIS_URL',
     default='redis://localhost:6379/0',
@@ -1,18 +1,8 @@
 from decimal import Decimal
 
-from django.db.models import (
-    CharField,
-    Count,
-    DecimalField,
-    IntegerField,
-    OuterRef,
-    Prefetch,
-    Q,
-    Subquery,
-    Sum,
-    Value,
-)
-from django.db.models.functions import Cast, Coalesce
+from django.db.models import Count
+
+from .portfolio_read_model import get_member_portfolio
 
 
 ZERO = Decimal('0.00')
@@ -21,45 +11,12 @@ ZERO = Decimal('0.00')
 def get_unified_portfolio(user):
     """
     Aggregate all SACCO data for a member across all their active SACCOs.
-    Returns a portfolio dict. Uses a single prefetched queryset for SACCO data.
+    Returns a portfolio dict. Per-SACCO totals come from the MemberPortfolio
+    read model; only the recent transactions are queried live.
     """
     from payments.models import Transaction
-    from saccomembership.models import Membership
-    from services.models import Loan, RepaymentSchedule, Saving
-
-    pending_schedule_queryset = RepaymentSchedule.objects.filter(
-        status=RepaymentSchedule.Status.PENDING,
-    ).order_by('due_date')
-    active_loans_queryset = Loan.objects.filter(
-        status=Loan.Status.ACTIVE,
-    ).prefetch_related(
-        Prefetch(
-            'schedule',
-            queryset=pending_schedule_queryset,
-            to_attr='pending_schedule',
-        )
-    )
-    memberships = list(
-        Membership.objects.filter(
-            user=user,
-            status=Membership.Status.APPROVED,
-        ).select_related('sacco').prefetch_related(
-            Prefetch(
-                'saving_set',
-                queryset=Saving.objects.filter(
-                    status=Saving.Status.ACTIVE,
-                ).select_related('savings_type'),
-                to_attr='active_savings',
-            ),
-            Prefetch(
-                'loan_set',
-                queryset=active_loans_queryset,
-                to_attr='active_loans',
-            ),
-        )
-    )
 
-    saccos = [get_per_sacco_summary(membership) for membership in memberships]
+    saccos = _get_approved_entries(user)
     recent_transactions = [
         _serialize_transaction(transaction)
         for transaction in Transaction.objects.filter(
@@ -68,7 +25,7 @@ def get_unified_portfolio(user):
     ]
 
     return {
-        'total_saccos': len(memberships),
+        'total_saccos': len(saccos),
         'total_savings': _sum_decimal(
             sacco['savings_total'] for sacco in saccos
         ),
@@ -83,38 +40,13 @@ def get_unified_portfolio(user):
     }
 
 
-def get_per_sacco_summary(membership):
-    savings = getattr(membership, 'active_savings', [])
-    loans = getattr(membership, 'active_loans', [])
-    bosa_total = _sum_savings_by_type(savings, 'BOSA')
-    fosa_total = _sum_savings_by_type(savings, 'FOSA')
-    share_capital_total = _sum_savings_by_type(savings, 'SHARE_CAPITAL')
-    outstanding_loan_balance = _sum_decimal(
-        loan.outstanding_balance for loan in loans
-    )
-
-    return {
-        'sacco_id': str(membership.sacco_id),
-        'sacco_name': membership.sacco.name,
-        'sacco_logo_url': _get_sacco_logo_url(membership),
-        'member_number': membership.member_number,
-        'membership_status': membership.status,
-        'savings_total': _sum_decimal(saving.amount for saving in savings),
-        'bosa_total': bosa_total,
-        'fosa_total': fosa_total,
-        'share_capital_total': share_capital_total,
-        'active_loans_count': len(loans),
-        'outstanding_loan_balance': outstanding_loan_balance,
-        'next_due_date': _get_next_due_date(loans),
-    }
-
-
 def get_dashboard_state(user):
     from saccomembership.models import Membership
 
-    statuses = list(
-        Membership.objects.filter(user=user).values_list('status', flat=True)
-    )
+    statuses = [
+        entry['membership_status']
+        for entry in get_member_portfolio(user.pk)
+    ]
     active_count = statuses.count(Membership.Status.APPROVED)
     pending_count = sum(
         1
@@ -158,88 +90,44 @@ def get_sacco_switcher_data(user):
     Return approved SACCO memberships for the dashboard SACCO switcher.
     """
     from notifications.models import Notification
-    from saccomembership.models import Membership
-    from services.models import Loan, Saving
 
-    unread_notifications = Notification.objects.filter(
-        user=user,
-        is_read=False,
-        related_object_type__iexact='Sacco',
-        related_object_id=Cast(OuterRef('sacco_id'), CharField()),
-    ).values('related_object_id').annotate(
-        total=Count('id')
-    ).values('total')[:1]
-
-    memberships = Membership.objects.filter(
-        user=user,
-        status=Membership.Status.APPROVED,
-    ).select_related('sacco').annotate(
-        savings_total=Coalesce(
-            Sum(
-                'saving__amount',
-                filter=Q(saving__status=Saving.Status.ACTIVE),
-                output_field=DecimalField(max_digits=12, decimal_places=2),
-            ),
-            Value(ZERO),
-            output_field=DecimalField(max_digits=12, decimal_places=2),
-        ),
-        active_loans=Count(
-            'loan',
-            filter=Q(loan__status=Loan.Status.ACTIVE),
-            distinct=True,
-        ),
-        unread_notifications=Coalesce(
-            Subquery(unread_notifications, output_field=IntegerField()),
-            Value(0),
-        ),
-    ).order_by('sacco__name')
+    unread_notifications = dict(
+        Notification.objects.filter(
+            user=user,
+            is_read=False,
+            related_object_type__iexact='Sacco',
+        )
+        .order_by()
+        .values('related_object_id')
+        .annotate(total=Count('id'))
+        .values_list('related_object_id', 'total')
+    )
 
     return [
         {
-            'sacco_id': str(membership.sacco_id),
-            'sacco_name': membership.sacco.name,
-            'sacco_logo_url': _get_sacco_logo_url(membership),
-            'savings_total': membership.savings_total,
-            'active_loans': membership.active_loans,
-            'unread_notifications': membership.unread_notifications,
-            'member_number': membership.member_number,
+            'sacco_id': entry['sacco_id'],
+            'sacco_name': entry['sacco_name'],
+            'sacco_logo_url': entry['sacco_logo_url'],
+            'savings_total': entry['savings_total'],
+            'active_loans': entry['active_loans_count'],
+            'unread_notifications': unread_notifications.get(
+                entry['sacco_id'],
+                0,
+            ),
+            'member_number': entry['member_number'],
         }
-        for membership in memberships
+        for entry in _get_approved_entries(user)
     ]
 
 
-def _sum_savings_by_type(savings, savings_type_name):
-    return _sum_decimal(
-        saving.amount
-        for saving in savings
-        if (
-            saving.savings_type
-            and saving.savings_type.name == savings_type_name
-        )
-    )
-
+def _get_approved_entries(user):
+    from saccomembership.models import Membership
 
-def _get_next_due_date(loans):
-    due_dates = [
-        schedule.due_date
-        for loan in loans
-        for schedule in getattr(loan, 'pending_schedule', [])
+    return [
+        entry
+        for entry in get_member_portfolio(user.pk)
+        if entry['membership_status'] == Membership.Status.APPROVED
     ]
-    if not due_dates:
-        return None
-
-    return min(due_dates).isoformat()
-
-
-def _get_sacco_logo_url(membership):
-    logo = membership.sacco.logo
-    if not logo:
-        return None
-
-    try:
-        return logo.url
-    except ValueError:
-        return None
 
 
 def _serialize_transaction(transaction):
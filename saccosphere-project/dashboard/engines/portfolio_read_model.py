@@ -0,0 +1,308 @@
+"""
+Per-user portfolio read model behind the member dashboard.
+
+MemberPortfolio holds one row of savings and loan totals per membership.
+Writes that move a membership's savings, loans, repayment schedule or
+ledger call schedule_portfolio_refresh(); once the transaction commits the
+affected rows are recomputed with grouped queries and each affected
+user's cached payload is rewritten (write-through). Dashboard reads go
+through get_member_portfolio(), which serves the cached payload and lets
+only one request rebuild a cold key while the others wait for it.
+"""
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from dashboard.models import MemberPortfolio
+
+
+logger = logging.getLogger('saccosphere.dashboard')
+
+PORTFOLIO_CACHE_KEY = 'dashboard:portfolio:{user_id}'
+PORTFOLIO_BUILD_LOCK_KEY = 'dashboard:portfolio:{user_id}:build'
+BUILD_LOCK_TIMEOUT = 30
+BUILD_POLL_SECONDS = 0.05
+SAVINGS_TYPE_FIELDS = {
+    'BOSA': 'bosa_total',
+    'FOSA': 'fosa_total',
+    'SHARE_CAPITAL': 'share_capital_total',
+}
+PORTFOLIO_FIELDS = (
+    'user',
+    'sacco',
+    'savings_total',
+    'bosa_total',
+    'fosa_total',
+    'share_capital_total',
+    'active_loans_count',
+    'outstanding_loan_balance',
+    'next_due_date',
+    'updated_at',
+)
+
+_pending = threading.local()
+
+
+def compute_member_portfolios(membership_ids):
+    """Build unsaved MemberPortfolio rows with four grouped queries."""
+    from saccomembership.models import Membership
+    from services.models import Loan, RepaymentSchedule, Saving
+
+    rows = {
+        membership.id: MemberPortfolio(
+            membership_id=membership.id,
+            user_id=membership.user_id,
+            sacco_id=membership.sacco_id,
+        )
+        for membership in Membership.objects.filter(
+            id__in=membership_ids,
+        ).only('id', 'user_id', 'sacco_id')
+    }
+    if not rows:
+        return []
+
+    for membership_id, type_name, total in (
+        Saving.objects.filter(
+            membership_id__in=rows,
+            status=Saving.Status.ACTIVE,
+        )
+        .order_by()
+        .values('membership_id', 'savings_type__name')
+        .annotate(total=Sum('amount'))
+        .values_list('membership_id', 'savings_type__name', 'total')
+    ):
+        row = rows[membership_id]
+        row.savings_total += total
+        if type_name in SAVINGS_TYPE_FIELDS:
+            setattr(row, SAVINGS_TYPE_FIELDS[type_name], total)
+
+    for membership_id, count, balance in (
+        Loan.objects.filter(
+            membership_id__in=rows,
+            status=Loan.Status.ACTIVE,
+        )
+        .order_by()
+        .values('membership_id')
+        .annotate(count=Count('id'), balance=Sum('outstanding_balance'))
+        .values_list('membership_id', 'count', 'balance')
+    ):
+        rows[membership_id].active_loans_count = count
+        rows[membership_id].outstanding_loan_balance = balance
+
+    for membership_id, next_due_date in (
+        RepaymentSchedule.objects.filter(
+            loan__membership_id__in=rows,
+            loan__status=Loan.Status.ACTIVE,
+            status=RepaymentSchedule.Status.PENDING,
+        )
+        .order_by()
+        .values('loan__membership_id')
+        .annotate(next_due_date=Min('due_date'))
+        .values_list('loan__membership_id', 'next_due_date')
+    ):
+        rows[membership_id].next_due_date = next_due_date
+
+    return list(rows.values())
+
+
+def refresh_member_portfolios(membership_ids):
+    """
+    Recompute and upsert the portfolio rows of the given memberships.
+
+    Returns the ids of the users whose rows were refreshed.
+    """
+    rows = compute_member_portfolios(set(membership_ids))
+    if rows:
+        MemberPortfolio.objects.bulk_create(
+            rows,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['membership'],
+            update_fields=list(PORTFOLIO_FIELDS),
+        )
+    return {row.user_id for row in rows}
+
+
+def schedule_portfolio_refresh(membership_ids=(), loan_ids=(), user_ids=()):
+    """
+    Refresh portfolio rows and cached payloads once the transaction commits.
+
+    Ids scheduled by every write in one transaction are collected and
+    refreshed together by the first commit callback; later callbacks
+    find nothing left to do. ``loan_ids`` are resolved to their
+    memberships at refresh time, and ``user_ids`` only have their cached
+    payload rewritten, e.g. after a membership is deleted.
+    """
+    pending = _get_pending()
+    pending['membership_ids'].update(membership_ids)
+    pending['loan_ids'].update(loan_ids)
+    pending['user_ids'].update(user_ids)
+    transaction.on_commit(_flush_pending_refreshes, robust=True)
+
+
+def _get_pending():
+    if not hasattr(_pending, 'ids'):
+        _pending.ids = {
+            'membership_ids': set(),
+            'loan_ids': set(),
+            'user_ids': set(),
+        }
+    return _pending.ids
+
+
+def _flush_pending_refreshes():
+    from services.models import Loan
+
+    pending = _get_pending()
+    membership_ids = set(pending['membership_ids'])
+    loan_ids = set(pending['loan_ids'])
+    user_ids = set(pending['user_ids'])
+    for ids in pending.values():
+        ids.clear()
+    if not (membership_ids or loan_ids or user_ids):
+        return
+
+    if loan_ids:
+        membership_ids.update(
+            Loan.objects.filter(id__in=loan_ids).values_list(
+                'membership_id',
+                flat=True,
+            )
+        )
+    user_ids |= refresh_member_portfolios(membership_ids)
+    write_portfolio_payloads(user_ids)
+
+
+def build_portfolio_payloads(user_ids):
+    """
+    Return ``{user_id: [membership entry, ...]}`` from the read model.
+
+    Memberships without a portfolio row yet are materialized first, so a
+    cold user costs one refresh and never a full multi-prefetch read.
+    """
+    from saccomembership.models import Membership
+
+    user_ids = set(user_ids)
+    memberships = list(
+        Membership.objects.filter(user_id__in=user_ids)
+        .select_related('sacco', 'portfolio')
+        .order_by('sacco__name')
+    )
+    missing = [
+        membership.id
+        for membership in memberships
+        if not hasattr(membership, 'portfolio')
+    ]
+    if missing:
+        refresh_member_portfolios(missing)
+        rows = {
+            row.membership_id: row
+            for row in MemberPortfolio.objects.filter(
+                membership_id__in=missing,
+            )
+        }
+        for membership in memberships:
+            if membership.id in rows:
+                membership.portfolio = rows[membership.id]
+
+    payloads = {user_id: [] for user_id in user_ids}
+    for membership in memberships:
+        payloads.setdefault(membership.user_id, []).append(
+            _serialize_entry(membership),
+        )
+    return payloads
+
+
+def write_portfolio_payloads(user_ids):
+    """Rebuild and cache the payloads of the given users."""
+    if not user_ids:
+        return
+
+    payloads = build_portfolio_payloads(user_ids)
+    cache.set_many(
+        {
+            PORTFOLIO_CACHE_KEY.format(user_id=user_id): payload
+            for user_id, payload in payloads.items()
+        },
+        timeout=settings.PORTFOLIO_CACHE_TIMEOUT,
+    )
+
+
+def get_member_portfolio(user_id):
+    """
+    Return a user's portfolio entries, one per membership.
+
+    On a cold key only the request that takes the build lock reads the
+    database; concurrent requests poll the cache for up to
+    PORTFOLIO_BUILD_WAIT_SECONDS and build it themselves only if the
+    builder has not finished by then. The builder stores the payload with
+    cache.add, so a refresh that committed meanwhile is never overwritten.
+    """
+    cache_key = PORTFOLIO_CACHE_KEY.format(user_id=user_id)
+    payload = cache.get(cache_key)
+    if payload is not None:
+        return payload
+
+    lock_key = PORTFOLIO_BUILD_LOCK_KEY.format(user_id=user_id)
+    locked = cache.add(lock_key, True, timeout=BUILD_LOCK_TIMEOUT)
+    if not locked:
+        deadline = time.monotonic() + settings.PORTFOLIO_BUILD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(BUILD_POLL_SECONDS)
+            payload = cache.get(cache_key)
+            if payload is not None:
+                return payload
+        logger.warning(
+            'Portfolio build for user_id=%s is slow; building directly.',
+            user_id,
+        )
+
+    try:
+        payload = build_portfolio_payloads([user_id])[user_id]
+        cache.add(
+            cache_key,
+            payload,
+            timeout=settings.PORTFOLIO_CACHE_TIMEOUT,
+        )
+    finally:
+        if locked:
+            cache.delete(lock_key)
+    return payload
+
+
+def _serialize_entry(membership):
+    portfolio = getattr(membership, 'portfolio', None) or MemberPortfolio()
+    return {
+        'sacco_id': str(membership.sacco_id),
+        'sacco_name': membership.sacco.name,
+        'sacco_logo_url': _get_sacco_logo_url(membership.sacco),
+        'member_number': membership.member_number,
+        'membership_status': membership.status,
+        'savings_total': portfolio.savings_total,
+        'bosa_total': portfolio.bosa_total,
+        'fosa_total': portfolio.fosa_total,
+        'share_capital_total': portfolio.share_capital_total,
+        'active_loans_count': portfolio.active_loans_count,
+        'outstanding_loan_balance': portfolio.outstanding_loan_balance,
+        'next_due_date': (
+            portfolio.next_due_date.isoformat()
+            if portfolio.next_due_date
+            else None
+        ),
+    }
+
+
+def _get_sacco_logo_url(sacco):
+    if not sacco.logo:
+        return None
+
+    try:
+        return sacco.logo.url
+    except ValueError:
+        return None
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.16 on 2026-10-18 17:50
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('saccomembership', '0003_membership_saccomember_sacco_i_2f5c18_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemberPortfolio',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('savings_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of all active savings accounts.', max_digits=14)),
+                ('bosa_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('fosa_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('share_capital_total', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('active_loans_count', models.PositiveIntegerField(default=0)),
+                ('outstanding_loan_balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Outstanding balance across active loans.', max_digits=14)),
+                ('next_due_date', models.DateField(blank=True, help_text='Earliest pending instalment of an active loan.', null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio', to='saccomembership.membership')),
+                ('sacco', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_portfolios', to='accounts.sacco')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='member_portfolios', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Member portfolio',
+                'verbose_name_plural': 'Member portfolios',
+            },
+        ),
+    ]
@@ -1,4 +1,78 @@
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
 from django.db import models
 
 
-# Create your models here.
+class MemberPortfolio(models.Model):
+    """
+    Materialized dashboard totals for one membership.
+
+    Rows are refreshed by dashboard.engines.portfolio_read_model whenever
+    savings, loans, repayment schedules or ledger entries of the membership
+    change, so the dashboard reads them instead of aggregating on every
+    request.
+    """
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+    )
+    membership = models.OneToOneField(
+        'saccomembership.Membership',
+        on_delete=models.CASCADE,
+        related_name='portfolio',
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='member_portfolios',
+    )
+    sacco = models.ForeignKey(
+        'accounts.Sacco',
+        on_delete=models.CASCADE,
+        related_name='member_portfolios',
+    )
+    savings_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Sum of all active savings accounts.',
+    )
+    bosa_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    fosa_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    share_capital_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    active_loans_count = models.PositiveIntegerField(default=0)
+    outstanding_loan_balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Outstanding balance across active loans.',
+    )
+    next_due_date = models.DateField(
+        null=True,
+        blank=True,
+        help_text='Earliest pending instalment of an active loan.',
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Member portfolio'
+        verbose_name_plural = 'Member portfolios'
+
+    def __str__(self):
+        return f'{self.membership} — {self.savings_total}'
@@ -0,0 +1,40 @@
+"""Signals that keep the member portfolio read model in sync."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from dashboard.engines.portfolio_read_model import schedule_portfolio_refresh
+from ledger.models import LedgerEntry
+from ledger.signals import ledger_entries_posted
+from saccomembership.models import Membership
+from services.models import Loan, RepaymentSchedule, Saving
+
+
+@receiver(post_save, sender=Saving)
+@receiver(post_delete, sender=Saving)
+@receiver(post_save, sender=Loan)
+@receiver(post_delete, sender=Loan)
+@receiver(post_save, sender=LedgerEntry)
+def refresh_portfolio_on_account_change(sender, instance, **kwargs):
+    schedule_portfolio_refresh(membership_ids=[instance.membership_id])
+
+
+@receiver(post_save, sender=RepaymentSchedule)
+@receiver(post_delete, sender=RepaymentSchedule)
+def refresh_portfolio_on_schedule_change(sender, instance, **kwargs):
+    schedule_portfolio_refresh(loan_ids=[instance.loan_id])
+
+
+@receiver(ledger_entries_posted)
+def refresh_portfolio_on_bulk_ledger_post(sender, membership_ids, **kwargs):
+    schedule_portfolio_refresh(membership_ids=membership_ids)
+
+
+@receiver(post_save, sender=Membership)
+def refresh_portfolio_on_membership_change(sender, instance, **kwargs):
+    schedule_portfolio_refresh(membership_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Membership)
+def refresh_portfolio_on_membership_delete(sender, instance, **kwargs):
+    schedule_portfolio_refresh(user_ids=[instance.user_id])
@@ -1,5 +1,197 @@
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Sacco, User
+from ledger.models import LedgerEntry
+from ledger.utils import create_ledger_entries
+from saccomembership.models import Membership
+from services.models import (
+    Loan,
+    LoanType,
+    RepaymentSchedule,
+    Saving,
+    SavingsType,
+)
+
+from .engines.portfolio_read_model import (
+    PORTFOLIO_BUILD_LOCK_KEY,
+    PORTFOLIO_CACHE_KEY,
+    get_member_portfolio,
+)
+from .models import MemberPortfolio
 
 
 class DashboardTests(TestCase):
     pass
+
+
+class MemberPortfolioReadModelTests(TestCase):
+    """Test the materialized portfolio, write-through and cold keys."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='portfolio-member@example.com',
+            password='StrongPass1',
+        )
+        self.client.force_authenticate(user=self.user)
+        self.sacco = Sacco.objects.create(
+            name='Portfolio SACCO',
+            registration_number='PORT001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.membership = Membership.objects.create(
+            user=self.user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number='PORT-1',
+        )
+        self.bosa = Saving.objects.create(
+            membership=self.membership,
+            savings_type=SavingsType.objects.create(
+                sacco=self.sacco,
+                name=SavingsType.Name.BOSA,
+            ),
+            amount=Decimal('1000.00'),
+        )
+        Saving.objects.create(
+            membership=self.membership,
+            savings_type=SavingsType.objects.create(
+                sacco=self.sacco,
+                name=SavingsType.Name.SHARE_CAPITAL,
+            ),
+            amount=Decimal('500.00'),
+        )
+        self.loan = Loan.objects.create(
+            membership=self.membership,
+            loan_type=LoanType.objects.create(
+                sacco=self.sacco,
+                name='Portfolio Loan',
+                interest_rate=Decimal('12.00'),
+                max_term_months=12,
+                min_amount=Decimal('100.00'),
+            ),
+            amount=Decimal('300.00'),
+            interest_rate=Decimal('12.00'),
+            term_months=3,
+            outstanding_balance=Decimal('300.00'),
+            status=Loan.Status.ACTIVE,
+        )
+        self.due_date = timezone.localdate() + timedelta(days=30)
+        self.instalment = RepaymentSchedule.objects.create(
+            loan=self.loan,
+            instalment_number=1,
+            due_date=self.due_date,
+            amount=Decimal('100.00'),
+            principal=Decimal('90.00'),
+            interest=Decimal('10.00'),
+            balance_after=Decimal('200.00'),
+        )
+
+    def test_cold_portfolio_is_materialized_once(self):
+        response = self.client.get('/api/v1/dashboard/portfolio/')
+
+        self.assertEqual(response.status_code, 200)
+        sacco = response.data['saccos'][0]
+        self.assertEqual(sacco['savings_total'], Decimal('1500.00'))
+        self.assertEqual(sacco['bosa_total'], Decimal('1000.00'))
+        self.assertEqual(sacco['share_capital_total'], Decimal('500.00'))
+        self.assertEqual(sacco['active_loans_count'], 1)
+        self.assertEqual(
+            sacco['outstanding_loan_balance'],
+            Decimal('300.00'),
+        )
+        self.assertEqual(sacco['next_due_date'], self.due_date.isoformat())
+        self.assertEqual(response.data['total_savings'], Decimal('1500.00'))
+        self.assertEqual(MemberPortfolio.objects.count(), 1)
+
+        with self.assertNumQueries(0):
+            get_member_portfolio(self.user.pk)
+
+    def test_writes_rewrite_the_cached_portfolio(self):
+        get_member_portfolio(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.bosa.amount = Decimal('1250.00')
+            self.bosa.save(update_fields=['amount'])
+            self.instalment.status = RepaymentSchedule.Status.PAID
+            self.instalment.save(update_fields=['status'])
+
+        with self.assertNumQueries(0):
+            entry = get_member_portfolio(self.user.pk)[0]
+        self.assertEqual(entry['savings_total'], Decimal('1750.00'))
+        self.assertIsNone(entry['next_due_date'])
+
+    def test_bulk_ledger_posts_refresh_the_portfolio(self):
+        get_member_portfolio(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Saving.objects.filter(pk=self.bosa.pk).update(
+                amount=Decimal('1100.00'),
+            )
+            create_ledger_entries(
+                [
+                    {
+                        'membership': self.membership,
+                        'entry_type': LedgerEntry.EntryType.CREDIT,
+                        'category': LedgerEntry.Category.DIVIDEND_PAYOUT,
+                        'amount': Decimal('100.00'),
+                        'description': 'Dividend payout',
+                    }
+                ]
+            )
+
+        portfolio = MemberPortfolio.objects.get(membership=self.membership)
+        self.assertEqual(portfolio.bosa_total, Decimal('1100.00'))
+        self.assertEqual(
+            get_member_portfolio(self.user.pk)[0]['savings_total'],
+            Decimal('1600.00'),
+        )
+
+    def test_cold_key_waits_for_the_request_building_it(self):
+        cache.add(PORTFOLIO_BUILD_LOCK_KEY.format(user_id=self.user.pk), True)
+        built = [{'membership_status': Membership.Status.APPROVED}]
+
+        def builder_finishes(seconds):
+            cache.set(PORTFOLIO_CACHE_KEY.format(user_id=self.user.pk), built)
+
+        with patch(
+            'dashboard.engines.portfolio_read_model.time.sleep',
+            side_effect=builder_finishes,
+        ):
+            with self.assertNumQueries(0):
+                payload = get_member_portfolio(self.user.pk)
+
+        self.assertEqual(payload, built)
+
+    def test_switcher_and_state_read_the_portfolio(self):
+        Membership.objects.create(
+            user=self.user,
+            sacco=Sacco.objects.create(
+                name='Pending SACCO',
+                registration_number='PORT002',
+                sector=Sacco.Sector.FINANCE,
+                county='Nairobi',
+            ),
+            status=Membership.Status.PENDING,
+        )
+
+        switcher = self.client.get('/api/v1/dashboard/saccos/')
+        state = self.client.get('/api/v1/dashboard/state/')
+
+        self.assertEqual(len(switcher.data), 1)
+        self.assertEqual(switcher.data[0]['active_loans'], 1)
+        self.assertEqual(
+            switcher.data[0]['savings_total'],
+            Decimal('1500.00'),
+        )
+        self.assertEqual(state.data['state'], 'PARTIAL_ACTIVE')
+        self.assertEqual(MemberPortfolio.objects.count(), 2)
@@ -27,16 +27,7 @@ class PortfolioView(APIView):
         security=[{'Bearer': []}],
     )
     def get(self, request):
-        cache_key = f'portfolio:{request.user.id}'
-        portfolio = cache.get(cache_key)
-        if portfolio is not None:
-            response = Response(portfolio, status=200)
-            response['X-Cache'] = 'HIT'
-            return response
-
-        portfolio = get_unified_portfolio(request.user)
-        cache.set(cache_key, portfolio, timeout=120)
-        return Response(portfolio, status=200)
+        return Response(get_unified_portfolio(request.user), status=200)
 
 
 class DashboardStateView(APIView):
@@ -48,16 +39,7 @@ class DashboardStateView(APIView):
         security=[{'Bearer': []}],
     )
     def get(self, request):
-        cache_key = f'dashboard_state:{request.user.id}'
-        state = cache.get(cache_key)
-        if state is not None:
-            response = Response(state, status=200)
-            response['X-Cache'] = 'HIT'
-            return response
-
-        state = get_dashboard_state(request.user)
-        cache.set(cache_key, state, timeout=60)
-        return Response(state, status=200)
+        return Response(get_dashboard_state(request.user), status=200)
 
 
 class SACCOSwitcherView(ListAPIView):
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import LedgerEntry
+from .models import LedgerBalanceHead, LedgerEntry, StatementExport
 
 
 @admin.register(LedgerEntry)
@@ -76,3 +76,83 @@ class LedgerEntryAdmin(admin.ModelAdmin):
 
     def has_delete_permission(self, request, obj=None):
         return False
+
+
+@admin.register(LedgerBalanceHead)
+class LedgerBalanceHeadAdmin(admin.ModelAdmin):
+    list_display = (
+        'membership',
+        'balance',
+        'total_credits',
+        'total_debits',
+        'sequence',
+        'updated_at',
+    )
+    search_fields = (
+        'membership__user__email',
+        'membership__member_number',
+        'membership__sacco__name',
+    )
+    readonly_fields = (
+        'id',
+        'membership',
+        'total_credits',
+        'total_debits',
+        'balance',
+        'sequence',
+        'updated_at',
+    )
+    list_select_related = ('membership',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(StatementExport)
+class StatementExportAdmin(admin.ModelAdmin):
+    list_display = (
+        'membership',
+        'from_date',
+        'to_date',
+        'status',
+        'page_count',
+        'render_seconds',
+        'created_at',
+    )
+    list_filter = ('status', 'created_at')
+    search_fields = (
+        'membership__user__email',
+        'membership__member_number',
+        'cache_key',
+    )
+    readonly_fields = (
+        'id',
+        'membership',
+        'requested_by',
+        'from_date',
+        'to_date',
+        'last_entry_id',
+        'cache_key',
+        'status',
+        'file',
+        'page_count',
+        'render_seconds',
+        'error_message',
+        'created_at',
+        'completed_at',
+    )
+    list_select_related = ('membership',)
+    list_per_page = 50
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
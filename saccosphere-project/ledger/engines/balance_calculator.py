@@ -1,13 +1,16 @@
-from datetime import datetime
+from datetime import date as date_type
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 from uuid import uuid4
 
-from django.db.models import Sum
+from django.db.models import OuterRef, Subquery, Sum
+from django.utils import timezone
 
-from ledger.models import LedgerEntry
+from ledger.models import LedgerBalanceHead, LedgerEntry
 
 
 ZERO = Decimal('0.00')
+AS_OF_DATES_PER_QUERY = 24
 
 
 def get_running_balance(membership, as_of_date=None):
@@ -15,11 +18,124 @@ def get_running_balance(membership, as_of_date=None):
     Calculate a member's ledger balance up to a given date.
 
     LedgerEntry is the source of truth for this calculation, not Saving.amount.
+    The current balance is read from the membership's LedgerBalanceHead and
+    historical balances from the stored balance_after of the last entry
+    posted before the cutoff.
     """
-    queryset = LedgerEntry.objects.filter(membership=membership)
     if as_of_date:
-        queryset = queryset.filter(created_at__date__lte=as_of_date)
+        return get_balance_as_of(membership, as_of_date)
 
+    head_balance = LedgerBalanceHead.objects.filter(
+        membership_id=_get_pk(membership),
+    ).values_list('balance', flat=True).first()
+    if head_balance is not None:
+        return head_balance
+
+    return _sum_entries(LedgerEntry.objects.filter(membership=membership))
+
+
+def get_balance_at_date(membership, date):
+    """Return a member's ledger balance at a specific date."""
+    return get_running_balance(membership, as_of_date=date)
+
+
+def get_balance_as_of(membership, as_of):
+    """
+    Return the balance_after of the last entry posted up to ``as_of``.
+
+    A date includes every entry made on that local calendar day. The cutoff
+    is applied as a range on created_at so the (membership, created_at)
+    index answers the lookup with a single seek.
+    """
+    balance = _latest_entries_before(
+        LedgerEntry.objects.filter(membership_id=_get_pk(membership)),
+        as_of,
+    ).values_list('balance_after', flat=True).first()
+    return balance if balance is not None else ZERO
+
+
+def get_balances_as_of(pairs):
+    """
+    Resolve many (membership, as_of) lookups with one query per date group.
+
+    Returns a dictionary keyed by (membership_id, as_of). Each distinct as_of
+    becomes a correlated subquery annotation on Membership, so a dividend
+    run asking for twelve month-ends across a whole SACCO is one query.
+    """
+    from saccomembership.models import Membership
+
+    membership_ids_by_date = {}
+    for membership, as_of in pairs:
+        membership_ids_by_date.setdefault(as_of, set()).add(
+            _get_pk(membership),
+        )
+
+    balances = {}
+    dates = list(membership_ids_by_date)
+    for start in range(0, len(dates), AS_OF_DATES_PER_QUERY):
+        date_group = dates[start:start + AS_OF_DATES_PER_QUERY]
+        membership_ids = set().union(
+            *(membership_ids_by_date[as_of] for as_of in date_group)
+        )
+        annotations = {
+            f'as_of_{index}': Subquery(
+                _latest_entries_before(
+                    LedgerEntry.objects.filter(membership_id=OuterRef('pk')),
+                    as_of,
+                ).values('balance_after')[:1]
+            )
+            for index, as_of in enumerate(date_group)
+        }
+        rows = Membership.objects.filter(
+            pk__in=membership_ids,
+        ).order_by().annotate(**annotations).values(
+            'pk',
+            *annotations,
+        )
+        for row in rows:
+            for index, as_of in enumerate(date_group):
+                if row['pk'] not in membership_ids_by_date[as_of]:
+                    continue
+                balance = row[f'as_of_{index}']
+                balances[(row['pk'], as_of)] = (
+                    balance if balance is not None else ZERO
+                )
+
+    for membership, as_of in pairs:
+        balances.setdefault((_get_pk(membership), as_of), ZERO)
+
+    return balances
+
+
+def get_as_of_cutoff(as_of):
+    """Return the exclusive created_at cutoff for a date or datetime."""
+    if isinstance(as_of, datetime):
+        if timezone.is_naive(as_of):
+            as_of = timezone.make_aware(as_of)
+        return as_of + timedelta(microseconds=1)
+
+    if isinstance(as_of, date_type):
+        return timezone.make_aware(
+            datetime.combine(as_of + timedelta(days=1), time.min),
+        )
+
+    raise TypeError('as_of must be a date or datetime.')
+
+
+def generate_reference(prefix):
+    """Generate a unique human-readable ledger reference."""
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    suffix = uuid4().hex[:6].upper()
+    return f'{prefix}-{timestamp}-{suffix}'
+
+
+def _latest_entries_before(queryset, as_of):
+    return queryset.filter(
+        created_at__lt=get_as_of_cutoff(as_of),
+    ).order_by('-created_at', '-id')
+
+
+def _sum_entries(queryset):
     credits = queryset.filter(
         entry_type=LedgerEntry.EntryType.CREDIT,
     ).aggregate(
@@ -34,13 +150,5 @@ def get_running_balance(membership, as_of_date=None):
     return credits - debits
 
 
-def get_balance_at_date(membership, date):
-    """Return a member's ledger balance at a specific date."""
-    return get_running_balance(membership, as_of_date=date)
-
-
-def generate_reference(prefix):
-    """Generate a unique human-readable ledger reference."""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    suffix = uuid4().hex[:6].upper()
-    return f'{prefix}-{timestamp}-{suffix}'
+def _get_pk(membership):
+    return getattr(membership, 'pk', membership)
@@ -1,5 +1,3 @@
-from copy import deepcopy
-
 from django.template.loader import render_to_string
 from django.utils import timezone
 
@@ -10,17 +8,28 @@ def generate_statement_pdf(statement_data):
 
     Returns bytes of the PDF file.
     """
+    pdf_bytes, _page_count = render_statement_pdf(statement_data)
+    return pdf_bytes
+
+
+def render_statement_pdf(statement_data):
+    """
+    Render a statement PDF and report how many pages it has.
+
+    Returns a tuple of (PDF bytes, page count).
+    """
     from weasyprint import HTML
 
     html_string = render_to_string(
         'ledger/statement.html',
         _format_statement_data(statement_data),
     )
-    return HTML(string=html_string).write_pdf()
+    document = HTML(string=html_string).render()
+    return document.write_pdf(), len(document.pages)
 
 
 def _format_statement_data(statement_data):
-    data = deepcopy(statement_data)
+    data = dict(statement_data)
 
     for field in (
         'opening_balance',
@@ -35,23 +44,30 @@ def _format_statement_data(statement_data):
     ).strftime('%Y-%m-%d %H:%M:%S')
     data['from_date'] = data['from_date'].strftime('%Y-%m-%d')
     data['to_date'] = data['to_date'].strftime('%Y-%m-%d')
-
-    for entry in data['entries']:
-        entry['created_at'] = timezone.localtime(
-            entry['created_at'],
-        ).strftime('%Y-%m-%d')
-        entry['balance_after_display'] = _format_money(
-            entry['balance_after'],
-        )
-        entry['debit_display'] = ''
-        entry['credit_display'] = ''
-        if entry['entry_type'] == 'DEBIT':
-            entry['debit_display'] = f"KES {_format_money(entry['amount'])}"
-        if entry['entry_type'] == 'CREDIT':
-            entry['credit_display'] = f"KES {_format_money(entry['amount'])}"
+    data['entries'] = [
+        _format_entry(entry)
+        for entry in statement_data['entries']
+    ]
 
     return data
 
 
+def _format_entry(entry):
+    formatted = dict(entry)
+    formatted['created_at'] = timezone.localtime(
+        entry['created_at'],
+    ).strftime('%Y-%m-%d')
+    formatted['balance_after_display'] = _format_money(
+        entry['balance_after'],
+    )
+    formatted['debit_display'] = ''
+    formatted['credit_display'] = ''
+    if entry['entry_type'] == 'DEBIT':
+        formatted['debit_display'] = f"KES {_format_money(entry['amount'])}"
+    if entry['entry_type'] == 'CREDIT':
+        formatted['credit_display'] = f"KES {_format_money(entry['amount'])}"
+    return formatted
+
+
 def _format_money(amount):
     return f'{amount:,.2f}'
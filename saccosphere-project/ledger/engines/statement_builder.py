@@ -1,14 +1,30 @@
-from datetime import timedelta
+import base64
+from datetime import datetime, timedelta
 from decimal import Decimal
+from uuid import UUID
 
-from django.db.models import Sum
+from django.db.models import Q
 from django.utils import timezone
 
-from ledger.engines.balance_calculator import get_balance_at_date
+from ledger.engines.balance_calculator import (
+    get_as_of_cutoff,
+    get_balance_as_of,
+)
 from ledger.models import LedgerEntry
 
 
 ZERO = Decimal('0.00')
+STATEMENT_CHUNK_SIZE = 2000
+STATEMENT_ENTRY_FIELDS = (
+    'id',
+    'entry_type',
+    'category',
+    'amount',
+    'description',
+    'reference',
+    'balance_after',
+    'created_at',
+)
 
 
 def build_statement(membership, from_date, to_date, requesting_user=None):
@@ -16,56 +32,203 @@ def build_statement(membership, from_date, to_date, requesting_user=None):
     Build a member financial statement for a SACCO and date range.
 
     The returned dictionary is ready for API serialization and PDF generation.
+    Use stream_statement instead when the entries do not all need to be held
+    in memory at once.
     """
-    opening_balance = get_balance_at_date(
+    stream = stream_statement(membership, from_date, to_date)
+    entries = list(stream)
+    statement = stream.summary()
+    statement['entries'] = entries
+    record_statement_access(membership, requesting_user)
+    return statement
+
+
+def build_statement_summary(
+    membership,
+    from_date,
+    to_date,
+    requesting_user=None,
+):
+    """
+    Return statement balances and totals without keeping any entries.
+
+    The entries are read once with a server-side iterator and discarded,
+    so memory use does not grow with the length of the range.
+    """
+    summary = stream_statement(membership, from_date, to_date).consume()
+    record_statement_access(membership, requesting_user)
+    return summary.summary()
+
+
+def stream_statement(
+    membership,
+    from_date,
+    to_date,
+    chunk_size=STATEMENT_CHUNK_SIZE,
+):
+    """Return a StatementStream over a member's entries in a date range."""
+    return StatementStream(membership, from_date, to_date, chunk_size)
+
+
+class StatementStream:
+    """
+    Iterate a member statement once while keeping running totals.
+
+    Entries are read with a server-side iterator in (created_at, id) order
+    and yielded as serialized dictionaries. Totals and the closing balance
+    are accumulated during that same pass, so summary() is complete once
+    the stream is exhausted. The opening balance is a single indexed lookup
+    of the last balance_after before the range.
+    """
+
+    def __init__(
+        self,
         membership,
-        from_date - timedelta(days=1),
-    )
-    entries = LedgerEntry.objects.filter(
+        from_date,
+        to_date,
+        chunk_size=STATEMENT_CHUNK_SIZE,
+    ):
+        self.membership = membership
+        self.from_date = from_date
+        self.to_date = to_date
+        self.chunk_size = chunk_size
+        self.generated_at = timezone.now()
+        self.opening_balance = get_balance_as_of(
+            membership,
+            from_date - timedelta(days=1),
+        )
+        self.closing_balance = self.opening_balance
+        self.total_credits = ZERO
+        self.total_debits = ZERO
+        self.entry_count = 0
+        self.exhausted = False
+
+    def __iter__(self):
+        if self.exhausted:
+            raise RuntimeError('A statement stream can only be read once.')
+
+        entries = get_statement_queryset(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        ).values(*STATEMENT_ENTRY_FIELDS)
+        for entry in entries.iterator(chunk_size=self.chunk_size):
+            if entry['entry_type'] == LedgerEntry.EntryType.CREDIT:
+                self.total_credits += entry['amount']
+            else:
+                self.total_debits += entry['amount']
+            self.closing_balance = entry['balance_after']
+            self.entry_count += 1
+            yield _serialize_entry(entry)
+
+        self.exhausted = True
+
+    def consume(self):
+        """Read the rest of the stream for its totals only."""
+        for _entry in self:
+            pass
+        return self
+
+    def header(self):
+        """Return the statement fields that are known before iterating."""
+        membership = self.membership
+        return {
+            'member_name': membership.user.get_full_name(),
+            'member_number': membership.member_number,
+            'sacco_name': membership.sacco.name,
+            'sacco_logo_url': _get_sacco_logo_url(membership),
+            'from_date': self.from_date,
+            'to_date': self.to_date,
+            'generated_at': self.generated_at,
+            'opening_balance': self.opening_balance,
+            'currency': 'KES',
+        }
+
+    def summary(self):
+        """Return the statement header with totals from the finished pass."""
+        if not self.exhausted:
+            raise RuntimeError('Statement totals need a fully read stream.')
+
+        return {
+            **self.header(),
+            'closing_balance': self.closing_balance,
+            'total_credits': self.total_credits,
+            'total_debits': self.total_debits,
+            'entry_count': self.entry_count,
+        }
+
+
+def get_statement_queryset(membership, from_date, to_date):
+    """Return a member's entries in a date range in statement order."""
+    return LedgerEntry.objects.filter(
         membership=membership,
-        created_at__date__gte=from_date,
-        created_at__date__lte=to_date,
-    ).order_by('created_at').select_related('transaction')
-    closing_balance = get_balance_at_date(membership, to_date)
-    total_credits = entries.filter(
-        entry_type=LedgerEntry.EntryType.CREDIT,
-    ).aggregate(
-        Sum('amount'),
-    )['amount__sum'] or ZERO
-    total_debits = entries.filter(
-        entry_type=LedgerEntry.EntryType.DEBIT,
-    ).aggregate(
-        Sum('amount'),
-    )['amount__sum'] or ZERO
-
-    statement = {
-        'member_name': membership.user.get_full_name(),
-        'member_number': membership.member_number,
-        'sacco_name': membership.sacco.name,
-        'sacco_logo_url': _get_sacco_logo_url(membership),
-        'from_date': from_date,
-        'to_date': to_date,
-        'generated_at': timezone.now(),
-        'opening_balance': opening_balance,
-        'closing_balance': closing_balance,
-        'total_credits': total_credits,
-        'total_debits': total_debits,
-        'entries': [_serialize_entry(entry) for entry in entries],
-        'currency': 'KES',
-    }
-    _record_statement_access(membership, requesting_user)
-    return statement
+        created_at__gte=get_as_of_cutoff(from_date - timedelta(days=1)),
+        created_at__lt=get_as_of_cutoff(to_date),
+    ).order_by('created_at', 'id')
+
+
+def get_statement_page(
+    membership,
+    from_date,
+    to_date,
+    cursor=None,
+    page_size=50,
+):
+    """
+    Return one keyset page of statement entries.
+
+    The cursor is the opaque value returned for the previous page; it holds
+    the (created_at, id) of that page's last entry, so fetching deep pages
+    is as cheap as fetching the first one.
+
+    Returns:
+        tuple: (list of serialized entries, next cursor or None)
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    queryset = get_statement_queryset(membership, from_date, to_date)
+    if cursor:
+        created_at, entry_id = decode_statement_cursor(cursor)
+        queryset = queryset.filter(
+            Q(created_at__gt=created_at)
+            | Q(created_at=created_at, id__gt=entry_id)
+        )
+
+    rows = list(queryset.values(*STATEMENT_ENTRY_FIELDS)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_statement_cursor(rows[-1])
+
+    return [_serialize_entry(row) for row in rows], next_cursor
+
+
+def encode_statement_cursor(entry):
+    """Encode the (created_at, id) position of a statement entry."""
+    value = f'{entry["created_at"].isoformat()}|{entry["id"]}'
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_statement_cursor(cursor):
+    """Decode a statement cursor into (created_at, id)."""
+    try:
+        value = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, entry_id = value.split('|', 1)
+        return datetime.fromisoformat(created_at), UUID(entry_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as exc:
+        raise ValueError('Invalid statement cursor.') from exc
 
 
 def _serialize_entry(entry):
     return {
-        'entry_type': entry.entry_type,
-        'category': entry.category,
-        'amount': entry.amount,
-        'description': entry.description,
-        'reference': entry.reference,
-        'balance_after': entry.balance_after,
-        'created_at': entry.created_at,
+        'entry_type': entry['entry_type'],
+        'category': entry['category'],
+        'amount': entry['amount'],
+        'description': entry['description'],
+        'reference': entry['reference'],
+        'balance_after': entry['balance_after'],
+        'created_at': entry['created_at'],
     }
 
 
@@ -80,7 +243,8 @@ def _get_sacco_logo_url(membership):
         return None
 
 
-def _record_statement_access(membership, requesting_user=None):
+def record_statement_access(membership, requesting_user=None):
+    """Log that a member statement was generated."""
     try:
         from saccomanagement import create_data_consent_log
     except ImportError:
@@ -0,0 +1,231 @@
+"""Content-addressed, asynchronously rendered statement PDFs."""
+
+import hashlib
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from ledger.engines.balance_calculator import get_as_of_cutoff
+from ledger.engines.pdf_generator import render_statement_pdf
+from ledger.engines.statement_builder import build_statement
+from ledger.models import LedgerEntry, StatementExport
+
+
+logger = logging.getLogger('saccosphere.ledger')
+
+RENDER_SECONDS_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60)
+PAGE_COUNT_BUCKETS = (1, 2, 5, 10, 25, 50, 100)
+IN_FLIGHT_STATUSES = (
+    StatementExport.Status.PENDING,
+    StatementExport.Status.PROCESSING,
+)
+
+
+def get_statement_cache_key(membership, from_date, to_date):
+    """
+    Return (cache_key, last_entry_id) for a statement request.
+
+    The key changes only when a ledger entry is posted on or before
+    to_date, which is exactly when the rendered statement would change.
+    """
+    last_entry_id = LedgerEntry.objects.filter(
+        membership=membership,
+        created_at__lt=get_as_of_cutoff(to_date),
+    ).order_by('-created_at', '-id').values_list('id', flat=True).first()
+    raw_key = f'{membership.pk}:{from_date}:{to_date}:{last_entry_id or "-"}'
+    return hashlib.sha256(raw_key.encode()).hexdigest(), last_entry_id
+
+
+def request_statement_export(
+    membership,
+    from_date,
+    to_date,
+    requested_by=None,
+):
+    """
+    Return (export, created) for a statement PDF request.
+
+    A finished export with the same cache key is returned as is, and so
+    is an in-flight one younger than STATEMENT_EXPORT_STALE_MINUTES.
+    Older in-flight exports are taken to have lost their task or worker:
+    they are marked FAILED and a new PENDING export is created for a
+    worker to render, as when nothing matches.
+    """
+    cache_key, last_entry_id = get_statement_cache_key(
+        membership,
+        from_date,
+        to_date,
+    )
+    exports = StatementExport.objects.filter(cache_key=cache_key)
+    export = exports.filter(
+        status=StatementExport.Status.COMPLETED,
+    ).order_by('-created_at').first()
+    if export is None:
+        stale_before = timezone.now() - timedelta(
+            minutes=settings.STATEMENT_EXPORT_STALE_MINUTES,
+        )
+        in_flight = exports.filter(status__in=IN_FLIGHT_STATUSES)
+        export = in_flight.filter(
+            created_at__gte=stale_before,
+        ).order_by('-created_at').first()
+        if export is None:
+            _fail_stale_exports(in_flight.filter(created_at__lt=stale_before))
+    if export is not None:
+        return export, False
+
+    export = StatementExport.objects.create(
+        membership=membership,
+        requested_by=requested_by,
+        from_date=from_date,
+        to_date=to_date,
+        last_entry_id=last_entry_id,
+        cache_key=cache_key,
+    )
+    return export, True
+
+
+def render_statement_export(export_id):
+    """Render one statement export to media storage and record metrics."""
+    export = StatementExport.objects.select_related(
+        'membership__user',
+        'membership__sacco',
+        'requested_by',
+    ).get(pk=export_id)
+    if export.status == StatementExport.Status.COMPLETED:
+        return export
+
+    export.status = StatementExport.Status.PROCESSING
+    export.save(update_fields=['status'])
+
+    statement = build_statement(
+        export.membership,
+        export.from_date,
+        export.to_date,
+        requesting_user=export.requested_by,
+    )
+    started = time.perf_counter()
+    pdf_bytes, page_count = render_statement_pdf(statement)
+    render_seconds = time.perf_counter() - started
+
+    export.file.save(
+        f'{export.cache_key}.pdf',
+        ContentFile(pdf_bytes),
+        save=False,
+    )
+    export.page_count = page_count
+    export.render_seconds = round(render_seconds, 3)
+    export.status = StatementExport.Status.COMPLETED
+    export.completed_at = timezone.now()
+    export.save(
+        update_fields=[
+            'file',
+            'page_count',
+            'render_seconds',
+            'status',
+            'completed_at',
+        ]
+    )
+    return export
+
+
+def mark_statement_export_failed(export_id, error_message):
+    """Record why a statement export could not be rendered."""
+    StatementExport.objects.filter(pk=export_id).update(
+        status=StatementExport.Status.FAILED,
+        error_message=str(error_message)[:1000],
+        completed_at=timezone.now(),
+    )
+
+
+def invalidate_statement_exports(membership_id, error_message):
+    """
+    Fail every usable export of a membership's statements.
+
+    Cache keys only change when an entry is posted, so after history is
+    rewritten in place the old PDFs would keep being served. Failed
+    exports are never reused and the next request renders afresh.
+    """
+    return StatementExport.objects.filter(
+        membership_id=membership_id,
+    ).exclude(
+        status=StatementExport.Status.FAILED,
+    ).update(
+        status=StatementExport.Status.FAILED,
+        error_message=str(error_message)[:1000],
+        completed_at=timezone.now(),
+    )
+
+
+def _fail_stale_exports(exports):
+    stale = exports.update(
+        status=StatementExport.Status.FAILED,
+        error_message=(
+            f'Rendering did not finish within '
+            f'{settings.STATEMENT_EXPORT_STALE_MINUTES} minutes.'
+        ),
+        completed_at=timezone.now(),
+    )
+    if stale:
+        logger.warning(
+            'Replaced %s stuck statement exports.',
+            stale,
+        )
+
+
+def get_statement_render_histogram(since=None):
+    """
+    Return cumulative render-time and page-count histograms.
+
+    Buckets follow the Prometheus convention: each bucket counts the
+    completed exports at or below its upper bound. All figures come from
+    one aggregate query over completed exports.
+    """
+    exports = StatementExport.objects.filter(
+        status=StatementExport.Status.COMPLETED,
+    )
+    if since is not None:
+        exports = exports.filter(completed_at__gte=since)
+
+    aggregates = {
+        'count': Count('id'),
+        'render_seconds_sum': Sum('render_seconds'),
+        'page_count_sum': Sum('page_count'),
+    }
+    for index, bound in enumerate(RENDER_SECONDS_BUCKETS):
+        aggregates[f'render_seconds_{index}'] = Count(
+            'id',
+            filter=Q(render_seconds__lte=bound),
+        )
+    for index, bound in enumerate(PAGE_COUNT_BUCKETS):
+        aggregates[f'page_count_{index}'] = Count(
+            'id',
+            filter=Q(page_count__lte=bound),
+        )
+    totals = exports.aggregate(**aggregates)
+
+    return {
+        'render_seconds': _histogram(
+            totals,
+            'render_seconds',
+            RENDER_SECONDS_BUCKETS,
+        ),
+        'page_count': _histogram(totals, 'page_count', PAGE_COUNT_BUCKETS),
+    }
+
+
+def _histogram(totals, name, bounds):
+    buckets = {
+        str(bound): totals[f'{name}_{index}']
+        for index, bound in enumerate(bounds)
+    }
+    buckets['+Inf'] = totals['count']
+    return {
+        'buckets': buckets,
+        'count': totals['count'],
+        'sum': totals[f'{name}_sum'] or 0,
+    }
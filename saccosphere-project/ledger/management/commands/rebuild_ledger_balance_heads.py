@@ -0,0 +1,287 @@
+"""Rebuild LedgerBalanceHead rows and balance_after from LedgerEntry."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+from django.db.models import Count, Q, Sum
+
+from ledger.engines.statement_export import invalidate_statement_exports
+from ledger.models import LedgerBalanceHead, LedgerEntry
+from ledger.utils import (
+    ZERO,
+    calculate_balance_head_totals,
+    lock_balance_head,
+)
+
+
+HEAD_FIELDS = ('total_credits', 'total_debits', 'balance', 'sequence')
+ENTRY_ORDER = ('created_at', 'id')
+
+
+class Command(BaseCommand):
+    """
+    Compare every membership's balance head with its ledger history.
+
+    Each entry's stored balance_after is also checked against the running
+    balance of the membership's entries in (created_at, id) order, which
+    point-in-time balances read. Entries written before balance_after held
+    the ledger balance (loan postings stored the loan balance, imports the
+    saving balance) show up here.
+
+    By default the command only verifies and exits with an error when any
+    head is missing or has drifted, or any balance_after is wrong. With
+    --execute, missing heads are created, drifted heads are recomputed and
+    balance_after is rewritten, each membership under its head's row lock.
+    Statement exports of a membership whose balance_after was rewritten are
+    marked FAILED, so the next request renders the corrected history.
+
+    Usage:
+        python manage.py rebuild_ledger_balance_heads
+        python manage.py rebuild_ledger_balance_heads --execute
+    """
+
+    help = 'Verify or rebuild ledger balance heads from LedgerEntry rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sacco',
+            type=str,
+            help='Only check memberships in this SACCO id.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of memberships compared per batch.',
+        )
+        parser.add_argument(
+            '--execute',
+            action='store_true',
+            help='Write rebuilt heads (default is verify only).',
+        )
+
+    def handle(self, *args, **options):
+        sacco_id = options.get('sacco')
+        batch_size = options['batch_size']
+        execute = options['execute']
+
+        checked = 0
+        missing = []
+        drifted = []
+        stale_entries = {}
+        for ledger_totals in self._iter_ledger_total_batches(
+            sacco_id,
+            batch_size,
+        ):
+            checked += len(ledger_totals)
+            stale_entries.update(
+                self._find_stale_balances(list(ledger_totals)),
+            )
+            heads = LedgerBalanceHead.objects.in_bulk(
+                list(ledger_totals),
+                field_name='membership_id',
+            )
+            for membership_id, expected in ledger_totals.items():
+                head = heads.get(membership_id)
+                if head is None:
+                    missing.append(membership_id)
+                elif self._differs(head, expected):
+                    drifted.append(membership_id)
+                    self._report_drift(head, expected)
+
+        orphan_heads = self._get_orphan_heads(sacco_id)
+        for head in orphan_heads:
+            drifted.append(head.membership_id)
+            self._report_drift(head, calculate_balance_head_totals(
+                head.membership_id,
+            ))
+
+        self.stdout.write(
+            f'Checked {checked} memberships: {len(missing)} missing heads, '
+            f'{len(drifted)} drifted heads, '
+            f'{sum(stale_entries.values())} entries with a wrong '
+            f'balance_after in {len(stale_entries)} memberships.'
+        )
+
+        if not missing and not drifted and not stale_entries:
+            self.stdout.write(
+                self.style.SUCCESS('All ledger balance heads match.')
+            )
+            return
+
+        if not execute:
+            raise CommandError(
+                'Ledger balance heads are out of date. '
+                'Re-run with --execute to rebuild them.'
+            )
+
+        self._create_missing_heads(missing)
+        self._rebuild_heads(drifted)
+        repaired = self._repair_balances(stale_entries)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Created {len(missing)} and rebuilt {len(drifted)} '
+                f'ledger balance heads; repaired balance_after on '
+                f'{repaired} entries.'
+            )
+        )
+
+    def _iter_ledger_total_batches(self, sacco_id, batch_size):
+        queryset = LedgerEntry.objects.all()
+        if sacco_id:
+            queryset = queryset.filter(membership__sacco_id=sacco_id)
+
+        totals = queryset.order_by().values('membership_id').annotate(
+            total_credits=Sum(
+                'amount',
+                filter=Q(entry_type=LedgerEntry.EntryType.CREDIT),
+            ),
+            total_debits=Sum(
+                'amount',
+                filter=Q(entry_type=LedgerEntry.EntryType.DEBIT),
+            ),
+            sequence=Count('id'),
+        ).order_by('membership_id')
+
+        batch = {}
+        for row in totals.iterator(chunk_size=batch_size):
+            total_credits = row['total_credits'] or ZERO
+            total_debits = row['total_debits'] or ZERO
+            batch[row['membership_id']] = {
+                'total_credits': total_credits,
+                'total_debits': total_debits,
+                'balance': total_credits - total_debits,
+                'sequence': row['sequence'],
+            }
+            if len(batch) >= batch_size:
+                yield batch
+                batch = {}
+
+        if batch:
+            yield batch
+
+    def _find_stale_balances(self, membership_ids):
+        """Return {membership_id: entries whose balance_after is wrong}."""
+        stale = {}
+        for membership_id, entries in self._iter_running_balances(
+            membership_ids,
+        ):
+            count = sum(
+                1
+                for _entry_id, stored, expected in entries
+                if stored != expected
+            )
+            if count:
+                stale[membership_id] = count
+        return stale
+
+    def _iter_running_balances(self, membership_ids):
+        """
+        Yield (membership_id, [(entry_id, stored, expected), ...]).
+
+        One ordered pass over the memberships' entries; ``expected`` is the
+        running balance after each entry.
+        """
+        rows = LedgerEntry.objects.filter(
+            membership_id__in=membership_ids,
+        ).order_by('membership_id', *ENTRY_ORDER).values_list(
+            'membership_id',
+            'id',
+            'entry_type',
+            'amount',
+            'balance_after',
+        )
+
+        current_id = None
+        balance = ZERO
+        entries = []
+        for membership_id, entry_id, entry_type, amount, stored in (
+            rows.iterator(chunk_size=2000)
+        ):
+            if membership_id != current_id:
+                if entries:
+                    yield current_id, entries
+                current_id = membership_id
+                balance = ZERO
+                entries = []
+
+            if entry_type == LedgerEntry.EntryType.CREDIT:
+                balance += amount
+            else:
+                balance -= amount
+            entries.append((entry_id, stored, balance))
+
+        if entries:
+            yield current_id, entries
+
+    def _get_orphan_heads(self, sacco_id):
+        """Return heads with posted totals but no ledger rows behind them."""
+        queryset = LedgerBalanceHead.objects.exclude(
+            membership__ledgerentry__isnull=False,
+        ).exclude(sequence=0)
+        if sacco_id:
+            queryset = queryset.filter(membership__sacco_id=sacco_id)
+        return list(queryset)
+
+    def _differs(self, head, expected):
+        return any(
+            getattr(head, field) != expected[field]
+            for field in HEAD_FIELDS
+        )
+
+    def _report_drift(self, head, expected):
+        self.stdout.write(
+            self.style.WARNING(
+                f'  membership={head.membership_id} '
+                f'head_balance={head.balance} '
+                f'ledger_balance={expected["balance"]} '
+                f'head_sequence={head.sequence} '
+                f'ledger_sequence={expected["sequence"]}'
+            )
+        )
+
+    def _create_missing_heads(self, membership_ids):
+        for membership_id in membership_ids:
+            with db_transaction.atomic():
+                lock_balance_head(membership_id)
+
+    def _rebuild_heads(self, membership_ids):
+        for membership_id in membership_ids:
+            with db_transaction.atomic():
+                head = LedgerBalanceHead.objects.select_for_update().get(
+                    membership_id=membership_id,
+                )
+                totals = calculate_balance_head_totals(membership_id)
+                for field in HEAD_FIELDS:
+                    setattr(head, field, totals[field])
+                head.save(update_fields=[*HEAD_FIELDS, 'updated_at'])
+
+    def _repair_balances(self, membership_ids):
+        repaired = 0
+        invalidated = 0
+        for membership_id in membership_ids:
+            with db_transaction.atomic():
+                # The head lock keeps new posts out while history is rewritten.
+                lock_balance_head(membership_id)
+                for _membership_id, entries in self._iter_running_balances(
+                    [membership_id],
+                ):
+                    stale = [
+                        LedgerEntry(id=entry_id, balance_after=expected)
+                        for entry_id, stored, expected in entries
+                        if stored != expected
+                    ]
+                    LedgerEntry.objects.bulk_update(
+                        stale,
+                        ['balance_after'],
+                        batch_size=1000,
+                    )
+                    repaired += len(stale)
+                invalidated += invalidate_statement_exports(
+                    membership_id,
+                    'Ledger balances were rebuilt after this export.',
+                )
+        if invalidated:
+            self.stdout.write(
+                f'Invalidated {invalidated} statement exports.'
+            )
+        return repaired
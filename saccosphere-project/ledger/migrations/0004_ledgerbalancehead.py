@@ -0,0 +1,33 @@
+# Generated by Django 5.2.16 on 2026-10-18 15:01
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0003_alter_ledgerentry_category'),
+        ('saccomembership', '0002_membershipdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerBalanceHead',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('total_credits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('total_debits', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('balance', models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=14)),
+                ('sequence', models.PositiveBigIntegerField(default=0, help_text='Number of ledger entries posted for this membership.')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('membership', models.OneToOneField(on_delete=django.db.models.deletion.PROTECT, related_name='ledger_balance_head', to='saccomembership.membership')),
+            ],
+            options={
+                'verbose_name': 'Ledger balance head',
+                'verbose_name_plural': 'Ledger balance heads',
+            },
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.16 on 2026-10-18 15:50
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ledger', '0004_ledgerbalancehead'),
+        ('saccomembership', '0002_membershipdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatementExport',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('from_date', models.DateField()),
+                ('to_date', models.DateField()),
+                ('last_entry_id', models.UUIDField(blank=True, null=True)),
+                ('cache_key', models.CharField(db_index=True, max_length=64)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=15)),
+                ('file', models.FileField(blank=True, upload_to='statements/')),
+                ('page_count', models.PositiveIntegerField(blank=True, null=True)),
+                ('render_seconds', models.FloatField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('membership', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statement_exports', to='saccomembership.membership')),
+                ('requested_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='statement_exports', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Statement export',
+                'verbose_name_plural': 'Statement exports',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
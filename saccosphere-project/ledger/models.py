@@ -1,5 +1,7 @@
+from decimal import Decimal
 from uuid import uuid4
 
+from django.conf import settings
 from django.db import models
 
 
@@ -53,3 +55,110 @@ class LedgerEntry(models.Model):
             f'{self.entry_type} {self.amount} — '
             f'{self.membership} — {self.reference}'
         )
+
+
+class LedgerBalanceHead(models.Model):
+    """
+    Running ledger totals for one membership.
+
+    The head row is the only row locked when a new entry is posted, so posting
+    cost does not grow with the length of a member's ledger history.
+    """
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+    )
+    membership = models.OneToOneField(
+        'saccomembership.Membership',
+        on_delete=models.PROTECT,
+        related_name='ledger_balance_head',
+    )
+    total_credits = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    total_debits = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    balance = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+    )
+    sequence = models.PositiveBigIntegerField(
+        default=0,
+        help_text='Number of ledger entries posted for this membership.',
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'Ledger balance head'
+        verbose_name_plural = 'Ledger balance heads'
+
+    def __str__(self):
+        return f'{self.membership} — {self.balance} (#{self.sequence})'
+
+
+class StatementExport(models.Model):
+    """
+    An asynchronously rendered statement PDF.
+
+    Exports are content-addressed: cache_key covers the membership, the date
+    range and the last ledger entry in that range, so an identical request
+    reuses the stored PDF until a new entry lands inside the range.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+    )
+    membership = models.ForeignKey(
+        'saccomembership.Membership',
+        on_delete=models.CASCADE,
+        related_name='statement_exports',
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='statement_exports',
+    )
+    from_date = models.DateField()
+    to_date = models.DateField()
+    last_entry_id = models.UUIDField(null=True, blank=True)
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(
+        max_length=15,
+        choices=Status.choices,
+        default=Status.PENDING,
+    )
+    file = models.FileField(upload_to='statements/', blank=True)
+    page_count = models.PositiveIntegerField(null=True, blank=True)
+    render_seconds = models.FloatField(null=True, blank=True)
+    error_message = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Statement export'
+        verbose_name_plural = 'Statement exports'
+
+    def __str__(self):
+        return (
+            f'{self.membership} — {self.from_date} to {self.to_date} '
+            f'({self.status})'
+        )
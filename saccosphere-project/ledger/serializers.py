@@ -1,6 +1,7 @@
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import LedgerEntry
+from .models import LedgerEntry, StatementExport
 
 
 class LedgerEntrySerializer(serializers.ModelSerializer):
@@ -64,3 +65,44 @@ class StatementSerializer(serializers.Serializer):
     )
     entries = StatementEntrySerializer(many=True)
     currency = serializers.CharField()
+
+
+class StatementExportSerializer(serializers.ModelSerializer):
+    """Serialize an asynchronous statement PDF job."""
+
+    job_id = serializers.UUIDField(source='id', read_only=True)
+    status_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = StatementExport
+        fields = [
+            'job_id',
+            'status',
+            'from_date',
+            'to_date',
+            'page_count',
+            'render_seconds',
+            'error_message',
+            'status_url',
+            'download_url',
+            'created_at',
+            'completed_at',
+        ]
+        read_only_fields = fields
+
+    def get_status_url(self, obj):
+        return self._absolute_url(
+            reverse('ledger:statement-export-detail', args=[obj.id]),
+        )
+
+    def get_download_url(self, obj):
+        if obj.status != StatementExport.Status.COMPLETED or not obj.file:
+            return None
+        return self._absolute_url(
+            reverse('ledger:statement-export-download', args=[obj.id]),
+        )
+
+    def _absolute_url(self, path):
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request else path
@@ -0,0 +1,8 @@
+"""Signals sent by the ledger posting helpers."""
+
+from django.dispatch import Signal
+
+
+# Sent by create_ledger_entries with ``membership_ids`` after a bulk post,
+# since bulk_create does not send post_save for the entries it writes.
+ledger_entries_posted = Signal()
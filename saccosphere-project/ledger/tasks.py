@@ -0,0 +1,65 @@
+"""Celery tasks for ledger statements."""
+
+import logging
+
+from celery import shared_task
+from django.db import DatabaseError, InterfaceError, OperationalError
+
+from .engines.statement_export import (
+    mark_statement_export_failed,
+    render_statement_export,
+)
+
+
+logger = logging.getLogger('saccosphere.ledger')
+
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    name='ledger.tasks.render_statement_export',
+)
+def render_statement_export_task(self, export_id):
+    """Render a statement PDF export outside the request cycle."""
+    try:
+        export = render_statement_export(export_id)
+    except (ImportError, OSError):
+        logger.exception(
+            'Statement PDF renderer unavailable for export_id=%s.',
+            export_id,
+        )
+        mark_statement_export_failed(
+            export_id,
+            'PDF generation temporarily unavailable.',
+        )
+        return {'export_id': export_id, 'status': 'FAILED'}
+    except (DatabaseError, InterfaceError, OperationalError) as exc:
+        if self.request.retries < self.max_retries:
+            countdown = 60 * (2 ** self.request.retries)
+            logger.warning(
+                'Statement export %s failed. Retrying in %s seconds.',
+                export_id,
+                countdown,
+                exc_info=True,
+            )
+            raise self.retry(exc=exc, countdown=countdown)
+        mark_statement_export_failed(export_id, exc)
+        raise
+    except Exception as exc:
+        logger.exception('Statement export %s failed.', export_id)
+        mark_statement_export_failed(export_id, exc)
+        raise
+
+    logger.info(
+        'Statement export %s rendered. pages=%s seconds=%s.',
+        export_id,
+        export.page_count,
+        export.render_seconds,
+    )
+    return {
+        'export_id': export_id,
+        'status': export.status,
+        'page_count': export.page_count,
+        'render_seconds': export.render_seconds,
+    }
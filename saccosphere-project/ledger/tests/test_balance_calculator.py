@@ -0,0 +1,128 @@
+"""Tests for point-in-time ledger balance lookups."""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Sacco, User
+from ledger.engines.balance_calculator import (
+    get_balance_as_of,
+    get_balances_as_of,
+    get_running_balance,
+)
+from ledger.models import LedgerEntry
+from ledger.utils import create_ledger_entry
+from saccomembership.models import Membership
+
+
+class AsOfBalanceTestCase(TestCase):
+    """Test balances read from stored balance_after values."""
+
+    def setUp(self):
+        """Create two members in one SACCO."""
+        self.sacco = Sacco.objects.create(
+            name='As Of SACCO',
+            registration_number='ASOF001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.first = self._membership('asof-one@example.com', 'ASOF-1')
+        self.second = self._membership('asof-two@example.com', 'ASOF-2')
+
+    def test_balance_as_of_uses_last_entry_on_or_before_date(self):
+        """Entries later on the cutoff day count; the next day does not."""
+        self._post(self.first, 'CREDIT', '1000.00', date(2026, 1, 10), 'A1')
+        self._post(
+            self.first,
+            'DEBIT',
+            '300.00',
+            date(2026, 1, 31),
+            'A2',
+            hour=23,
+        )
+        self._post(self.first, 'CREDIT', '50.00', date(2026, 2, 1), 'A3')
+
+        self.assertEqual(
+            get_balance_as_of(self.first, date(2026, 1, 9)),
+            Decimal('0.00'),
+        )
+        self.assertEqual(
+            get_balance_as_of(self.first, date(2026, 1, 31)),
+            Decimal('700.00'),
+        )
+        self.assertEqual(
+            get_running_balance(self.first, as_of_date=date(2026, 2, 1)),
+            Decimal('750.00'),
+        )
+        self.assertEqual(get_running_balance(self.first), Decimal('750.00'))
+
+    def test_batched_lookup_matches_single_lookups_in_one_query(self):
+        """Many (membership, date) pairs are answered by a single query."""
+        self._post(self.first, 'CREDIT', '1000.00', date(2026, 1, 5), 'B1')
+        self._post(self.first, 'CREDIT', '500.00', date(2026, 2, 5), 'B2')
+        self._post(self.second, 'CREDIT', '200.00', date(2026, 2, 20), 'B3')
+        pairs = [
+            (membership, as_of)
+            for membership in (self.first, self.second)
+            for as_of in (
+                date(2026, 1, 31),
+                date(2026, 2, 28),
+                date(2026, 3, 31),
+            )
+        ]
+
+        with self.assertNumQueries(1):
+            balances = get_balances_as_of(pairs)
+
+        for membership, as_of in pairs:
+            self.assertEqual(
+                balances[(membership.id, as_of)],
+                get_balance_as_of(membership, as_of),
+            )
+        self.assertEqual(
+            balances[(self.second.id, date(2026, 1, 31))],
+            Decimal('0.00'),
+        )
+        self.assertEqual(
+            balances[(self.first.id, date(2026, 3, 31))],
+            Decimal('1500.00'),
+        )
+
+    def _membership(self, email, member_number):
+        user = User.objects.create_user(
+            email=email,
+            password='StrongPass123',
+            first_name='As',
+            last_name='Of',
+        )
+        return Membership.objects.create(
+            user=user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number=member_number,
+        )
+
+    def _post(
+        self,
+        membership,
+        entry_type,
+        amount,
+        created_date,
+        reference,
+        hour=12,
+    ):
+        entry = create_ledger_entry(
+            membership=membership,
+            entry_type=entry_type,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal(amount),
+            description='As-of test entry',
+            reference=reference,
+        )
+        LedgerEntry.objects.filter(id=entry.id).update(
+            created_at=timezone.make_aware(
+                datetime.combine(created_date, time(hour=hour)),
+            ),
+        )
@@ -0,0 +1,264 @@
+"""Tests for ledger balance heads and their rebuild command."""
+
+from decimal import Decimal
+from io import StringIO
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import Sacco, User
+from ledger.engines.balance_calculator import get_balance_as_of
+from ledger.engines.statement_export import request_statement_export
+from ledger.models import LedgerBalanceHead, LedgerEntry, StatementExport
+from ledger.utils import create_ledger_entries, create_ledger_entry
+from saccomembership.models import Membership
+
+
+class LedgerBalanceHeadTestCase(TestCase):
+    """Test that posting keeps one running head row per membership."""
+
+    def setUp(self):
+        """Create an approved member without ledger history."""
+        self.user = User.objects.create_user(
+            email='head@example.com',
+            password='StrongPass123',
+            first_name='Head',
+            last_name='Member',
+        )
+        self.sacco = Sacco.objects.create(
+            name='Head SACCO',
+            registration_number='HEAD001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.membership = Membership.objects.create(
+            user=self.user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number='HEAD-M001',
+        )
+
+    def test_posting_updates_head_totals_and_sequence(self):
+        """Each post moves the head and returns the running balance."""
+        self._post(LedgerEntry.EntryType.CREDIT, '1000.00', 'HEAD-1')
+        entry = self._post(LedgerEntry.EntryType.DEBIT, '250.00', 'HEAD-2')
+
+        head = LedgerBalanceHead.objects.get(membership=self.membership)
+        self.assertEqual(entry.balance_after, Decimal('750.00'))
+        self.assertEqual(head.total_credits, Decimal('1000.00'))
+        self.assertEqual(head.total_debits, Decimal('250.00'))
+        self.assertEqual(head.balance, Decimal('750.00'))
+        self.assertEqual(head.sequence, 2)
+
+    def test_missing_head_is_seeded_from_existing_entries(self):
+        """Entries written before heads existed still count once."""
+        LedgerEntry.objects.create(
+            membership=self.membership,
+            entry_type=LedgerEntry.EntryType.CREDIT,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal('400.00'),
+            reference='LEGACY-1',
+            description='Legacy entry',
+            balance_after=Decimal('400.00'),
+        )
+
+        entry = self._post(LedgerEntry.EntryType.CREDIT, '100.00', 'HEAD-3')
+
+        head = LedgerBalanceHead.objects.get(membership=self.membership)
+        self.assertEqual(entry.balance_after, Decimal('500.00'))
+        self.assertEqual(head.sequence, 2)
+
+    def test_rebuild_command_reports_drift_without_execute(self):
+        """Verify mode fails loudly when a head disagrees with the ledger."""
+        self._post(LedgerEntry.EntryType.CREDIT, '500.00', 'HEAD-5')
+        LedgerBalanceHead.objects.filter(
+            membership=self.membership,
+        ).update(balance=Decimal('1.00'))
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ledger_balance_heads', stdout=StringIO())
+
+        head = LedgerBalanceHead.objects.get(membership=self.membership)
+        self.assertEqual(head.balance, Decimal('1.00'))
+
+    def test_rebuild_command_execute_repairs_heads(self):
+        """Execute mode creates missing heads and rebuilds drifted ones."""
+        self._post(LedgerEntry.EntryType.CREDIT, '500.00', 'HEAD-6')
+        LedgerBalanceHead.objects.filter(
+            membership=self.membership,
+        ).update(balance=Decimal('1.00'), sequence=9)
+
+        call_command(
+            'rebuild_ledger_balance_heads',
+            '--execute',
+            stdout=StringIO(),
+        )
+
+        head = LedgerBalanceHead.objects.get(membership=self.membership)
+        self.assertEqual(head.balance, Decimal('500.00'))
+        self.assertEqual(head.sequence, 1)
+        call_command('rebuild_ledger_balance_heads', stdout=StringIO())
+
+    def test_rebuild_command_repairs_legacy_balance_after(self):
+        """Loan rows that stored the loan balance are rewritten in order."""
+        self._post(LedgerEntry.EntryType.CREDIT, '1000.00', 'HEAD-8')
+        for reference, entry_type, category, amount, loan_balance in (
+            (
+                'LEGACY-LOAN-1',
+                LedgerEntry.EntryType.DEBIT,
+                LedgerEntry.Category.LOAN_DISBURSEMENT,
+                '600.00',
+                '600.00',
+            ),
+            (
+                'LEGACY-LOAN-2',
+                LedgerEntry.EntryType.CREDIT,
+                LedgerEntry.Category.LOAN_REPAYMENT,
+                '100.00',
+                '500.00',
+            ),
+        ):
+            LedgerEntry.objects.create(
+                membership=self.membership,
+                entry_type=entry_type,
+                category=category,
+                amount=Decimal(amount),
+                reference=reference,
+                description='Legacy loan entry',
+                balance_after=Decimal(loan_balance),
+            )
+        self._post(LedgerEntry.EntryType.CREDIT, '50.00', 'HEAD-9')
+        self.assertEqual(
+            get_balance_as_of(self.membership, timezone.localdate()),
+            Decimal('1050.00'),
+        )
+
+        output = StringIO()
+        with self.assertRaises(CommandError):
+            call_command('rebuild_ledger_balance_heads', stdout=output)
+        self.assertIn(
+            '2 entries with a wrong balance_after',
+            output.getvalue(),
+        )
+        today = timezone.localdate()
+        export, _created = request_statement_export(
+            self.membership,
+            today.replace(day=1),
+            today,
+        )
+        StatementExport.objects.filter(pk=export.pk).update(
+            status=StatementExport.Status.COMPLETED,
+        )
+
+        call_command(
+            'rebuild_ledger_balance_heads',
+            '--execute',
+            stdout=StringIO(),
+        )
+
+        self.assertEqual(
+            list(
+                LedgerEntry.objects.filter(
+                    membership=self.membership,
+                ).order_by('created_at', 'id').values_list(
+                    'balance_after',
+                    flat=True,
+                )
+            ),
+            [
+                Decimal('1000.00'),
+                Decimal('400.00'),
+                Decimal('500.00'),
+                Decimal('550.00'),
+            ],
+        )
+        self.assertEqual(
+            get_balance_as_of(self.membership, timezone.localdate()),
+            Decimal('550.00'),
+        )
+        export.refresh_from_db()
+        self.assertEqual(export.status, StatementExport.Status.FAILED)
+        fresh_export, created = request_statement_export(
+            self.membership,
+            today.replace(day=1),
+            today,
+        )
+        self.assertTrue(created)
+        self.assertNotEqual(fresh_export.pk, export.pk)
+        call_command('rebuild_ledger_balance_heads', stdout=StringIO())
+
+    def test_bulk_posting_matches_single_posting(self):
+        """Bulk posts chain balances from existing heads and history."""
+        self._post(LedgerEntry.EntryType.CREDIT, '300.00', 'HEAD-7')
+        LedgerEntry.objects.create(
+            membership=self.membership,
+            entry_type=LedgerEntry.EntryType.CREDIT,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal('10.00'),
+            reference='LEGACY-2',
+            description='Entry written behind the head',
+            balance_after=Decimal('10.00'),
+        )
+        other = Membership.objects.create(
+            user=User.objects.create_user(
+                email='head-two@example.com',
+                password='StrongPass123',
+                first_name='Head',
+                last_name='Two',
+            ),
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+        )
+
+        entries = create_ledger_entries(
+            [
+                self._spec(self.membership, 'CREDIT', '100.00'),
+                self._spec(other, 'CREDIT', '40.00'),
+                self._spec(self.membership, 'DEBIT', '50.00'),
+                self._spec(other, 'DEBIT', '15.00'),
+            ]
+        )
+
+        self.assertEqual(
+            [entry.balance_after for entry in entries],
+            [
+                Decimal('400.00'),
+                Decimal('40.00'),
+                Decimal('350.00'),
+                Decimal('25.00'),
+            ],
+        )
+        head = LedgerBalanceHead.objects.get(membership=self.membership)
+        self.assertEqual(head.balance, Decimal('350.00'))
+        self.assertEqual(head.sequence, 3)
+        other_head = LedgerBalanceHead.objects.get(membership=other)
+        self.assertEqual(other_head.balance, Decimal('25.00'))
+        self.assertEqual(other_head.sequence, 2)
+        ordered = list(
+            LedgerEntry.objects.filter(membership=other).order_by(
+                'created_at',
+                'id',
+            ).values_list('balance_after', flat=True)
+        )
+        self.assertEqual(ordered, [Decimal('40.00'), Decimal('25.00')])
+
+    def _spec(self, membership, entry_type, amount):
+        return {
+            'membership': membership,
+            'entry_type': entry_type,
+            'category': LedgerEntry.Category.SAVING_DEPOSIT,
+            'amount': Decimal(amount),
+            'description': 'Bulk balance head test entry',
+        }
+
+    def _post(self, entry_type, amount, reference):
+        return create_ledger_entry(
+            membership=self.membership,
+            entry_type=entry_type,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal(amount),
+            description='Balance head test entry',
+            reference=reference,
+        )
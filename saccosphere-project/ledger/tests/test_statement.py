@@ -5,9 +5,14 @@ from decimal import Decimal
 
 from django.test import TestCase
 from django.utils import timezone
+from rest_framework.test import APIClient
 
 from accounts.models import Sacco, User
-from ledger.engines.statement_builder import build_statement
+from ledger.engines.statement_builder import (
+    build_statement,
+    get_statement_page,
+    stream_statement,
+)
 from ledger.models import LedgerEntry
 from ledger.utils import create_ledger_entry
 from saccomembership.models import Membership
@@ -132,6 +137,133 @@ class StatementBuilderTestCase(TestCase):
         self.assertEqual(entry.amount, Decimal('10.01'))
         self.assertEqual(entry.balance_after, Decimal('10.01'))
 
+    def test_stream_computes_totals_in_one_pass(self):
+        """Streaming reads the range once and matches the full build."""
+        self._create_entry(
+            LedgerEntry.EntryType.CREDIT,
+            Decimal('1000.00'),
+            datetime(2026, 4, 25).date(),
+            'STREAM-OPENING',
+        )
+        for day in range(1, 6):
+            self._create_entry(
+                LedgerEntry.EntryType.CREDIT,
+                Decimal('100.00'),
+                datetime(2026, 5, day).date(),
+                f'STREAM-CREDIT-{day}',
+            )
+        self._create_entry(
+            LedgerEntry.EntryType.DEBIT,
+            Decimal('50.00'),
+            datetime(2026, 5, 31).date(),
+            'STREAM-DEBIT',
+        )
+        expected = build_statement(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+
+        with self.assertNumQueries(2):
+            stream = stream_statement(
+                self.membership,
+                self.from_date,
+                self.to_date,
+                chunk_size=2,
+            )
+            entries = list(stream)
+
+        summary = stream.summary()
+        self.assertEqual(entries, expected['entries'])
+        self.assertEqual(summary['entry_count'], 6)
+        self.assertEqual(summary['total_credits'], Decimal('500.00'))
+        self.assertEqual(summary['total_debits'], Decimal('50.00'))
+        self.assertEqual(summary['opening_balance'], Decimal('1000.00'))
+        self.assertEqual(summary['closing_balance'], Decimal('1450.00'))
+
+    def test_cursor_pages_walk_every_entry_once(self):
+        """Keyset pages cover the range in order without overlap."""
+        for day in range(1, 8):
+            self._create_entry(
+                LedgerEntry.EntryType.CREDIT,
+                Decimal('10.00'),
+                datetime(2026, 5, day).date(),
+                f'CURSOR-{day}',
+            )
+
+        references = []
+        cursor = None
+        while True:
+            entries, cursor = get_statement_page(
+                self.membership,
+                self.from_date,
+                self.to_date,
+                cursor=cursor,
+                page_size=3,
+            )
+            references.extend(entry['reference'] for entry in entries)
+            if cursor is None:
+                break
+
+        self.assertEqual(
+            references,
+            [f'CURSOR-{day}' for day in range(1, 8)],
+        )
+        with self.assertRaises(ValueError):
+            get_statement_page(
+                self.membership,
+                self.from_date,
+                self.to_date,
+                cursor='not-a-cursor',
+            )
+
+    def test_statement_endpoints_page_and_stream_csv(self):
+        """The JSON API pages by cursor and the CSV download streams."""
+        for day in range(1, 4):
+            self._create_entry(
+                LedgerEntry.EntryType.CREDIT,
+                Decimal('100.00'),
+                datetime(2026, 5, day).date(),
+                f'API-{day}',
+            )
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        params = {
+            'sacco_id': str(self.sacco.id),
+            'from_date': '2026-05-01',
+            'to_date': '2026-05-31',
+        }
+
+        response = client.get(
+            '/api/v1/ledger/statement/',
+            {**params, 'pagination': 'cursor', 'page_size': 2},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['total_credits'], '300.00')
+        self.assertEqual(len(response.data['entries']), 2)
+        next_cursor = response.data['entries_pagination']['next_cursor']
+
+        response = client.get(
+            '/api/v1/ledger/statement/',
+            {**params, 'cursor': next_cursor, 'page_size': 2},
+        )
+        self.assertEqual(
+            [entry['reference'] for entry in response.data['entries']],
+            ['API-3'],
+        )
+        self.assertIsNone(response.data['entries_pagination']['next_cursor'])
+
+        response = client.get('/api/v1/ledger/statement/', params)
+        self.assertEqual(response.data['entries_pagination']['count'], 3)
+
+        response = client.get('/api/v1/ledger/statement/csv/', params)
+        self.assertEqual(response.status_code, 200)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0].split(',')[0], 'Date')
+        self.assertEqual(len(rows), 7)
+        self.assertEqual(rows[-2], ',,Totals,,0.00,300.00,')
+        self.assertEqual(rows[-1], ',,Closing balance,,,,300.00')
+
     def _create_entry(self, entry_type, amount, created_date, reference):
         entry = create_ledger_entry(
             membership=self.membership,
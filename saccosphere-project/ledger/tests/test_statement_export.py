@@ -0,0 +1,266 @@
+"""Tests for asynchronously rendered statement PDFs."""
+
+import shutil
+import tempfile
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Sacco, User
+from ledger.engines.statement_export import (
+    get_statement_render_histogram,
+    render_statement_export,
+    request_statement_export,
+)
+from ledger.models import LedgerEntry, StatementExport
+from ledger.tasks import render_statement_export_task
+from ledger.utils import create_ledger_entry
+from saccomembership.models import Membership
+
+
+FAKE_PDF = b'%PDF-1.4 statement'
+
+
+class StatementExportTestCase(TestCase):
+    """Test statement export caching, rendering and download."""
+
+    def setUp(self):
+        """Create a member with ledger history and a scratch media root."""
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.user = User.objects.create_user(
+            email='export@example.com',
+            password='StrongPass123',
+            first_name='Export',
+            last_name='Member',
+        )
+        self.sacco = Sacco.objects.create(
+            name='Export SACCO',
+            registration_number='EXPT001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.membership = Membership.objects.create(
+            user=self.user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number='EXPT-M001',
+        )
+        self.from_date = date(2026, 5, 1)
+        self.to_date = date(2026, 5, 31)
+        self._post('1000.00', date(2026, 5, 10), 'EXPT-1')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_identical_request_reuses_export_until_range_changes(self):
+        """Only a new entry inside the range invalidates the cache key."""
+        export, created = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        again, created_again = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertEqual(again.id, export.id)
+
+        self._post('50.00', date(2026, 6, 5), 'EXPT-LATER')
+        _, created_after_range = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        self.assertFalse(created_after_range)
+
+        self._post('75.00', date(2026, 5, 20), 'EXPT-2')
+        fresh, created_fresh = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        self.assertTrue(created_fresh)
+        self.assertNotEqual(fresh.cache_key, export.cache_key)
+
+    @patch(
+        'ledger.engines.statement_export.render_statement_pdf',
+        return_value=(FAKE_PDF, 3),
+    )
+    def test_render_stores_pdf_and_metrics(self, mock_render):
+        """A rendered export keeps the file, page count and timing."""
+        export, _ = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+
+        render_statement_export(export.id)
+
+        export.refresh_from_db()
+        self.assertEqual(export.status, StatementExport.Status.COMPLETED)
+        self.assertEqual(export.page_count, 3)
+        self.assertIsNotNone(export.render_seconds)
+        with export.file.open('rb') as handle:
+            self.assertEqual(handle.read(), FAKE_PDF)
+        statement = mock_render.call_args.args[0]
+        self.assertEqual(statement['closing_balance'], Decimal('1000.00'))
+
+        histogram = get_statement_render_histogram()
+        self.assertEqual(histogram['page_count']['count'], 1)
+        self.assertEqual(histogram['page_count']['buckets']['2'], 0)
+        self.assertEqual(histogram['page_count']['buckets']['5'], 1)
+        self.assertEqual(histogram['render_seconds']['buckets']['+Inf'], 1)
+
+    @override_settings(STATEMENT_EXPORT_STALE_MINUTES=15)
+    def test_stuck_in_flight_export_is_replaced(self):
+        """A job older than the staleness window is failed and re-queued."""
+        export, _ = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        StatementExport.objects.filter(pk=export.pk).update(
+            status=StatementExport.Status.PROCESSING,
+            created_at=timezone.now() - timedelta(minutes=16),
+        )
+
+        with patch('ledger.tasks.render_statement_export_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('ledger:statement-export'),
+                    {
+                        'sacco_id': str(self.sacco.id),
+                        'from_date': '2026-05-01',
+                        'to_date': '2026-05-31',
+                    },
+                    format='json',
+                )
+
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.data['job_id'], export.id)
+        delay.assert_called_once_with(str(response.data['job_id']))
+        export.refresh_from_db()
+        self.assertEqual(export.status, StatementExport.Status.FAILED)
+        self.assertIn('15 minutes', export.error_message)
+
+    @patch(
+        'ledger.engines.statement_export.render_statement_pdf',
+        side_effect=OSError('cannot load library'),
+    )
+    def test_task_marks_export_failed_when_renderer_missing(self, _render):
+        """Missing WeasyPrint libraries fail the job without retrying."""
+        export, _ = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+
+        result = render_statement_export_task.apply(args=[str(export.id)])
+
+        export.refresh_from_db()
+        self.assertEqual(result.result['status'], 'FAILED')
+        self.assertEqual(export.status, StatementExport.Status.FAILED)
+        _, created = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        self.assertTrue(created)
+
+    @patch(
+        'ledger.engines.statement_export.render_statement_pdf',
+        return_value=(FAKE_PDF, 1),
+    )
+    def test_api_queues_then_serves_download(self, _render):
+        """POST returns a job id; the rendered PDF is then downloadable."""
+        payload = {
+            'sacco_id': str(self.sacco.id),
+            'from_date': '2026-05-01',
+            'to_date': '2026-05-31',
+        }
+        with patch('ledger.tasks.render_statement_export_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    reverse('ledger:statement-export'),
+                    payload,
+                    format='json',
+                )
+
+        self.assertEqual(response.status_code, 202)
+        job_id = response.data['job_id']
+        delay.assert_called_once_with(str(job_id))
+        self.assertIsNone(response.data['download_url'])
+
+        render_statement_export(job_id)
+        status_response = self.client.get(
+            reverse('ledger:statement-export-detail', args=[job_id]),
+        )
+        self.assertEqual(status_response.data['status'], 'COMPLETED')
+
+        with patch('ledger.tasks.render_statement_export_task.delay') as delay:
+            repeat = self.client.post(
+                reverse('ledger:statement-export'),
+                payload,
+                format='json',
+            )
+        self.assertEqual(repeat.status_code, 200)
+        self.assertEqual(repeat.data['job_id'], job_id)
+        delay.assert_not_called()
+
+        download = self.client.get(
+            reverse('ledger:statement-export-download', args=[job_id]),
+        )
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download['Content-Type'], 'application/pdf')
+        self.assertEqual(b''.join(download.streaming_content), FAKE_PDF)
+
+    def test_other_users_cannot_see_export(self):
+        """Exports are scoped to the member who owns the membership."""
+        export, _ = request_statement_export(
+            self.membership,
+            self.from_date,
+            self.to_date,
+        )
+        stranger = User.objects.create_user(
+            email='stranger@example.com',
+            password='StrongPass123',
+            first_name='Other',
+            last_name='User',
+        )
+        self.client.force_authenticate(user=stranger)
+
+        response = self.client.get(
+            reverse('ledger:statement-export-detail', args=[export.id]),
+        )
+        metrics = self.client.get(reverse('ledger:statement-export-metrics'))
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(metrics.status_code, 403)
+
+    def _post(self, amount, created_date, reference):
+        entry = create_ledger_entry(
+            membership=self.membership,
+            entry_type=LedgerEntry.EntryType.CREDIT,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal(amount),
+            description='Statement export test entry',
+            reference=reference,
+        )
+        LedgerEntry.objects.filter(id=entry.id).update(
+            created_at=timezone.make_aware(
+                datetime.combine(created_date, time(hour=12)),
+            ),
+        )
+        return entry
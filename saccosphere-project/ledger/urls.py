@@ -3,6 +3,11 @@ from django.urls import path
 from .views import (
     BalanceView,
     LedgerEntryListView,
+    StatementCSVView,
+    StatementExportDetailView,
+    StatementExportDownloadView,
+    StatementExportMetricsView,
+    StatementExportView,
     StatementPDFView,
     StatementView,
 )
@@ -15,4 +20,25 @@ urlpatterns = [
     path('balance/', BalanceView.as_view(), name='balance'),
     path('statement/', StatementView.as_view(), name='statement'),
     path('statement/pdf/', StatementPDFView.as_view(), name='statement-pdf'),
+    path('statement/csv/', StatementCSVView.as_view(), name='statement-csv'),
+    path(
+        'statement/exports/',
+        StatementExportView.as_view(),
+        name='statement-export',
+    ),
+    path(
+        'statement/exports/metrics/',
+        StatementExportMetricsView.as_view(),
+        name='statement-export-metrics',
+    ),
+    path(
+        'statement/exports/<uuid:export_id>/',
+        StatementExportDetailView.as_view(),
+        name='statement-export-detail',
+    ),
+    path(
+        'statement/exports/<uuid:export_id>/download/',
+        StatementExportDownloadView.as_view(),
+        name='statement-export-download',
+    ),
 ]
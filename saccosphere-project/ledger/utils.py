@@ -1,15 +1,29 @@
+from datetime import datetime, timedelta
 from decimal import Decimal, ROUND_HALF_UP
+from uuid import uuid4
 
+from django.db import IntegrityError
 from django.db import transaction as db_transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
 
 from .engines.balance_calculator import (
     generate_reference,
 )
-from .models import LedgerEntry
+from .models import LedgerBalanceHead, LedgerEntry
+from .signals import ledger_entries_posted
 
 
 MONEY_QUANTIZER = Decimal('0.01')
 ZERO = Decimal('0.00')
+LEDGER_BULK_BATCH_SIZE = 1000
+BALANCE_HEAD_FIELDS = [
+    'total_credits',
+    'total_debits',
+    'balance',
+    'sequence',
+    'updated_at',
+]
 
 
 CATEGORY_PREFIXES = {
@@ -38,47 +52,23 @@ def create_ledger_entry(
     Create a ledger entry with its running balance.
 
     This is the only supported way to create ledger entries. The membership's
-    existing ledger rows are locked while the new running balance is computed
-    and written, so concurrent writes for the same membership are serialized.
+    LedgerBalanceHead row is locked while the new running balance is computed
+    and written, so concurrent writes for the same membership are serialized
+    without touching the rest of the member's ledger history.
     """
-    amount = Decimal(str(amount)).quantize(
-        MONEY_QUANTIZER,
-        rounding=ROUND_HALF_UP,
-    )
+    amount = _quantize(amount)
 
     with db_transaction.atomic():
         if reference is None:
             reference = generate_reference(_get_reference_prefix(category))
 
-        locked_entries = list(
-            LedgerEntry.objects.select_for_update()
-            .filter(membership=membership)
-            .only('entry_type', 'amount')
-        )
-        credits = sum(
-            (
-                entry.amount
-                for entry in locked_entries
-                if entry.entry_type == LedgerEntry.EntryType.CREDIT
-            ),
-            ZERO,
-        )
-        debits = sum(
-            (
-                entry.amount
-                for entry in locked_entries
-                if entry.entry_type == LedgerEntry.EntryType.DEBIT
-            ),
-            ZERO,
-        )
-        balance_before = credits - debits
-
+        head = lock_balance_head(membership)
         if entry_type == LedgerEntry.EntryType.CREDIT:
-            balance_after = balance_before + amount
+            balance_after = head.balance + amount
         else:
-            balance_after = balance_before - amount
+            balance_after = head.balance - amount
 
-        return LedgerEntry.objects.create(
+        entry = LedgerEntry.objects.create(
             membership=membership,
             entry_type=entry_type,
             category=category,
@@ -88,6 +78,287 @@ def create_ledger_entry(
             balance_after=balance_after,
             transaction=transaction,
         )
+        _apply_to_balance_head(head, entry_type, amount)
+        return entry
+
+
+def create_ledger_entries(entries):
+    """
+    Post many ledger entries with correct running balances in bulk.
+
+    ``entries`` is a list of dicts holding create_ledger_entry keyword
+    arguments. Existing balance heads of every membership involved are
+    locked up front, running balances are computed in memory in list order,
+    and entries and heads are written with bulk_create and bulk_update.
+    Memberships without a head get one created with its final totals.
+    Returns the created LedgerEntry rows in input order.
+    """
+    if not entries:
+        return []
+
+    membership_ids = [
+        getattr(entry['membership'], 'pk', entry['membership'])
+        for entry in entries
+    ]
+    try:
+        with db_transaction.atomic():
+            ledger_entries = _post_ledger_entries(entries, membership_ids)
+    except IntegrityError:
+        # Another writer created one of the missing heads; lock and retry.
+        with db_transaction.atomic():
+            lock_balance_heads(membership_ids)
+            ledger_entries = _post_ledger_entries(entries, membership_ids)
+
+    ledger_entries_posted.send(
+        sender=LedgerEntry,
+        membership_ids=set(membership_ids),
+    )
+    return ledger_entries
+
+
+def lock_balance_head(membership):
+    """
+    Return the membership's LedgerBalanceHead locked for update.
+
+    A missing head is seeded once from the existing ledger history, so rows
+    posted before balance heads existed are still counted.
+    """
+    membership_id = getattr(membership, 'pk', membership)
+    head = LedgerBalanceHead.objects.select_for_update().filter(
+        membership_id=membership_id,
+    ).first()
+    if head is not None:
+        return head
+
+    try:
+        with db_transaction.atomic():
+            LedgerBalanceHead.objects.create(
+                membership_id=membership_id,
+                **calculate_balance_head_totals(membership_id),
+            )
+    except IntegrityError:
+        # Another writer seeded the head first; lock the row it created.
+        pass
+
+    return LedgerBalanceHead.objects.select_for_update().get(
+        membership_id=membership_id,
+    )
+
+
+def lock_balance_heads(memberships):
+    """
+    Return {membership_id: LedgerBalanceHead} locked for update.
+
+    Heads are locked in membership order to keep concurrent bulk posts from
+    deadlocking. Missing heads are seeded in bulk from ledger history.
+    """
+    membership_ids = sorted(
+        {getattr(membership, 'pk', membership) for membership in memberships},
+        key=str,
+    )
+    heads = {}
+    for start in range(0, len(membership_ids), LEDGER_BULK_BATCH_SIZE):
+        chunk = membership_ids[start:start + LEDGER_BULK_BATCH_SIZE]
+        heads.update(_select_heads_for_update(chunk))
+
+        missing = [
+            membership_id
+            for membership_id in chunk
+            if membership_id not in heads
+        ]
+        if missing:
+            LedgerBalanceHead.objects.bulk_create(
+                [
+                    LedgerBalanceHead(membership_id=membership_id, **totals)
+                    for membership_id, totals in (
+                        _calculate_grouped_head_totals(missing).items()
+                    )
+                ],
+                ignore_conflicts=True,
+            )
+            heads.update(_select_heads_for_update(missing))
+
+    return heads
+
+
+def calculate_balance_head_totals(membership):
+    """Aggregate a membership's full ledger history into head totals."""
+    totals = LedgerEntry.objects.filter(
+        membership_id=getattr(membership, 'pk', membership),
+    ).aggregate(
+        total_credits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.CREDIT),
+        ),
+        total_debits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.DEBIT),
+        ),
+        sequence=Count('id'),
+    )
+    total_credits = totals['total_credits'] or ZERO
+    total_debits = totals['total_debits'] or ZERO
+    return {
+        'total_credits': total_credits,
+        'total_debits': total_debits,
+        'balance': total_credits - total_debits,
+        'sequence': totals['sequence'],
+    }
+
+
+def _apply_to_balance_head(head, entry_type, amount):
+    _apply_amount(head, entry_type, amount)
+    head.save(update_fields=BALANCE_HEAD_FIELDS)
+
+
+def _apply_amount(head, entry_type, amount):
+    if entry_type == LedgerEntry.EntryType.CREDIT:
+        head.total_credits += amount
+        head.balance += amount
+    else:
+        head.total_debits += amount
+        head.balance -= amount
+
+    head.sequence += 1
+
+
+def _post_ledger_entries(entries, membership_ids):
+    heads = {}
+    new_heads = {}
+    unique_ids = sorted(set(membership_ids), key=str)
+    for start in range(0, len(unique_ids), LEDGER_BULK_BATCH_SIZE):
+        chunk = unique_ids[start:start + LEDGER_BULK_BATCH_SIZE]
+        heads.update(_select_heads_for_update(chunk))
+        missing = [
+            membership_id
+            for membership_id in chunk
+            if membership_id not in heads
+        ]
+        if missing:
+            for membership_id, totals in (
+                _calculate_grouped_head_totals(missing).items()
+            ):
+                new_heads[membership_id] = LedgerBalanceHead(
+                    membership_id=membership_id,
+                    **totals,
+                )
+
+    ledger_entries = []
+    for entry, membership_id in zip(entries, membership_ids):
+        amount = _quantize(entry['amount'])
+        head = heads.get(membership_id) or new_heads[membership_id]
+        _apply_amount(head, entry['entry_type'], amount)
+        ledger_entries.append(
+            LedgerEntry(
+                membership_id=membership_id,
+                entry_type=entry['entry_type'],
+                category=entry['category'],
+                amount=amount,
+                reference=(
+                    entry.get('reference')
+                    or _bulk_reference(entry['category'])
+                ),
+                description=entry['description'],
+                balance_after=head.balance,
+                transaction=entry.get('transaction'),
+            )
+        )
+
+    LedgerEntry.objects.bulk_create(
+        ledger_entries,
+        batch_size=LEDGER_BULK_BATCH_SIZE,
+    )
+    _separate_same_instant_entries(ledger_entries)
+
+    LedgerBalanceHead.objects.bulk_create(
+        list(new_heads.values()),
+        batch_size=LEDGER_BULK_BATCH_SIZE,
+    )
+    now = timezone.now()
+    for head in heads.values():
+        head.updated_at = now
+    LedgerBalanceHead.objects.bulk_update(
+        list(heads.values()),
+        BALANCE_HEAD_FIELDS,
+        batch_size=LEDGER_BULK_BATCH_SIZE,
+    )
+    return ledger_entries
+
+
+def _select_heads_for_update(membership_ids):
+    return {
+        head.membership_id: head
+        for head in LedgerBalanceHead.objects.select_for_update().filter(
+            membership_id__in=membership_ids,
+        ).order_by('membership_id')
+    }
+
+
+def _calculate_grouped_head_totals(membership_ids):
+    totals = {
+        membership_id: {
+            'total_credits': ZERO,
+            'total_debits': ZERO,
+            'balance': ZERO,
+            'sequence': 0,
+        }
+        for membership_id in membership_ids
+    }
+    rows = LedgerEntry.objects.filter(
+        membership_id__in=membership_ids,
+    ).values('membership_id').annotate(
+        total_credits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.CREDIT),
+        ),
+        total_debits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.DEBIT),
+        ),
+        sequence=Count('id'),
+    ).order_by()
+    for row in rows:
+        total_credits = row['total_credits'] or ZERO
+        total_debits = row['total_debits'] or ZERO
+        totals[row['membership_id']] = {
+            'total_credits': total_credits,
+            'total_debits': total_debits,
+            'balance': total_credits - total_debits,
+            'sequence': row['sequence'],
+        }
+    return totals
+
+
+def _separate_same_instant_entries(ledger_entries):
+    """
+    Keep bulk-posted entries for one membership in posting order.
+
+    bulk_create stamps created_at per row, so two entries for the same
+    membership can share a timestamp. Statements order by created_at, so
+    such rows are nudged forward by a microsecond.
+    """
+    latest = {}
+    for entry in ledger_entries:
+        previous = latest.get(entry.membership_id)
+        if previous is not None and entry.created_at <= previous:
+            entry.created_at = previous + timedelta(microseconds=1)
+            LedgerEntry.objects.filter(pk=entry.pk).update(
+                created_at=entry.created_at,
+            )
+        latest[entry.membership_id] = entry.created_at
+
+
+def _quantize(amount):
+    return Decimal(str(amount)).quantize(
+        MONEY_QUANTIZER,
+        rounding=ROUND_HALF_UP,
+    )
+
+
+def _bulk_reference(category):
+    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
+    suffix = uuid4().hex[:12].upper()
+    return f'{_get_reference_prefix(category)}-{timestamp}-{suffix}'
 
 
 def _get_reference_prefix(category):
@@ -1,7 +1,9 @@
+import csv
 from math import ceil
 
 from django.core.cache import cache
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
 from django.utils.dateparse import parse_date
 from rest_framework import status
 from rest_framework.exceptions import NotFound
@@ -11,16 +13,33 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from config.pagination import FinancialPagination
+from accounts.permissions import IsSuperAdmin
+from config.pagination import (
+    FinancialCursorPagination,
+    FinancialPagination,
+)
 from saccomembership.models import Membership
 
 from .engines.balance_calculator import get_running_balance
 from .engines.pdf_generator import generate_statement_pdf
-from .engines.statement_builder import build_statement
-from .models import LedgerEntry
+from .engines.statement_builder import (
+    STATEMENT_ENTRY_FIELDS,
+    build_statement,
+    build_statement_summary,
+    get_statement_page,
+    get_statement_queryset,
+    record_statement_access,
+    stream_statement,
+)
+from .engines.statement_export import (
+    get_statement_render_histogram,
+    request_statement_export,
+)
+from .models import LedgerBalanceHead, LedgerEntry, StatementExport
 from .serializers import (
     BalanceSerializer,
     LedgerEntrySerializer,
+    StatementExportSerializer,
     StatementSerializer,
 )
 
@@ -30,7 +49,7 @@ class LedgerEntryListView(ListAPIView):
 
     serializer_class = LedgerEntrySerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = FinancialPagination
+    pagination_class = FinancialCursorPagination
 
     def get_queryset(self):
         membership = self._get_membership()
@@ -107,36 +126,92 @@ class BalanceView(APIView):
 
 
 class StatementView(APIView):
-    """Return a paginated ledger statement for a SACCO membership."""
+    """
+    Return a paginated ledger statement for a SACCO membership.
+
+    Balances and totals come from one streamed pass over the range, cached
+    until the member's next ledger posting. Entries are paged in the
+    database: by page number by default, or with a keyset cursor when
+    ``pagination=cursor`` or ``cursor`` is passed.
+    """
 
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
         from_date, to_date = self._get_date_range(request)
         membership = self._get_membership(request)
-        cache_key = f'statement:{membership.id}:{from_date}:{to_date}'
-        statement = cache.get(cache_key)
+        statement = self._get_summary(
+            membership,
+            from_date,
+            to_date,
+            request,
+        )
 
-        if statement is None:
-            statement = build_statement(
+        if (
+            request.query_params.get('pagination') == 'cursor'
+            or 'cursor' in request.query_params
+        ):
+            entries, pagination = self._cursor_page_entries(
                 membership,
                 from_date,
                 to_date,
-                requesting_user=request.user,
+                request,
+            )
+        else:
+            entries, pagination = self._paginate_entries(
+                get_statement_queryset(
+                    membership,
+                    from_date,
+                    to_date,
+                ).values(*STATEMENT_ENTRY_FIELDS),
+                request,
             )
-            cache.set(cache_key, statement, timeout=300)
 
-        statement = statement.copy()
-        statement['entries'], pagination = self._paginate_entries(
-            statement['entries'],
-            request,
-        )
+        statement['entries'] = entries
         serializer = StatementSerializer(statement)
         data = serializer.data
         data['entries_pagination'] = pagination
 
         return Response(data)
 
+    def _get_summary(self, membership, from_date, to_date, request):
+        sequence = LedgerBalanceHead.objects.filter(
+            membership=membership,
+        ).values_list('sequence', flat=True).first() or 0
+        cache_key = (
+            f'statement:{membership.id}:{from_date}:{to_date}:{sequence}'
+        )
+        statement = cache.get(cache_key)
+
+        if statement is None:
+            statement = build_statement_summary(
+                membership,
+                from_date,
+                to_date,
+                requesting_user=request.user,
+            )
+            cache.set(cache_key, statement, timeout=300)
+
+        return dict(statement)
+
+    def _cursor_page_entries(self, membership, from_date, to_date, request):
+        page_size = FinancialPagination().get_page_size(request)
+        try:
+            entries, next_cursor = get_statement_page(
+                membership,
+                from_date,
+                to_date,
+                cursor=request.query_params.get('cursor'),
+                page_size=page_size,
+            )
+        except ValueError as exc:
+            raise ValidationError({'cursor': str(exc)}) from exc
+
+        return entries, {
+            'page_size': page_size,
+            'next_cursor': next_cursor,
+        }
+
     def _get_date_range(self, request):
         from_date = self._parse_required_date(request, 'from_date')
         to_date = self._parse_required_date(request, 'to_date')
@@ -153,8 +228,14 @@ class StatementView(APIView):
 
         return from_date, to_date
 
+    def _get_param(self, request, name):
+        value = request.query_params.get(name)
+        if value is None and request.method == 'POST':
+            value = request.data.get(name)
+        return value
+
     def _parse_required_date(self, request, name):
-        raw_value = request.query_params.get(name)
+        raw_value = self._get_param(request, name)
         if not raw_value:
             raise ValidationError({name: 'This query param is required.'})
 
@@ -167,7 +248,7 @@ class StatementView(APIView):
         return value
 
     def _get_membership(self, request):
-        sacco_id = request.query_params.get('sacco_id')
+        sacco_id = self._get_param(request, 'sacco_id')
         if not sacco_id:
             raise ValidationError({'sacco_id': 'This query param is required.'})
 
@@ -185,6 +266,7 @@ class StatementView(APIView):
         page = paginator.paginate_queryset(entries, request, view=self)
 
         if page is None:
+            entries = list(entries)
             return entries, {
                 'count': len(entries),
                 'total_pages': 1,
@@ -236,3 +318,171 @@ class StatementPDFView(StatementView):
         return response
 
 
+class _Echo:
+    """File-like object whose write returns the value for streaming."""
+
+    def write(self, value):
+        return value
+
+
+class StatementCSVView(StatementView):
+    """Stream a ledger statement for a SACCO membership as CSV."""
+
+    def get(self, request):
+        from_date, to_date = self._get_date_range(request)
+        membership = self._get_membership(request)
+        stream = stream_statement(membership, from_date, to_date)
+        record_statement_access(membership, request.user)
+
+        writer = csv.writer(_Echo())
+        response = StreamingHttpResponse(
+            (writer.writerow(row) for row in self._csv_rows(stream)),
+            content_type='text/csv',
+        )
+        filename = (
+            f'statement_{membership.member_number or membership.id}_'
+            f'{from_date}_{to_date}.csv'
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{filename}"'
+        )
+        return response
+
+    def _csv_rows(self, stream):
+        yield [
+            'Date',
+            'Reference',
+            'Description',
+            'Category',
+            'Debit',
+            'Credit',
+            'Balance',
+        ]
+        yield ['', '', 'Opening balance', '', '', '', stream.opening_balance]
+
+        for entry in stream:
+            is_credit = entry['entry_type'] == LedgerEntry.EntryType.CREDIT
+            yield [
+                entry['created_at'].isoformat(),
+                entry['reference'],
+                entry['description'],
+                entry['category'],
+                '' if is_credit else entry['amount'],
+                entry['amount'] if is_credit else '',
+                entry['balance_after'],
+            ]
+
+        yield [
+            '',
+            '',
+            'Totals',
+            '',
+            stream.total_debits,
+            stream.total_credits,
+            '',
+        ]
+        yield ['', '', 'Closing balance', '', '', '', stream.closing_balance]
+
+
+class StatementExportView(StatementView):
+    """
+    Queue a statement PDF for rendering by a worker.
+
+    Accepts ``sacco_id``, ``from_date`` and ``to_date`` in the body or query
+    string. An identical request whose ledger range has not changed returns
+    the existing export instead of rendering again.
+    """
+
+    http_method_names = ['post', 'options']
+
+    def post(self, request):
+        from_date, to_date = self._get_date_range(request)
+        membership = self._get_membership(request)
+        export, created = request_statement_export(
+            membership,
+            from_date,
+            to_date,
+            requested_by=request.user,
+        )
+
+        if created:
+            from .tasks import render_statement_export_task
+
+            export_id = str(export.id)
+            transaction.on_commit(
+                lambda: render_statement_export_task.delay(export_id)
+            )
+
+        record_statement_access(membership, request.user)
+        response_status = (
+            status.HTTP_200_OK
+            if export.status == StatementExport.Status.COMPLETED
+            else status.HTTP_202_ACCEPTED
+        )
+        return Response(
+            StatementExportSerializer(
+                export,
+                context={'request': request},
+            ).data,
+            status=response_status,
+        )
+
+
+class StatementExportDetailView(APIView):
+    """Return the status of one of the user's statement exports."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_id):
+        export = get_user_statement_export(request.user, export_id)
+        return Response(
+            StatementExportSerializer(
+                export,
+                context={'request': request},
+            ).data
+        )
+
+
+class StatementExportDownloadView(APIView):
+    """Download a rendered statement PDF from media storage."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, export_id):
+        export = get_user_statement_export(request.user, export_id)
+        if export.status != StatementExport.Status.COMPLETED or not export.file:
+            return Response(
+                {'message': 'Statement PDF is not ready yet.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        membership = export.membership
+        filename = (
+            f'statement_{membership.member_number or membership.id}_'
+            f'{export.from_date}_{export.to_date}.pdf'
+        )
+        return FileResponse(
+            export.file.open('rb'),
+            as_attachment=True,
+            filename=filename,
+            content_type='application/pdf',
+        )
+
+
+class StatementExportMetricsView(APIView):
+    """Return render-time and page-count histograms for statement PDFs."""
+
+    permission_classes = [IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request):
+        return Response(get_statement_render_histogram())
+
+
+def get_user_statement_export(user, export_id):
+    try:
+        return StatementExport.objects.select_related('membership').get(
+            id=export_id,
+            membership__user=user,
+        )
+    except StatementExport.DoesNotExist as exc:
+        raise NotFound('Statement export not found.') from exc
@@ -6,6 +6,15 @@ from django.conf import settings
 
 logger = logging.getLogger('saccosphere.notifications')
 
+INVALID_TOKEN_ERRORS = frozenset({'InvalidRegistration', 'NotRegistered'})
+# Per-token errors that FCM documents as safe to retry.
+TRANSIENT_ERRORS = frozenset({
+    'Unavailable',
+    'InternalServerError',
+    'DeviceMessageRateExceeded',
+    'TopicsMessageRateExceeded',
+})
+
 
 class FCMError(Exception):
     def __init__(self, message, response=None, error_code=None):
@@ -16,24 +25,19 @@ class FCMError(Exception):
 
     @property
     def invalid_registration(self):
-        return self.error_code in {'InvalidRegistration', 'NotRegistered'}
+        return self.error_code in INVALID_TOKEN_ERRORS
 
 
 class FCMPushClient:
     FCM_URL = 'https://fcm.googleapis.com/fcm/send'
+    # Largest registration_ids list FCM accepts in one request.
+    MAX_MULTICAST_TOKENS = 1000
 
     def __init__(self):
         self.server_key = settings.FCM_SERVER_KEY
 
     def send(self, device_token, title, body, data=None):
-        payload = {
-            'to': device_token,
-            'notification': {
-                'title': title,
-                'body': body,
-            },
-            'data': data or {},
-        }
+        payload = self._build_payload(title, body, data, to=device_token)
 
         if settings.DEBUG:
             logger.info(
@@ -43,6 +47,88 @@ class FCMPushClient:
             )
             return {'success': 1, 'debug': True}
 
+        response_data = self._post(payload)
+        if response_data.get('success') == 0:
+            error_code = self._get_error_code(response_data)
+            raise FCMError(
+                'FCM push notification failed.',
+                response=response_data,
+                error_code=error_code,
+            )
+
+        return response_data
+
+    def send_multicast(self, device_tokens, title, body, data=None):
+        """
+        Send one notification to up to MAX_MULTICAST_TOKENS tokens.
+
+        Returns a list with one entry per token, in input order: None for
+        a delivered push or the FCM error code. FCMError is raised only
+        when the call as a whole fails.
+        """
+        device_tokens = list(device_tokens)
+        if len(device_tokens) > self.MAX_MULTICAST_TOKENS:
+            raise ValueError(
+                f'FCM multicast accepts at most '
+                f'{self.MAX_MULTICAST_TOKENS} tokens.'
+            )
+
+        if settings.DEBUG:
+            logger.info(
+                '[DEBUG MODE] Multicast push for %s tokens title=%s',
+                len(device_tokens),
+                title,
+            )
+            return [None] * len(device_tokens)
+
+        response_data = self._post(
+            self._build_payload(
+                title,
+                body,
+                data,
+                registration_ids=device_tokens,
+            )
+        )
+        results = response_data.get('results') or []
+        if len(results) != len(device_tokens):
+            raise FCMError(
+                'FCM multicast returned an unexpected result count.',
+                response=response_data,
+            )
+        return [result.get('error') for result in results]
+
+    def send_to_topic(self, topic, title, body, data=None):
+        """Send one notification to every device subscribed to a topic."""
+        payload = self._build_payload(title, body, data, to=f'/topics/{topic}')
+
+        if settings.DEBUG:
+            logger.info(
+                '[DEBUG MODE] Topic push for topic=%s title=%s',
+                topic,
+                title,
+            )
+            return {'message_id': 0, 'debug': True}
+
+        response_data = self._post(payload)
+        if response_data.get('error'):
+            raise FCMError(
+                'FCM topic push failed.',
+                response=response_data,
+                error_code=response_data['error'],
+            )
+        return response_data
+
+    def _build_payload(self, title, body, data, **target):
+        return {
+            **target,
+            'notification': {
+                'title': title,
+                'body': body,
+            },
+            'data': data or {},
+        }
+
+    def _post(self, payload):
         if not self.server_key:
             raise FCMError('FCM_SERVER_KEY must be configured.')
 
@@ -62,16 +148,7 @@ class FCMPushClient:
         except requests.RequestException as exc:
             raise FCMError('Failed to send FCM push notification.') from exc
 
-        response_data = response.json()
-        if response_data.get('success') == 0:
-            error_code = self._get_error_code(response_data)
-            raise FCMError(
-                'FCM push notification failed.',
-                response=response_data,
-                error_code=error_code,
-            )
-
-        return response_data
+        return response.json()
 
     def _get_error_code(self, response_data):
         results = response_data.get('results') or []
@@ -0,0 +1,131 @@
+"""Benchmark page-number against keyset pagination on deep pages."""
+
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import User
+from config.benchmark import BenchmarkCommand
+from config.pagination import (
+    SaccoSphereCursorPagination,
+    SaccoSpherePagination,
+)
+from notifications.models import Notification
+
+
+class Command(BenchmarkCommand):
+    """
+    Time page 1 and a deep page of a heavy user's notification feed.
+
+    Each run seeds one user with enough notifications to reach the
+    requested page, fetches page 1 and the deep page with both paginators
+    and rolls everything back. The keyset cursor for the deep page is
+    built from the row just before it, as a client walking the feed would
+    have received it.
+
+    Usage:
+        python manage.py benchmark_pagination --page 5000
+    """
+
+    help = 'Benchmark page-number vs keyset pagination depth.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--page',
+            type=int,
+            default=5000,
+            help='Deep page number to fetch.',
+        )
+        parser.add_argument(
+            '--page-size',
+            type=int,
+            default=20,
+            help='Rows per page.',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=5,
+            help='Fetches per measurement.',
+        )
+
+    def handle(self, *args, **options):
+        self.run_rolled_back(
+            self._run_scenario,
+            options['page'],
+            options['page_size'],
+            options['repeat'],
+        )
+
+    def _run_scenario(self, page, page_size, repeat):
+        timings = {}
+        row_count = page * page_size
+        with self.timed(timings, 'seed synthetic data'):
+            user = self._seed(row_count)
+
+        queryset = Notification.objects.filter(user=user)
+        factory = APIRequestFactory()
+        deep_cursor = SaccoSphereCursorPagination().encode_cursor(
+            queryset.order_by('-created_at', '-id')[
+                (page - 1) * page_size - 1
+            ]
+        )
+        scenarios = [
+            ('page-number page 1', SaccoSpherePagination, {}),
+            (
+                f'page-number page {page}',
+                SaccoSpherePagination,
+                {'page': page},
+            ),
+            ('keyset page 1', SaccoSphereCursorPagination, {}),
+            (
+                f'keyset page {page}',
+                SaccoSphereCursorPagination,
+                {'cursor': deep_cursor},
+            ),
+        ]
+
+        for label, paginator_class, params in scenarios:
+            request = Request(
+                factory.get(
+                    '/api/v1/notifications/',
+                    {'page_size': page_size, **params},
+                )
+            )
+            with self.timed(timings, f'{label} (x{repeat})'):
+                for _ in range(repeat):
+                    paginator_class().paginate_queryset(
+                        queryset.order_by('-created_at'),
+                        request,
+                    )
+
+        self.write_timings(f'{row_count:,} notifications', timings)
+
+    def _seed(self, row_count):
+        user = User.objects.create(
+            email=f'pagination-bench-{timezone.now().timestamp()}@test.com',
+            password=make_password(None),
+        )
+        started = timezone.now()
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    user=user,
+                    title=f'Benchmark notice {index}',
+                    message='Pagination benchmark',
+                    category=Notification.Category.ALERT,
+                )
+                for index in range(row_count)
+            ],
+            batch_size=5000,
+        )
+        # Spread timestamps so the feed has a realistic order.
+        for offset in range(0, row_count, 5000):
+            batch = notifications[offset:offset + 5000]
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification in batch],
+            ).update(created_at=started - timedelta(minutes=offset))
+        return user
@@ -0,0 +1,171 @@
+"""Benchmark the bulk SMS campaign dispatcher against a stub SMS API."""
+
+import time
+from unittest.mock import patch
+
+from django.test.utils import override_settings
+
+from accounts.models import SaccoSettings
+from config.benchmark import BenchmarkCommand, seed_members, seed_sacco
+from notifications.sms_campaigns import dispatch_sms_campaign
+from saccomanagement.models import SMSCampaign, SMSCampaignRecipient
+
+
+class _StubSMSService:
+    """Stands in for africastalking.SMS, accepting every number."""
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def send(self, message, recipients):
+        time.sleep(self.latency)
+        return {
+            'SMSMessageData': {
+                'Message': f'Sent to {len(recipients)}/{len(recipients)}',
+                'Recipients': [
+                    {
+                        'number': number,
+                        'status': 'Success',
+                        'statusCode': 101,
+                        'messageId': f'ATXid_{index}',
+                    }
+                    for index, number in enumerate(recipients)
+                ],
+            },
+        }
+
+
+class _StubAfricasTalking:
+    """Minimal africastalking module replacement for the benchmark."""
+
+    def __init__(self, latency):
+        self.SMS = _StubSMSService(latency)
+
+    def initialize(self, username, api_key):
+        pass
+
+
+class Command(BenchmarkCommand):
+    """
+    Measure bulk SMS messages per second on synthetic members.
+
+    Each run seeds one SACCO with a campaign for every member, dispatches
+    it through a local stub of the Africa's Talking SMS API and rolls
+    everything back. Every stub call sleeps for --latency-ms, so the
+    figures show what multi-recipient batching and the worker pool get
+    out of the configured provider rate limit. A batch size of 1 is the
+    old one-SMS-per-call behaviour.
+
+    Usage:
+        python manage.py benchmark_sms_campaign --recipients 5000 --rate 5
+    """
+
+    help = 'Benchmark bulk SMS campaign dispatch throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients',
+            type=int,
+            nargs='+',
+            default=[1000, 5000],
+            help='Campaign sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            nargs='+',
+            default=[1, 100],
+            help='Recipients per provider call to compare.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Thread pool size.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=5.0,
+            help='Provider calls per second allowed by the token bucket.',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=200.0,
+            help='Simulated provider latency per call.',
+        )
+
+    def handle(self, *args, **options):
+        for recipient_count in options['recipients']:
+            for batch_size in options['batch_size']:
+                self.run_rolled_back(
+                    self._run_scenario,
+                    recipient_count,
+                    batch_size,
+                    options['workers'],
+                    options['rate'],
+                    options['latency_ms'] / 1000,
+                )
+
+    def _run_scenario(
+        self,
+        recipient_count,
+        batch_size,
+        workers,
+        rate,
+        latency,
+    ):
+        timings = {}
+        with self.timed(timings, 'seed synthetic data'):
+            sacco = seed_sacco('SMS Benchmark SACCO')
+            memberships = seed_members(sacco, recipient_count)
+            SaccoSettings.objects.update_or_create(
+                sacco=sacco,
+                defaults={'sms_daily_limit': recipient_count},
+            )
+            campaign = SMSCampaign.objects.create(
+                sacco=sacco,
+                message='Benchmark campaign message.',
+                status=SMSCampaign.Status.SENDING,
+                total_recipients=recipient_count,
+            )
+            SMSCampaignRecipient.objects.bulk_create(
+                [
+                    SMSCampaignRecipient(
+                        campaign=campaign,
+                        membership=membership,
+                        phone_number=membership.user.phone_number,
+                    )
+                    for membership in memberships
+                ],
+                batch_size=2000,
+            )
+
+        with override_settings(
+            DEBUG=False,
+            AT_API_KEY='benchmark',
+            SMS_PROVIDER_RATE_LIMIT=rate,
+        ):
+            with patch(
+                'accounts.integrations.otp_service.africastalking',
+                _StubAfricasTalking(latency),
+            ):
+                with self.timed(timings, 'dispatch_sms_campaign'):
+                    result = dispatch_sms_campaign(
+                        campaign.id,
+                        max_workers=workers,
+                        batch_size=batch_size,
+                    )
+
+        self.write_timings(
+            f'{recipient_count:,} recipients, {batch_size} per call, '
+            f'{workers} workers, {rate:g} calls/s, '
+            f'{latency * 1000:g}ms latency',
+            timings,
+            rows=recipient_count,
+        )
+        self.stdout.write(
+            f'  status: {result["status"]}, sent: {result["sent"]:,}, '
+            f'failed: {result["failed"]:,}'
+        )
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0004_alter_notification_category'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at'], name='notificatio_user_id_c62b26_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.16 on 2026-10-18 17:34
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_notificatio_user_id_c62b26_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='dedup_key',
+            field=models.CharField(blank=True, help_text='Caller-supplied key; a user gets at most one notification per key, so retried fan-outs do not notify twice.', max_length=150, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='notification',
+            constraint=models.UniqueConstraint(condition=models.Q(('dedup_key__isnull', False)), fields=('user', 'dedup_key'), name='unique_notification_dedup_key'),
+        ),
+    ]
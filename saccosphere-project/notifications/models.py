@@ -44,12 +44,29 @@ class Notification(models.Model):
         null=True,
         blank=True,
     )
+    dedup_key = models.CharField(
+        max_length=150,
+        null=True,
+        blank=True,
+        help_text=(
+            'Caller-supplied key; a user gets at most one notification '
+            'per key, so retried fan-outs do not notify twice.'
+        ),
+    )
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'dedup_key'],
+                condition=models.Q(dedup_key__isnull=False),
+                name='unique_notification_dedup_key',
+            ),
         ]
 
     def __str__(self):
@@ -0,0 +1,208 @@
+"""Batched FCM push delivery over multicast calls."""
+
+import logging
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.conf import settings
+
+from .integrations.fcm_push import (
+    INVALID_TOKEN_ERRORS,
+    TRANSIENT_ERRORS,
+    FCMError,
+    FCMPushClient,
+)
+from .models import DeviceToken, Notification
+
+
+logger = logging.getLogger('saccosphere.notifications')
+
+
+@dataclass
+class PushDeliveryResult:
+    """Device token ids grouped by what happened to their push."""
+
+    sent: set = field(default_factory=set)
+    retry: set = field(default_factory=set)
+    invalid: set = field(default_factory=set)
+    failed: set = field(default_factory=set)
+
+    def merge(self, other):
+        self.sent |= other.sent
+        self.retry |= other.retry
+        self.invalid |= other.invalid
+        self.failed |= other.failed
+
+
+def deliver_push(
+    device_tokens,
+    title,
+    body,
+    data=None,
+    client=None,
+    deactivate=True,
+):
+    """
+    Send one push to many devices in multicast batches.
+
+    ``device_tokens`` is an iterable of ``(token_id, token)`` pairs and is
+    consumed lazily, FCM_MULTICAST_BATCH_SIZE tokens per call, so large
+    segments can be streamed from a queryset iterator. A call that fails
+    as a whole marks its batch for retry; per-token transient errors
+    mark only that token. Tokens FCM reports as unregistered are
+    deactivated in one update once every batch is sent, unless
+    ``deactivate`` is False and the caller does it for several sends.
+
+    Returns:
+        PushDeliveryResult: Token ids by outcome
+    """
+    client = client or FCMPushClient()
+    batch_size = min(
+        settings.FCM_MULTICAST_BATCH_SIZE,
+        client.MAX_MULTICAST_TOKENS,
+    )
+    result = PushDeliveryResult()
+    device_tokens = iter(device_tokens)
+
+    while True:
+        batch = list(islice(device_tokens, batch_size))
+        if not batch:
+            break
+
+        token_ids = [token_id for token_id, _token in batch]
+        try:
+            errors = client.send_multicast(
+                [token for _token_id, token in batch],
+                title,
+                body,
+                data,
+            )
+        except FCMError:
+            logger.warning(
+                'Multicast push to %s tokens failed.',
+                len(batch),
+                exc_info=True,
+            )
+            result.retry.update(token_ids)
+            continue
+
+        for token_id, error in zip(token_ids, errors):
+            if error is None:
+                result.sent.add(token_id)
+            elif error in INVALID_TOKEN_ERRORS:
+                result.invalid.add(token_id)
+            elif error in TRANSIENT_ERRORS:
+                result.retry.add(token_id)
+            else:
+                result.failed.add(token_id)
+
+    if deactivate:
+        deactivate_device_tokens(result.invalid)
+    return result
+
+
+def deactivate_device_tokens(token_ids):
+    """Mark unregistered device tokens inactive in a single update."""
+    if not token_ids:
+        return 0
+
+    deactivated = DeviceToken.objects.filter(
+        id__in=token_ids,
+        is_active=True,
+    ).update(is_active=False)
+    logger.info('Deactivated %s invalid device tokens.', deactivated)
+    return deactivated
+
+
+def active_device_tokens(user_ids=None, sacco_id=None, token_ids=None):
+    """
+    Return ``(id, token)`` pairs of active tokens for a push segment.
+
+    Filters combine: explicit users, approved members of a SACCO and a
+    subset of token ids (used when retrying the failed part of a send).
+    """
+    tokens = DeviceToken.objects.filter(is_active=True)
+    if user_ids is not None:
+        tokens = tokens.filter(user_id__in=user_ids)
+    if sacco_id is not None:
+        from saccomembership.models import Membership
+
+        tokens = tokens.filter(
+            user__membership__sacco_id=sacco_id,
+            user__membership__status=Membership.Status.APPROVED,
+        ).distinct()
+    if token_ids is not None:
+        tokens = tokens.filter(id__in=token_ids)
+    return tokens.order_by('id').values_list('id', 'token')
+
+
+def deliver_notification_pushes(push_ids):
+    """
+    Send pushes for bulk-created notifications and flag them sent.
+
+    Notifications with the same payload share multicast calls. A
+    notification counts as sent when any of its user's devices took the
+    push. The ids returned are the notifications that reached no device
+    but had a transient failure, so only those are retried.
+    """
+    notifications = list(
+        Notification.objects.filter(id__in=push_ids, push_sent=False)
+    )
+    if not notifications:
+        return []
+
+    tokens_by_user = {}
+    for token_id, user_id, token in DeviceToken.objects.filter(
+        user_id__in={notification.user_id for notification in notifications},
+        is_active=True,
+    ).values_list('id', 'user_id', 'token'):
+        tokens_by_user.setdefault(user_id, []).append((token_id, token))
+
+    groups = {}
+    for notification in notifications:
+        payload = (
+            notification.title,
+            notification.message,
+            notification.category,
+            notification.action_url or '',
+        )
+        groups.setdefault(payload, []).append(notification)
+
+    client = FCMPushClient()
+    result = PushDeliveryResult()
+    for (title, message, category, action_url), group in groups.items():
+        user_ids = {notification.user_id for notification in group}
+        result.merge(
+            deliver_push(
+                [
+                    device_token
+                    for user_id in user_ids
+                    for device_token in tokens_by_user.get(user_id, [])
+                ],
+                title,
+                message,
+                {'category': category, 'action_url': action_url},
+                client=client,
+                deactivate=False,
+            )
+        )
+    deactivate_device_tokens(result.invalid)
+
+    sent_ids = []
+    failed_ids = []
+    for notification in notifications:
+        token_ids = {
+            token_id
+            for token_id, _token in tokens_by_user.get(
+                notification.user_id,
+                [],
+            )
+        }
+        if token_ids & result.sent:
+            sent_ids.append(notification.id)
+        elif token_ids & result.retry:
+            failed_ids.append(str(notification.id))
+
+    if sent_ids:
+        Notification.objects.filter(id__in=sent_ids).update(push_sent=True)
+    return failed_ids
@@ -0,0 +1,254 @@
+"""Concurrent, rate-limited dispatch of SACCO bulk SMS campaigns."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from accounts.models import SaccoSettings
+from payments.reconciliation import TokenBucket
+from saccomanagement.models import SMSCampaign, SMSCampaignRecipient
+
+
+logger = logging.getLogger('saccosphere.sms')
+
+MAX_RUN_SECONDS = 8 * 60
+DISPATCH_LOCK_KEY = 'sms_campaign_dispatch:{campaign_id}'
+DAILY_LIMIT_ERROR = 'daily SMS limit reached'
+RETRIES_EXHAUSTED_ERROR = 'dispatch retries ran out'
+
+
+def dispatch_sms_campaign(
+    campaign_id,
+    max_workers=None,
+    batch_size=None,
+    max_run_seconds=MAX_RUN_SECONDS,
+):
+    """
+    Send a campaign's PENDING recipients within the SACCO's daily limit.
+
+    Recipients beyond the remaining daily allowance are failed up front.
+    The rest are paged by id and grouped into multi-recipient provider
+    calls of ``batch_size`` numbers, sent through a bounded thread pool
+    with one token bucket so the dispatch stays under
+    SMS_PROVIDER_RATE_LIMIT calls per second. Each call's statuses are
+    written with one bulk update and the campaign counters are moved by
+    F() increments. Only PENDING rows are sent, so a dispatch cut short
+    by the time budget or a worker restart resumes where it stopped.
+
+    Returns:
+        dict: {'status': str, 'sent': int, 'failed': int}
+    """
+    lock_key = DISPATCH_LOCK_KEY.format(campaign_id=campaign_id)
+    if not cache.add(lock_key, True, timeout=max_run_seconds + 60):
+        logger.info('SMS campaign %s is already dispatching.', campaign_id)
+        return {'status': None, 'sent': 0, 'failed': 0}
+
+    try:
+        return _dispatch(
+            campaign_id,
+            max_workers or settings.SMS_CAMPAIGN_MAX_WORKERS,
+            batch_size or settings.SMS_CAMPAIGN_BATCH_SIZE,
+            max_run_seconds,
+        )
+    finally:
+        cache.delete(lock_key)
+
+
+def abandon_sms_campaign(campaign_id):
+    """
+    Mark a campaign FAILED once its dispatch retries are exhausted.
+
+    Recipients still PENDING are failed with RETRIES_EXHAUSTED_ERROR and
+    counted in failed_count, so the campaign totals add up and nothing is
+    left waiting on a dispatch that will not come.
+
+    Returns:
+        int: Recipients left unsent
+    """
+    with transaction.atomic():
+        outstanding = SMSCampaignRecipient.objects.filter(
+            campaign_id=campaign_id,
+            status=SMSCampaignRecipient.Status.PENDING,
+        ).update(
+            status=SMSCampaignRecipient.Status.FAILED,
+            error_message=RETRIES_EXHAUSTED_ERROR,
+        )
+        SMSCampaign.objects.filter(
+            pk=campaign_id,
+            status=SMSCampaign.Status.SENDING,
+        ).update(
+            status=SMSCampaign.Status.FAILED,
+            failed_count=F('failed_count') + outstanding,
+        )
+    logger.error(
+        'SMS campaign %s gave up with %s recipients outstanding.',
+        campaign_id,
+        outstanding,
+    )
+    return outstanding
+
+
+def _dispatch(campaign_id, max_workers, batch_size, max_run_seconds):
+    from accounts.integrations.otp_service import ATSMSClient
+
+    campaign = SMSCampaign.objects.select_related('sacco').get(
+        pk=campaign_id,
+    )
+    summary = {'sent': 0, 'failed': 0}
+    if campaign.status in (
+        SMSCampaign.Status.COMPLETED,
+        SMSCampaign.Status.FAILED,
+    ):
+        return {'status': campaign.status, **summary}
+
+    summary['failed'] += _fail_over_daily_limit(campaign)
+
+    client = ATSMSClient()
+    bucket = TokenBucket(settings.SMS_PROVIDER_RATE_LIMIT)
+    deadline = time.monotonic() + max_run_seconds
+    page_size = batch_size * max_workers
+    after_id = None
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='sms-campaign',
+    ) as executor:
+        while time.monotonic() < deadline:
+            page = _pending_page(campaign, after_id, page_size)
+            if not page:
+                break
+
+            after_id = page[-1].id
+            batches = [
+                page[index:index + batch_size]
+                for index in range(0, len(page), batch_size)
+            ]
+            results = executor.map(
+                lambda batch: _send_batch(
+                    client,
+                    bucket,
+                    campaign.message,
+                    batch,
+                ),
+                batches,
+            )
+            for batch, batch_results in zip(batches, results):
+                sent, failed = _record_results(campaign, batch, batch_results)
+                summary['sent'] += sent
+                summary['failed'] += failed
+
+    return {'status': _finish_dispatch(campaign), **summary}
+
+
+def _fail_over_daily_limit(campaign):
+    """Fail the PENDING recipients beyond the remaining daily allowance."""
+    settings_obj, _created = SaccoSettings.objects.get_or_create(
+        sacco=campaign.sacco,
+    )
+    sent_today = SMSCampaignRecipient.objects.filter(
+        campaign__sacco=campaign.sacco,
+        status=SMSCampaignRecipient.Status.SENT,
+        sent_at__date=timezone.localdate(),
+    ).count()
+    allowance = max(settings_obj.sms_daily_limit - sent_today, 0)
+
+    over_limit = campaign.recipients.filter(
+        status=SMSCampaignRecipient.Status.PENDING,
+    )
+    if allowance:
+        last_allowed_id = list(
+            over_limit.order_by('id').values_list('id', flat=True)[
+                allowance - 1:allowance
+            ]
+        )
+        if not last_allowed_id:
+            return 0
+        over_limit = over_limit.filter(id__gt=last_allowed_id[0])
+
+    with transaction.atomic():
+        failed = over_limit.update(
+            status=SMSCampaignRecipient.Status.FAILED,
+            error_message=DAILY_LIMIT_ERROR,
+        )
+        if failed:
+            SMSCampaign.objects.filter(pk=campaign.pk).update(
+                failed_count=F('failed_count') + failed,
+            )
+    return failed
+
+
+def _pending_page(campaign, after_id, page_size):
+    recipients = campaign.recipients.filter(
+        status=SMSCampaignRecipient.Status.PENDING,
+    )
+    if after_id is not None:
+        recipients = recipients.filter(id__gt=after_id)
+    return list(recipients.order_by('id')[:page_size])
+
+
+def _send_batch(client, bucket, message, batch):
+    """Send one multi-recipient call; a failed call fails every number."""
+    from accounts.integrations.otp_service import ATSMSError
+
+    bucket.acquire()
+    try:
+        return client.send_bulk_sms(
+            [recipient.phone_number for recipient in batch],
+            message,
+        )
+    except ATSMSError as exc:
+        logger.warning(
+            'Bulk SMS call for %s recipients failed.',
+            len(batch),
+            exc_info=True,
+        )
+        return [
+            {'success': False, 'status': str(exc), 'message_id': ''}
+        ] * len(batch)
+
+
+def _record_results(campaign, batch, results):
+    now = timezone.now()
+    sent = 0
+    for recipient, result in zip(batch, results):
+        if result['success']:
+            sent += 1
+            recipient.status = SMSCampaignRecipient.Status.SENT
+            recipient.sent_at = now
+            recipient.error_message = ''
+        else:
+            recipient.status = SMSCampaignRecipient.Status.FAILED
+            recipient.error_message = result['status'][:255]
+    failed = len(batch) - sent
+
+    with transaction.atomic():
+        SMSCampaignRecipient.objects.bulk_update(
+            batch,
+            ['status', 'sent_at', 'error_message'],
+        )
+        SMSCampaign.objects.filter(pk=campaign.pk).update(
+            sent_count=F('sent_count') + sent,
+            failed_count=F('failed_count') + failed,
+        )
+    return sent, failed
+
+
+def _finish_dispatch(campaign):
+    if campaign.recipients.filter(
+        status=SMSCampaignRecipient.Status.PENDING,
+    ).exists():
+        status = SMSCampaign.Status.SENDING
+    elif SMSCampaign.objects.filter(pk=campaign.pk, sent_count__gt=0).exists():
+        status = SMSCampaign.Status.COMPLETED
+    else:
+        status = SMSCampaign.Status.FAILED
+
+    SMSCampaign.objects.filter(pk=campaign.pk).update(status=status)
+    logger.info('SMS campaign %s dispatched: status=%s.', campaign.id, status)
+    return status
@@ -4,9 +4,6 @@ from celery import chain, shared_task
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.mail import send_mail
-from django.utils import timezone
-
-from .models import DeviceToken
 
 
 logger = logging.getLogger('saccosphere.notifications')
@@ -56,42 +53,124 @@ def send_email_task(self, to_email, subject, body, html_body=None):
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def send_push_notification_task(self, user_id, title, body, data=None):
-    from notifications.integrations.fcm_push import FCMPushClient, FCMError
+def send_push_notification_task(
+    self,
+    user_id,
+    title,
+    body,
+    data=None,
+    token_ids=None,
+):
+    """
+    Push one notification to a user's active devices in multicast calls.
+
+    A retry is limited to the devices that hit a transient error, passed
+    back in as ``token_ids``.
+    """
+    from .push_delivery import active_device_tokens, deliver_push
+
+    result = deliver_push(
+        active_device_tokens(user_ids=[user_id], token_ids=token_ids),
+        title,
+        body,
+        data,
+    )
+    if result.retry:
+        countdown = 60 * 2 ** self.request.retries
+        logger.warning(
+            'Push notification failed for %s devices of user_id=%s. '
+            'Retrying in %s seconds.',
+            len(result.retry),
+            user_id,
+            countdown,
+        )
+        raise self.retry(
+            args=(user_id, title, body, data),
+            kwargs={'token_ids': [str(pk) for pk in result.retry]},
+            countdown=countdown,
+        )
 
-    client = FCMPushClient()
-    sent_count = 0
-    tokens = DeviceToken.objects.filter(user_id=user_id, is_active=True)
+    return len(result.sent)
 
-    for device_token in tokens:
+
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def broadcast_push_task(
+    self,
+    title,
+    body,
+    data=None,
+    topic=None,
+    user_ids=None,
+    sacco_id=None,
+    token_ids=None,
+):
+    """
+    Broadcast one push to an FCM topic or to a segment of users.
+
+    With ``topic`` a single FCM call reaches every subscribed device.
+    Otherwise the segment's active tokens (``user_ids`` and/or the
+    approved members of ``sacco_id``; every active device when neither is
+    given) are streamed into multicast calls in one job, and a retry
+    covers only the tokens that failed.
+    """
+    from .integrations.fcm_push import (
+        TRANSIENT_ERRORS,
+        FCMError,
+        FCMPushClient,
+    )
+    from .push_delivery import active_device_tokens, deliver_push
+
+    if topic:
         try:
-            client.send(device_token.token, title, body, data)
-            sent_count += 1
-            logger.info(
-                'Push notification sent to device_token_id=%s.',
-                device_token.id,
-            )
+            FCMPushClient().send_to_topic(topic, title, body, data)
         except FCMError as exc:
-            if exc.invalid_registration:
-                device_token.is_active = False
-                device_token.save(update_fields=['is_active'])
-                logger.info(
-                    'Deactivated invalid device_token_id=%s.',
-                    device_token.id,
+            if exc.error_code and exc.error_code not in TRANSIENT_ERRORS:
+                logger.error(
+                    'Topic push to %s rejected: %s.',
+                    topic,
+                    exc.error_code,
                 )
-                continue
-
-            countdown = 60 * 2 ** self.request.retries
-            logger.warning(
-                'Push notification failed for user_id=%s. '
-                'Retrying in %s seconds.',
-                user_id,
-                countdown,
-                exc_info=True,
+                return 0
+            raise self.retry(
+                exc=exc,
+                countdown=60 * 2 ** self.request.retries,
             )
-            raise self.retry(exc=exc, countdown=countdown)
+        return 1
+
+    result = deliver_push(
+        active_device_tokens(
+            user_ids=user_ids,
+            sacco_id=sacco_id,
+            token_ids=token_ids,
+        ).iterator(chunk_size=settings.FCM_MULTICAST_BATCH_SIZE),
+        title,
+        body,
+        data,
+    )
+    if result.retry:
+        countdown = 60 * 2 ** self.request.retries
+        logger.warning(
+            'Broadcast push failed for %s devices. Retrying in %s seconds.',
+            len(result.retry),
+            countdown,
+        )
+        raise self.retry(
+            args=(title, body, data),
+            kwargs={
+                'user_ids': user_ids,
+                'sacco_id': sacco_id,
+                'token_ids': [str(pk) for pk in result.retry],
+            },
+            countdown=countdown,
+        )
 
-    return sent_count
+    logger.info(
+        'Broadcast push sent to %s devices; %s invalid, %s rejected.',
+        len(result.sent),
+        len(result.invalid),
+        len(result.failed),
+    )
+    return len(result.sent)
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
@@ -162,151 +241,103 @@ def notify_user_task(
 
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
-def send_bulk_sms_campaign_task(self, campaign_id):
-    """Send a SACCO bulk SMS campaign through Africa's Talking."""
-    from accounts.integrations.otp_service import ATSMSClient, ATSMSError
-    from accounts.models import SaccoSettings
-    from saccomanagement.models import (
-        SMSCampaign,
-        SMSCampaignRecipient,
+def deliver_notifications_task(self, push_ids, sms_messages):
+    """
+    Deliver one chunk of bulk-created notifications.
+
+    Pushes with the same payload share FCM multicast calls and are
+    flagged ``push_sent`` in a single update; SMS go out through
+    one Africa's Talking client. Only the notifications that hit a
+    transient error are retried.
+    """
+    from .push_delivery import deliver_notification_pushes
+
+    failed_push_ids = (
+        deliver_notification_pushes(push_ids) if push_ids else []
     )
+    failed_sms = _deliver_sms_chunk(sms_messages)
 
-    try:
-        campaign = SMSCampaign.objects.select_related('sacco').get(
-            id=campaign_id,
-        )
-    except SMSCampaign.DoesNotExist:
-        logger.warning('SMS campaign_id=%s does not exist.', campaign_id)
-        return None
-
-    try:
-        settings_obj, _created = SaccoSettings.objects.get_or_create(
-            sacco=campaign.sacco,
-        )
-        allowance = get_remaining_daily_sms_allowance(
-            campaign,
-            settings_obj.sms_daily_limit,
-            SMSCampaignRecipient,
-        )
-        pending_recipients = campaign.recipients.filter(
-            status=SMSCampaignRecipient.Status.PENDING,
-        ).order_by('id')
-
-        if allowance <= 0:
-            mark_daily_limit_failures(pending_recipients)
-            update_campaign_counts(campaign, SMSCampaignRecipient)
-            campaign.status = SMSCampaign.Status.FAILED
-            campaign.save(update_fields=[
-                'status',
-                'sent_count',
-                'failed_count',
-            ])
-            return {
-                'sent': campaign.sent_count,
-                'failed': campaign.failed_count,
-                'status': campaign.status,
-            }
-
-        allowed_recipients = list(pending_recipients[:allowance])
-        allowed_ids = [recipient.id for recipient in allowed_recipients]
-        limit_recipients = pending_recipients.exclude(id__in=allowed_ids)
-        mark_daily_limit_failures(limit_recipients)
-
-        client = ATSMSClient()
-        for batch in chunked(allowed_recipients, 50):
-            for recipient in batch:
-                send_campaign_sms(
-                    client,
-                    campaign,
-                    recipient,
-                    ATSMSError,
-                )
-            update_campaign_counts(campaign, SMSCampaignRecipient)
-
-        update_campaign_counts(campaign, SMSCampaignRecipient)
-        campaign.status = (
-            SMSCampaign.Status.COMPLETED
-            if campaign.sent_count > 0
-            else SMSCampaign.Status.FAILED
-        )
-        campaign.save(update_fields=[
-            'status',
-            'sent_count',
-            'failed_count',
-        ])
-        return {
-            'sent': campaign.sent_count,
-            'failed': campaign.failed_count,
-            'status': campaign.status,
-        }
-    except Exception as exc:
+    if failed_push_ids or failed_sms:
         countdown = 60 * 2 ** self.request.retries
         logger.warning(
-            'Bulk SMS campaign_id=%s failed. Retrying in %s seconds.',
-            campaign_id,
+            'Notification delivery failed for %s pushes and %s SMS. '
+            'Retrying in %s seconds.',
+            len(failed_push_ids),
+            len(failed_sms),
             countdown,
-            exc_info=True,
         )
-        raise self.retry(exc=exc, countdown=countdown)
+        raise self.retry(
+            args=(failed_push_ids, failed_sms),
+            countdown=countdown,
+        )
 
+    return {
+        'push': len(push_ids),
+        'sms': len(sms_messages),
+    }
 
-def get_remaining_daily_sms_allowance(
-    campaign,
-    sms_daily_limit,
-    recipient_model,
-):
-    sent_today = recipient_model.objects.filter(
-        campaign__sacco=campaign.sacco,
-        status=recipient_model.Status.SENT,
-        sent_at__date=timezone.localdate(),
-    ).count()
-    return max(sms_daily_limit - sent_today, 0)
-
-
-def mark_daily_limit_failures(recipients):
-    recipients.update(
-        status=recipients.model.Status.FAILED,
-        error_message='daily SMS limit reached',
-    )
 
+def _deliver_sms_chunk(sms_messages):
+    """Send SMS for a chunk and return the entries that should retry."""
+    from accounts.integrations.otp_service import ATSMSClient, ATSMSError
 
-def send_campaign_sms(client, campaign, recipient, sms_error_class):
-    try:
-        client.send_sms(recipient.phone_number, campaign.message)
-    except sms_error_class as exc:
-        recipient.status = recipient.Status.FAILED
-        recipient.error_message = str(exc)[:255]
-        recipient.save(update_fields=['status', 'error_message'])
-        logger.warning(
-            'Bulk SMS recipient_id=%s failed.',
-            recipient.id,
-            exc_info=True,
-        )
-        return False
+    if not sms_messages:
+        return []
 
-    recipient.status = recipient.Status.SENT
-    recipient.sent_at = timezone.now()
-    recipient.error_message = ''
-    recipient.save(update_fields=[
-        'status',
-        'sent_at',
-        'error_message',
-    ])
-    return True
+    client = ATSMSClient()
+    failed = []
+    for notification_id, phone_number, message in sms_messages:
+        try:
+            client.send_sms(phone_number, message)
+        except ATSMSError:
+            logger.warning(
+                'SMS failed for notification_id=%s.',
+                notification_id,
+                exc_info=True,
+            )
+            failed.append([notification_id, phone_number, message])
+    return failed
 
 
-def update_campaign_counts(campaign, recipient_model):
-    campaign.sent_count = campaign.recipients.filter(
-        status=recipient_model.Status.SENT,
-    ).count()
-    campaign.failed_count = campaign.recipients.filter(
-        status=recipient_model.Status.FAILED,
-    ).count()
-    campaign.save(update_fields=['sent_count', 'failed_count'])
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def send_bulk_sms_campaign_task(self, campaign_id):
+    """
+    Send a SACCO bulk SMS campaign through Africa's Talking.
 
+    The campaign is sent in multi-recipient calls by dispatch_sms_campaign.
+    A dispatch that runs out of time leaves the campaign SENDING, and the
+    task retries to send the recipients still PENDING. Once the retries
+    are exhausted the campaign is failed with its outstanding recipients.
+    """
+    from saccomanagement.models import SMSCampaign
 
-def chunked(items, size):
-    for index in range(0, len(items), size):
-        yield items[index:index + size]
+    from .sms_campaigns import abandon_sms_campaign, dispatch_sms_campaign
 
+    try:
+        result = dispatch_sms_campaign(campaign_id)
+    except SMSCampaign.DoesNotExist:
+        logger.warning('SMS campaign_id=%s does not exist.', campaign_id)
+        return None
+    except Exception as exc:
+        if self.request.retries >= self.max_retries:
+            abandon_sms_campaign(campaign_id)
+            raise
+        countdown = 60 * 2 ** self.request.retries
+        logger.warning(
+            'Bulk SMS campaign_id=%s failed. Retrying in %s seconds.',
+            campaign_id,
+            countdown,
+            exc_info=True,
+        )
+        raise self.retry(exc=exc, countdown=countdown)
 
+    if result['status'] == SMSCampaign.Status.SENDING:
+        if self.request.retries >= self.max_retries:
+            outstanding = abandon_sms_campaign(campaign_id)
+            return {
+                **result,
+                'status': SMSCampaign.Status.FAILED,
+                'failed': result['failed'] + outstanding,
+            }
+        raise self.retry()
+    return result
@@ -1,5 +1,376 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import User
+from config.pagination import NotificationCursorPagination
+
+from .models import DeviceToken, Notification
+from .tasks import (
+    broadcast_push_task,
+    deliver_notifications_task,
+    send_push_notification_task,
+)
+from .utils import create_notifications
 
 
 class NotificationsTests(TestCase):
     pass
+
+
+class NotificationFeedPaginationTests(TestCase):
+    """Test keyset pagination of the notification feed."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email='feed-member@example.com',
+            password='StrongPass1',
+        )
+        self.client.force_authenticate(user=self.user)
+        created_at = timezone.now()
+        notifications = Notification.objects.bulk_create(
+            [
+                Notification(
+                    user=self.user,
+                    title=f'Notice {index}',
+                    message='Feed notice',
+                    category=Notification.Category.ALERT,
+                )
+                for index in range(5)
+            ]
+        )
+        # Two notices share a timestamp so the id tie-breaker is used.
+        for index, notification in enumerate(notifications):
+            Notification.objects.filter(pk=notification.pk).update(
+                created_at=created_at - timedelta(minutes=min(index, 3)),
+            )
+        self.expected_ids = [
+            str(pk)
+            for pk in Notification.objects.order_by(
+                '-created_at',
+                '-id',
+            ).values_list('id', flat=True)
+        ]
+
+    def _get(self, url='/api/v1/notifications/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['data']
+
+    def test_pages_walk_forward_and_back_without_gaps(self):
+        """Next and previous links cover every row exactly once."""
+        first = self._get(page_size=2)
+        second = self.client.get(first['next']).data['data']
+        third = self.client.get(second['next']).data['data']
+
+        seen = [
+            str(row['id'])
+            for page in (first, second, third)
+            for row in page['results']
+        ]
+        self.assertEqual(seen, self.expected_ids)
+        self.assertIsNone(first['previous'])
+        self.assertIsNone(third['next'])
+        self.assertIsNone(first['count'])
+
+        back = self.client.get(third['previous']).data['data']
+        self.assertEqual(
+            [str(row['id']) for row in back['results']],
+            self.expected_ids[2:4],
+        )
+
+    def test_count_is_optional_and_capped(self):
+        """The total is only counted on request, up to max_count."""
+        data = self._get(include_count='true')
+        self.assertEqual(data['count'], 5)
+        self.assertTrue(data['count_is_exact'])
+
+        with patch.object(NotificationCursorPagination, 'max_count', 3):
+            data = self._get(include_count='true')
+        self.assertEqual(data['count'], 3)
+        self.assertFalse(data['count_is_exact'])
+
+    def test_invalid_cursor_is_rejected(self):
+        """A tampered cursor returns 404 instead of a server error."""
+        response = self.client.get(
+            '/api/v1/notifications/',
+            {'cursor': 'not-a-cursor'},
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+
+class BulkNotificationTests(TestCase):
+    """Test bulk notification writes, dedup keys and chunked delivery."""
+
+    def setUp(self):
+        self.users = [
+            User.objects.create_user(
+                email=f'bulk-{index}@example.com',
+                phone_number=f'25471100{index:04d}',
+                password='StrongPass1',
+            )
+            for index in range(5)
+        ]
+
+    def _entries(self, dedup_key='npl-flag:1', **payload):
+        return [
+            (
+                user,
+                {
+                    'title': 'Loan notice',
+                    'message': 'Your loan is overdue.',
+                    'category': Notification.Category.LOAN,
+                    'dedup_key': dedup_key,
+                    **payload,
+                },
+            )
+            for user in self.users
+        ]
+
+    @override_settings(NOTIFICATION_FANOUT_CHUNK_SIZE=2)
+    @patch('notifications.tasks.deliver_notifications_task.delay')
+    def test_rows_are_bulk_written_and_delivery_is_chunked(self, delay_mock):
+        with self.assertNumQueries(3):
+            with self.captureOnCommitCallbacks(execute=True):
+                created = create_notifications(
+                    self._entries(sms_message='Pay now.'),
+                )
+
+        self.assertEqual(len(created), 5)
+        self.assertEqual(delay_mock.call_count, 3)
+        push_chunks = [call.args[0] for call in delay_mock.call_args_list]
+        sms_chunks = [call.args[1] for call in delay_mock.call_args_list]
+        self.assertEqual([len(chunk) for chunk in push_chunks], [2, 2, 1])
+        self.assertEqual(sms_chunks[0][0][1], self.users[0].phone_number)
+
+    @patch('notifications.tasks.deliver_notifications_task.delay')
+    def test_dedup_keys_stop_retried_fan_outs_notifying_twice(
+        self,
+        delay_mock,
+    ):
+        with self.captureOnCommitCallbacks(execute=True):
+            create_notifications(self._entries()[:2])
+        with self.captureOnCommitCallbacks(execute=True):
+            created = create_notifications(
+                self._entries() + self._entries(),
+            )
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(Notification.objects.count(), 5)
+        self.assertEqual(
+            [len(call.args[0]) for call in delay_mock.call_args_list],
+            [2, 3],
+        )
+
+    def test_categories_without_push_are_not_dispatched(self):
+        with patch(
+            'notifications.tasks.deliver_notifications_task.delay',
+        ) as delay_mock:
+            with self.captureOnCommitCallbacks(execute=True):
+                create_notifications(
+                    self._entries(
+                        category=Notification.Category.NPL_WARNING,
+                    ),
+                )
+
+        delay_mock.assert_not_called()
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_delivery_retries_only_failed_notifications(self):
+        created = create_notifications(self._entries(), dispatch_async=False)
+        for index, user in enumerate(self.users[:3]):
+            DeviceToken.objects.create(
+                user=user,
+                token=f'token-{index}',
+                platform=DeviceToken.Platform.ANDROID,
+            )
+
+        def send_multicast(device_tokens, title, body, data=None):
+            errors = {'token-1': 'NotRegistered', 'token-2': 'Unavailable'}
+            return [errors.get(token) for token in device_tokens]
+
+        push_ids = [str(notification.id) for notification in created]
+        with patch(
+            'notifications.integrations.fcm_push.FCMPushClient.'
+            'send_multicast',
+            side_effect=send_multicast,
+        ) as send_mock:
+            with patch.object(
+                deliver_notifications_task,
+                'retry',
+                side_effect=RuntimeError('retry'),
+            ) as retry_mock:
+                with self.assertRaises(RuntimeError):
+                    deliver_notifications_task.run(push_ids, [])
+
+        send_mock.assert_called_once()
+        self.assertEqual(
+            retry_mock.call_args.kwargs['args'],
+            ([push_ids[2]], []),
+        )
+        self.assertFalse(DeviceToken.objects.get(token='token-1').is_active)
+        self.assertEqual(
+            list(
+                Notification.objects.filter(push_sent=True).values_list(
+                    'user',
+                    flat=True,
+                )
+            ),
+            [self.users[0].id],
+        )
+
+
+class MulticastPushTests(TestCase):
+    """Test multicast batching, token invalidation and subset retries."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='push-member@example.com',
+            password='StrongPass1',
+        )
+        self.tokens = [
+            DeviceToken.objects.create(
+                user=self.user,
+                token=f'device-{index}',
+                platform=DeviceToken.Platform.ANDROID,
+            )
+            for index in range(5)
+        ]
+
+    def _patch_multicast(self, errors=None):
+        errors = errors or {}
+        return patch(
+            'notifications.integrations.fcm_push.FCMPushClient.'
+            'send_multicast',
+            side_effect=lambda device_tokens, title, body, data=None: [
+                errors.get(token) for token in device_tokens
+            ],
+        )
+
+    @override_settings(FCM_MULTICAST_BATCH_SIZE=2)
+    def test_tokens_are_sent_in_multicast_batches(self):
+        with self._patch_multicast() as send_mock:
+            with self.assertNumQueries(1):
+                sent = send_push_notification_task.run(
+                    self.user.id,
+                    'Loan approved',
+                    'Your loan was approved.',
+                )
+
+        self.assertEqual(sent, 5)
+        self.assertEqual(
+            [len(call.args[0]) for call in send_mock.call_args_list],
+            [2, 2, 1],
+        )
+
+    def test_only_failed_tokens_are_retried(self):
+        errors = {
+            'device-0': 'NotRegistered',
+            'device-1': 'InvalidRegistration',
+            'device-2': 'Unavailable',
+        }
+        with self._patch_multicast(errors):
+            with patch.object(
+                send_push_notification_task,
+                'retry',
+                side_effect=RuntimeError('retry'),
+            ) as retry_mock:
+                with self.assertRaises(RuntimeError):
+                    send_push_notification_task.run(
+                        self.user.id,
+                        'Loan approved',
+                        'Your loan was approved.',
+                    )
+
+        self.assertEqual(
+            retry_mock.call_args.kwargs['kwargs'],
+            {'token_ids': [str(self.tokens[2].id)]},
+        )
+        self.assertEqual(
+            set(
+                DeviceToken.objects.filter(is_active=False).values_list(
+                    'token',
+                    flat=True,
+                )
+            ),
+            {'device-0', 'device-1'},
+        )
+
+        with self._patch_multicast() as send_mock:
+            sent = send_push_notification_task.run(
+                self.user.id,
+                'Loan approved',
+                'Your loan was approved.',
+                **retry_mock.call_args.kwargs['kwargs'],
+            )
+
+        self.assertEqual(sent, 1)
+        send_mock.assert_called_once()
+        self.assertEqual(send_mock.call_args.args[0], ['device-2'])
+
+    def test_sacco_segment_broadcast_reaches_approved_members(self):
+        from accounts.models import Sacco
+        from saccomembership.models import Membership
+
+        sacco = Sacco.objects.create(
+            name='Push SACCO',
+            registration_number='PUSH001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        Membership.objects.create(
+            user=self.user,
+            sacco=sacco,
+            status=Membership.Status.APPROVED,
+            member_number='PUSH-1',
+        )
+        pending = User.objects.create_user(
+            email='push-pending@example.com',
+            password='StrongPass1',
+        )
+        Membership.objects.create(
+            user=pending,
+            sacco=sacco,
+            status=Membership.Status.PENDING,
+            member_number='PUSH-2',
+        )
+        DeviceToken.objects.create(
+            user=pending,
+            token='pending-device',
+            platform=DeviceToken.Platform.IOS,
+        )
+
+        with self._patch_multicast() as send_mock:
+            sent = broadcast_push_task.run(
+                'AGM notice',
+                'The AGM is on Saturday.',
+                sacco_id=str(sacco.id),
+            )
+
+        self.assertEqual(sent, 5)
+        self.assertNotIn('pending-device', send_mock.call_args.args[0])
+
+    def test_topic_broadcast_is_one_call(self):
+        with patch(
+            'notifications.integrations.fcm_push.FCMPushClient.'
+            'send_to_topic',
+            return_value={'message_id': 1},
+        ) as topic_mock:
+            sent = broadcast_push_task.run(
+                'Maintenance',
+                'Payments pause at midnight.',
+                topic='all-members',
+            )
+
+        self.assertEqual(sent, 1)
+        topic_mock.assert_called_once_with(
+            'all-members',
+            'Maintenance',
+            'Payments pause at midnight.',
+            None,
+        )
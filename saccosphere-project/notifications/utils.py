@@ -2,6 +2,9 @@
 
 import logging
 
+from django.conf import settings
+from django.db import transaction
+
 from .models import Notification
 
 
@@ -62,3 +65,156 @@ def create_notification(
             )
 
     return notification
+
+
+PUSH_CATEGORIES = {
+    Notification.Category.PAYMENT,
+    Notification.Category.LOAN,
+}
+
+
+def create_notifications(entries, dispatch_async=True):
+    """
+    Create in-app notifications for many users and fan out delivery.
+
+    ``entries`` is an iterable of ``(user, payload)`` pairs. A payload
+    takes the create_notification fields (title, message, category,
+    action_url, related_object_type, related_object_id) plus:
+
+    - ``dedup_key``: a user is notified at most once per key, so a
+      retried job skips rows an earlier attempt already wrote.
+    - ``push``: send a push; defaults to the PAYMENT/LOAN rule used by
+      create_notification.
+    - ``sms_message``: also text this message to the user's phone.
+
+    Rows are written with bulk_create and delivery is queued as one
+    deliver_notifications_task per NOTIFICATION_FANOUT_CHUNK_SIZE users.
+    Returns the notifications this call created.
+    """
+    rows = []
+    for user, payload in entries:
+        category = payload.get('category', Notification.Category.SYSTEM)
+        notification = Notification(
+            user=user,
+            title=payload['title'],
+            message=payload['message'],
+            category=category,
+            action_url=payload.get('action_url'),
+            related_object_type=payload.get('related_object_type'),
+            related_object_id=payload.get('related_object_id'),
+            dedup_key=payload.get('dedup_key'),
+        )
+        rows.append(
+            (
+                notification,
+                payload.get('push', category in PUSH_CATEGORIES),
+                payload.get('sms_message'),
+            )
+        )
+
+    rows = _drop_duplicate_notifications(rows)
+    if not rows:
+        return []
+
+    try:
+        Notification.objects.bulk_create(
+            [notification for notification, _push, _sms in rows],
+            batch_size=1000,
+            ignore_conflicts=True,
+        )
+        # Ids are generated here, so a row lost to a concurrent insert of
+        # the same dedup key is simply absent from the table.
+        created_ids = set(
+            Notification.objects.filter(
+                pk__in=[notification.pk for notification, _p, _s in rows],
+            ).values_list('pk', flat=True)
+        )
+    except Exception:
+        logger.exception(
+            'Failed to create %s notifications in bulk.',
+            len(rows),
+        )
+        return []
+
+    rows = [row for row in rows if row[0].pk in created_ids]
+    if dispatch_async:
+        transaction.on_commit(lambda: _dispatch_delivery(rows))
+    return [notification for notification, _push, _sms in rows]
+
+
+def _drop_duplicate_notifications(rows):
+    """Skip rows whose (user, dedup_key) exists or repeats in the batch."""
+    keyed = {
+        (notification.user_id, notification.dedup_key)
+        for notification, _push, _sms in rows
+        if notification.dedup_key
+    }
+    if not keyed:
+        return rows
+
+    seen = set(
+        Notification.objects.filter(
+            user_id__in={user_id for user_id, _key in keyed},
+            dedup_key__in={key for _user_id, key in keyed},
+        ).values_list('user_id', 'dedup_key')
+    )
+    unique_rows = []
+    for row in rows:
+        notification = row[0]
+        if notification.dedup_key:
+            key = (notification.user_id, notification.dedup_key)
+            if key in seen:
+                continue
+            seen.add(key)
+        unique_rows.append(row)
+    return unique_rows
+
+
+def _dispatch_delivery(rows):
+    """Queue one delivery task per chunk of distinct users."""
+    from .tasks import deliver_notifications_task
+
+    chunk_size = settings.NOTIFICATION_FANOUT_CHUNK_SIZE
+    chunk_users = set()
+    push_ids = []
+    sms_messages = []
+
+    def flush():
+        if not push_ids and not sms_messages:
+            return
+        try:
+            deliver_notifications_task.delay(
+                list(push_ids),
+                list(sms_messages),
+            )
+        except Exception:
+            logger.exception(
+                'Failed to dispatch delivery for %s notifications.',
+                len(push_ids) + len(sms_messages),
+            )
+
+    for notification, push, sms_message in rows:
+        sms_message = sms_message if notification.user.phone_number else None
+        if not push and not sms_message:
+            continue
+        if (
+            notification.user_id not in chunk_users
+            and len(chunk_users) >= chunk_size
+        ):
+            flush()
+            chunk_users.clear()
+            push_ids.clear()
+            sms_messages.clear()
+
+        chunk_users.add(notification.user_id)
+        if push:
+            push_ids.append(str(notification.pk))
+        if sms_message:
+            sms_messages.append(
+                [
+                    str(notification.pk),
+                    notification.user.phone_number,
+                    sms_message,
+                ]
+            )
+    flush()
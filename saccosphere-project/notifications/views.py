@@ -5,7 +5,7 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from config.pagination import NotificationPagination
+from config.pagination import NotificationCursorPagination
 
 from .models import DeviceToken, Notification
 from .serializers import DeviceTokenSerializer, NotificationSerializer
@@ -16,7 +16,7 @@ class NotificationListView(ListAPIView):
 
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
-    pagination_class = NotificationPagination
+    pagination_class = NotificationCursorPagination
 
     def get_queryset(self):
         """Return filtered notifications for the current user."""
@@ -0,0 +1,489 @@
+"""Concurrent, rate-limited dispatch of bulk B2C payouts."""
+
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .disbursements import B2C_CALLBACK_PATH
+from .integrations.mpesa.daraja import DarajaClient, DarajaError
+from .models import (
+    B2CPayoutBatch,
+    MpesaTransaction,
+    PaymentProvider,
+    Transaction,
+)
+from .providers.registry import get_provider, get_provider_class
+from .reconciliation import TokenBucket
+
+
+logger = logging.getLogger('saccosphere.payments')
+
+DARAJA_PROVIDER_NAME = 'mpesa'
+PAGE_SIZE = 200
+BULK_CREATE_BATCH_SIZE = 1000
+MAX_RUN_SECONDS = 8 * 60
+DISPATCH_LOCK_KEY = 'b2c_payout_batch_dispatch:{batch_id}'
+
+SENT = 'sent'
+FAILED = 'failed'
+RETRY = 'retry'
+# HTTP statuses Daraja returns for throttling, an expired token or a slow
+# upstream. None of them says whether the payout was refused, so they are
+# resent like timeouts instead of failing the payout.
+RETRYABLE_DARAJA_STATUS_CODES = frozenset({401, 403, 408, 429})
+OUTSTANDING_STATUSES = (
+    Transaction.Status.PENDING,
+    Transaction.Status.PROCESSING,
+)
+
+
+class PayoutRejected(Exception):
+    """Raised when the provider gives a definite no for one payout."""
+
+    def __init__(self, message, response_code=None):
+        super().__init__(message)
+        self.message = message
+        self.response_code = response_code
+
+
+def create_payout_batch(
+    *,
+    payouts,
+    occasion,
+    provider_name=None,
+    sacco=None,
+    created_by=None,
+    transaction_type=Transaction.TransactionType.LOAN_DISBURSEMENT,
+):
+    """
+    Persist a batch of B2C payouts without sending anything.
+
+    Each payout is a dict with ``user``, ``phone_number``, ``amount`` and
+    ``remarks``, plus an optional ``loan`` that is moved to
+    DISBURSEMENT_PENDING. Transactions and MpesaTransactions are bulk
+    inserted, and every payout's originator conversation ID is fixed here
+    so later resends reuse it.
+
+    Returns:
+        B2CPayoutBatch: The new PENDING batch
+    """
+    from services.models import Loan
+
+    provider_name = (
+        provider_name
+        or settings.PAYMENT_PROVIDER
+        or DARAJA_PROVIDER_NAME
+    ).strip().lower()
+    payouts = list(payouts)
+
+    with db_transaction.atomic():
+        provider = _get_payment_provider(provider_name)
+        batch = B2CPayoutBatch.objects.create(
+            sacco=sacco,
+            provider_name=provider_name,
+            occasion=occasion[:100],
+            created_by=created_by,
+            total_count=len(payouts),
+            total_amount=sum(
+                (Decimal(payout['amount']) for payout in payouts),
+                Decimal('0.00'),
+            ),
+        )
+        transactions = Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    provider=provider,
+                    user=payout['user'],
+                    reference=f'SS-B2C-{uuid4().hex[:18].upper()}',
+                    transaction_type=transaction_type,
+                    amount=payout['amount'],
+                    sacco=sacco,
+                    status=Transaction.Status.PENDING,
+                    description=payout['remarks'],
+                    metadata={},
+                )
+                for payout in payouts
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+        MpesaTransaction.objects.bulk_create(
+            [
+                MpesaTransaction(
+                    transaction=transaction,
+                    phone_number=payout['phone_number'],
+                    transaction_type=MpesaTransaction.TransactionType.B2C,
+                    originator_conversation_id=transaction.reference,
+                    related_loan=payout.get('loan'),
+                    payout_batch=batch,
+                )
+                for payout, transaction in zip(payouts, transactions)
+            ],
+            batch_size=BULK_CREATE_BATCH_SIZE,
+        )
+
+        loan_ids = [
+            payout['loan'].id for payout in payouts if payout.get('loan')
+        ]
+        if loan_ids:
+            Loan.objects.filter(id__in=loan_ids).update(
+                status=Loan.Status.DISBURSEMENT_PENDING,
+                updated_at=timezone.now(),
+            )
+
+    return batch
+
+
+def dispatch_payout_batch(
+    batch_id,
+    max_workers=None,
+    max_run_seconds=MAX_RUN_SECONDS,
+    page_size=PAGE_SIZE,
+):
+    """
+    Send a batch's outstanding payouts concurrently within the rate limit.
+
+    Payouts are claimed a page at a time and sent through a bounded thread
+    pool; every send first takes a token from the provider's bucket, so
+    the batch never exceeds B2C_PAYOUT_RATE_LIMITS. Results are written back
+    per page with bulk updates. A send that ends without a clear answer
+    (timeout, connection error, 5xx) leaves the payout PROCESSING. If the
+    provider did accept it, its result callback is matched on the
+    originator conversation ID and settles the payout before the next
+    dispatch; otherwise that dispatch resends it under the same ID.
+
+    Returns:
+        dict: {'status': str, 'sent': int, 'failed': int, 'retry': int}
+    """
+    lock_key = DISPATCH_LOCK_KEY.format(batch_id=batch_id)
+    if not cache.add(lock_key, True, timeout=max_run_seconds + 60):
+        logger.info('B2C payout batch %s is already dispatching.', batch_id)
+        return {'status': None, 'sent': 0, 'failed': 0, 'retry': 0}
+
+    try:
+        return _dispatch(batch_id, max_workers, max_run_seconds, page_size)
+    finally:
+        cache.delete(lock_key)
+
+
+def _dispatch(batch_id, max_workers, max_run_seconds, page_size):
+    batch = _start_dispatch(batch_id)
+    summary = {'sent': 0, 'failed': 0, 'retry': 0}
+    if batch.status == B2CPayoutBatch.Status.COMPLETED:
+        return {'status': batch.status, **summary}
+
+    try:
+        send = _get_sender(batch)
+    except (ImportError, AttributeError, TypeError, ValueError) as exc:
+        B2CPayoutBatch.objects.filter(pk=batch.pk).update(
+            status=B2CPayoutBatch.Status.FAILED,
+            error_message=str(exc),
+        )
+        raise
+
+    rate_limits = settings.B2C_PAYOUT_RATE_LIMITS
+    bucket = TokenBucket(
+        rate_limits.get(batch.provider_name, rate_limits['default']),
+    )
+    max_workers = max_workers or settings.B2C_DISPATCH_MAX_WORKERS
+    deadline = time.monotonic() + max_run_seconds
+    after_id = None
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='b2c-payout',
+    ) as executor:
+        while time.monotonic() < deadline:
+            page = _claim_page(batch, after_id, page_size)
+            if not page:
+                break
+
+            after_id = page[-1].id
+            results = list(
+                executor.map(
+                    lambda payout: _send_payout(send, bucket, payout),
+                    page,
+                )
+            )
+            for outcome, count in _record_results(batch, page, results):
+                summary[outcome] += count
+
+    return {'status': _finish_dispatch(batch), **summary}
+
+
+def _start_dispatch(batch_id):
+    with db_transaction.atomic():
+        batch = B2CPayoutBatch.objects.select_for_update().get(pk=batch_id)
+        if batch.status != B2CPayoutBatch.Status.COMPLETED:
+            batch.status = B2CPayoutBatch.Status.DISPATCHING
+            batch.error_message = ''
+            batch.save(update_fields=['status', 'error_message'])
+    return batch
+
+
+def _get_sender(batch):
+    if batch.provider_name == DARAJA_PROVIDER_NAME:
+        return _daraja_sender(batch)
+    return _provider_sender(batch)
+
+
+def _daraja_sender(batch):
+    daraja_client = DarajaClient()
+    callback_url = daraja_client._build_callback_url(B2C_CALLBACK_PATH)
+
+    def send(payout):
+        try:
+            response = daraja_client.initiate_b2c(
+                phone_number=payout.phone_number,
+                amount=payout.transaction.amount,
+                occasion=batch.occasion,
+                remarks=payout.transaction.description,
+                result_url=callback_url,
+                timeout_url=callback_url,
+                originator_conversation_id=(
+                    payout.originator_conversation_id
+                ),
+            )
+        except DarajaError as exc:
+            # Timeouts, connection errors, 5xx and throttling carry no
+            # Daraja answer.
+            status_code = exc.response_code
+            if status_code is None or (
+                isinstance(status_code, int)
+                and (
+                    status_code >= 500
+                    or status_code in RETRYABLE_DARAJA_STATUS_CODES
+                )
+            ):
+                raise
+            raise PayoutRejected(exc.message, str(status_code)) from exc
+
+        return response.get('ConversationID'), response
+
+    return send
+
+
+def _provider_sender(batch):
+    provider = get_provider(batch.provider_name, batch.sacco)
+
+    def send(payout):
+        result = provider.disburse(
+            str(payout.transaction_id),
+            payout.phone_number,
+            payout.transaction.amount,
+            payout.originator_conversation_id,
+            occasion=batch.occasion,
+            remarks=payout.transaction.description,
+        )
+        if not result.success:
+            raise PayoutRejected(
+                result.error_message or 'B2C payout rejected.',
+                result.status,
+            )
+        return result.conversation_id, result.raw_response
+
+    return send
+
+
+def _claim_page(batch, after_id, page_size):
+    payouts = MpesaTransaction.objects.select_related('transaction').filter(
+        payout_batch=batch,
+        transaction__status__in=OUTSTANDING_STATUSES,
+    )
+    if after_id is not None:
+        payouts = payouts.filter(id__gt=after_id)
+
+    page = list(payouts.order_by('id')[:page_size])
+    if page:
+        Transaction.objects.filter(
+            id__in=[payout.transaction_id for payout in page],
+            status=Transaction.Status.PENDING,
+        ).update(
+            status=Transaction.Status.PROCESSING,
+            updated_at=timezone.now(),
+        )
+    return page
+
+
+def _send_payout(send, bucket, payout):
+    bucket.acquire()
+    try:
+        conversation_id, response = send(payout)
+    except PayoutRejected as exc:
+        return FAILED, exc
+    except Exception as exc:
+        logger.warning(
+            'B2C payout %s had no clear outcome and will be resent: %s',
+            payout.originator_conversation_id,
+            exc,
+        )
+        return RETRY, exc
+    return SENT, (conversation_id, response)
+
+
+def _record_results(batch, page, results):
+    from services.models import Loan
+
+    now = timezone.now()
+    counts = {SENT: 0, FAILED: 0, RETRY: 0}
+    resolved_retries = 0
+    failed_loan_ids = []
+
+    with db_transaction.atomic():
+        # A result callback matched on the originator conversation ID can
+        # settle a payout while it is being resent; keep its outcome.
+        settled_ids = set(
+            Transaction.objects.select_for_update()
+            .filter(id__in=[payout.transaction_id for payout in page])
+            .exclude(status__in=OUTSTANDING_STATUSES)
+            .values_list('id', flat=True)
+        )
+        recorded = []
+
+        for payout, (outcome, detail) in zip(page, results):
+            if payout.transaction_id in settled_ids:
+                continue
+
+            recorded.append(payout)
+            counts[outcome] += 1
+            transaction = payout.transaction
+            if 'last_send_error' in transaction.metadata:
+                resolved_retries += 1
+            transaction.updated_at = now
+            payout.updated_at = now
+
+            if outcome == SENT:
+                conversation_id, response = detail
+                transaction.status = Transaction.Status.SENT
+                transaction.external_reference = conversation_id
+                transaction.metadata = {'provider_response': response}
+                payout.conversation_id = conversation_id
+            elif outcome == FAILED:
+                transaction.status = Transaction.Status.FAILED
+                transaction.metadata = {
+                    'provider_error': {
+                        'message': detail.message,
+                        'response_code': detail.response_code,
+                    },
+                }
+                payout.result_code = detail.response_code
+                payout.result_description = detail.message
+                if payout.related_loan_id:
+                    failed_loan_ids.append(payout.related_loan_id)
+            else:
+                transaction.status = Transaction.Status.PROCESSING
+                transaction.metadata = {'last_send_error': str(detail)[:500]}
+
+        Transaction.objects.bulk_update(
+            [payout.transaction for payout in recorded],
+            ['status', 'external_reference', 'metadata', 'updated_at'],
+        )
+        MpesaTransaction.objects.bulk_update(
+            recorded,
+            [
+                'conversation_id',
+                'result_code',
+                'result_description',
+                'updated_at',
+            ],
+        )
+        if failed_loan_ids:
+            Loan.objects.filter(
+                id__in=failed_loan_ids,
+                status=Loan.Status.DISBURSEMENT_PENDING,
+            ).update(status=Loan.Status.APPROVED, updated_at=now)
+        B2CPayoutBatch.objects.filter(pk=batch.pk).update(
+            sent_count=F('sent_count') + counts[SENT],
+            failed_count=F('failed_count') + counts[FAILED],
+            retry_count=F('retry_count') + counts[RETRY] - resolved_retries,
+        )
+
+    return counts.items()
+
+
+def _finish_dispatch(batch):
+    outstanding = MpesaTransaction.objects.filter(
+        payout_batch=batch,
+        transaction__status__in=OUTSTANDING_STATUSES,
+    ).count()
+
+    if outstanding:
+        status = B2CPayoutBatch.Status.DISPATCHING
+        completed_at = None
+    else:
+        status = B2CPayoutBatch.Status.COMPLETED
+        completed_at = timezone.now()
+
+    B2CPayoutBatch.objects.filter(pk=batch.pk).update(
+        status=status,
+        completed_at=completed_at,
+    )
+    logger.info(
+        'B2C payout batch %s dispatched: status=%s outstanding=%s.',
+        batch.id,
+        status,
+        outstanding,
+    )
+    return status
+
+
+def abandon_payout_batch(batch_id):
+    """
+    Mark a batch FAILED once its dispatch retries are exhausted.
+
+    Payouts still without a clear outcome stay PROCESSING, so a late
+    result callback can settle them, and dispatching the batch again
+    resumes from them.
+
+    Returns:
+        int: Payouts left outstanding
+    """
+    outstanding = MpesaTransaction.objects.filter(
+        payout_batch_id=batch_id,
+        transaction__status__in=OUTSTANDING_STATUSES,
+    ).count()
+    B2CPayoutBatch.objects.filter(
+        pk=batch_id,
+        status=B2CPayoutBatch.Status.DISPATCHING,
+    ).update(
+        status=B2CPayoutBatch.Status.FAILED,
+        error_message=(
+            f'{outstanding} payouts still had no clear outcome when '
+            f'dispatch retries ran out.'
+        ),
+    )
+    logger.error(
+        'B2C payout batch %s gave up with %s payouts outstanding.',
+        batch_id,
+        outstanding,
+    )
+    return outstanding
+
+
+def _get_payment_provider(provider_name):
+    # Same records the Daraja and PSP payment views create, so a batch
+    # never labels a PSP as M-Pesa or invents a provider that is not
+    # registered.
+    if provider_name == DARAJA_PROVIDER_NAME:
+        name = 'M-Pesa'
+        provider_type = PaymentProvider.ProviderType.MPESA
+    else:
+        get_provider_class(provider_name)
+        name = provider_name
+        provider_type = PaymentProvider.ProviderType.INTERNAL
+
+    provider, _ = PaymentProvider.objects.get_or_create(
+        name=name,
+        defaults={
+            'provider_type': provider_type,
+            'is_active': True,
+        },
+    )
+    return provider
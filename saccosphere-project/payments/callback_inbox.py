@@ -0,0 +1,340 @@
+"""Micro-batched consumer for the durable M-Pesa callback inbox."""
+
+import logging
+import time
+
+from django.db import transaction as db_transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import MpesaCallbackInbox, MpesaTransaction
+from .tasks import (
+    _callback_already_processed,
+    _get_stk_callback,
+    _match_b2c_originator,
+    _normalize_result_code,
+    _process_failed_b2c_callback,
+    _process_failed_callback,
+    _process_successful_b2c_callback,
+    _process_successful_callback,
+)
+
+
+logger = logging.getLogger('saccosphere.payments')
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+MAX_RUN_SECONDS = 50
+
+
+def append_callback(callback_type, callback_identifier, result_code, payload):
+    """Append a raw callback to the inbox and return the new entry."""
+    return MpesaCallbackInbox.objects.create(
+        callback_type=callback_type,
+        callback_identifier=callback_identifier,
+        result_code='' if result_code is None else str(result_code),
+        payload=payload,
+    )
+
+
+def drain_callback_inbox(
+    batch_size=BATCH_SIZE,
+    max_run_seconds=MAX_RUN_SECONDS,
+):
+    """
+    Process RECEIVED inbox entries batch by batch until none are left.
+
+    Concurrent drains claim disjoint batches through SKIP LOCKED. Entries
+    that fail are not claimed again within the same run, so a poison
+    callback is retried on the next drain rather than in a tight loop.
+
+    Returns:
+        dict: {'batches': int, 'processed': int, 'failed': int}
+    """
+    deadline = time.monotonic() + max_run_seconds
+    failed_ids = set()
+    summary = {'batches': 0, 'processed': 0, 'failed': 0}
+
+    while time.monotonic() < deadline:
+        result = process_inbox_batch(batch_size, exclude_ids=failed_ids)
+        if not result['claimed']:
+            break
+
+        summary['batches'] += 1
+        summary['processed'] += result['processed']
+        summary['failed'] += len(result['failed_ids'])
+        failed_ids.update(result['failed_ids'])
+
+    if summary['batches']:
+        logger.info(
+            'M-Pesa callback inbox drained: batches=%s processed=%s '
+            'failed=%s.',
+            summary['batches'],
+            summary['processed'],
+            summary['failed'],
+        )
+    return summary
+
+
+def process_inbox_batch(batch_size=BATCH_SIZE, exclude_ids=()):
+    """
+    Claim one batch of inbox entries and process it in a single commit.
+
+    All MpesaTransactions for the batch are loaded and locked in one query
+    per callback type, and the savings and loans they touch are locked up
+    front in primary-key order. Each entry then runs in its own savepoint,
+    so one failing callback is rolled back and recorded without affecting
+    the rest of the batch.
+
+    Returns:
+        dict: {'claimed': int, 'processed': int, 'failed_ids': list}
+    """
+    with db_transaction.atomic():
+        entries = list(
+            MpesaCallbackInbox.objects.select_for_update(skip_locked=True)
+            .filter(status=MpesaCallbackInbox.Status.RECEIVED)
+            .exclude(pk__in=exclude_ids)
+            .order_by('id')[:batch_size]
+        )
+        if not entries:
+            return {'claimed': 0, 'processed': 0, 'failed_ids': []}
+
+        stk_transactions = _load_stk_transactions(entries)
+        b2c_transactions = _load_b2c_transactions(entries)
+        _lock_related_accounts(
+            list(stk_transactions.values()) + list(b2c_transactions.values())
+        )
+
+        processed_ids = []
+        failed_entries = []
+        for entry in entries:
+            if entry.callback_type == MpesaCallbackInbox.CallbackType.STK:
+                process_entry = _process_stk_entry
+                mpesa_transactions = stk_transactions
+            else:
+                process_entry = _process_b2c_entry
+                mpesa_transactions = b2c_transactions
+
+            try:
+                with db_transaction.atomic():
+                    process_entry(
+                        entry,
+                        mpesa_transactions.get(entry.callback_identifier),
+                    )
+            except Exception as exc:
+                logger.warning(
+                    'M-Pesa %s callback processing failed for inbox entry '
+                    '%s (%s).',
+                    entry.callback_type,
+                    entry.id,
+                    entry.callback_identifier,
+                    exc_info=True,
+                )
+                entry.error_message = str(exc)[:1000]
+                failed_entries.append(entry)
+            else:
+                processed_ids.append(entry.id)
+
+        _close_entries(processed_ids, failed_entries)
+
+    return {
+        'claimed': len(entries),
+        'processed': len(processed_ids),
+        'failed_ids': [entry.id for entry in failed_entries],
+    }
+
+
+def _load_stk_transactions(entries):
+    checkout_request_ids = {
+        entry.callback_identifier
+        for entry in entries
+        if entry.callback_type == MpesaCallbackInbox.CallbackType.STK
+    }
+    if not checkout_request_ids:
+        return {}
+
+    mpesa_transactions = MpesaTransaction.objects.select_for_update(
+        of=('self',),
+    ).select_related(
+        'transaction',
+        'transaction__user',
+        'related_saving',
+        'related_saving__membership',
+        'related_saving__membership__sacco',
+        'related_loan',
+        'related_loan__membership',
+        'related_loan__membership__sacco',
+    ).filter(checkout_request_id__in=checkout_request_ids)
+
+    return {
+        mpesa_transaction.checkout_request_id: mpesa_transaction
+        for mpesa_transaction in mpesa_transactions
+    }
+
+
+def _load_b2c_transactions(entries):
+    conversation_ids = {
+        entry.callback_identifier
+        for entry in entries
+        if entry.callback_type == MpesaCallbackInbox.CallbackType.B2C
+    }
+    if not conversation_ids:
+        return {}
+
+    b2c_transactions = MpesaTransaction.objects.select_for_update(
+        of=('self',),
+    ).select_related(
+        'transaction',
+        'transaction__user',
+        'related_loan',
+        'related_loan__membership',
+    ).filter(
+        transaction_type=MpesaTransaction.TransactionType.B2C,
+    )
+    matched = {
+        mpesa_transaction.conversation_id: mpesa_transaction
+        for mpesa_transaction in b2c_transactions.filter(
+            conversation_id__in=conversation_ids,
+        )
+    }
+
+    for entry in entries:
+        if (
+            entry.callback_type == MpesaCallbackInbox.CallbackType.B2C
+            and entry.callback_identifier not in matched
+        ):
+            mpesa_transaction = _match_b2c_originator(
+                b2c_transactions,
+                entry.callback_identifier,
+                entry.payload,
+            )
+            if mpesa_transaction is not None:
+                matched[entry.callback_identifier] = mpesa_transaction
+    return matched
+
+
+def _lock_related_accounts(mpesa_transactions):
+    # Lock every saving and loan the batch touches in one ordered pass, so
+    # concurrent batches queue on each other instead of deadlocking.
+    from services.models import Loan, Saving
+
+    saving_ids = {
+        mpesa_transaction.related_saving_id
+        for mpesa_transaction in mpesa_transactions
+        if mpesa_transaction.related_saving_id
+    }
+    loan_ids = {
+        mpesa_transaction.related_loan_id
+        for mpesa_transaction in mpesa_transactions
+        if mpesa_transaction.related_loan_id
+    }
+
+    if saving_ids:
+        list(
+            Saving.objects.select_for_update()
+            .filter(id__in=saving_ids)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+    if loan_ids:
+        list(
+            Loan.objects.select_for_update()
+            .filter(id__in=loan_ids)
+            .order_by('id')
+            .values_list('id', flat=True)
+        )
+
+
+def _process_stk_entry(entry, mpesa_transaction):
+    if mpesa_transaction is None:
+        raise LookupError(
+            f'M-Pesa transaction not found for checkout request '
+            f'{entry.callback_identifier}.'
+        )
+
+    transaction = mpesa_transaction.transaction
+    if _callback_already_processed(mpesa_transaction, transaction):
+        return
+
+    stk_callback = _get_stk_callback(entry.payload)
+    result_code = _normalize_result_code(stk_callback.get('ResultCode'))
+
+    if result_code == 0:
+        _process_successful_callback(
+            mpesa_transaction,
+            transaction,
+            stk_callback,
+        )
+    else:
+        _process_failed_callback(
+            mpesa_transaction,
+            transaction,
+            stk_callback,
+            result_code,
+        )
+
+
+def _process_b2c_entry(entry, mpesa_transaction):
+    if mpesa_transaction is None:
+        raise LookupError(
+            f'M-Pesa B2C transaction not found for conversation '
+            f'{entry.callback_identifier}.'
+        )
+
+    result = entry.payload.get('Result') or entry.payload.get('result') or {}
+
+    if (
+        mpesa_transaction.related_loan_id
+        and mpesa_transaction.related_loan.disbursement_transaction_id
+    ):
+        from services.tasks import on_disbursement_b2c_callback
+
+        on_disbursement_b2c_callback(
+            str(mpesa_transaction.related_loan_id),
+            result,
+        )
+        return
+
+    transaction = mpesa_transaction.transaction
+    if _callback_already_processed(mpesa_transaction, transaction):
+        return
+
+    result_code = _normalize_result_code(result.get('ResultCode'))
+
+    if result_code == 0:
+        _process_successful_b2c_callback(
+            mpesa_transaction,
+            transaction,
+            result,
+        )
+    else:
+        _process_failed_b2c_callback(
+            mpesa_transaction,
+            transaction,
+            result,
+            result_code,
+        )
+
+
+def _close_entries(processed_ids, failed_entries):
+    now = timezone.now()
+
+    if processed_ids:
+        MpesaCallbackInbox.objects.filter(pk__in=processed_ids).update(
+            status=MpesaCallbackInbox.Status.PROCESSED,
+            attempts=F('attempts') + 1,
+            error_message='',
+            processed_at=now,
+        )
+
+    for entry in failed_entries:
+        entry.attempts += 1
+        if entry.attempts >= MAX_ATTEMPTS:
+            entry.status = MpesaCallbackInbox.Status.FAILED
+            entry.processed_at = now
+
+    if failed_entries:
+        MpesaCallbackInbox.objects.bulk_update(
+            failed_entries,
+            ['attempts', 'error_message', 'status', 'processed_at'],
+        )
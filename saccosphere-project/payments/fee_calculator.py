@@ -7,9 +7,97 @@ confirmed business model. This calculator is the single source of truth
 for that math, and its output feeds directly into FeePreviewView.
 """
 
+from bisect import bisect_left
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+FEE_SETTINGS = ('PLATFORM_FEES', 'DISBURSEMENT_TIERS', 'WITHDRAWAL_TIERS')
+QUOTE_COLUMNS = (
+    'transaction_type',
+    'direction',
+    'net_amount',
+    'platform_fee',
+    'gross_amount',
+    'fee_rate',
+    'fee_model',
+    'rate_applied',
+    'tier_applied',
+)
+
+
+class TierTable:
+    """
+    One outflow tier table compiled for bisect lookups.
+
+    Only tiers that can be the first match of a lowest-to-highest walk
+    are kept, so ``bisect_left`` over the ceilings lands on the same tier
+    the walk would have picked.
+    """
+
+    def __init__(self, tiers):
+        self.ceilings = []
+        self.fees = []
+        self.rate_descriptions = []
+        self.capped_fee = None
+        for ceiling, fee in tiers:
+            if ceiling is None:
+                self.capped_fee = fee
+                self.capped_rate_description = f'Flat KES {fee} (tiered)'
+                break
+            if self.ceilings and ceiling <= self.ceilings[-1]:
+                continue
+            self.ceilings.append(ceiling)
+            self.fees.append(fee)
+            self.rate_descriptions.append(f'Flat KES {fee} (tiered)')
+
+    def lookup(self, amount):
+        """Return (fee, rate_applied, tier_applied) for a gross amount."""
+        index = bisect_left(self.ceilings, amount)
+        if index < len(self.ceilings):
+            ceiling = self.ceilings[index]
+            return (
+                self.fees[index],
+                self.rate_descriptions[index],
+                f'KES {amount:,.0f} falls in tier <= KES {ceiling:,.0f}',
+            )
+        if self.capped_fee is None:
+            raise ValueError(
+                'Tier configuration error -- no ceiling=None entry'
+            )
+        return (
+            self.capped_fee,
+            self.capped_rate_description,
+            f'KES {amount:,.0f} exceeds all tiers (capped fee)',
+        )
+
+
+@lru_cache(maxsize=1)
+def get_fee_schedule():
+    """Compile the fee settings once; rebuilt when they are overridden."""
+    return {
+        'rates': {
+            transaction_type: (
+                rate,
+                f'{rate * Decimal("100"):.1f}% of {transaction_type} amount',
+            )
+            for transaction_type, rate in settings.PLATFORM_FEES.items()
+        },
+        'tiers': {
+            'disbursement': TierTable(settings.DISBURSEMENT_TIERS),
+            'withdrawal': TierTable(settings.WITHDRAWAL_TIERS),
+        },
+    }
+
+
+@receiver(setting_changed)
+def reset_fee_schedule(*, setting, **kwargs):
+    if setting in FEE_SETTINGS:
+        get_fee_schedule.cache_clear()
 
 
 class SaccoInvoiceFeeCalculator:
@@ -26,85 +114,101 @@ class SaccoInvoiceFeeCalculator:
     OUTFLOW_TYPES = ('disbursement', 'withdrawal')
 
     def calculate(self, transaction_type: str, amount: Decimal) -> dict:
+        return dict(
+            zip(
+                QUOTE_COLUMNS,
+                self._quote(get_fee_schedule(), transaction_type, amount),
+            )
+        )
+
+    def calculate_batch(self, transaction_types, amounts) -> dict:
+        """
+        Quote many (transaction_type, amount) pairs in one call.
+
+        Returns a dict of equal-length lists keyed like ``calculate``'s
+        result; row ``i`` of every column is exactly what
+        ``calculate(transaction_types[i], amounts[i])`` returns.
+        """
+        transaction_types = list(transaction_types)
+        amounts = list(amounts)
+        if len(transaction_types) != len(amounts):
+            raise ValueError(
+                'transaction_types and amounts must have the same length.'
+            )
+
+        schedule = get_fee_schedule()
+        rows = [
+            self._quote(schedule, transaction_type, amount)
+            for transaction_type, amount in zip(transaction_types, amounts)
+        ]
+        if not rows:
+            return {column: [] for column in QUOTE_COLUMNS}
+        return {
+            column: list(values)
+            for column, values in zip(QUOTE_COLUMNS, zip(*rows))
+        }
+
+    def _quote(self, schedule, transaction_type, amount) -> tuple:
+        """Return one quote as a tuple ordered like QUOTE_COLUMNS."""
         transaction_type = (transaction_type or '').strip().lower()
         amount = Decimal(amount)
 
         if transaction_type in self.INFLOW_TYPES:
-            return self._calculate_inflow(transaction_type, amount)
+            return self._calculate_inflow(schedule, transaction_type, amount)
 
         if transaction_type in self.OUTFLOW_TYPES:
-            return self._calculate_outflow(transaction_type, amount)
+            return self._calculate_outflow(
+                schedule,
+                transaction_type,
+                amount,
+            )
 
         raise ValueError(f'Unknown transaction type: {transaction_type}')
 
     def _calculate_inflow(
         self,
+        schedule: dict,
         transaction_type: str,
         net_amount: Decimal,
-    ) -> dict:
-        rate = settings.PLATFORM_FEES[transaction_type]
+    ) -> tuple:
+        rate, rate_applied = schedule['rates'][transaction_type]
         platform_fee = (net_amount * rate).quantize(
             Decimal('0.01'),
             rounding=ROUND_HALF_UP,
         )
         gross_amount = net_amount + platform_fee
 
-        return {
-            'transaction_type': transaction_type,
-            'direction': 'inflow',
-            'net_amount': net_amount,
-            'platform_fee': platform_fee,
-            'gross_amount': gross_amount,
-            'fee_rate': rate,
-            'fee_model': 'percentage',
-            'rate_applied': (
-                f'{rate * Decimal("100"):.1f}% of {transaction_type} amount'
-            ),
-            'tier_applied': None,
-        }
+        return (
+            transaction_type,
+            'inflow',
+            net_amount,
+            platform_fee,
+            gross_amount,
+            rate,
+            'percentage',
+            rate_applied,
+            None,
+        )
 
     def _calculate_outflow(
         self,
+        schedule: dict,
         transaction_type: str,
         gross_amount: Decimal,
-    ) -> dict:
-        if transaction_type == 'disbursement':
-            tiers = settings.DISBURSEMENT_TIERS
-        else:
-            tiers = settings.WITHDRAWAL_TIERS
-
-        platform_fee, tier_desc = self._tiered_fee(gross_amount, tiers)
+    ) -> tuple:
+        platform_fee, rate_applied, tier_desc = (
+            schedule['tiers'][transaction_type].lookup(gross_amount)
+        )
         net_amount = gross_amount - platform_fee
 
-        return {
-            'transaction_type': transaction_type,
-            'direction': 'outflow',
-            'gross_amount': gross_amount,
-            'platform_fee': platform_fee,
-            'net_amount': net_amount,
-            'fee_rate': None,
-            'fee_model': 'tiered_flat',
-            'rate_applied': f'Flat KES {platform_fee} (tiered)',
-            'tier_applied': tier_desc,
-        }
-
-    def _tiered_fee(
-        self,
-        amount: Decimal,
-        tiers: list,
-    ) -> tuple[Decimal, str]:
-        """Walk tiers lowest to highest and return fee plus description."""
-        for ceiling, fee in tiers:
-            if ceiling is None or amount <= ceiling:
-                if ceiling is None:
-                    desc = (
-                        f'KES {amount:,.0f} exceeds all tiers (capped fee)'
-                    )
-                else:
-                    desc = (
-                        f'KES {amount:,.0f} falls in tier <= '
-                        f'KES {ceiling:,.0f}'
-                    )
-                return fee, desc
-
-        raise ValueError('Tier configuration error -- no ceiling=None entry')
+        return (
+            transaction_type,
+            'outflow',
+            net_amount,
+            platform_fee,
+            gross_amount,
+            None,
+            'tiered_flat',
+            rate_applied,
+            tier_desc,
+        )
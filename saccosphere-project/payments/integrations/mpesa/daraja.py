@@ -1,13 +1,151 @@
 import base64
 import logging
+import os
+import threading
+import time
+from uuid import uuid4
 
 import requests
 from django.conf import settings
 from django.core.cache import cache
 from django.utils import timezone
+from requests.adapters import HTTPAdapter
 
 logger = logging.getLogger('saccosphere.payments')
 
+ACCESS_TOKEN_CACHE_KEY = 'mpesa_access_token'
+ACCESS_TOKEN_LOCK_KEY = 'mpesa_access_token:refresh_lock'
+ACCESS_TOKEN_LOCK_SECONDS = 35
+ACCESS_TOKEN_WAIT_SECONDS = 10
+ACCESS_TOKEN_EXPIRY_BUFFER_SECONDS = 10 * 60
+ACCESS_TOKEN_REFRESH_MARGIN_SECONDS = 10 * 60
+DEFAULT_ACCESS_TOKEN_EXPIRES_IN = 3600
+
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 30
+LATENCY_MS_BUCKETS = (100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+# Per-process pooled session; rebuilt after fork so workers never share
+# sockets with their parent.
+_session = None
+_session_pid = None
+_session_lock = threading.Lock()
+
+# In-process counters for Daraja request metrics
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def get_daraja_session():
+    """
+    Return this process's keep-alive session for Daraja calls.
+
+    The session pools connections per host, so repeated STK pushes, queries
+    and B2C requests reuse an open TLS connection instead of handshaking
+    with Safaricom on every call. Requests are never retried by the
+    adapter because STK push and B2C are not idempotent.
+    """
+    global _session, _session_pid
+
+    pid = os.getpid()
+    if _session is not None and _session_pid == pid:
+        return _session
+
+    with _session_lock:
+        if _session is None or _session_pid != pid:
+            pool_size = settings.MPESA_HTTP_POOL_MAXSIZE
+            adapter = HTTPAdapter(
+                pool_connections=2,
+                pool_maxsize=pool_size,
+                max_retries=0,
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session = session
+            _session_pid = pid
+
+    return _session
+
+
+def close_daraja_session():
+    """Close the pooled session; the next call opens a new one."""
+    global _session, _session_pid
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+        _session_pid = None
+
+
+def get_daraja_metrics():
+    """
+    Return this process's per-endpoint request counters.
+
+    Latency buckets are cumulative, following the Prometheus convention:
+    each bucket counts the requests at or below its upper bound in ms.
+    """
+    with _metrics_lock:
+        endpoints = {
+            endpoint: {
+                **counters,
+                'latency_ms_buckets': dict(counters['latency_ms_buckets']),
+            }
+            for endpoint, counters in _metrics.items()
+        }
+
+    for counters in endpoints.values():
+        requests_count = counters['requests']
+        counters['latency_ms_avg'] = (
+            round(counters['latency_ms_sum'] / requests_count, 1)
+            if requests_count
+            else None
+        )
+
+    return {'pid': os.getpid(), 'endpoints': endpoints}
+
+
+def reset_daraja_metrics():
+    """Clear this process's Daraja request counters."""
+    with _metrics_lock:
+        _metrics.clear()
+
+
+def _record_request(endpoint, elapsed_ms, error=None):
+    with _metrics_lock:
+        counters = _metrics.get(endpoint)
+        if counters is None:
+            counters = _metrics[endpoint] = {
+                'requests': 0,
+                'errors': 0,
+                'timeouts': 0,
+                'connection_errors': 0,
+                'http_errors': 0,
+                'request_errors': 0,
+                'latency_ms_sum': 0.0,
+                'latency_ms_max': 0.0,
+                'latency_ms_buckets': {
+                    **{str(bound): 0 for bound in LATENCY_MS_BUCKETS},
+                    '+Inf': 0,
+                },
+            }
+
+        counters['requests'] += 1
+        counters['latency_ms_sum'] += elapsed_ms
+        counters['latency_ms_max'] = max(
+            counters['latency_ms_max'],
+            elapsed_ms,
+        )
+        for bound in LATENCY_MS_BUCKETS:
+            if elapsed_ms <= bound:
+                counters['latency_ms_buckets'][str(bound)] += 1
+        counters['latency_ms_buckets']['+Inf'] += 1
+
+        if error is not None:
+            counters['errors'] += 1
+            counters[error] += 1
+
 
 class DarajaError(Exception):
     def __init__(self, message, response_code=None):
@@ -49,11 +187,75 @@ class DarajaClient:
         return f'{self.base_url}/mpesa/b2c/v1/paymentrequest'
 
     def get_access_token(self):
-        token = cache.get('mpesa_access_token')
-        if token:
-            logger.debug('M-Pesa access token retrieved from cache.')
-            return token
+        """
+        Return a cached OAuth token, fetching a new one at most once.
+
+        Only the caller holding the cross-process refresh lock talks to the
+        OAuth endpoint; everyone else waits briefly for the token it caches.
+        In the last minutes of a token's life the current token is still
+        served while one caller refreshes it ahead of expiry.
+        """
+        cached = cache.get(ACCESS_TOKEN_CACHE_KEY)
+        if isinstance(cached, dict):
+            if time.time() < cached['refresh_after']:
+                logger.debug('M-Pesa access token retrieved from cache.')
+                return cached['token']
+
+            return self._refresh_expiring_token(cached['token'])
+
+        lock_owner = self._acquire_token_lock()
+        if lock_owner is None:
+            token = self._wait_for_token()
+            if token:
+                return token
+            logger.warning(
+                'Timed out waiting for another M-Pesa token refresh.',
+            )
 
+        try:
+            return self._fetch_access_token()
+        finally:
+            self._release_token_lock(lock_owner)
+
+    def refresh_access_token_if_due(self):
+        """
+        Refresh the shared token when it is missing or about to expire.
+
+        Returns:
+            bool: True if this call fetched a new token
+        """
+        cached = cache.get(ACCESS_TOKEN_CACHE_KEY)
+        if isinstance(cached, dict) and time.time() < cached['refresh_after']:
+            return False
+
+        lock_owner = self._acquire_token_lock()
+        if lock_owner is None:
+            return False
+
+        try:
+            self._fetch_access_token()
+        finally:
+            self._release_token_lock(lock_owner)
+
+        return True
+
+    def _refresh_expiring_token(self, current_token):
+        lock_owner = self._acquire_token_lock()
+        if lock_owner is None:
+            return current_token
+
+        try:
+            return self._fetch_access_token()
+        except DarajaError:
+            logger.warning(
+                'Early M-Pesa token refresh failed; using current token.',
+                exc_info=True,
+            )
+            return current_token
+        finally:
+            self._release_token_lock(lock_owner)
+
+    def _fetch_access_token(self):
         self._require_settings(
             'MPESA_CONSUMER_KEY',
             'MPESA_CONSUMER_SECRET',
@@ -68,20 +270,29 @@ class DarajaClient:
             self._get_auth_url,
         )
 
+        started = time.perf_counter()
+        error = None
         try:
-            response = requests.get(
+            response = get_daraja_session().get(
                 self._get_auth_url,
                 headers=headers,
-                timeout=30,
+                timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
             )
             response.raise_for_status()
         except requests.RequestException as exc:
+            error = 'request_errors'
             logger.error(
                 'Failed to get M-Pesa access token: %s',
                 exc,
                 exc_info=True,
             )
             raise DarajaError('Failed to get M-Pesa access token.') from exc
+        finally:
+            _record_request(
+                'oauth',
+                (time.perf_counter() - started) * 1000,
+                error,
+            )
 
         data = self._parse_json_response(
             response,
@@ -98,10 +309,60 @@ class DarajaClient:
                 data.get('errorCode'),
             )
 
-        cache.set('mpesa_access_token', token, timeout=50 * 60)
-        logger.debug('M-Pesa access token cached for 50 minutes.')
+        try:
+            expires_in = int(data.get('expires_in'))
+        except (TypeError, ValueError):
+            expires_in = DEFAULT_ACCESS_TOKEN_EXPIRES_IN
+
+        cache_seconds = max(
+            expires_in - ACCESS_TOKEN_EXPIRY_BUFFER_SECONDS,
+            60,
+        )
+        refresh_seconds = max(
+            cache_seconds - ACCESS_TOKEN_REFRESH_MARGIN_SECONDS,
+            cache_seconds // 2,
+        )
+        cache.set(
+            ACCESS_TOKEN_CACHE_KEY,
+            {
+                'token': token,
+                'refresh_after': time.time() + refresh_seconds,
+            },
+            timeout=cache_seconds,
+        )
+        logger.debug(
+            'M-Pesa access token cached for %s seconds.',
+            cache_seconds,
+        )
         return token
 
+    def _acquire_token_lock(self):
+        owner = uuid4().hex
+        if cache.add(
+            ACCESS_TOKEN_LOCK_KEY,
+            owner,
+            timeout=ACCESS_TOKEN_LOCK_SECONDS,
+        ):
+            return owner
+
+        return None
+
+    def _release_token_lock(self, owner):
+        if owner is not None and cache.get(ACCESS_TOKEN_LOCK_KEY) == owner:
+            cache.delete(ACCESS_TOKEN_LOCK_KEY)
+
+    def _wait_for_token(self):
+        deadline = time.monotonic() + ACCESS_TOKEN_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.1)
+            cached = cache.get(ACCESS_TOKEN_CACHE_KEY)
+            if isinstance(cached, dict):
+                return cached['token']
+            if cache.get(ACCESS_TOKEN_LOCK_KEY) is None:
+                return None
+
+        return None
+
     def initiate_stk_push(
         self,
         phone_number,
@@ -144,7 +405,12 @@ class DarajaClient:
             timestamp,
         )
 
-        data = self._post(self._get_stk_url, token, payload)
+        data = self._post(
+            self._get_stk_url,
+            token,
+            payload,
+            endpoint='stk_push',
+        )
         response_code = data.get('ResponseCode')
         if response_code != '0':
             raise DarajaError(
@@ -173,7 +439,12 @@ class DarajaClient:
             'CheckoutRequestID': checkout_request_id,
         }
 
-        return self._post(self._get_stk_query_url, token, payload)
+        return self._post(
+            self._get_stk_query_url,
+            token,
+            payload,
+            endpoint='stk_query',
+        )
 
     def initiate_b2c(
         self,
@@ -183,6 +454,7 @@ class DarajaClient:
         remarks,
         result_url,
         timeout_url,
+        originator_conversation_id=None,
     ):
         self._require_settings(
             'MPESA_CONSUMER_KEY',
@@ -204,8 +476,16 @@ class DarajaClient:
             'ResultURL': result_url,
             'Occasion': occasion[:100],
         }
-
-        data = self._post(self._get_b2c_url, token, payload)
+        if originator_conversation_id:
+            # Lets Safaricom recognise a payout resent after a timeout.
+            payload['OriginatorConversationID'] = originator_conversation_id
+
+        data = self._post(
+            self._get_b2c_url,
+            token,
+            payload,
+            endpoint='b2c',
+        )
         response_code = str(data.get('ResponseCode'))
         if response_code != '0':
             raise DarajaError(
@@ -233,12 +513,15 @@ class DarajaClient:
         return timezone.now().strftime('%Y%m%d%H%M%S')
 
     def _get_base_url(self):
+        if settings.MPESA_BASE_URL:
+            return settings.MPESA_BASE_URL.rstrip('/')
+
         if str(self.environment).lower() == 'live':
             return self.LIVE_BASE_URL
 
         return self.SANDBOX_BASE_URL
 
-    def _post(self, url, token, payload):
+    def _post(self, url, token, payload, endpoint=None):
         headers = {
             'Authorization': f'Bearer {token}',
             'Content-Type': 'application/json',
@@ -250,15 +533,18 @@ class DarajaClient:
             list(payload.keys()),
         )
 
+        started = time.perf_counter()
+        error = None
         try:
-            response = requests.post(
+            response = get_daraja_session().post(
                 url,
                 json=payload,
                 headers=headers,
-                timeout=30,
+                timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS),
             )
             response.raise_for_status()
         except requests.exceptions.Timeout as exc:
+            error = 'timeouts'
             logger.error(
                 'M-Pesa API timeout: %s',
                 exc,
@@ -268,6 +554,7 @@ class DarajaClient:
                 'M-Pesa request timed out. Please try again.',
             ) from exc
         except requests.exceptions.ConnectionError as exc:
+            error = 'connection_errors'
             logger.error(
                 'M-Pesa connection error: %s',
                 exc,
@@ -277,6 +564,7 @@ class DarajaClient:
                 'Failed to connect to M-Pesa API. Check your internet connection.',
             ) from exc
         except requests.exceptions.HTTPError as exc:
+            error = 'http_errors'
             response_text = getattr(exc.response, 'text', '')
             logger.error(
                 'M-Pesa HTTP error %s at %s: %s',
@@ -290,12 +578,19 @@ class DarajaClient:
                 exc.response.status_code,
             ) from exc
         except requests.RequestException as exc:
+            error = 'request_errors'
             logger.error(
                 'M-Pesa request error: %s',
                 exc,
                 exc_info=True,
             )
             raise DarajaError('M-Pesa request failed.') from exc
+        finally:
+            _record_request(
+                endpoint or url,
+                (time.perf_counter() - started) * 1000,
+                error,
+            )
 
         return self._parse_json_response(
             response,
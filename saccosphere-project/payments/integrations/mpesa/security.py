@@ -64,6 +64,11 @@ SAFARICOM_IP_RANGES = [
     '196.201.214.0/23',
     '192.168.201.0/24',  
 ]
+# Parsed once at import; callbacks only do membership tests.
+SAFARICOM_NETWORKS = tuple(
+    ipaddress.ip_network(ip_range) for ip_range in SAFARICOM_IP_RANGES
+)
+REPLAY_MARKER_TIMEOUT = 86400
 
 def verify_mpesa_signature(request):
     """
@@ -132,8 +137,8 @@ def is_safaricom_ip(request):
         logger.warning('Invalid M-Pesa callback request IP: %s.', ip_address)
         return False
 
-    for ip_range in SAFARICOM_IP_RANGES:
-        if request_ip in ipaddress.ip_network(ip_range):
+    for network in SAFARICOM_NETWORKS:
+        if request_ip in network:
             return True
 
     logger.warning(
@@ -144,16 +149,21 @@ def is_safaricom_ip(request):
 
 
 def is_replay_attack(checkout_request_id):
+    """
+    Set the replay marker for a callback, reporting whether it was set.
+
+    cache.add is a single atomic set-if-absent, so of two concurrent
+    deliveries of the same callback exactly one gets through.
+    """
     cache_key = f'mpesa_replay:{checkout_request_id}'
-    if cache.get(cache_key):
-        logger.warning(
-            'M-Pesa callback replay detected for checkout_request_id=%s.',
-            checkout_request_id,
-        )
-        return True
+    if cache.add(cache_key, True, timeout=REPLAY_MARKER_TIMEOUT):
+        return False
 
-    cache.set(cache_key, True, timeout=86400)
-    return False
+    logger.warning(
+        'M-Pesa callback replay detected for checkout_request_id=%s.',
+        checkout_request_id,
+    )
+    return True
 
 
 def _get_client_ip(request):
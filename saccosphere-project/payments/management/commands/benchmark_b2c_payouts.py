@@ -0,0 +1,120 @@
+"""Benchmark the bulk B2C payout dispatcher against the mock provider."""
+
+import time
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test.utils import override_settings
+
+from config.benchmark import BenchmarkCommand, seed_members, seed_sacco
+from payments.bulk_b2c import (
+    DISPATCH_LOCK_KEY,
+    create_payout_batch,
+    dispatch_payout_batch,
+)
+from payments.providers.mock import MockPSPProvider
+
+
+class Command(BenchmarkCommand):
+    """
+    Measure bulk B2C payouts per second on synthetic members.
+
+    Each run seeds one SACCO, creates a payout batch for the mock PSP
+    provider and dispatches it, then rolls everything back. Every mock
+    send sleeps for --latency-ms to stand in for the provider round trip,
+    so the figures show how far the thread pool and token bucket get
+    towards the configured rate limit.
+
+    Usage:
+        python manage.py benchmark_b2c_payouts --payouts 2000 --rate 50
+    """
+
+    help = 'Benchmark bulk B2C payout dispatch throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payouts',
+            type=int,
+            nargs='+',
+            default=[500, 2000],
+            help='Batch sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            default=50.0,
+            help='Payouts per second allowed by the token bucket.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            nargs='+',
+            default=[1, 8],
+            help='Thread pool sizes to compare.',
+        )
+        parser.add_argument(
+            '--latency-ms',
+            type=float,
+            default=150.0,
+            help='Simulated provider latency per payout.',
+        )
+
+    def handle(self, *args, **options):
+        for payout_count in options['payouts']:
+            for workers in options['workers']:
+                self.run_rolled_back(
+                    self._run_scenario,
+                    payout_count,
+                    workers,
+                    options['rate'],
+                    options['latency_ms'] / 1000,
+                )
+
+    def _run_scenario(self, payout_count, workers, rate, latency):
+        timings = {}
+        with self.timed(timings, 'seed synthetic data'):
+            sacco = seed_sacco('B2C Benchmark SACCO')
+            memberships = seed_members(sacco, payout_count)
+
+        with self.timed(timings, 'create_payout_batch'):
+            batch = create_payout_batch(
+                payouts=[
+                    {
+                        'user': membership.user,
+                        'phone_number': membership.user.phone_number,
+                        'amount': Decimal('1000.00'),
+                        'remarks': 'Benchmark payout',
+                    }
+                    for membership in memberships
+                ],
+                occasion='Benchmark Payout',
+                provider_name='mock',
+                sacco=sacco,
+            )
+
+        original_disburse = MockPSPProvider.disburse
+
+        def slow_disburse(provider, *args, **kwargs):
+            time.sleep(latency)
+            return original_disburse(provider, *args, **kwargs)
+
+        with override_settings(B2C_PAYOUT_RATE_LIMITS={'default': rate}):
+            with patch.object(MockPSPProvider, 'disburse', slow_disburse):
+                with self.timed(timings, 'dispatch_payout_batch'):
+                    result = dispatch_payout_batch(
+                        batch.id,
+                        max_workers=workers,
+                    )
+        cache.delete(DISPATCH_LOCK_KEY.format(batch_id=batch.id))
+
+        self.write_timings(
+            f'{payout_count:,} payouts, {workers} workers, '
+            f'{rate:g}/s limit, {latency * 1000:g}ms latency',
+            timings,
+            rows=payout_count,
+        )
+        self.stdout.write(
+            f'  status: {result["status"]}, sent: {result["sent"]:,}, '
+            f'failed: {result["failed"]:,}, retry: {result["retry"]:,}'
+        )
@@ -0,0 +1,144 @@
+"""Benchmark the M-Pesa STK callback ingestion endpoint."""
+
+import statistics
+import time
+from contextlib import nullcontext
+from unittest.mock import patch
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.cache import cache
+from django.test import Client
+from django.urls import reverse
+
+from config.benchmark import BenchmarkCommand
+
+
+SAFARICOM_IP = '196.201.214.200'
+
+
+class Command(BenchmarkCommand):
+    """
+    Post synthetic STK callbacks through the full middleware stack.
+
+    Every callback has a fresh CheckoutRequestID, so each one takes the
+    accept path: IP check, replay marker, inbox append and a debounced
+    drain schedule. The Celery hand-off is stubbed unless --with-broker is
+    given, so the figures measure the endpoint rather than the broker. Inbox rows are rolled back
+    and replay markers deleted afterwards.
+
+    Usage:
+        python manage.py benchmark_stk_callbacks --callbacks 5000
+    """
+
+    help = 'Benchmark STK callback ingestion throughput and latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--callbacks',
+            type=int,
+            nargs='+',
+            default=[1000, 5000],
+            help='Number of callbacks to post per scenario.',
+        )
+        parser.add_argument(
+            '--with-broker',
+            action='store_true',
+            help='Schedule inbox drains on the real broker.',
+        )
+
+    def handle(self, *args, **options):
+        for callback_count in options['callbacks']:
+            self.run_rolled_back(
+                self._run_scenario,
+                callback_count,
+                options['with_broker'],
+            )
+
+    def _run_scenario(self, callback_count, with_broker):
+        run_id = uuid4().hex[:8]
+        client = Client(
+            REMOTE_ADDR=SAFARICOM_IP,
+            HTTP_HOST=self._host(),
+        )
+        url = reverse('payments:mpesa-stk-callback')
+        checkout_ids = [
+            f'ws_CO_BENCH_{run_id}_{index:07d}'
+            for index in range(callback_count)
+        ]
+        latencies = []
+        rejected = 0
+
+        enqueue_patch = (
+            nullcontext()
+            if with_broker
+            else patch(
+                'payments.tasks.drain_mpesa_callback_inbox.apply_async'
+            )
+        )
+        started = time.perf_counter()
+        with enqueue_patch:
+            for checkout_request_id in checkout_ids:
+                request_started = time.perf_counter()
+                response = client.post(
+                    url,
+                    self._callback_body(checkout_request_id),
+                    content_type='application/json',
+                )
+                latencies.append(time.perf_counter() - request_started)
+                if response.status_code != 200:
+                    rejected += 1
+        elapsed = time.perf_counter() - started
+
+        cache.delete_many(
+            [f'mpesa_replay:{checkout_id}' for checkout_id in checkout_ids]
+        )
+
+        self.write_timings(
+            f'{callback_count:,} STK callbacks',
+            {'ingest': elapsed},
+            rows=callback_count,
+        )
+        latencies.sort()
+        self.stdout.write(
+            '  latency ms: '
+            f'p50 {self._percentile(latencies, 50):.2f}, '
+            f'p95 {self._percentile(latencies, 95):.2f}, '
+            f'p99 {self._percentile(latencies, 99):.2f}, '
+            f'max {latencies[-1] * 1000:.2f}, '
+            f'mean {statistics.fmean(latencies) * 1000:.2f}'
+        )
+        self.stdout.write(f'  non-200 responses: {rejected:,}')
+
+    def _callback_body(self, checkout_request_id):
+        return {
+            'Body': {
+                'stkCallback': {
+                    'MerchantRequestID': f'MR-{checkout_request_id}',
+                    'CheckoutRequestID': checkout_request_id,
+                    'ResultCode': 0,
+                    'ResultDesc': 'The service request is processed.',
+                    'CallbackMetadata': {
+                        'Item': [
+                            {'Name': 'Amount', 'Value': 1000},
+                            {
+                                'Name': 'MpesaReceiptNumber',
+                                'Value': checkout_request_id[-10:],
+                            },
+                            {'Name': 'PhoneNumber', 'Value': 254708374149},
+                        ],
+                    },
+                },
+            },
+        }
+
+    def _host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host and host != '*':
+                return host.lstrip('.')
+
+        return 'localhost'
+
+    def _percentile(self, sorted_latencies, percentile):
+        index = round(percentile / 100 * (len(sorted_latencies) - 1))
+        return sorted_latencies[index] * 1000
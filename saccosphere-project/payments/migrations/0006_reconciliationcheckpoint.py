@@ -0,0 +1,28 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0005_transaction_fee_rate_transaction_gross_amount_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReconciliationCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Reconciler this checkpoint belongs to.', max_length=50, unique=True)),
+                ('cursor_created_at', models.DateTimeField(blank=True, help_text='created_at of the last transaction claimed this sweep.', null=True)),
+                ('cursor_id', models.UUIDField(blank=True, help_text='ID of the last transaction claimed this sweep.', null=True)),
+                ('sweep_started_at', models.DateTimeField(blank=True, help_text='Date and time the current sweep started.', null=True)),
+                ('claimed_in_sweep', models.PositiveIntegerField(default=0, help_text='Transactions claimed so far in the current sweep.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Date and time the cursor last moved.')),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payments', '0006_reconciliationcheckpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MpesaCallbackInbox',
+            fields=[
+                ('id', models.BigAutoField(help_text='Arrival-ordered inbox identifier.', primary_key=True, serialize=False)),
+                ('callback_type', models.CharField(choices=[('STK', 'STK push'), ('B2C', 'B2C')], help_text='Callback endpoint that received this payload.', max_length=10)),
+                ('callback_identifier', models.CharField(db_index=True, help_text='CheckoutRequestID or ConversationID of the callback.', max_length=100)),
+                ('result_code', models.CharField(blank=True, default='', help_text='ResultCode reported by Safaricom.', max_length=20)),
+                ('payload', models.JSONField(help_text='Raw callback body as received.')),
+                ('status', models.CharField(choices=[('RECEIVED', 'Received'), ('PROCESSED', 'Processed'), ('FAILED', 'Failed')], default='RECEIVED', help_text='Processing status of this callback.', max_length=20)),
+                ('attempts', models.PositiveIntegerField(default=0, help_text='Times a worker has tried to process this callback.')),
+                ('error_message', models.TextField(blank=True, default='', help_text='Last processing error, if any.')),
+                ('received_at', models.DateTimeField(auto_now_add=True, help_text='Date and time the callback was received.')),
+                ('processed_at', models.DateTimeField(blank=True, help_text='Date and time the callback was processed.', null=True)),
+            ],
+            options={
+                'verbose_name': 'M-Pesa Callback Inbox Entry',
+                'verbose_name_plural': 'M-Pesa Callback Inbox',
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['status', 'id'], name='payments_mp_status_2672f1_idx')],
+            },
+        ),
+    ]
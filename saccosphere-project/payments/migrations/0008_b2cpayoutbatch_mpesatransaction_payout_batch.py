@@ -0,0 +1,48 @@
+# Generated by Django 5.2.16 on 2026-10-18 17:07
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('payments', '0007_mpesacallbackinbox'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='B2CPayoutBatch',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique payout batch identifier.', primary_key=True, serialize=False)),
+                ('provider_name', models.CharField(help_text='Registered PSP provider, or mpesa for Daraja directly.', max_length=50)),
+                ('occasion', models.CharField(help_text='Occasion sent with every payout, e.g. Dividend Payout.', max_length=100)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('DISPATCHING', 'Dispatching'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Dispatch status of this batch.', max_length=20)),
+                ('total_count', models.PositiveIntegerField(default=0, help_text='Payouts in this batch.')),
+                ('total_amount', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of all payout amounts.', max_digits=14)),
+                ('sent_count', models.PositiveIntegerField(default=0, help_text='Payouts accepted by the provider.')),
+                ('failed_count', models.PositiveIntegerField(default=0, help_text='Payouts the provider rejected.')),
+                ('retry_count', models.PositiveIntegerField(default=0, help_text='Payouts whose last send attempt had no clear outcome.')),
+                ('error_message', models.TextField(blank=True, default='', help_text='Error that stopped the last dispatch, if any.')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time this batch was created.')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='Date and time every payout was sent or rejected.', null=True)),
+                ('created_by', models.ForeignKey(blank=True, help_text='User who created this batch.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='b2c_payout_batches', to=settings.AUTH_USER_MODEL)),
+                ('sacco', models.ForeignKey(blank=True, help_text='SACCO paying out this batch.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='b2c_payout_batches', to='accounts.sacco')),
+            ],
+            options={
+                'verbose_name': 'B2C Payout Batch',
+                'verbose_name_plural': 'B2C Payout Batches',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='mpesatransaction',
+            name='payout_batch',
+            field=models.ForeignKey(blank=True, help_text='Bulk B2C batch this payout was dispatched in.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payouts', to='payments.b2cpayoutbatch'),
+        ),
+    ]
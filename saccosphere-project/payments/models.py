@@ -329,6 +329,14 @@ class MpesaTransaction(models.Model):
         blank=True,
         help_text='Repayment instalment number affected by this transaction.',
     )
+    payout_batch = models.ForeignKey(
+        'B2CPayoutBatch',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='payouts',
+        help_text='Bulk B2C batch this payout was dispatched in.',
+    )
     created_at = models.DateTimeField(
         auto_now_add=True,
         help_text='Date and time this M-Pesa record was created.',
@@ -409,3 +417,227 @@ class PlatformFee(models.Model):
 
     def __str__(self):
         return f'{self.fee_type} — {self.amount}'
+
+
+class ReconciliationCheckpoint(models.Model):
+    """
+    Keyset cursor for a sweep over stuck PENDING transactions.
+
+    Reconciler runs claim pages by advancing the cursor under a row lock, so
+    overlapping runs never query the provider for the same transaction in
+    one sweep.
+    """
+
+    name = models.CharField(
+        max_length=50,
+        unique=True,
+        help_text='Reconciler this checkpoint belongs to.',
+    )
+    cursor_created_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='created_at of the last transaction claimed this sweep.',
+    )
+    cursor_id = models.UUIDField(
+        null=True,
+        blank=True,
+        help_text='ID of the last transaction claimed this sweep.',
+    )
+    sweep_started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time the current sweep started.',
+    )
+    claimed_in_sweep = models.PositiveIntegerField(
+        default=0,
+        help_text='Transactions claimed so far in the current sweep.',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        help_text='Date and time the cursor last moved.',
+    )
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return f'{self.name} — {self.claimed_in_sweep} claimed'
+
+
+class MpesaCallbackInbox(models.Model):
+    """
+    Append-only log of raw M-Pesa callbacks, written before acknowledging.
+
+    The callback endpoints only append here; workers claim entries in
+    batches and process them (see payments.callback_inbox). A callback
+    survives broker outages and worker crashes once Safaricom has been told
+    it was accepted.
+    """
+
+    class CallbackType(models.TextChoices):
+        STK = 'STK', 'STK push'
+        B2C = 'B2C', 'B2C'
+
+    class Status(models.TextChoices):
+        RECEIVED = 'RECEIVED', 'Received'
+        PROCESSED = 'PROCESSED', 'Processed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.BigAutoField(
+        primary_key=True,
+        help_text='Arrival-ordered inbox identifier.',
+    )
+    callback_type = models.CharField(
+        max_length=10,
+        choices=CallbackType.choices,
+        help_text='Callback endpoint that received this payload.',
+    )
+    callback_identifier = models.CharField(
+        max_length=100,
+        db_index=True,
+        help_text='CheckoutRequestID or ConversationID of the callback.',
+    )
+    result_code = models.CharField(
+        max_length=20,
+        blank=True,
+        default='',
+        help_text='ResultCode reported by Safaricom.',
+    )
+    payload = models.JSONField(
+        help_text='Raw callback body as received.',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.RECEIVED,
+        help_text='Processing status of this callback.',
+    )
+    attempts = models.PositiveIntegerField(
+        default=0,
+        help_text='Times a worker has tried to process this callback.',
+    )
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        help_text='Last processing error, if any.',
+    )
+    received_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time the callback was received.',
+    )
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time the callback was processed.',
+    )
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            models.Index(fields=['status', 'id']),
+        ]
+        verbose_name = 'M-Pesa Callback Inbox Entry'
+        verbose_name_plural = 'M-Pesa Callback Inbox'
+
+    def __str__(self):
+        return f'{self.callback_type} {self.callback_identifier} — {self.status}'
+
+
+class B2CPayoutBatch(models.Model):
+    """
+    A set of B2C payouts dispatched together (see payments.bulk_b2c).
+
+    Each payout is a Transaction with a B2C MpesaTransaction whose
+    originator conversation ID is fixed before anything is sent, so a
+    payout resent after a crash or timeout is recognised by the provider
+    as the same request.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        DISPATCHING = 'DISPATCHING', 'Dispatching'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text='Unique payout batch identifier.',
+    )
+    sacco = models.ForeignKey(
+        'accounts.Sacco',
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+        related_name='b2c_payout_batches',
+        help_text='SACCO paying out this batch.',
+    )
+    provider_name = models.CharField(
+        max_length=50,
+        help_text='Registered PSP provider, or mpesa for Daraja directly.',
+    )
+    occasion = models.CharField(
+        max_length=100,
+        help_text='Occasion sent with every payout, e.g. Dividend Payout.',
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='b2c_payout_batches',
+        help_text='User who created this batch.',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text='Dispatch status of this batch.',
+    )
+    total_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts in this batch.',
+    )
+    total_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Sum of all payout amounts.',
+    )
+    sent_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts accepted by the provider.',
+    )
+    failed_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts the provider rejected.',
+    )
+    retry_count = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts whose last send attempt had no clear outcome.',
+    )
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        help_text='Error that stopped the last dispatch, if any.',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time this batch was created.',
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time every payout was sent or rejected.',
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'B2C Payout Batch'
+        verbose_name_plural = 'B2C Payout Batches'
+
+    def __str__(self):
+        return (
+            f'{self.occasion} — {self.sent_count}/{self.total_count} sent'
+        )
@@ -10,14 +10,14 @@ from .base import (
     DisbursementResult,
     StatusResult,
 )
-from .registry import get_provider_class
+from .registry import get_provider
 
 if TYPE_CHECKING:
     from accounts.models import Sacco
 
 
 def get_psp_provider(sacco: "Sacco | None" = None) -> BasePSPProvider:
-    """Resolve and instantiate the configured PSP provider for the request."""
+    """Return the shared instance of the PSP provider configured for a SACCO."""
     provider_name = ""
 
     if settings.DEBUG and not getattr(settings, "PAYMENT_PROVIDER", ""):
@@ -30,7 +30,7 @@ def get_psp_provider(sacco: "Sacco | None" = None) -> BasePSPProvider:
     if not provider_name:
         raise ValueError("No PSP provider configured.")
 
-    return get_provider_class(provider_name)()
+    return get_provider(provider_name, sacco)
 
 
 __all__ = [
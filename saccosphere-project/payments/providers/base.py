@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import os
+import threading
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from decimal import Decimal
 from typing import TYPE_CHECKING
 
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
 if TYPE_CHECKING:
     from accounts.models import Sacco
 
@@ -57,6 +63,53 @@ class BasePSPProvider(ABC):
 
     provider_name: str = "base"
 
+    def __init__(self, config_key: str = "") -> None:
+        self.config_key = config_key
+        self._session: requests.Session | None = None
+        self._session_pid: int | None = None
+        self._session_lock = threading.Lock()
+
+    @classmethod
+    def get_config_key(cls, sacco: "Sacco | None") -> str:
+        """
+        Return the key of the configuration serving a SACCO.
+
+        The registry keeps one instance per (provider name, config key), so
+        the default shares a single instance across SACCOs. Providers with
+        per-SACCO credentials return a key that tells them apart.
+        """
+        return ""
+
+    @property
+    def session(self) -> requests.Session:
+        """Return this instance's keep-alive HTTP session for the process."""
+        pid = os.getpid()
+        if self._session is not None and self._session_pid == pid:
+            return self._session
+
+        with self._session_lock:
+            if self._session is None or self._session_pid != pid:
+                adapter = HTTPAdapter(
+                    pool_connections=2,
+                    pool_maxsize=settings.PSP_HTTP_POOL_MAXSIZE,
+                    max_retries=0,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                self._session = session
+                self._session_pid = pid
+
+        return self._session
+
+    def close(self) -> None:
+        """Close the pooled HTTP session; the next request opens a new one."""
+        with self._session_lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._session_pid = None
+
     @abstractmethod
     def create_checkout(
         self,
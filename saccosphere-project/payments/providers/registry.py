@@ -1,9 +1,21 @@
 from __future__ import annotations
 
 import importlib
+import logging
+import os
+import threading
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from django.conf import settings
 
 from .base import BasePSPProvider
 
+if TYPE_CHECKING:
+    from accounts.models import Sacco
+
+
+logger = logging.getLogger(__name__)
 
 PROVIDER_REGISTRY: dict[str, str] = {
     "cellulant": "payments.providers.cellulant.provider.CellulantProvider",
@@ -12,9 +24,15 @@ PROVIDER_REGISTRY: dict[str, str] = {
     "mock": "payments.providers.mock.MockPSPProvider",
 }
 
+# Long-lived provider instances per (provider name, config key). Dropped
+# after fork so worker processes never share pooled sockets.
+_instances: dict[tuple[str, str], BasePSPProvider] = {}
+_instances_pid: int | None = None
+_instances_lock = threading.Lock()
+
 
 def get_provider_class(name: str) -> type[BasePSPProvider]:
-    """Dynamically load a PSP provider class from the registry."""
+    """Return a PSP provider class, importing and validating it once."""
     normalized_name = (name or "").strip().lower()
 
     if normalized_name not in PROVIDER_REGISTRY:
@@ -23,6 +41,87 @@ def get_provider_class(name: str) -> type[BasePSPProvider]:
             f"Unknown PSP provider '{name}'. Registered providers: {registered}"
         )
 
+    return _load_provider_class(normalized_name)
+
+
+def get_provider(
+    name: str,
+    sacco: "Sacco | None" = None,
+) -> BasePSPProvider:
+    """
+    Return the shared provider instance for a provider name and SACCO.
+
+    Instances are created once per process and keyed by the provider's
+    config key for the SACCO, so callers reuse their pooled HTTP sessions
+    instead of building fresh provider state on every call.
+    """
+    global _instances_pid
+
+    provider_class = get_provider_class(name)
+    key = (
+        (name or "").strip().lower(),
+        provider_class.get_config_key(sacco),
+    )
+
+    pid = os.getpid()
+    if _instances_pid == pid:
+        provider = _instances.get(key)
+        if provider is not None:
+            return provider
+
+    with _instances_lock:
+        if _instances_pid != pid:
+            _instances.clear()
+            _instances_pid = pid
+
+        provider = _instances.get(key)
+        if provider is None:
+            provider = provider_class(config_key=key[1])
+            _instances[key] = provider
+
+    return provider
+
+
+def warm_up_providers(names: list[str] | None = None) -> list[str]:
+    """
+    Resolve and instantiate providers ahead of the first request.
+
+    Defaults to the configured PAYMENT_PROVIDER (the mock provider in
+    DEBUG when none is set). Providers that fail to load are logged and
+    skipped so a bad entry cannot stop a worker from booting.
+
+    Returns:
+        list: Names of the providers that were warmed up
+    """
+    if names is None:
+        configured = getattr(settings, "PAYMENT_PROVIDER", "")
+        if not configured and settings.DEBUG:
+            configured = "mock"
+        names = [configured] if configured else []
+
+    warmed = []
+    for name in names:
+        try:
+            get_provider(name)
+        except (ImportError, AttributeError, TypeError, ValueError) as exc:
+            logger.warning("Could not warm up PSP provider %s: %s", name, exc)
+            continue
+        warmed.append(name)
+
+    return warmed
+
+
+def reset_providers() -> None:
+    """Close pooled sessions and forget every resolved provider."""
+    with _instances_lock:
+        for provider in _instances.values():
+            provider.close()
+        _instances.clear()
+    _load_provider_class.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def _load_provider_class(normalized_name: str) -> type[BasePSPProvider]:
     module_path, class_name = PROVIDER_REGISTRY[normalized_name].rsplit(".", 1)
     module = importlib.import_module(module_path)
     provider_class = getattr(module, class_name)
@@ -0,0 +1,263 @@
+"""Concurrent, rate-limited reconciliation of stuck PENDING transactions."""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction as db_transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Callback, ReconciliationCheckpoint, Transaction
+from .providers.registry import get_provider
+
+
+logger = logging.getLogger('saccosphere.payments')
+
+CHECKPOINT_NAME = 'pending_transactions'
+PENDING_AGE = timedelta(minutes=10)
+SWEEP_INTERVAL = timedelta(minutes=10)
+PAGE_SIZE = 200
+CALLBACK_BATCH_SIZE = 50
+MAX_RUN_SECONDS = 8 * 60
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` acquisitions per second."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(self.rate, 1.0))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity,
+                    self._tokens + (now - self._updated) * self.rate,
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+
+            time.sleep(wait_seconds)
+
+
+def reconcile_pending_transactions(
+    page_size=PAGE_SIZE,
+    max_workers=None,
+    max_run_seconds=MAX_RUN_SECONDS,
+):
+    """
+    Query providers for stuck PENDING transactions and queue the results.
+
+    Pages are claimed from the shared checkpoint, so overlapping runs split
+    the backlog between them. Each page is queried through a bounded thread
+    pool with one token bucket per provider. Settled results become
+    Callback rows, bulk inserted and processed in micro-batches. Results
+    that are still pending are left for the next sweep.
+
+    Returns:
+        dict: {
+            'claimed': int,
+            'queried': int,
+            'query_errors': int,
+            'callbacks': int,
+        }
+    """
+    max_workers = max_workers or settings.RECONCILE_MAX_WORKERS
+    deadline = time.monotonic() + max_run_seconds
+    providers = {}
+    buckets = {}
+    summary = {'claimed': 0, 'queried': 0, 'query_errors': 0, 'callbacks': 0}
+
+    with ThreadPoolExecutor(
+        max_workers=max_workers,
+        thread_name_prefix='reconcile',
+    ) as executor:
+        start_new_sweep = True
+        while time.monotonic() < deadline:
+            page = claim_pending_page(page_size, start_new_sweep)
+            start_new_sweep = False
+            if not page:
+                break
+
+            summary['claimed'] += len(page)
+            queries = []
+            for transaction in page:
+                provider = _get_provider(
+                    transaction.provider.name,
+                    providers,
+                    buckets,
+                )
+                if provider is not None:
+                    queries.append((transaction, provider))
+
+            results = executor.map(_query_status, queries)
+
+            settled = []
+            for (transaction, _), result in zip(queries, results):
+                if result is None:
+                    summary['query_errors'] += 1
+                    continue
+
+                summary['queried'] += 1
+                if result.is_successful or result.is_failed:
+                    settled.append((transaction, result))
+
+            summary['callbacks'] += _queue_callbacks(settled)
+
+    logger.info(
+        'Pending transaction reconciliation finished: claimed=%s '
+        'queried=%s query_errors=%s callbacks=%s.',
+        summary['claimed'],
+        summary['queried'],
+        summary['query_errors'],
+        summary['callbacks'],
+    )
+    return summary
+
+
+def claim_pending_page(page_size=PAGE_SIZE, start_new_sweep=False):
+    """
+    Claim the next page of stuck PENDING transactions.
+
+    The checkpoint row is locked only while the page is read and the cursor
+    is moved past it. When the cursor reaches the end, a new sweep starts
+    from the oldest transaction, but only if ``start_new_sweep`` is set and
+    the current sweep is at least SWEEP_INTERVAL old.
+    """
+    now = timezone.now()
+    ReconciliationCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+    with db_transaction.atomic():
+        checkpoint = ReconciliationCheckpoint.objects.select_for_update().get(
+            name=CHECKPOINT_NAME,
+        )
+        page = _next_page(checkpoint, now - PENDING_AGE, page_size)
+
+        if not page:
+            sweep_is_recent = (
+                checkpoint.sweep_started_at is not None
+                and now - checkpoint.sweep_started_at < SWEEP_INTERVAL
+            )
+            if not start_new_sweep or sweep_is_recent:
+                return []
+
+            checkpoint.cursor_created_at = None
+            checkpoint.cursor_id = None
+            checkpoint.sweep_started_at = now
+            checkpoint.claimed_in_sweep = 0
+            page = _next_page(checkpoint, now - PENDING_AGE, page_size)
+        elif checkpoint.sweep_started_at is None:
+            checkpoint.sweep_started_at = now
+
+        if page:
+            checkpoint.cursor_created_at = page[-1].created_at
+            checkpoint.cursor_id = page[-1].id
+            checkpoint.claimed_in_sweep += len(page)
+        checkpoint.save()
+
+    return page
+
+
+def _next_page(checkpoint, cutoff, page_size):
+    transactions = Transaction.objects.filter(
+        status=Transaction.Status.PENDING,
+        created_at__lt=cutoff,
+        provider__isnull=False,
+    )
+    if checkpoint.cursor_created_at is not None:
+        transactions = transactions.filter(
+            Q(created_at__gt=checkpoint.cursor_created_at)
+            | Q(
+                created_at=checkpoint.cursor_created_at,
+                id__gt=checkpoint.cursor_id,
+            )
+        )
+
+    return list(
+        transactions.select_related('provider').order_by(
+            'created_at',
+            'id',
+        )[:page_size]
+    )
+
+
+def _get_provider(name, providers, buckets):
+    if name not in providers:
+        try:
+            providers[name] = get_provider(name)
+        except (TypeError, ValueError) as exc:
+            logger.warning(
+                'Skipping reconciliation for provider %s: %s',
+                name,
+                exc,
+            )
+            providers[name] = None
+
+        rate_limits = settings.PSP_STATUS_QUERY_RATE_LIMITS
+        buckets[name] = TokenBucket(
+            rate_limits.get(name, rate_limits['default']),
+        )
+
+    if providers[name] is None:
+        return None
+
+    return providers[name], buckets[name]
+
+
+def _query_status(query):
+    transaction, (provider, bucket) = query
+    bucket.acquire()
+    try:
+        return provider.query_status(str(transaction.id))
+    except Exception as exc:
+        logger.warning(
+            'Reconciliation failed for transaction %s: %s',
+            transaction.id,
+            exc,
+        )
+        return None
+
+
+def _queue_callbacks(settled):
+    from .tasks import process_payment_callbacks
+
+    queued = 0
+    for start in range(0, len(settled), CALLBACK_BATCH_SIZE):
+        batch = settled[start:start + CALLBACK_BATCH_SIZE]
+        callbacks = Callback.objects.bulk_create(
+            [
+                Callback(
+                    transaction=transaction,
+                    provider=transaction.provider,
+                    raw_payload={
+                        'merchantTransactionID': str(transaction.id),
+                        'status': result.provider_status,
+                        'amount_confirmed': str(
+                            result.amount_confirmed or '0.00'
+                        ),
+                    },
+                    processed=False,
+                )
+                for transaction, result in batch
+            ]
+        )
+        callback_ids = [str(callback.id) for callback in callbacks]
+        db_transaction.on_commit(
+            lambda ids=callback_ids: process_payment_callbacks.delay(ids),
+        )
+        queued += len(callbacks)
+
+    return queued
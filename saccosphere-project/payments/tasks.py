@@ -2,19 +2,36 @@ import logging
 from decimal import Decimal
 
 from celery import shared_task
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction as db_transaction
+from django.db.models import F
 from django.utils import timezone
 
 from notifications.tasks import notify_user_task
 
 from ledger.utils import create_ledger_entry
 
-from .models import Callback, MpesaTransaction, Transaction
-from .providers.registry import get_provider_class
+from .bulk_b2c import abandon_payout_batch, dispatch_payout_batch
+from .integrations.mpesa.daraja import DarajaClient, DarajaError
+from .models import (
+    B2CPayoutBatch,
+    Callback,
+    MpesaCallbackInbox,
+    MpesaTransaction,
+    Transaction,
+)
+from .providers.registry import get_provider
+from .reconciliation import (
+    reconcile_pending_transactions as run_pending_reconciliation,
+)
 
 
 logger = logging.getLogger('saccosphere.payments')
 
+INBOX_DRAIN_SCHEDULED_KEY = 'mpesa_callback_inbox_drain_scheduled'
+INBOX_DRAIN_DEBOUNCE_SECONDS = 1
+
 
 @shared_task(
     bind=True,
@@ -27,54 +44,16 @@ def process_stk_callback_task(
     checkout_request_id,
     result_code,
     callback_body,
+    inbox_id=None,
 ):
     try:
-        with db_transaction.atomic():
-            try:
-                mpesa_transaction = MpesaTransaction.objects.select_for_update(
-                    of=('self',),
-                ).select_related(
-                    'transaction',
-                    'transaction__user',
-                    'related_saving',
-                    'related_saving__membership',
-                    'related_loan',
-                    'related_loan__membership',
-                ).get(checkout_request_id=checkout_request_id)
-            except MpesaTransaction.DoesNotExist:
-                logger.warning(
-                    'M-Pesa STK callback ignored. Transaction not found: %s.',
-                    checkout_request_id,
-                )
-                return False
-
-            transaction = mpesa_transaction.transaction
-            if _callback_already_processed(mpesa_transaction, transaction):
-                logger.info(
-                    'M-Pesa STK callback already processed: '
-                    'checkout_request_id=%s transaction_reference=%s.',
-                    checkout_request_id,
-                    transaction.reference,
-                )
-                return True
-
-            stk_callback = _get_stk_callback(callback_body)
-            normalized_result_code = _normalize_result_code(result_code)
-
-            if normalized_result_code == 0:
-                _process_successful_callback(
-                    mpesa_transaction,
-                    transaction,
-                    stk_callback,
-                )
-            else:
-                _process_failed_callback(
-                    mpesa_transaction,
-                    transaction,
-                    stk_callback,
-                    normalized_result_code,
-                )
+        processed = _process_stk_callback(
+            checkout_request_id,
+            result_code,
+            callback_body,
+        )
     except Exception as exc:
+        _record_inbox_failure(inbox_id, exc)
         countdown = 60 * 2 ** self.request.retries
         logger.warning(
             'M-Pesa STK callback processing failed for '
@@ -85,11 +64,8 @@ def process_stk_callback_task(
         )
         raise self.retry(exc=exc, countdown=countdown)
 
-    logger.info(
-        'M-Pesa STK callback processed for checkout_request_id=%s.',
-        checkout_request_id,
-    )
-    return True
+    _mark_inbox_processed(inbox_id)
+    return processed
 
 
 @shared_task(
@@ -100,6 +76,32 @@ def process_stk_callback_task(
 )
 def process_payment_callback(self, callback_id):
     """Process a PSP callback through the provider-specific parser."""
+    return _process_payment_callback(callback_id)
+
+
+@shared_task(
+    bind=True,
+    name='payments.tasks.process_payment_callbacks',
+    max_retries=3,
+    default_retry_delay=60,
+)
+def process_payment_callbacks(self, callback_ids):
+    """Process a micro-batch of PSP callbacks in one task."""
+    processed = 0
+    for callback_id in callback_ids:
+        try:
+            if _process_payment_callback(callback_id):
+                processed += 1
+        except Exception:
+            logger.exception(
+                'Payment callback %s failed in batch.',
+                callback_id,
+            )
+
+    return processed
+
+
+def _process_payment_callback(callback_id):
     try:
         callback = Callback.objects.select_related('provider').get(
             id=callback_id,
@@ -112,7 +114,7 @@ def process_payment_callback(self, callback_id):
         logger.info('Payment callback already processed: %s', callback_id)
         return True
 
-    provider = get_provider_class(callback.provider.name)()
+    provider = get_provider(callback.provider.name)
     result = provider.parse_callback(callback.raw_payload)
 
     transaction_id = callback.raw_payload.get('merchantTransactionID')
@@ -175,48 +177,70 @@ def process_payment_callback(self, callback_id):
 @shared_task(name='payments.tasks.reconcile_pending_transactions')
 def reconcile_pending_transactions():
     """Query pending transactions and reconcile them with provider status."""
-    cutoff = timezone.now() - timezone.timedelta(minutes=10)
-    pending_transactions = Transaction.objects.filter(
-        status=Transaction.Status.PENDING,
-        created_at__lt=cutoff,
-        provider__isnull=False,
-    ).select_related('provider')
-
-    for transaction in pending_transactions:
-        try:
-            provider = get_provider_class(transaction.provider.name)()
-            result = provider.query_status(str(transaction.id))
-        except Exception as exc:
-            logger.warning(
-                'Reconciliation failed for transaction %s: %s',
-                transaction.id,
-                exc,
-            )
-            continue
+    return run_pending_reconciliation()
 
-        if (
-            not result.is_successful
-            and not result.is_failed
-            and not result.is_pending
-        ):
-            continue
 
-        callback_payload = {
-            'merchantTransactionID': str(transaction.id),
-            'status': result.provider_status,
-            'amount_confirmed': str(result.amount_confirmed or '0.00'),
-        }
-        callback = Callback.objects.create(
-            transaction=transaction,
-            provider=transaction.provider,
-            raw_payload=callback_payload,
-            processed=False,
-        )
-        process_payment_callback.delay(str(callback.id))
+@shared_task(
+    bind=True,
+    name='payments.tasks.dispatch_b2c_payout_batch',
+    max_retries=5,
+    default_retry_delay=120,
+)
+def dispatch_b2c_payout_batch(self, batch_id):
+    """Send a bulk B2C batch and retry the payouts with no clear outcome."""
+    result = dispatch_payout_batch(batch_id)
+    if result['status'] == B2CPayoutBatch.Status.DISPATCHING:
+        if self.request.retries >= self.max_retries:
+            abandon_payout_batch(batch_id)
+            return {**result, 'status': B2CPayoutBatch.Status.FAILED}
+        raise self.retry()
+    return result
+
+
+@shared_task(name='payments.tasks.drain_mpesa_callback_inbox')
+def drain_mpesa_callback_inbox():
+    """Process received M-Pesa callbacks from the inbox in micro-batches."""
+    from .callback_inbox import drain_callback_inbox
+
+    # Callbacks arriving from here on schedule a fresh drain.
+    cache.delete(INBOX_DRAIN_SCHEDULED_KEY)
+    return drain_callback_inbox()
+
+
+def schedule_inbox_drain():
+    """
+    Schedule a debounced inbox drain shortly after a callback is appended.
+
+    Only the first callback in each debounce window sends a broker message;
+    the rest are picked up by that drain. The beat schedule drains the
+    inbox as a backstop when a message is lost.
+    """
+    if not cache.add(
+        INBOX_DRAIN_SCHEDULED_KEY,
+        True,
+        timeout=INBOX_DRAIN_DEBOUNCE_SECONDS * 5,
+    ):
+        return False
 
+    drain_mpesa_callback_inbox.apply_async(
+        countdown=INBOX_DRAIN_DEBOUNCE_SECONDS,
+    )
     return True
 
 
+@shared_task(name='payments.tasks.refresh_mpesa_access_token')
+def refresh_mpesa_access_token():
+    """Refresh the shared Daraja token before requests find it expired."""
+    if not (settings.MPESA_CONSUMER_KEY and settings.MPESA_CONSUMER_SECRET):
+        return False
+
+    try:
+        return DarajaClient().refresh_access_token_if_due()
+    except DarajaError as exc:
+        logger.warning('Background M-Pesa token refresh failed: %s', exc)
+        return False
+
+
 @shared_task(
     bind=True,
     name='payments.tasks.process_b2c_callback',
@@ -231,19 +255,27 @@ def process_b2c_callback_task(
 ):
     try:
         with db_transaction.atomic():
+            b2c_transactions = MpesaTransaction.objects.select_for_update(
+                of=('self',),
+            ).select_related(
+                'transaction',
+                'transaction__user',
+                'related_loan',
+                'related_loan__membership',
+            ).filter(
+                transaction_type=MpesaTransaction.TransactionType.B2C,
+            )
             try:
-                mpesa_transaction = MpesaTransaction.objects.select_for_update(
-                    of=('self',),
-                ).select_related(
-                    'transaction',
-                    'transaction__user',
-                    'related_loan',
-                    'related_loan__membership',
-                ).get(
+                mpesa_transaction = b2c_transactions.get(
                     conversation_id=conversation_id,
-                    transaction_type=MpesaTransaction.TransactionType.B2C,
                 )
             except MpesaTransaction.DoesNotExist:
+                mpesa_transaction = _match_b2c_originator(
+                    b2c_transactions,
+                    conversation_id,
+                    callback_body,
+                )
+            if mpesa_transaction is None:
                 logger.warning(
                     'M-Pesa B2C callback ignored. Transaction not found: %s.',
                     conversation_id,
@@ -298,6 +330,135 @@ def process_b2c_callback_task(
     return True
 
 
+def _match_b2c_originator(b2c_transactions, conversation_id, callback_body):
+    """
+    Match a B2C callback on its originator conversation ID.
+
+    A bulk payout whose send timed out has no conversation ID yet, although
+    Daraja may have accepted it. When such a callback arrives, the payout
+    takes the callback's conversation ID and is marked SENT, so the batch
+    dispatcher does not send it again.
+    """
+    result = callback_body.get('Result') or callback_body.get('result') or {}
+    originator_conversation_id = result.get('OriginatorConversationID')
+    if not originator_conversation_id:
+        return None
+
+    mpesa_transaction = b2c_transactions.filter(
+        originator_conversation_id=originator_conversation_id,
+        conversation_id__isnull=True,
+    ).first()
+    if mpesa_transaction is None:
+        return None
+
+    mpesa_transaction.conversation_id = conversation_id
+    mpesa_transaction.save(update_fields=['conversation_id', 'updated_at'])
+
+    transaction = mpesa_transaction.transaction
+    if transaction.status in {
+        Transaction.Status.PENDING,
+        Transaction.Status.PROCESSING,
+    }:
+        had_send_error = 'last_send_error' in transaction.metadata
+        transaction.status = Transaction.Status.SENT
+        transaction.external_reference = conversation_id
+        transaction.save(
+            update_fields=['status', 'external_reference', 'updated_at']
+        )
+        if mpesa_transaction.payout_batch_id:
+            B2CPayoutBatch.objects.filter(
+                pk=mpesa_transaction.payout_batch_id,
+            ).update(sent_count=F('sent_count') + 1)
+            if had_send_error:
+                B2CPayoutBatch.objects.filter(
+                    pk=mpesa_transaction.payout_batch_id,
+                    retry_count__gt=0,
+                ).update(retry_count=F('retry_count') - 1)
+
+    logger.info(
+        'M-Pesa B2C callback %s matched on originator conversation ID %s.',
+        conversation_id,
+        originator_conversation_id,
+    )
+    return mpesa_transaction
+
+
+def _process_stk_callback(checkout_request_id, result_code, callback_body):
+    with db_transaction.atomic():
+        try:
+            mpesa_transaction = MpesaTransaction.objects.select_for_update(
+                of=('self',),
+            ).select_related(
+                'transaction',
+                'transaction__user',
+                'related_saving',
+                'related_saving__membership',
+                'related_loan',
+                'related_loan__membership',
+            ).get(checkout_request_id=checkout_request_id)
+        except MpesaTransaction.DoesNotExist:
+            logger.warning(
+                'M-Pesa STK callback ignored. Transaction not found: %s.',
+                checkout_request_id,
+            )
+            return False
+
+        transaction = mpesa_transaction.transaction
+        if _callback_already_processed(mpesa_transaction, transaction):
+            logger.info(
+                'M-Pesa STK callback already processed: '
+                'checkout_request_id=%s transaction_reference=%s.',
+                checkout_request_id,
+                transaction.reference,
+            )
+            return True
+
+        stk_callback = _get_stk_callback(callback_body)
+        normalized_result_code = _normalize_result_code(result_code)
+
+        if normalized_result_code == 0:
+            _process_successful_callback(
+                mpesa_transaction,
+                transaction,
+                stk_callback,
+            )
+        else:
+            _process_failed_callback(
+                mpesa_transaction,
+                transaction,
+                stk_callback,
+                normalized_result_code,
+            )
+
+    logger.info(
+        'M-Pesa STK callback processed for checkout_request_id=%s.',
+        checkout_request_id,
+    )
+    return True
+
+
+def _mark_inbox_processed(inbox_id):
+    if inbox_id is None:
+        return
+
+    MpesaCallbackInbox.objects.filter(pk=inbox_id).update(
+        status=MpesaCallbackInbox.Status.PROCESSED,
+        attempts=F('attempts') + 1,
+        error_message='',
+        processed_at=timezone.now(),
+    )
+
+
+def _record_inbox_failure(inbox_id, error):
+    if inbox_id is None:
+        return
+
+    MpesaCallbackInbox.objects.filter(pk=inbox_id).update(
+        attempts=F('attempts') + 1,
+        error_message=str(error)[:1000],
+    )
+
+
 def _callback_already_processed(mpesa_transaction, transaction):
     return (
         mpesa_transaction.callback_received
@@ -560,6 +721,12 @@ def _process_successful_b2c_callback(
         update_fields=['status', 'external_reference', 'updated_at']
     )
 
+    if loan is None:
+        # Payouts without a loan (e.g. dividends) are posted to the ledger
+        # by whoever created them; only the member is told.
+        _notify_payout_success(mpesa_transaction, transaction, amount)
+        return
+
     loan.status = loan.Status.ACTIVE
     loan.disbursed_amount = amount
     loan.disbursement_date = timezone.localdate()
@@ -604,14 +771,21 @@ def _process_failed_b2c_callback(
     transaction.status = Transaction.Status.FAILED
     transaction.save(update_fields=['status', 'updated_at'])
 
-    loan.status = loan.Status.APPROVED
-    loan.save(update_fields=['status', 'updated_at'])
+    if loan is None:
+        _notify_payout_failure(
+            mpesa_transaction,
+            transaction,
+            result_description,
+        )
+    else:
+        loan.status = loan.Status.APPROVED
+        loan.save(update_fields=['status', 'updated_at'])
 
-    _notify_disbursement_failure(
-        mpesa_transaction,
-        transaction,
-        result_description,
-    )
+        _notify_disbursement_failure(
+            mpesa_transaction,
+            transaction,
+            result_description,
+        )
     logger.info(
         'M-Pesa B2C callback failed for conversation_id=%s: %s.',
         mpesa_transaction.conversation_id,
@@ -690,7 +864,7 @@ def _apply_loan_repayment(mpesa_transaction, transaction, amount):
         )
         loan.save(update_fields=['outstanding_balance', 'updated_at'])
 
-        LedgerEntry.objects.create(
+        create_ledger_entry(
             membership=loan.membership,
             entry_type=LedgerEntry.EntryType.CREDIT,
             category=LedgerEntry.Category.LOAN_REPAYMENT,
@@ -701,7 +875,6 @@ def _apply_loan_repayment(mpesa_transaction, transaction, amount):
                 f'{_get_authoritative_gross_amount(transaction):,.2f}. '
                 f'Instalment: KES {transaction.amount:,.2f}.'
             ),
-            balance_after=loan.outstanding_balance,
             transaction=transaction,
         )
 
@@ -772,14 +945,13 @@ def _create_loan_disbursement_ledger(
     from ledger.models import LedgerEntry
 
     loan = mpesa_transaction.related_loan
-    LedgerEntry.objects.create(
+    create_ledger_entry(
         membership=loan.membership,
         entry_type=LedgerEntry.EntryType.DEBIT,
         category=LedgerEntry.Category.LOAN_DISBURSEMENT,
         amount=amount,
         reference=f'{transaction.reference}-LEDGER',
         description='M-Pesa loan disbursement',
-        balance_after=loan.outstanding_balance,
         transaction=transaction,
     )
 
@@ -852,6 +1024,38 @@ def _notify_disbursement_failure(
     )
 
 
+def _notify_payout_success(mpesa_transaction, transaction, amount):
+    from notifications.models import Notification
+    from notifications.utils import create_notification
+
+    create_notification(
+        user=transaction.user,
+        title='Payout received',
+        message=f'KES {amount} has been sent to your M-Pesa.',
+        category=Notification.Category.PAYMENT,
+        related_object_type='MpesaTransaction',
+        related_object_id=str(mpesa_transaction.id),
+    )
+
+
+def _notify_payout_failure(
+    mpesa_transaction,
+    transaction,
+    result_description,
+):
+    from notifications.models import Notification
+    from notifications.utils import create_notification
+
+    create_notification(
+        user=transaction.user,
+        title='Payout failed',
+        message=f'Your M-Pesa payout failed: {result_description}',
+        category=Notification.Category.PAYMENT,
+        related_object_type='MpesaTransaction',
+        related_object_id=str(mpesa_transaction.id),
+    )
+
+
 def _get_stk_callback(callback_body):
     body = callback_body.get('Body') or callback_body.get('body') or {}
     return body.get('stkCallback') or body.get('StkCallback') or {}
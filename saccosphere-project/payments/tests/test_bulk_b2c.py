@@ -0,0 +1,469 @@
+"""Tests for the bulk B2C payout dispatcher."""
+
+from decimal import Decimal
+from unittest.mock import patch
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from accounts.models import Sacco, User
+from payments.bulk_b2c import (
+    DISPATCH_LOCK_KEY,
+    create_payout_batch,
+    dispatch_payout_batch,
+)
+from payments.integrations.mpesa.daraja import DarajaError
+from payments.callback_inbox import append_callback, process_inbox_batch
+from payments.models import (
+    B2CPayoutBatch,
+    MpesaCallbackInbox,
+    MpesaTransaction,
+    PaymentProvider,
+    Transaction,
+)
+from payments.providers.base import DisbursementResult
+from payments.providers.mock import MockPSPProvider
+from payments.providers.registry import reset_providers
+from payments.tasks import (
+    dispatch_b2c_payout_batch,
+    process_b2c_callback_task,
+)
+from saccomembership.models import Membership
+from services.models import Loan, LoanType
+
+
+@override_settings(B2C_PAYOUT_RATE_LIMITS={'default': 1000.0})
+class BulkB2CDispatchTests(TestCase):
+    """Test bulk persistence, concurrent sending and idempotent retries."""
+
+    def setUp(self):
+        cache.clear()
+        reset_providers()
+        self.addCleanup(reset_providers)
+        self.sacco = Sacco.objects.create(
+            name='Payout SACCO',
+            registration_number='PAYOUT-001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.loan_type = LoanType.objects.create(
+            sacco=self.sacco,
+            name='Payout Loan',
+            interest_rate=Decimal('12.00'),
+            max_term_months=12,
+            min_amount=Decimal('100.00'),
+        )
+        self.payouts = [self._payout(index) for index in range(4)]
+
+    def _payout(self, index):
+        user = User.objects.create_user(
+            email=f'payout-{index}@example.com',
+            phone_number=f'2547124000{index:02d}',
+            password='StrongPass1',
+        )
+        membership = Membership.objects.create(
+            user=user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number=f'PAYOUT-{index}',
+        )
+        loan = Loan.objects.create(
+            membership=membership,
+            loan_type=self.loan_type,
+            amount=Decimal('500.00'),
+            interest_rate=Decimal('12.00'),
+            term_months=6,
+            outstanding_balance=Decimal('500.00'),
+            status=Loan.Status.APPROVED,
+        )
+        return {
+            'user': user,
+            'phone_number': user.phone_number,
+            'amount': Decimal('500.00'),
+            'remarks': f'Loan disbursement {index}',
+            'loan': loan,
+        }
+
+    def _create_batch(self, provider_name='mock'):
+        return create_payout_batch(
+            payouts=self.payouts,
+            occasion='Loan Disbursement',
+            provider_name=provider_name,
+            sacco=self.sacco,
+        )
+
+    def _create_dividend_batch(self):
+        return create_payout_batch(
+            payouts=[
+                {key: value for key, value in payout.items() if key != 'loan'}
+                for payout in self.payouts
+            ],
+            occasion='Dividend Payout',
+            provider_name='mpesa',
+            sacco=self.sacco,
+            transaction_type=Transaction.TransactionType.WITHDRAWAL,
+        )
+
+    def _ordered_payouts(self, batch):
+        return list(
+            MpesaTransaction.objects.filter(payout_batch=batch).order_by(
+                'id',
+            )
+        )
+
+    def _b2c_result(self, conversation_id, originator_id, result_code):
+        return {
+            'Result': {
+                'ConversationID': conversation_id,
+                'OriginatorConversationID': originator_id,
+                'ResultCode': result_code,
+                'ResultDesc': 'Processed.',
+                'ResultParameters': {
+                    'ResultParameter': [
+                        {
+                            'Key': 'TransactionReceipt',
+                            'Value': f'RCPT{result_code}',
+                        },
+                    ],
+                },
+            },
+        }
+
+    def test_batch_is_persisted_in_bulk_and_sent(self):
+        """Every payout gets a B2C record and is sent once."""
+        batch = self._create_batch()
+
+        self.assertEqual(batch.total_count, 4)
+        self.assertEqual(batch.total_amount, Decimal('2000.00'))
+        self.assertEqual(
+            Loan.objects.filter(
+                status=Loan.Status.DISBURSEMENT_PENDING,
+            ).count(),
+            4,
+        )
+
+        result = dispatch_payout_batch(batch.id, max_workers=4, page_size=3)
+
+        self.assertEqual(result['status'], B2CPayoutBatch.Status.COMPLETED)
+        self.assertEqual(result['sent'], 4)
+        batch.refresh_from_db()
+        self.assertEqual(batch.sent_count, 4)
+        self.assertEqual(batch.retry_count, 0)
+        self.assertIsNotNone(batch.completed_at)
+        payouts = MpesaTransaction.objects.filter(payout_batch=batch)
+        self.assertEqual(payouts.count(), 4)
+        self.assertFalse(payouts.filter(conversation_id__isnull=True).exists())
+        self.assertEqual(
+            Transaction.objects.filter(
+                status=Transaction.Status.SENT,
+            ).count(),
+            4,
+        )
+
+    def test_unclear_sends_are_retried_with_the_same_originator_id(self):
+        """Timeouts are resent idempotently; rejections are final."""
+        batch = self._create_batch()
+        payouts = list(
+            MpesaTransaction.objects.filter(payout_batch=batch).order_by(
+                'id',
+            )
+        )
+        timed_out = payouts[0].originator_conversation_id
+        rejected = payouts[1].originator_conversation_id
+        attempts = []
+        original_disburse = MockPSPProvider.disburse
+
+        def flaky_disburse(
+            provider,
+            transaction_id,
+            phone,
+            amount,
+            reference,
+            **kwargs,
+        ):
+            attempts.append(reference)
+            if reference == rejected:
+                return DisbursementResult(
+                    provider_reference='',
+                    status='REJECTED',
+                    raw_response={},
+                    success=False,
+                    error_message='Invalid receiver.',
+                )
+            if reference == timed_out and attempts.count(reference) == 1:
+                raise requests.exceptions.Timeout('read timed out')
+            return original_disburse(
+                provider,
+                transaction_id,
+                phone,
+                amount,
+                reference,
+                **kwargs,
+            )
+
+        with patch.object(
+            MockPSPProvider,
+            'disburse',
+            autospec=True,
+            side_effect=flaky_disburse,
+        ):
+            first = dispatch_payout_batch(batch.id)
+            batch.refresh_from_db()
+            self.assertEqual(first['status'], batch.Status.DISPATCHING)
+            self.assertEqual(batch.sent_count, 2)
+            self.assertEqual(batch.failed_count, 1)
+            self.assertEqual(batch.retry_count, 1)
+
+            second = dispatch_payout_batch(batch.id)
+
+        self.assertEqual(second['status'], B2CPayoutBatch.Status.COMPLETED)
+        self.assertEqual(second['sent'], 1)
+        batch.refresh_from_db()
+        self.assertEqual(batch.retry_count, 0)
+        self.assertEqual(attempts.count(timed_out), 2)
+        self.assertEqual(attempts.count(rejected), 1)
+        self.assertEqual(len(attempts), 5)
+
+        failed = MpesaTransaction.objects.select_related(
+            'transaction',
+            'related_loan',
+        ).get(originator_conversation_id=rejected)
+        self.assertEqual(failed.transaction.status, Transaction.Status.FAILED)
+        self.assertEqual(failed.result_description, 'Invalid receiver.')
+        self.assertEqual(failed.related_loan.status, Loan.Status.APPROVED)
+
+    @patch('payments.bulk_b2c.DarajaClient.initiate_b2c')
+    def test_daraja_payouts_carry_the_originator_id(self, initiate_mock):
+        """Daraja errors with a response code fail; others are retried."""
+        batch = self._create_batch(provider_name='mpesa')
+        payouts = list(
+            MpesaTransaction.objects.filter(payout_batch=batch).order_by(
+                'id',
+            )
+        )
+        outcomes = {
+            payouts[0].originator_conversation_id: DarajaError(
+                'Insufficient funds.',
+                '2001',
+            ),
+            payouts[1].originator_conversation_id: DarajaError(
+                'M-Pesa request timed out. Please try again.',
+            ),
+        }
+
+        def initiate_b2c(**kwargs):
+            originator_id = kwargs['originator_conversation_id']
+            if originator_id in outcomes:
+                raise outcomes[originator_id]
+            return {
+                'ConversationID': f'AG-{originator_id}',
+                'OriginatorConversationID': originator_id,
+                'ResponseCode': '0',
+            }
+
+        initiate_mock.side_effect = initiate_b2c
+
+        result = dispatch_payout_batch(batch.id)
+
+        self.assertEqual(
+            (result['sent'], result['failed'], result['retry']),
+            (2, 1, 1),
+        )
+        sent = MpesaTransaction.objects.get(
+            originator_conversation_id=payouts[2].originator_conversation_id,
+        )
+        self.assertEqual(
+            sent.conversation_id,
+            f'AG-{payouts[2].originator_conversation_id}',
+        )
+
+    @patch('payments.bulk_b2c.DarajaClient.initiate_b2c')
+    def test_throttled_daraja_sends_are_retried(self, initiate_mock):
+        """A 429 from Daraja is resent, not recorded as a rejection."""
+        batch = self._create_batch(provider_name='mpesa')
+        throttled = self._ordered_payouts(batch)[0].originator_conversation_id
+        attempts = []
+
+        def initiate_b2c(**kwargs):
+            originator_id = kwargs['originator_conversation_id']
+            attempts.append(originator_id)
+            if originator_id == throttled and attempts.count(throttled) == 1:
+                raise DarajaError('M-Pesa API returned error 429.', 429)
+            return {
+                'ConversationID': f'AG-{originator_id}',
+                'OriginatorConversationID': originator_id,
+                'ResponseCode': '0',
+            }
+
+        initiate_mock.side_effect = initiate_b2c
+
+        first = dispatch_payout_batch(batch.id)
+        self.assertEqual(
+            (first['sent'], first['failed'], first['retry']),
+            (3, 0, 1),
+        )
+
+        second = dispatch_payout_batch(batch.id)
+
+        self.assertEqual(second['sent'], 1)
+        self.assertEqual(attempts.count(throttled), 2)
+        payout = MpesaTransaction.objects.get(
+            originator_conversation_id=throttled,
+        )
+        self.assertEqual(payout.conversation_id, f'AG-{throttled}')
+
+    def test_psp_batches_are_not_recorded_as_mpesa(self):
+        """Each batch is attached to a provider record of the right type."""
+        psp_batch = self._create_batch()
+        daraja_batch = self._create_dividend_batch()
+
+        psp_provider = Transaction.objects.filter(
+            mpesa__payout_batch=psp_batch,
+        ).first().provider
+        daraja_provider = Transaction.objects.filter(
+            mpesa__payout_batch=daraja_batch,
+        ).first().provider
+        self.assertEqual(psp_provider.name, 'mock')
+        self.assertEqual(
+            psp_provider.provider_type,
+            PaymentProvider.ProviderType.INTERNAL,
+        )
+        self.assertEqual(daraja_provider.name, 'M-Pesa')
+        self.assertEqual(
+            daraja_provider.provider_type,
+            PaymentProvider.ProviderType.MPESA,
+        )
+
+    def test_unknown_provider_names_are_refused(self):
+        """A batch cannot be created for a provider that does not exist."""
+        with self.assertRaises(ValueError):
+            self._create_batch(provider_name='unknown-psp')
+
+        self.assertFalse(B2CPayoutBatch.objects.exists())
+
+    def test_overlapping_dispatches_are_single_flight(self):
+        """A second dispatch of a running batch sends nothing."""
+        batch = self._create_batch()
+        cache.add(DISPATCH_LOCK_KEY.format(batch_id=batch.id), True)
+
+        result = dispatch_payout_batch(batch.id)
+
+        self.assertIsNone(result['status'])
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, B2CPayoutBatch.Status.PENDING)
+
+    @patch('payments.bulk_b2c.DarajaClient.initiate_b2c')
+    def test_payouts_without_a_loan_settle_on_callback(self, initiate_mock):
+        """Dividend payouts complete or fail without touching loans."""
+        initiate_mock.side_effect = lambda **kwargs: {
+            'ConversationID': f'AG-{kwargs["originator_conversation_id"]}',
+            'ResponseCode': '0',
+        }
+        batch = self._create_dividend_batch()
+        dispatch_payout_batch(batch.id)
+        paid, rejected = self._ordered_payouts(batch)[:2]
+
+        self.assertTrue(
+            process_b2c_callback_task(
+                paid.conversation_id,
+                0,
+                self._b2c_result(
+                    paid.conversation_id,
+                    paid.originator_conversation_id,
+                    0,
+                ),
+            )
+        )
+        self.assertTrue(
+            process_b2c_callback_task(
+                rejected.conversation_id,
+                2001,
+                self._b2c_result(
+                    rejected.conversation_id,
+                    rejected.originator_conversation_id,
+                    2001,
+                ),
+            )
+        )
+
+        paid.refresh_from_db()
+        rejected.refresh_from_db()
+        self.assertEqual(
+            paid.transaction.status,
+            Transaction.Status.COMPLETED,
+        )
+        self.assertEqual(paid.mpesa_receipt_number, 'RCPT0')
+        self.assertEqual(
+            rejected.transaction.status,
+            Transaction.Status.FAILED,
+        )
+        self.assertEqual(rejected.result_code, '2001')
+        self.assertEqual(
+            Loan.objects.filter(status=Loan.Status.APPROVED).count(),
+            4,
+        )
+
+    @patch('payments.bulk_b2c.DarajaClient.initiate_b2c')
+    def test_callback_for_a_timed_out_send_stops_the_resend(
+        self,
+        initiate_mock,
+    ):
+        """A timed-out payout Daraja accepted is settled, not resent."""
+        batch = self._create_batch(provider_name='mpesa')
+        timed_out = self._ordered_payouts(batch)[0]
+
+        def initiate_b2c(**kwargs):
+            originator_id = kwargs['originator_conversation_id']
+            if originator_id == timed_out.originator_conversation_id:
+                raise DarajaError('M-Pesa request timed out.')
+            return {'ConversationID': f'AG-{originator_id}'}
+
+        initiate_mock.side_effect = initiate_b2c
+        dispatch_payout_batch(batch.id)
+        batch.refresh_from_db()
+        self.assertEqual(batch.retry_count, 1)
+
+        append_callback(
+            MpesaCallbackInbox.CallbackType.B2C,
+            'AG-LATE',
+            0,
+            self._b2c_result(
+                'AG-LATE',
+                timed_out.originator_conversation_id,
+                0,
+            ),
+        )
+        self.assertEqual(process_inbox_batch()['processed'], 1)
+
+        initiate_mock.reset_mock()
+        result = dispatch_payout_batch(batch.id)
+
+        initiate_mock.assert_not_called()
+        self.assertEqual(result['status'], B2CPayoutBatch.Status.COMPLETED)
+        timed_out.refresh_from_db()
+        self.assertEqual(timed_out.conversation_id, 'AG-LATE')
+        self.assertEqual(
+            timed_out.transaction.status,
+            Transaction.Status.COMPLETED,
+        )
+        self.assertEqual(timed_out.related_loan.status, Loan.Status.ACTIVE)
+        batch.refresh_from_db()
+        self.assertEqual((batch.sent_count, batch.retry_count), (4, 0))
+
+    @patch('payments.bulk_b2c.DarajaClient.initiate_b2c')
+    def test_exhausted_dispatch_retries_fail_the_batch(self, initiate_mock):
+        """The last dispatch attempt leaves the batch FAILED, not stuck."""
+        initiate_mock.side_effect = DarajaError('M-Pesa request timed out.')
+        batch = self._create_batch(provider_name='mpesa')
+
+        result = dispatch_b2c_payout_batch.apply(
+            args=[batch.id],
+            retries=dispatch_b2c_payout_batch.max_retries,
+        )
+
+        self.assertEqual(result.result['status'], B2CPayoutBatch.Status.FAILED)
+        batch.refresh_from_db()
+        self.assertEqual(batch.status, B2CPayoutBatch.Status.FAILED)
+        self.assertEqual(batch.retry_count, 4)
+        self.assertIn('4 payouts', batch.error_message)
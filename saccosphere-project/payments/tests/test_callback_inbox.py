@@ -0,0 +1,247 @@
+"""Tests for the micro-batched M-Pesa callback inbox consumer."""
+
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+
+from accounts.models import Sacco, User
+from ledger.models import LedgerEntry
+from payments.callback_inbox import (
+    append_callback,
+    drain_callback_inbox,
+    process_inbox_batch,
+)
+from payments.models import (
+    MpesaCallbackInbox,
+    MpesaTransaction,
+    PaymentProvider,
+    Transaction,
+)
+from saccomembership.models import Membership
+from services.models import Loan, LoanType, Saving, SavingsType
+
+
+class CallbackInboxConsumerTests(TestCase):
+    """Test batched claiming, shared lookups and failure isolation."""
+
+    def setUp(self):
+        notification_patcher = patch('notifications.utils.create_notification')
+        notification_patcher.start()
+        self.addCleanup(notification_patcher.stop)
+        self.user = User.objects.create_user(
+            email='inbox-member@example.com',
+            phone_number='254712400001',
+            password='StrongPass1',
+        )
+        self.sacco = Sacco.objects.create(
+            name='Inbox SACCO',
+            registration_number='INBOX-001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+            membership_type=Sacco.MembershipType.OPEN,
+        )
+        self.membership = Membership.objects.create(
+            user=self.user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number='INBOX-M-001',
+        )
+        self.saving = Saving.objects.create(
+            membership=self.membership,
+            savings_type=SavingsType.objects.create(
+                sacco=self.sacco,
+                name=SavingsType.Name.BOSA,
+                minimum_contribution=Decimal('100.00'),
+            ),
+            amount=Decimal('100.00'),
+            total_contributions=Decimal('100.00'),
+            status=Saving.Status.ACTIVE,
+        )
+        self.loan = Loan.objects.create(
+            membership=self.membership,
+            loan_type=LoanType.objects.create(
+                sacco=self.sacco,
+                name='Inbox Loan',
+                interest_rate=Decimal('12.00'),
+                max_term_months=12,
+                min_amount=Decimal('100.00'),
+            ),
+            amount=Decimal('300.00'),
+            interest_rate=Decimal('12.00'),
+            term_months=3,
+            outstanding_balance=Decimal('300.00'),
+            status=Loan.Status.APPROVED,
+        )
+        self.provider = PaymentProvider.objects.create(
+            name='M-Pesa',
+            provider_type=PaymentProvider.ProviderType.MPESA,
+            is_active=True,
+        )
+
+    def _deposit(self, reference, amount='25.00'):
+        transaction = Transaction.objects.create(
+            provider=self.provider,
+            user=self.user,
+            reference=reference,
+            transaction_type=Transaction.TransactionType.DEPOSIT,
+            amount=Decimal(amount),
+            sacco=self.sacco,
+            status=Transaction.Status.PENDING,
+            description='Inbox deposit',
+        )
+        return MpesaTransaction.objects.create(
+            transaction=transaction,
+            phone_number='254712400001',
+            checkout_request_id=f'CHECKOUT-{reference}',
+            related_saving=self.saving,
+        )
+
+    def _append_stk(self, checkout_request_id, amount='25.00'):
+        return append_callback(
+            MpesaCallbackInbox.CallbackType.STK,
+            checkout_request_id,
+            0,
+            {
+                'Body': {
+                    'stkCallback': {
+                        'CheckoutRequestID': checkout_request_id,
+                        'ResultCode': 0,
+                        'ResultDesc': 'Success',
+                        'CallbackMetadata': {
+                            'Item': [
+                                {'Name': 'Amount', 'Value': amount},
+                                {
+                                    'Name': 'MpesaReceiptNumber',
+                                    'Value': checkout_request_id[-10:],
+                                },
+                            ],
+                        },
+                    },
+                },
+            },
+        )
+
+    def test_batch_credits_deposits_and_isolates_failures(self):
+        """One unknown callback does not roll back the rest of the batch."""
+        deposits = [self._deposit(f'INBOX-DEP-{index}') for index in range(3)]
+        for mpesa_transaction in deposits[:2]:
+            self._append_stk(mpesa_transaction.checkout_request_id)
+        unknown = self._append_stk('CHECKOUT-UNKNOWN')
+        self._append_stk(deposits[2].checkout_request_id)
+
+        result = process_inbox_batch()
+
+        self.assertEqual(result['claimed'], 4)
+        self.assertEqual(result['processed'], 3)
+        self.assertEqual(result['failed_ids'], [unknown.id])
+        self.saving.refresh_from_db()
+        self.assertEqual(self.saving.amount, Decimal('175.00'))
+        self.assertEqual(
+            LedgerEntry.objects.filter(
+                category=LedgerEntry.Category.SAVING_DEPOSIT,
+            ).count(),
+            3,
+        )
+        self.assertEqual(
+            Transaction.objects.filter(
+                status=Transaction.Status.COMPLETED,
+            ).count(),
+            3,
+        )
+        unknown.refresh_from_db()
+        self.assertEqual(unknown.status, MpesaCallbackInbox.Status.RECEIVED)
+        self.assertEqual(unknown.attempts, 1)
+        self.assertIn('CHECKOUT-UNKNOWN', unknown.error_message)
+        self.assertEqual(
+            MpesaCallbackInbox.objects.filter(
+                status=MpesaCallbackInbox.Status.PROCESSED,
+            ).count(),
+            3,
+        )
+
+    def test_transactions_are_loaded_in_one_query_per_batch(self):
+        """Lookups are shared across the batch instead of per callback."""
+        for index in range(3):
+            mpesa_transaction = self._deposit(f'INBOX-SHARED-{index}')
+            self._append_stk(mpesa_transaction.checkout_request_id)
+
+        with patch.object(
+            MpesaTransaction.objects,
+            'select_for_update',
+            wraps=MpesaTransaction.objects.select_for_update,
+        ) as lookup_mock:
+            result = process_inbox_batch()
+
+        self.assertEqual(result['processed'], 3)
+        lookup_mock.assert_called_once()
+
+    def test_duplicate_callbacks_in_one_batch_credit_once(self):
+        """A redelivered callback in the same batch is skipped."""
+        mpesa_transaction = self._deposit('INBOX-DUPLICATE')
+        self._append_stk(mpesa_transaction.checkout_request_id)
+        self._append_stk(mpesa_transaction.checkout_request_id)
+
+        result = process_inbox_batch()
+
+        self.assertEqual(result['processed'], 2)
+        self.saving.refresh_from_db()
+        self.assertEqual(self.saving.amount, Decimal('125.00'))
+
+    def test_failed_entries_are_not_reclaimed_within_a_drain(self):
+        """A poison callback is tried once per drain and then given up."""
+        entry = self._append_stk('CHECKOUT-POISON')
+
+        with patch('payments.callback_inbox.MAX_ATTEMPTS', 2):
+            first = drain_callback_inbox(batch_size=10)
+            entry.refresh_from_db()
+            self.assertEqual(first['failed'], 1)
+            self.assertEqual(entry.status, MpesaCallbackInbox.Status.RECEIVED)
+
+            drain_callback_inbox(batch_size=10)
+
+        entry.refresh_from_db()
+        self.assertEqual(entry.attempts, 2)
+        self.assertEqual(entry.status, MpesaCallbackInbox.Status.FAILED)
+        self.assertIsNotNone(entry.processed_at)
+        self.assertEqual(drain_callback_inbox()['batches'], 0)
+
+    def test_failed_b2c_callback_returns_loan_to_approved(self):
+        """B2C callbacks share the batch path with STK callbacks."""
+        transaction = Transaction.objects.create(
+            provider=self.provider,
+            user=self.user,
+            reference='INBOX-B2C-001',
+            transaction_type=Transaction.TransactionType.LOAN_DISBURSEMENT,
+            amount=Decimal('300.00'),
+            sacco=self.sacco,
+            status=Transaction.Status.PENDING,
+            description='Inbox disbursement',
+        )
+        MpesaTransaction.objects.create(
+            transaction=transaction,
+            phone_number='254712400001',
+            conversation_id='INBOX-CONVERSATION-001',
+            transaction_type=MpesaTransaction.TransactionType.B2C,
+            related_loan=self.loan,
+        )
+        append_callback(
+            MpesaCallbackInbox.CallbackType.B2C,
+            'INBOX-CONVERSATION-001',
+            2001,
+            {
+                'Result': {
+                    'ConversationID': 'INBOX-CONVERSATION-001',
+                    'ResultCode': 2001,
+                    'ResultDesc': 'Invalid initiator.',
+                },
+            },
+        )
+
+        result = process_inbox_batch()
+
+        self.assertEqual(result['processed'], 1)
+        transaction.refresh_from_db()
+        self.loan.refresh_from_db()
+        self.assertEqual(transaction.status, Transaction.Status.FAILED)
+        self.assertEqual(self.loan.status, Loan.Status.APPROVED)
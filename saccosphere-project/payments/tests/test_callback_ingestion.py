@@ -0,0 +1,157 @@
+"""Tests for the M-Pesa STK callback ingestion fast path."""
+
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from payments.integrations.mpesa.security import (
+    is_replay_attack,
+    is_safaricom_ip,
+)
+from payments.models import MpesaCallbackInbox
+from payments.tasks import (
+    INBOX_DRAIN_SCHEDULED_KEY,
+    drain_mpesa_callback_inbox,
+    process_stk_callback_task,
+)
+
+
+SAFARICOM_IP = '196.201.214.200'
+
+
+class STKCallbackIngestionTests(TestCase):
+    """Test that STK callbacks are appended to the inbox without lookups."""
+
+    def setUp(self):
+        self.client = APIClient()
+        cache.clear()
+
+    def _callback_body(self, checkout_request_id='ws_CO_INGEST_001'):
+        return {
+            'Body': {
+                'stkCallback': {
+                    'MerchantRequestID': 'MR-INGEST',
+                    'CheckoutRequestID': checkout_request_id,
+                    'ResultCode': 0,
+                    'ResultDesc': 'Success',
+                },
+            },
+        }
+
+    def _post(self, callback_body):
+        return self.client.post(
+            reverse('payments:mpesa-stk-callback'),
+            callback_body,
+            format='json',
+            REMOTE_ADDR=SAFARICOM_IP,
+        )
+
+    @patch('payments.tasks.drain_mpesa_callback_inbox.apply_async')
+    def test_callback_is_appended_to_inbox_in_one_query(self, apply_mock):
+        """Ingestion is a single INSERT followed by one drain schedule."""
+        callback_body = self._callback_body()
+
+        with self.assertNumQueries(1):
+            response = self._post(callback_body)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        inbox_entry = MpesaCallbackInbox.objects.get()
+        self.assertEqual(inbox_entry.callback_identifier, 'ws_CO_INGEST_001')
+        self.assertEqual(inbox_entry.result_code, '0')
+        apply_mock.assert_called_once_with(countdown=1)
+
+    @patch('payments.tasks.drain_mpesa_callback_inbox.apply_async')
+    def test_duplicate_delivery_is_ingested_once(self, apply_mock):
+        """A redelivered callback is acknowledged without a second entry."""
+        first = self._post(self._callback_body())
+        second = self._post(self._callback_body())
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(MpesaCallbackInbox.objects.count(), 1)
+        apply_mock.assert_called_once()
+
+    def test_non_safaricom_ip_is_rejected(self):
+        """Only the precompiled Safaricom networks are accepted."""
+        response = self.client.post(
+            reverse('payments:mpesa-stk-callback'),
+            self._callback_body(),
+            format='json',
+            REMOTE_ADDR='203.0.113.10',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(MpesaCallbackInbox.objects.exists())
+
+    def test_worker_marks_inbox_entry_processed(self):
+        """Processing a callback closes its inbox entry."""
+        inbox_entry = MpesaCallbackInbox.objects.create(
+            callback_type=MpesaCallbackInbox.CallbackType.STK,
+            callback_identifier='ws_CO_UNKNOWN',
+            result_code='0',
+            payload=self._callback_body('ws_CO_UNKNOWN'),
+        )
+
+        process_stk_callback_task(
+            'ws_CO_UNKNOWN',
+            0,
+            inbox_entry.payload,
+            inbox_id=inbox_entry.id,
+        )
+
+        inbox_entry.refresh_from_db()
+        self.assertEqual(
+            inbox_entry.status,
+            MpesaCallbackInbox.Status.PROCESSED,
+        )
+        self.assertEqual(inbox_entry.attempts, 1)
+        self.assertIsNotNone(inbox_entry.processed_at)
+
+    @patch('payments.callback_inbox.drain_callback_inbox')
+    @patch('payments.tasks.drain_mpesa_callback_inbox.apply_async')
+    def test_drain_is_scheduled_once_per_debounce_window(
+        self,
+        apply_mock,
+        drain_mock,
+    ):
+        """A burst of callbacks shares one drain until the drain starts."""
+        for index in range(3):
+            self._post(self._callback_body(f'ws_CO_BURST_{index}'))
+
+        self.assertEqual(MpesaCallbackInbox.objects.count(), 3)
+        apply_mock.assert_called_once()
+
+        drain_mpesa_callback_inbox()
+        self.assertIsNone(cache.get(INBOX_DRAIN_SCHEDULED_KEY))
+        drain_mock.assert_called_once_with()
+
+        self._post(self._callback_body('ws_CO_BURST_AFTER'))
+        self.assertEqual(apply_mock.call_count, 2)
+
+
+class CallbackSecurityTests(TestCase):
+    """Test the replay guard and IP allowlist helpers."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_replay_marker_is_set_if_absent(self):
+        """Only the first delivery of a callback gets through."""
+        self.assertFalse(is_replay_attack('ws_CO_REPLAY'))
+        self.assertTrue(is_replay_attack('ws_CO_REPLAY'))
+
+    @override_settings(DEBUG=False)
+    def test_safaricom_ip_ranges_are_matched(self):
+        """Requests are matched against the parsed Safaricom networks."""
+        factory = RequestFactory()
+
+        self.assertTrue(
+            is_safaricom_ip(factory.post('/', REMOTE_ADDR=SAFARICOM_IP))
+        )
+        self.assertFalse(
+            is_safaricom_ip(factory.post('/', REMOTE_ADDR='203.0.113.10'))
+        )
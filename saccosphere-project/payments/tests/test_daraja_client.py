@@ -0,0 +1,191 @@
+"""Tests for the pooled Daraja HTTP layer against a local stub server."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from payments.integrations.mpesa.daraja import (
+    ACCESS_TOKEN_CACHE_KEY,
+    ACCESS_TOKEN_LOCK_KEY,
+    DarajaClient,
+    DarajaError,
+    close_daraja_session,
+    get_daraja_metrics,
+    reset_daraja_metrics,
+)
+from payments.tasks import refresh_mpesa_access_token
+
+
+class StubDarajaHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        super().setup()
+        with self.server.state_lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        if not self.path.startswith('/oauth/v1/generate'):
+            self._send(404, {'errorMessage': 'Not found'})
+            return
+
+        time.sleep(self.server.oauth_delay)
+        with self.server.state_lock:
+            self.server.oauth_calls += 1
+            token = f'token-{self.server.oauth_calls}'
+        self._send(200, {'access_token': token, 'expires_in': '3599'})
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        payload = json.loads(self.rfile.read(length) or b'{}')
+
+        if self.path == '/mpesa/stkpush/v1/processrequest':
+            self._send(
+                200,
+                {
+                    'MerchantRequestID': 'stub-merchant',
+                    'CheckoutRequestID': 'ws_CO_stub',
+                    'ResponseCode': '0',
+                    'ResponseDescription': 'Success',
+                },
+            )
+        elif self.path == '/mpesa/stkpushquery/v1/query':
+            if payload.get('CheckoutRequestID') == 'ws_CO_fail':
+                self._send(500, {'errorMessage': 'Internal error'})
+            else:
+                self._send(200, {'ResultCode': '0'})
+        else:
+            self._send(404, {'errorMessage': 'Not found'})
+
+    def log_message(self, format, *args):
+        return None
+
+    def _send(self, status_code, body):
+        content = json.dumps(body).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+
+class DarajaSessionTests(SimpleTestCase):
+    """Test connection reuse, token single-flight and request metrics."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(('127.0.0.1', 0), StubDarajaHandler)
+        cls.server.daemon_threads = True
+        cls.server.state_lock = threading.Lock()
+        cls.server_thread = threading.Thread(
+            target=cls.server.serve_forever,
+            daemon=True,
+        )
+        cls.server_thread.start()
+        cls.settings_override = override_settings(
+            MPESA_BASE_URL=f'http://127.0.0.1:{cls.server.server_port}',
+            MPESA_CONSUMER_KEY='stub-key',
+            MPESA_CONSUMER_SECRET='stub-secret',
+            MPESA_SHORTCODE='174379',
+            MPESA_PASSKEY='stub-passkey',
+            MPESA_CALLBACK_BASE_URL='https://example.test',
+        )
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.oauth_calls = 0
+        self.server.oauth_delay = 0
+        cache.clear()
+        close_daraja_session()
+        reset_daraja_metrics()
+
+    def tearDown(self):
+        close_daraja_session()
+
+    def test_requests_reuse_one_pooled_connection(self):
+        """Token, STK pushes and a query share one keep-alive socket."""
+        client = DarajaClient()
+        for _ in range(2):
+            client.initiate_stk_push(
+                phone_number='254712345678',
+                amount=10,
+                account_reference='SS-TEST',
+                description='Test payment',
+                callback_path='/api/v1/payments/callback/mpesa/stk/',
+            )
+        client.query_stk_status('ws_CO_stub')
+
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.oauth_calls, 1)
+        endpoints = get_daraja_metrics()['endpoints']
+        self.assertEqual(endpoints['oauth']['requests'], 1)
+        self.assertEqual(endpoints['stk_push']['requests'], 2)
+        self.assertEqual(endpoints['stk_push']['errors'], 0)
+        self.assertEqual(endpoints['stk_query']['requests'], 1)
+        self.assertEqual(
+            endpoints['stk_push']['latency_ms_buckets']['+Inf'],
+            2,
+        )
+
+    def test_concurrent_callers_fetch_token_once(self):
+        """Only one caller hits OAuth when the cached token is missing."""
+        self.server.oauth_delay = 0.3
+        tokens = []
+
+        def fetch_token():
+            tokens.append(DarajaClient().get_access_token())
+
+        threads = [threading.Thread(target=fetch_token) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.server.oauth_calls, 1)
+        self.assertEqual(tokens, ['token-1'] * 8)
+
+    def test_expiring_token_is_refreshed_early(self):
+        """A token inside its refresh window is replaced before expiry."""
+        cache.set(
+            ACCESS_TOKEN_CACHE_KEY,
+            {'token': 'old-token', 'refresh_after': time.time() - 1},
+        )
+
+        cache.add(ACCESS_TOKEN_LOCK_KEY, 'other-worker')
+        self.assertEqual(DarajaClient().get_access_token(), 'old-token')
+        self.assertEqual(self.server.oauth_calls, 0)
+
+        cache.delete(ACCESS_TOKEN_LOCK_KEY)
+        self.assertEqual(DarajaClient().get_access_token(), 'token-1')
+        self.assertEqual(DarajaClient().get_access_token(), 'token-1')
+        self.assertEqual(self.server.oauth_calls, 1)
+
+    def test_background_refresh_only_runs_when_due(self):
+        """The beat task refreshes a missing token and skips a fresh one."""
+        self.assertTrue(refresh_mpesa_access_token())
+        self.assertFalse(refresh_mpesa_access_token())
+        self.assertEqual(self.server.oauth_calls, 1)
+
+    def test_http_errors_are_counted_per_endpoint(self):
+        """Daraja HTTP errors raise DarajaError and bump error counters."""
+        with self.assertRaises(DarajaError) as context:
+            DarajaClient().query_stk_status('ws_CO_fail')
+
+        self.assertEqual(context.exception.response_code, 500)
+        stk_query = get_daraja_metrics()['endpoints']['stk_query']
+        self.assertEqual(stk_query['requests'], 1)
+        self.assertEqual(stk_query['errors'], 1)
+        self.assertEqual(stk_query['http_errors'], 1)
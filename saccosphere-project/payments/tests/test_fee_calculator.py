@@ -1,6 +1,6 @@
 from decimal import Decimal
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
 
 from payments.fee_calculator import SaccoInvoiceFeeCalculator
 
@@ -99,3 +99,73 @@ class FeePreviewContractTests(TestCase):
 
         with self.assertRaises(ValueError):
             calc.calculate('bogus_type', Decimal('100'))
+
+
+class BatchQuoteTests(TestCase):
+    """Batch quotes must match row-by-row quotes exactly."""
+
+    def setUp(self):
+        self.calc = SaccoInvoiceFeeCalculator()
+
+    def test_batch_columns_match_single_quotes(self):
+        types = []
+        amounts = []
+        for tx_type in ('deposit', 'Repayment ', 'disbursement', 'withdrawal'):
+            for amount in (
+                '0', '0.01', '333.33', '1999.99', '2000', '2000.005',
+                '10000', '10001', '70000.50', '300000', '999999.99',
+            ):
+                types.append(tx_type)
+                amounts.append(Decimal(amount))
+
+        columns = self.calc.calculate_batch(types, amounts)
+
+        for index, (tx_type, amount) in enumerate(zip(types, amounts)):
+            expected = self.calc.calculate(tx_type, amount)
+            row = {key: values[index] for key, values in columns.items()}
+            self.assertEqual(row, expected)
+            self.assertEqual(
+                str(row['platform_fee']),
+                str(expected['platform_fee']),
+            )
+
+    def test_empty_batch_returns_empty_columns(self):
+        columns = self.calc.calculate_batch([], [])
+
+        self.assertEqual(columns['platform_fee'], [])
+        self.assertEqual(columns['gross_amount'], [])
+
+    def test_batch_rejects_mismatched_lengths_and_unknown_types(self):
+        with self.assertRaises(ValueError):
+            self.calc.calculate_batch(['deposit'], [])
+        with self.assertRaises(ValueError):
+            self.calc.calculate_batch(['bogus'], [Decimal('1')])
+
+    def test_overridden_tiers_are_recompiled(self):
+        self.calc.calculate('withdrawal', Decimal('100'))
+        tiers = [
+            (1000, Decimal('5')),
+            (500, Decimal('1')),
+            (None, Decimal('9')),
+        ]
+
+        with override_settings(WITHDRAWAL_TIERS=tiers):
+            columns = self.calc.calculate_batch(
+                ['withdrawal'] * 3,
+                [Decimal('400'), Decimal('1000'), Decimal('1000.01')],
+            )
+
+        # The 500 ceiling sits behind 1000, so a tier walk never reaches it.
+        self.assertEqual(
+            columns['platform_fee'],
+            [Decimal('5'), Decimal('5'), Decimal('9')],
+        )
+        self.assertEqual(
+            self.calc.calculate('withdrawal', Decimal('100'))['platform_fee'],
+            Decimal('15'),
+        )
+
+    @override_settings(WITHDRAWAL_TIERS=[(1000, Decimal('5'))])
+    def test_amount_above_uncapped_tiers_raises(self):
+        with self.assertRaises(ValueError):
+            self.calc.calculate_batch(['withdrawal'], [Decimal('1001')])
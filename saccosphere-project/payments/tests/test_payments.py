@@ -2,6 +2,7 @@ from datetime import timedelta
 from decimal import Decimal
 from unittest.mock import patch
 
+from django.core.cache import cache
 from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.utils import timezone
@@ -16,6 +17,7 @@ from notifications.models import Notification
 from payments.disbursements import initiate_b2c_loan_disbursement
 from payments.models import (
     Callback,
+    MpesaCallbackInbox,
     MpesaTransaction,
     PaymentProvider,
     Transaction,
@@ -71,18 +73,18 @@ class DarajaClientTests(TestCase):
             )
 
     @patch('payments.integrations.mpesa.daraja.cache')
-    @patch('payments.integrations.mpesa.daraja.requests.get')
+    @patch('payments.integrations.mpesa.daraja.get_daraja_session')
     @override_settings(
         MPESA_CONSUMER_KEY='test-key',
         MPESA_CONSUMER_SECRET='test-secret',
     )
     def test_get_access_token_rejects_non_json_response(
         self,
-        mock_get,
+        mock_session,
         mock_cache,
     ):
         mock_cache.get.return_value = None
-        mock_get.return_value = FakeResponse()
+        mock_session.return_value.get.return_value = FakeResponse()
 
         with self.assertRaisesMessage(
             DarajaError,
@@ -90,9 +92,9 @@ class DarajaClientTests(TestCase):
         ):
             DarajaClient().get_access_token()
 
-    @patch('payments.integrations.mpesa.daraja.requests.post')
-    def test_post_rejects_non_json_response(self, mock_post):
-        mock_post.return_value = FakeResponse()
+    @patch('payments.integrations.mpesa.daraja.get_daraja_session')
+    def test_post_rejects_non_json_response(self, mock_session):
+        mock_session.return_value.post.return_value = FakeResponse()
 
         with self.assertRaisesMessage(
             DarajaError,
@@ -293,6 +295,41 @@ class FeePreviewViewTests(TestCase):
         )
 
 
+    def test_batch_fee_preview_returns_columns_in_item_order(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('payments:fee-preview-batch'),
+            {
+                'items': [
+                    {'type': 'deposit', 'amount': '1000'},
+                    {'type': 'withdrawal', 'amount': '5000'},
+                ],
+            },
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(
+            response.data['columns']['platform_fee'],
+            [Decimal('10.00'), Decimal('25')],
+        )
+        self.assertEqual(
+            response.data['columns']['net_amount'],
+            [Decimal('1000.00'), Decimal('4975')],
+        )
+
+    def test_batch_fee_preview_rejects_unknown_types(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            reverse('payments:fee-preview-batch'),
+            {'items': [{'type': 'bogus', 'amount': '100'}]},
+            format='json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class CallbackCreateViewTests(TestCase):
     """Validate generic PSP callback verification and async dispatch."""
 
@@ -304,10 +341,10 @@ class CallbackCreateViewTests(TestCase):
             is_active=True,
         )
 
-    @patch('payments.views.get_provider_class')
+    @patch('payments.views.get_provider')
     def test_rejects_non_mpesa_callback_when_verification_fails(
         self,
-        get_provider_class_mock,
+        get_provider_mock,
     ):
         """Failed provider verification rejects the callback."""
 
@@ -315,7 +352,7 @@ class CallbackCreateViewTests(TestCase):
             def verify_webhook(self, request):
                 return False
 
-        get_provider_class_mock.return_value = RejectingProvider
+        get_provider_mock.return_value = RejectingProvider()
 
         response = self.client.post(
             reverse('payments:callback-create'),
@@ -330,10 +367,10 @@ class CallbackCreateViewTests(TestCase):
         self.assertFalse(Callback.objects.exists())
 
     @patch('payments.views.process_payment_callback.delay')
-    @patch('payments.views.get_provider_class')
+    @patch('payments.views.get_provider')
     def test_verified_non_mpesa_callback_is_enqueued(
         self,
-        get_provider_class_mock,
+        get_provider_mock,
         delay_mock,
     ):
         """Verified callbacks are saved and handed to Celery."""
@@ -342,7 +379,7 @@ class CallbackCreateViewTests(TestCase):
             def verify_webhook(self, request):
                 return True
 
-        get_provider_class_mock.return_value = AcceptingProvider
+        get_provider_mock.return_value = AcceptingProvider()
 
         response = self.client.post(
             reverse('payments:callback-create'),
@@ -426,6 +463,7 @@ class MpesaCallbackAcknowledgementTests(TestCase):
     """Validate durable callback storage before retryable acknowledgements."""
 
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = User.objects.create_user(
             email='callback-ack-member@example.com',
@@ -451,14 +489,14 @@ class MpesaCallbackAcknowledgementTests(TestCase):
 
     @patch('payments.views.is_safaricom_ip', return_value=True)
     @patch('payments.views.is_replay_attack', return_value=False)
-    @patch('payments.tasks.process_stk_callback_task.delay')
-    def test_stk_enqueue_failure_is_saved_and_returns_retry(
+    @patch('payments.tasks.drain_mpesa_callback_inbox.apply_async')
+    def test_stk_enqueue_failure_is_kept_in_inbox_and_accepted(
         self,
-        delay_mock,
+        apply_async_mock,
         _replay_mock,
         _ip_mock,
     ):
-        delay_mock.side_effect = KombuOperationalError('broker unavailable')
+        apply_async_mock.side_effect = KombuOperationalError('broker unavailable')
         transaction = self._transaction(
             'CALLBACK-ACK-STK-001',
             Transaction.TransactionType.DEPOSIT,
@@ -486,27 +524,33 @@ class MpesaCallbackAcknowledgementTests(TestCase):
             format='json',
         )
 
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['ResultCode'], 0)
+        inbox_entry = MpesaCallbackInbox.objects.get()
         self.assertEqual(
-            response.status_code,
-            status.HTTP_503_SERVICE_UNAVAILABLE,
+            inbox_entry.status,
+            MpesaCallbackInbox.Status.RECEIVED,
         )
-        callback = Callback.objects.get()
-        self.assertFalse(callback.processed)
-        self.assertEqual(callback.transaction, transaction)
-        self.assertEqual(callback.raw_payload['callback_type'], 'STK')
-        self.assertEqual(callback.raw_payload['payload'], callback_body)
-        self.assertIn('broker unavailable', callback.processing_error)
+        self.assertEqual(
+            inbox_entry.callback_identifier,
+            mpesa_transaction.checkout_request_id,
+        )
+        self.assertEqual(inbox_entry.payload, callback_body)
+        self.assertFalse(Callback.objects.exists())
+        self.assertEqual(transaction.status, Transaction.Status.PENDING)
 
     @patch('payments.views.is_safaricom_ip', return_value=True)
     @patch('payments.views.is_replay_attack', return_value=False)
-    @patch('payments.tasks.process_b2c_callback_task.delay')
-    def test_b2c_enqueue_failure_is_saved_and_returns_retry(
+    @patch('payments.tasks.drain_mpesa_callback_inbox.apply_async')
+    def test_b2c_enqueue_failure_is_kept_in_inbox_and_accepted(
         self,
-        delay_mock,
+        apply_async_mock,
         _replay_mock,
         _ip_mock,
     ):
-        delay_mock.side_effect = KombuOperationalError('broker unavailable')
+        apply_async_mock.side_effect = KombuOperationalError(
+            'broker unavailable'
+        )
         transaction = self._transaction(
             'CALLBACK-ACK-B2C-001',
             Transaction.TransactionType.LOAN_DISBURSEMENT,
@@ -531,16 +575,19 @@ class MpesaCallbackAcknowledgementTests(TestCase):
             format='json',
         )
 
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['ResultCode'], 0)
+        inbox_entry = MpesaCallbackInbox.objects.get()
         self.assertEqual(
-            response.status_code,
-            status.HTTP_503_SERVICE_UNAVAILABLE,
+            inbox_entry.callback_type,
+            MpesaCallbackInbox.CallbackType.B2C,
         )
-        callback = Callback.objects.get()
-        self.assertFalse(callback.processed)
-        self.assertEqual(callback.transaction, transaction)
-        self.assertEqual(callback.raw_payload['callback_type'], 'B2C')
-        self.assertEqual(callback.raw_payload['payload'], callback_body)
-        self.assertIn('broker unavailable', callback.processing_error)
+        self.assertEqual(
+            inbox_entry.status,
+            MpesaCallbackInbox.Status.RECEIVED,
+        )
+        self.assertEqual(inbox_entry.payload, callback_body)
+        self.assertFalse(Callback.objects.exists())
 
 
 class PaymentTaskHardeningTests(TestCase):
@@ -0,0 +1,85 @@
+"""Tests for the cached PSP provider registry."""
+
+from unittest.mock import patch
+
+from django.test import SimpleTestCase, override_settings
+
+from payments.providers import get_psp_provider
+from payments.providers.mock import MockPSPProvider
+from payments.providers.registry import (
+    get_provider,
+    get_provider_class,
+    reset_providers,
+    warm_up_providers,
+)
+
+
+class PerSaccoProvider(MockPSPProvider):
+    @classmethod
+    def get_config_key(cls, sacco):
+        return '' if sacco is None else str(sacco)
+
+
+class ProviderRegistryTests(SimpleTestCase):
+    """Test class caching, shared instances and warm-up."""
+
+    def setUp(self):
+        reset_providers()
+        self.addCleanup(reset_providers)
+
+    def test_provider_class_is_imported_once(self):
+        """Repeated lookups reuse the validated class."""
+        with patch(
+            'payments.providers.registry.importlib.import_module',
+            wraps=__import__('importlib').import_module,
+        ) as import_mock:
+            first = get_provider_class('mock')
+            second = get_provider_class(' MOCK ')
+
+        self.assertIs(first, MockPSPProvider)
+        self.assertIs(second, first)
+        import_mock.assert_called_once_with('payments.providers.mock')
+
+    @override_settings(PAYMENT_PROVIDER='mock')
+    def test_instances_are_shared_per_provider_and_config(self):
+        """Callers get one long-lived instance and its pooled session."""
+        provider = get_provider('mock')
+
+        self.assertIs(get_provider('Mock'), provider)
+        self.assertIs(get_psp_provider(), provider)
+        self.assertIs(provider.session, provider.session)
+
+        with patch(
+            'payments.providers.registry._load_provider_class',
+            return_value=PerSaccoProvider,
+        ):
+            first = get_provider('mock', sacco='sacco-a')
+            second = get_provider('mock', sacco='sacco-b')
+
+        self.assertIsNot(first, second)
+        self.assertEqual(first.config_key, 'sacco-a')
+
+    def test_instances_are_rebuilt_after_fork(self):
+        """A forked worker never reuses its parent's provider sessions."""
+        provider = get_provider('mock')
+        session = provider.session
+
+        with patch('payments.providers.registry.os.getpid', return_value=0):
+            child_provider = get_provider('mock')
+        with patch('payments.providers.base.os.getpid', return_value=0):
+            child_session = provider.session
+
+        self.assertIsNot(child_provider, provider)
+        self.assertIsNot(child_session, session)
+
+    @override_settings(PAYMENT_PROVIDER='')
+    def test_warm_up_skips_providers_that_fail_to_load(self):
+        """A broken registry entry is logged instead of stopping boot."""
+        with self.assertLogs('payments.providers.registry', 'WARNING'):
+            warmed = warm_up_providers(['mock', 'cellulant', 'unknown'])
+
+        self.assertEqual(warmed, ['mock'])
+        with self.settings(DEBUG=True):
+            self.assertEqual(warm_up_providers(), ['mock'])
+        with self.settings(DEBUG=False):
+            self.assertEqual(warm_up_providers(), [])
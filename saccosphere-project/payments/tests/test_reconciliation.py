@@ -0,0 +1,146 @@
+"""Tests for the concurrent pending-transaction reconciler."""
+
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase
+from django.utils import timezone
+
+from accounts.models import User
+from payments.models import (
+    Callback,
+    PaymentProvider,
+    ReconciliationCheckpoint,
+    Transaction,
+)
+from payments.providers import StatusResult
+from payments.reconciliation import (
+    CHECKPOINT_NAME,
+    TokenBucket,
+    claim_pending_page,
+    reconcile_pending_transactions,
+)
+
+
+class PendingReconciliationTests(TestCase):
+    """Test checkpointed claiming, batching and rate limiting."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='reconcile@example.com',
+            password='secret',
+        )
+        self.provider = PaymentProvider.objects.create(
+            name='mock',
+            provider_type=PaymentProvider.ProviderType.INTERNAL,
+            is_active=True,
+        )
+        self.stuck = [self._transaction(f'REC-{index}') for index in range(5)]
+        stale = timezone.now() - timedelta(minutes=30)
+        for offset, transaction in enumerate(self.stuck):
+            Transaction.objects.filter(pk=transaction.pk).update(
+                created_at=stale + timedelta(seconds=offset),
+            )
+        self.recent = self._transaction('REC-RECENT')
+
+    @patch('payments.tasks.process_payment_callbacks.delay')
+    def test_settled_results_become_batched_callbacks(self, mock_delay):
+        """Every stuck transaction is queried once and queued in batches."""
+        with patch('payments.reconciliation.CALLBACK_BATCH_SIZE', 2):
+            with self.captureOnCommitCallbacks(execute=True):
+                summary = reconcile_pending_transactions(page_size=3)
+
+        self.assertEqual(summary['claimed'], 5)
+        self.assertEqual(summary['queried'], 5)
+        self.assertEqual(summary['callbacks'], 5)
+        self.assertEqual(Callback.objects.count(), 5)
+        self.assertFalse(
+            Callback.objects.filter(transaction=self.recent).exists()
+        )
+        queued_ids = [
+            callback_id
+            for call in mock_delay.call_args_list
+            for callback_id in call.args[0]
+        ]
+        self.assertEqual(mock_delay.call_count, 3)
+        self.assertCountEqual(
+            queued_ids,
+            [str(pk) for pk in Callback.objects.values_list('id', flat=True)],
+        )
+
+    def test_overlapping_claims_never_share_a_transaction(self):
+        """The checkpoint hands out disjoint pages within one sweep."""
+        first = claim_pending_page(page_size=3, start_new_sweep=True)
+        second = claim_pending_page(page_size=3, start_new_sweep=True)
+        third = claim_pending_page(page_size=3, start_new_sweep=True)
+
+        self.assertEqual(
+            [transaction.pk for transaction in first + second],
+            [transaction.pk for transaction in self.stuck],
+        )
+        self.assertEqual(third, [])
+        checkpoint = ReconciliationCheckpoint.objects.get(
+            name=CHECKPOINT_NAME,
+        )
+        self.assertEqual(checkpoint.claimed_in_sweep, 5)
+
+        ReconciliationCheckpoint.objects.filter(pk=checkpoint.pk).update(
+            sweep_started_at=timezone.now() - timedelta(hours=1),
+        )
+        self.assertEqual(
+            len(claim_pending_page(page_size=3, start_new_sweep=True)),
+            3,
+        )
+
+    @patch('payments.tasks.process_payment_callbacks.delay')
+    @patch('payments.providers.mock.MockPSPProvider.query_status')
+    def test_still_pending_and_failed_queries_are_skipped(
+        self,
+        mock_query_status,
+        mock_delay,
+    ):
+        """Only settled provider results produce callbacks."""
+        pending = StatusResult(
+            is_successful=False,
+            is_failed=False,
+            is_pending=True,
+            provider_status='PENDING',
+        )
+        mock_query_status.side_effect = [
+            pending,
+            RuntimeError('provider down'),
+            pending,
+            pending,
+            pending,
+        ]
+
+        summary = reconcile_pending_transactions(max_workers=1)
+
+        self.assertEqual(summary['queried'], 4)
+        self.assertEqual(summary['query_errors'], 1)
+        self.assertEqual(summary['callbacks'], 0)
+        self.assertFalse(Callback.objects.exists())
+        mock_delay.assert_not_called()
+
+    def test_token_bucket_limits_request_rate(self):
+        """Acquisitions beyond the burst wait for the refill rate."""
+        bucket = TokenBucket(rate=50, capacity=1)
+
+        started = time.monotonic()
+        for _ in range(6):
+            bucket.acquire()
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.09)
+
+    def _transaction(self, reference):
+        return Transaction.objects.create(
+            provider=self.provider,
+            user=self.user,
+            reference=reference,
+            transaction_type=Transaction.TransactionType.DEPOSIT,
+            amount=Decimal('100.00'),
+            status=Transaction.Status.PENDING,
+            description='Reconciliation test',
+        )
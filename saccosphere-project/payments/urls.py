@@ -6,7 +6,9 @@ from .views import (
     B2CHistoryView,
     B2CStatusView,
     CallbackCreateView,
+    DarajaMetricsView,
     DepositInitiateView,
+    FeePreviewBatchView,
     FeePreviewView,
     MpesaTransactionDetailView,
     MPesaSTKCallbackView,
@@ -42,6 +44,11 @@ urlpatterns = [
         FeePreviewView.as_view(),
         name='fee-preview',
     ),
+    path(
+        'fee-preview/batch/',
+        FeePreviewBatchView.as_view(),
+        name='fee-preview-batch',
+    ),
     path(
         'deposit/',
         DepositInitiateView.as_view(),
@@ -77,6 +84,11 @@ urlpatterns = [
         B2CStatusView.as_view(),
         name='mpesa-b2c-status',
     ),
+    path(
+        'mpesa/metrics/',
+        DarajaMetricsView.as_view(),
+        name='mpesa-metrics',
+    ),
     path(
         'mpesa/b2c/history/',
         B2CHistoryView.as_view(),
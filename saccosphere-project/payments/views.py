@@ -5,6 +5,7 @@ from uuid import uuid4
 
 from amqp.exceptions import ConnectionError as AmqpConnectionError
 from django.core.cache import cache
+from django.db import DatabaseError
 from django.db import transaction as db_transaction
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
@@ -21,22 +22,34 @@ from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from accounts.permissions import IsSaccoAdmin
+from accounts.permissions import IsSaccoAdmin, IsSuperAdmin
+from config.pagination import SaccoSphereCursorPagination
 from config.response import StandardResponseMixin
 from guarantor.utils import check_loan_guarantors_complete
 from payments.disbursements import initiate_b2c_loan_disbursement
 from payments.providers import get_psp_provider
-from payments.providers.registry import get_provider_class
+from payments.providers.registry import get_provider
 from services.models import Loan, Saving
 
+from .callback_inbox import append_callback
 from .fee_calculator import SaccoInvoiceFeeCalculator
-from .integrations.mpesa.daraja import DarajaClient, DarajaError
+from .integrations.mpesa.daraja import (
+    DarajaClient,
+    DarajaError,
+    get_daraja_metrics,
+)
 from .integrations.mpesa.security import (
     is_replay_attack,
     is_safaricom_ip,
     verify_mpesa_signature,
 )
-from .models import Callback, MpesaTransaction, PaymentProvider, Transaction
+from .models import (
+    Callback,
+    MpesaCallbackInbox,
+    MpesaTransaction,
+    PaymentProvider,
+    Transaction,
+)
 from .serializers import (
     CallbackSerializer,
     DepositRequestSerializer,
@@ -44,7 +57,7 @@ from .serializers import (
     TransactionSerializer,
     WithdrawalRequestSerializer,
 )
-from .tasks import process_payment_callback
+from .tasks import process_payment_callback, schedule_inbox_drain
 from .validators import validate_mpesa_phone
 
 
@@ -57,40 +70,46 @@ BROKER_CONNECTION_ERRORS = (
     RedisConnectionError,
     RedisTimeoutError,
 )
+# Upper bound on rows a single batch fee preview may quote.
+FEE_QUOTE_BATCH_MAX_ITEMS = 500
 
 
-def _get_mpesa_provider_record():
-    provider, _ = PaymentProvider.objects.get_or_create(
-        name='M-Pesa',
-        defaults={
-            'provider_type': PaymentProvider.ProviderType.MPESA,
-            'is_active': True,
-        },
-    )
-    return provider
-
-
-def _persist_mpesa_enqueue_failure(
-    *,
-    callback_body,
-    error,
+def _append_mpesa_callback(
     callback_type,
-    mpesa_transaction=None,
+    callback_identifier,
+    result_code,
+    callback_body,
 ):
-    transaction = None
-    if mpesa_transaction is not None:
-        transaction = mpesa_transaction.transaction
-
-    return Callback.objects.create(
-        transaction=transaction,
-        provider=_get_mpesa_provider_record(),
-        raw_payload={
-            'callback_type': callback_type,
-            'payload': callback_body,
-        },
-        processed=False,
-        processing_error=str(error),
-    )
+    try:
+        inbox_entry = append_callback(
+            callback_type,
+            callback_identifier,
+            result_code,
+            callback_body,
+        )
+    except DatabaseError as exc:
+        logger.error(
+            'M-Pesa %s callback inbox write error: %s',
+            callback_type,
+            exc,
+            exc_info=True,
+        )
+        _clear_mpesa_replay_marker(callback_identifier)
+        return False
+
+    try:
+        schedule_inbox_drain()
+    except BROKER_CONNECTION_ERRORS as exc:
+        # The inbox row is durable; the scheduled drain picks it up later.
+        logger.error(
+            'M-Pesa callback drain scheduling error, left inbox entry %s '
+            'for the next drain: %s',
+            inbox_entry.id,
+            exc,
+            exc_info=True,
+        )
+
+    return True
 
 
 def _retry_mpesa_response(result_desc='Temporary processing unavailable'):
@@ -198,6 +217,28 @@ class B2CDisbursementSerializer(serializers.Serializer):
         return value
 
 
+class FeeQuoteItemSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(
+        choices=(
+            SaccoInvoiceFeeCalculator.INFLOW_TYPES
+            + SaccoInvoiceFeeCalculator.OUTFLOW_TYPES
+        ),
+    )
+    amount = serializers.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        min_value=Decimal('0.00'),
+    )
+
+
+class FeeQuoteBatchSerializer(serializers.Serializer):
+    items = FeeQuoteItemSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=FEE_QUOTE_BATCH_MAX_ITEMS,
+    )
+
+
 class DepositInitiateView(APIView):
     """Initiate a PSP-backed deposit for the authenticated user."""
 
@@ -497,6 +538,7 @@ class PaymentCallbackView(APIView):
 class TransactionListView(StandardResponseMixin, ListAPIView):
     serializer_class = TransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = SaccoSphereCursorPagination
 
     def get_queryset(self):
         return Transaction.objects.select_related('provider').filter(
@@ -735,6 +777,15 @@ class STKStatusView(APIView):
         )
 
 
+class DarajaMetricsView(APIView):
+    """Return this process's per-endpoint Daraja latency and error counts."""
+
+    permission_classes = [IsAuthenticated, IsSuperAdmin]
+
+    def get(self, request):
+        return Response(get_daraja_metrics())
+
+
 class FeePreviewView(APIView):
     """Return a human-readable fee breakdown for a given transaction type.
 
@@ -772,9 +823,41 @@ class FeePreviewView(APIView):
         return Response({**breakdown, 'summary': summary})
 
 
+class FeePreviewBatchView(APIView):
+    """Quote many fee previews in one request.
+
+    Body: {"items": [{"type": "withdrawal", "amount": "1500"}, ...]}.
+    The response holds one list per breakdown column, in item order.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = FeeQuoteBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data['items']
+
+        columns = SaccoInvoiceFeeCalculator().calculate_batch(
+            [item['type'] for item in items],
+            [item['amount'] for item in items],
+        )
+        return Response({'count': len(items), 'columns': columns})
+
+
 class MPesaSTKCallbackView(APIView):
+    """
+    Ingest Safaricom STK callbacks on a fast path.
+
+    The request never reads payment tables: it checks the IP and replay
+    marker, appends the raw body to MpesaCallbackInbox and schedules a
+    debounced inbox drain. Once the inbox row exists the callback is
+    acknowledged, even if the broker is down. Callers are allowlisted by
+    IP, so the anonymous rate throttle is not applied.
+    """
+
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = []
 
     @swagger_auto_schema(
         operation_description='Receive Safaricom STK callback payload.',
@@ -806,66 +889,29 @@ class MPesaSTKCallbackView(APIView):
                 logger.debug('M-Pesa STK callback missing CheckoutRequestID')
                 return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
 
-            if is_replay_attack(checkout_request_id):
-                logger.warning(
-                    'M-Pesa STK callback is replay attack: %s',
-                    checkout_request_id,
-                )
-                return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
-
             if not verify_mpesa_signature(request):
                 logger.warning(
                     'M-Pesa STK callback signature verification failed'
                 )
                 return JsonResponse({'detail': 'Forbidden'}, status=403)
 
-            try:
-                mpesa_transaction = MpesaTransaction.objects.select_related(
-                    'transaction',
-                ).get(
-                    checkout_request_id=checkout_request_id,
-                )
-            except Exception as exc:
-                logger.error(
-                    'M-Pesa STK callback transaction lookup error: %s',
-                    exc,
-                    exc_info=True,
-                )
-                _persist_mpesa_enqueue_failure(
-                    callback_body=callback_body,
-                    error=exc,
-                    callback_type='STK',
-                )
-                _clear_mpesa_replay_marker(checkout_request_id)
-                return _retry_mpesa_response()
-
-            result_code = stk_callback.get('ResultCode')
-
-            from .tasks import process_stk_callback_task
-
-            try:
-                process_stk_callback_task.delay(
+            if is_replay_attack(checkout_request_id):
+                logger.warning(
+                    'M-Pesa STK callback is replay attack: %s',
                     checkout_request_id,
-                    result_code,
-                    callback_body,
-                )
-            except BROKER_CONNECTION_ERRORS as exc:
-                logger.error(
-                    'M-Pesa STK callback task enqueue error: %s',
-                    exc,
-                    exc_info=True,
-                )
-                _persist_mpesa_enqueue_failure(
-                    callback_body=callback_body,
-                    error=exc,
-                    callback_type='STK',
-                    mpesa_transaction=mpesa_transaction,
                 )
-                _clear_mpesa_replay_marker(checkout_request_id)
+                return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
+
+            if not _append_mpesa_callback(
+                MpesaCallbackInbox.CallbackType.STK,
+                checkout_request_id,
+                stk_callback.get('ResultCode'),
+                callback_body,
+            ):
                 return _retry_mpesa_response()
 
             logger.info(
-                'M-Pesa STK callback enqueued: %s',
+                'M-Pesa STK callback accepted: %s',
                 checkout_request_id,
             )
             return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
@@ -938,6 +984,7 @@ class B2CDisbursementView(APIView):
 class B2CCallbackView(APIView):
     authentication_classes = []
     permission_classes = [AllowAny]
+    throttle_classes = []
 
     @swagger_auto_schema(
         operation_description='Receive Safaricom B2C callback payload.',
@@ -968,78 +1015,29 @@ class B2CCallbackView(APIView):
                 logger.debug('M-Pesa B2C callback missing ConversationID')
                 return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
 
-            if is_replay_attack(conversation_id):
-                logger.warning(
-                    'M-Pesa B2C callback is replay attack: %s',
-                    conversation_id,
-                )
-                return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
-
             if not verify_mpesa_signature(request):
                 logger.warning(
                     'M-Pesa B2C callback signature verification failed'
                 )
                 return JsonResponse({'detail': 'Forbidden'}, status=403)
 
-            result_code = result.get('ResultCode')
-
-            try:
-                mpesa_transaction = MpesaTransaction.objects.select_related(
-                    'transaction',
-                ).get(
-                    conversation_id=conversation_id,
-                    transaction_type=MpesaTransaction.TransactionType.B2C,
-                )
-            except Exception as exc:
-                logger.error(
-                    'M-Pesa B2C callback transaction lookup error: %s',
-                    exc,
-                    exc_info=True,
-                )
-                _persist_mpesa_enqueue_failure(
-                    callback_body=callback_body,
-                    error=exc,
-                    callback_type='B2C',
+            if is_replay_attack(conversation_id):
+                logger.warning(
+                    'M-Pesa B2C callback is replay attack: %s',
+                    conversation_id,
                 )
-                _clear_mpesa_replay_marker(conversation_id)
-                return _retry_mpesa_response()
-
-            try:
-                if (
-                    mpesa_transaction.related_loan_id
-                    and mpesa_transaction.related_loan.disbursement_transaction_id
-                ):
-                    from services.tasks import on_disbursement_b2c_callback
-
-                    on_disbursement_b2c_callback.delay(
-                        str(mpesa_transaction.related_loan_id),
-                        result,
-                    )
-                else:
-                    from .tasks import process_b2c_callback_task
+                return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
 
-                    process_b2c_callback_task.delay(
-                        conversation_id,
-                        result_code,
-                        callback_body,
-                    )
-            except BROKER_CONNECTION_ERRORS as exc:
-                logger.error(
-                    'M-Pesa B2C callback task enqueue error: %s',
-                    exc,
-                    exc_info=True,
-                )
-                _persist_mpesa_enqueue_failure(
-                    callback_body=callback_body,
-                    error=exc,
-                    callback_type='B2C',
-                    mpesa_transaction=mpesa_transaction,
-                )
-                _clear_mpesa_replay_marker(conversation_id)
+            if not _append_mpesa_callback(
+                MpesaCallbackInbox.CallbackType.B2C,
+                conversation_id,
+                result.get('ResultCode'),
+                callback_body,
+            ):
                 return _retry_mpesa_response()
 
             logger.info(
-                'M-Pesa B2C callback enqueued: %s',
+                'M-Pesa B2C callback accepted: %s',
                 conversation_id,
             )
             return JsonResponse({'ResultCode': 0, 'ResultDesc': 'Accepted'})
@@ -1145,8 +1143,7 @@ class CallbackCreateView(StandardResponseMixin, CreateAPIView):
             return verify_mpesa_signature(request)
 
         try:
-            provider_class = get_provider_class(provider.name)
-            provider_client = provider_class()
+            provider_client = get_provider(provider.name)
         except (ImportError, AttributeError, TypeError, ValueError) as exc:
             logger.warning(
                 'Callback rejected for unsupported provider %s: %s',
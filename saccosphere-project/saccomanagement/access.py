@@ -0,0 +1,210 @@
+"""
+Request-scoped authorization context backed by a cached role graph.
+
+The role graph holds everything the access layers ask about a user: role
+names with their SACCO scope, the SACCOs they administer (including the
+billing suspension flag) and the RolePermission matrix. It is cached per
+user and dropped by the signals in saccomanagement.signals whenever a
+Role, RolePermission or Sacco changes. Middleware, mixins and permission
+classes read it through get_authorization_context(), which builds one
+AuthorizationContext per request.
+"""
+
+import logging
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from saccomanagement.models import Role, RolePermission
+
+
+logger = logging.getLogger('saccosphere.access')
+
+ROLE_GRAPH_CACHE_KEY = 'access:role-graph:{user_id}'
+PERMISSION_ACTIONS = ('create', 'read', 'update', 'delete')
+
+
+def _normalize_sacco_id(sacco):
+    """Return a canonical SACCO id string for an instance, UUID or str."""
+    if sacco is None:
+        return None
+    sacco_id = getattr(sacco, 'pk', sacco)
+    try:
+        return str(UUID(str(sacco_id)))
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+def build_role_graph(user_id):
+    """Load a user's roles, administered SACCOs and permission matrix."""
+    roles = []
+    saccos = {}
+    for role in (
+        Role.objects.filter(user_id=user_id)
+        .select_related('sacco')
+        .order_by('-created_at')
+    ):
+        sacco_id = _normalize_sacco_id(role.sacco_id)
+        roles.append((role.name, sacco_id))
+        if role.name == Role.SACCO_ADMIN and role.sacco is not None:
+            saccos.setdefault(sacco_id, role.sacco)
+
+    permissions = {}
+    for permission in RolePermission.objects.filter(
+        role__user_id=user_id,
+    ).select_related('role'):
+        scope = (
+            permission.role.name,
+            _normalize_sacco_id(permission.role.sacco_id),
+        )
+        permissions.setdefault(scope, {})[permission.resource] = {
+            'create': permission.can_create,
+            'read': permission.can_read,
+            'update': permission.can_update,
+            'delete': permission.can_delete,
+        }
+
+    return {'roles': roles, 'saccos': saccos, 'permissions': permissions}
+
+
+def get_role_graph(user_id):
+    """Return the cached role graph for a user, building it on a miss."""
+    cache_key = ROLE_GRAPH_CACHE_KEY.format(user_id=user_id)
+    try:
+        graph = cache.get(cache_key)
+    except Exception:
+        logger.warning('Role graph cache read failed.', exc_info=True)
+        return build_role_graph(user_id)
+
+    if graph is None:
+        graph = build_role_graph(user_id)
+        try:
+            cache.set(
+                cache_key,
+                graph,
+                timeout=settings.ROLE_GRAPH_CACHE_TIMEOUT,
+            )
+        except Exception:
+            logger.warning('Role graph cache write failed.', exc_info=True)
+    return graph
+
+
+def invalidate_role_graphs(user_ids):
+    """
+    Drop cached role graphs now and again once the transaction commits.
+
+    The second delete stops a request that read the old rows mid-transaction
+    from caching them for the full timeout.
+    """
+    cache_keys = [
+        ROLE_GRAPH_CACHE_KEY.format(user_id=user_id)
+        for user_id in set(user_ids)
+    ]
+    if not cache_keys:
+        return
+
+    def delete_keys():
+        try:
+            cache.delete_many(cache_keys)
+        except Exception:
+            logger.warning('Role graph invalidation failed.', exc_info=True)
+
+    delete_keys()
+    transaction.on_commit(delete_keys)
+
+
+class AuthorizationContext:
+    """One user's roles and SACCO scope, answered from the role graph."""
+
+    def __init__(self, user, graph):
+        self.user = user
+        self.user_id = getattr(user, 'pk', None)
+        self.is_authenticated = self.user_id is not None
+        self.is_staff = bool(getattr(user, 'is_staff', False))
+        self._roles = frozenset(graph['roles'])
+        self._role_names = frozenset(name for name, _ in graph['roles'])
+        self._saccos = graph['saccos']
+        self._permissions = graph['permissions']
+
+    @classmethod
+    def anonymous(cls):
+        return cls(None, {'roles': [], 'saccos': {}, 'permissions': {}})
+
+    def has_role(self, *names):
+        """Return True when the user holds any of the named roles."""
+        return not self._role_names.isdisjoint(names)
+
+    @property
+    def is_super_admin(self):
+        """Staff users and SUPER_ADMIN role holders see all data."""
+        return self.is_staff or self.has_role(Role.SUPER_ADMIN)
+
+    @property
+    def is_sacco_admin(self):
+        return self.has_role(Role.SACCO_ADMIN)
+
+    @property
+    def admin_sacco_ids(self):
+        """SACCO ids with a SACCO_ADMIN role, newest role first."""
+        return list(self._saccos)
+
+    @property
+    def admin_saccos(self):
+        return list(self._saccos.values())
+
+    def is_admin_of(self, sacco):
+        """Return True for a SACCO_ADMIN role scoped to ``sacco``."""
+        return (Role.SACCO_ADMIN, _normalize_sacco_id(sacco)) in self._roles
+
+    def get_admin_sacco(self, sacco_id=None):
+        """
+        Return the administered Sacco for ``sacco_id``.
+
+        Without an id the SACCO of the newest SACCO_ADMIN role is returned.
+        None means the user does not administer the requested SACCO.
+        """
+        if sacco_id is None:
+            return next(iter(self._saccos.values()), None)
+        return self._saccos.get(_normalize_sacco_id(sacco_id))
+
+    @property
+    def is_billing_suspended(self):
+        """True when any SACCO the user administers is suspended."""
+        return any(
+            sacco.is_billing_suspended for sacco in self._saccos.values()
+        )
+
+    def can(self, resource, action, sacco=None):
+        """Check the RolePermission matrix for an action on a resource."""
+        if action not in PERMISSION_ACTIONS:
+            raise ValueError(f'Unknown permission action: {action}')
+
+        sacco_id = _normalize_sacco_id(sacco)
+        for scope, resources in self._permissions.items():
+            if sacco is not None and scope[1] not in (sacco_id, None):
+                continue
+            if resources.get(resource, {}).get(action):
+                return True
+        return False
+
+
+def get_authorization_context(request):
+    """
+    Return the AuthorizationContext for ``request.user``.
+
+    The context is stored on the underlying HttpRequest, so Django
+    middleware and DRF permission checks share it. It is rebuilt if the
+    user changes, e.g. when DRF authenticates a JWT after middleware ran.
+    """
+    http_request = getattr(request, '_request', request)
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return AuthorizationContext.anonymous()
+
+    context = getattr(http_request, '_authorization_context', None)
+    if context is None or context.user_id != user.pk:
+        context = AuthorizationContext(user, get_role_graph(user.pk))
+        http_request._authorization_context = context
+    return context
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SaccoManagementConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'saccomanagement'
+
+    def ready(self):
+        """Register role graph invalidation signals."""
+        import saccomanagement.signals  # noqa: F401
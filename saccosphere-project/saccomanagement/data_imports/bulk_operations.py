@@ -3,15 +3,36 @@
 from decimal import Decimal
 from uuid import uuid4
 
-from django.db import transaction
+from django.contrib.auth.hashers import make_password
+from django.db import DataError, IntegrityError, transaction
 from django.utils import timezone
 
 from accounts.models import User
+from dashboard.engines.portfolio_read_model import schedule_portfolio_refresh
 from ledger.models import LedgerEntry
+from ledger.utils import create_ledger_entries, create_ledger_entry
 from saccomembership.models import Membership
 from services.models import Saving, SavingsType
 
 
+MEMBER_IMPORT_BATCH_SIZE = 1000
+BULK_WRITE_BATCH_SIZE = 500
+MAX_FAILURE_RATE = Decimal('0.05')
+MEMBERSHIP_IMPORT_FIELDS = [
+    'status',
+    'member_number',
+    'approved_date',
+    'updated_at',
+]
+SAVING_IMPORT_FIELDS = [
+    'amount',
+    'total_contributions',
+    'status',
+    'last_transaction_date',
+    'updated_at',
+]
+
+
 class ImportAbortError(Exception):
     """Raised when DB failure rate exceeds the allowed threshold."""
 
@@ -20,18 +41,27 @@ class ImportParseError(Exception):
     """Raised when import payload structure cannot be processed."""
 
 
-def import_members_to_sacco(valid_rows, sacco, imported_by):
+def import_members_to_sacco(
+    valid_rows,
+    sacco,
+    imported_by,
+    batch_size=MEMBER_IMPORT_BATCH_SIZE,
+):
     """
     Bulk import member records into a SACCO.
 
-    Uses atomic transactions and rolls back the full import when database
-    failures exceed five percent of input rows.
+    Each batch prefetches existing users, memberships and savings in a
+    handful of queries, plans every row in memory and writes the result with
+    bulk_create/bulk_update and one bulk ledger post. Rows that would break a
+    constraint are reported individually. A batch the bulk path still cannot
+    write is replayed row by row in savepoints, so every database error is
+    attributed to its row. The full import rolls back when failures exceed
+    five percent of input rows.
     """
     total_rows = len(valid_rows)
     success_count = 0
     fail_count = 0
     errors = []
-    batch_size = 500
 
     if total_rows == 0:
         return {
@@ -41,33 +71,39 @@ def import_members_to_sacco(valid_rows, sacco, imported_by):
             'total_rows': 0,
         }
 
+    savings_types = {
+        savings_type.name: savings_type
+        for savings_type in SavingsType.objects.filter(sacco=sacco)
+    }
+
     with transaction.atomic():
         for batch_start in range(0, total_rows, batch_size):
             batch = valid_rows[batch_start:batch_start + batch_size]
+            _resolve_savings_types(batch, sacco, savings_types)
 
-            with transaction.atomic(savepoint=True):
-                for batch_index, row in enumerate(batch, start=1):
-                    row_number = batch_start + batch_index
-                    try:
-                        with transaction.atomic(savepoint=True):
-                            _import_single_row(
-                                row=row,
-                                sacco=sacco,
-                                imported_by=imported_by,
-                            )
-                        success_count += 1
-                    except Exception as exc:  # pragma: no cover
-                        fail_count += 1
-                        errors.append(
-                            {
-                                'row_number': row_number,
-                                'email': row.get('email'),
-                                'error': str(exc),
-                            },
-                        )
-
-                if (Decimal(fail_count) / Decimal(total_rows)) > Decimal('0.05'):
-                    raise ImportAbortError('Too many failures — rolling back')
+            try:
+                with transaction.atomic(savepoint=True):
+                    batch_errors = _import_batch(
+                        batch,
+                        batch_start,
+                        sacco,
+                        imported_by,
+                        savings_types,
+                    )
+            except (DataError, IntegrityError):
+                batch_errors = _import_rows_individually(
+                    batch,
+                    batch_start,
+                    sacco,
+                    imported_by,
+                )
+
+            success_count += len(batch) - len(batch_errors)
+            fail_count += len(batch_errors)
+            errors.extend(batch_errors)
+
+            if (Decimal(fail_count) / Decimal(total_rows)) > MAX_FAILURE_RATE:
+                raise ImportAbortError('Too many failures — rolling back')
 
     return {
         'success_count': success_count,
@@ -77,6 +113,229 @@ def import_members_to_sacco(valid_rows, sacco, imported_by):
     }
 
 
+def _import_batch(rows, batch_start, sacco, imported_by, savings_types):
+    """Plan one batch in memory, then write it with bulk operations."""
+    now = timezone.now()
+    today = timezone.localdate()
+    errors = []
+
+    emails = {row['email'] for row in rows}
+    users = User.objects.in_bulk(emails, field_name='email')
+    memberships = {
+        membership.user_id: membership
+        for membership in Membership.objects.filter(
+            sacco=sacco,
+            user__email__in=emails,
+        )
+    }
+    member_number_owners = dict(
+        Membership.objects.filter(
+            member_number__in={
+                row.get('member_number')
+                for row in rows
+                if row.get('member_number')
+            },
+        ).values_list('member_number', 'id')
+    )
+    savings = {}
+    for saving in Saving.objects.filter(
+        membership_id__in=[membership.pk for membership in memberships.values()],
+    ):
+        key = (saving.membership_id, saving.savings_type_id)
+        savings.setdefault(key, []).append(saving)
+
+    new_users = []
+    new_memberships = {}
+    updated_memberships = {}
+    new_savings = {}
+    updated_savings = {}
+    deposits = []
+
+    for batch_index, row in enumerate(rows, start=1):
+        row_number = batch_start + batch_index
+        user = users.get(row['email'])
+        membership = memberships.get(user.pk) if user else None
+        member_number = row.get('member_number') or None
+        savings_amount = row.get('savings_amount') or Decimal('0')
+        savings_type = savings_types.get(
+            (row.get('savings_type') or '').strip().upper()
+        )
+
+        owner_id = member_number_owners.get(member_number)
+        if member_number and owner_id not in (
+            None,
+            membership.pk if membership else None,
+        ):
+            errors.append(
+                _row_error(
+                    row_number,
+                    row,
+                    f'member_number {member_number} is already in use.',
+                )
+            )
+            continue
+
+        saving_key = (
+            membership.pk if membership else None,
+            savings_type.pk if savings_type else None,
+        )
+        if (
+            savings_amount > Decimal('0')
+            and len(savings.get(saving_key, [])) > 1
+        ):
+            errors.append(
+                _row_error(
+                    row_number,
+                    row,
+                    'More than one savings account matches this savings type.',
+                )
+            )
+            continue
+
+        if user is None:
+            user = User(
+                email=row['email'],
+                first_name=row.get('first_name', ''),
+                last_name=row.get('last_name', ''),
+                phone_number=row.get('phone') or None,
+                password=make_password(None),
+            )
+            users[user.email] = user
+            new_users.append(user)
+
+        if membership is None:
+            membership = Membership(user=user, sacco=sacco)
+            memberships[user.pk] = membership
+            new_memberships[membership.pk] = membership
+        elif membership.pk not in new_memberships:
+            updated_memberships[membership.pk] = membership
+
+        if (
+            membership.member_number
+            and member_number_owners.get(membership.member_number)
+            == membership.pk
+        ):
+            del member_number_owners[membership.member_number]
+        if member_number:
+            member_number_owners[member_number] = membership.pk
+        membership.status = Membership.Status.APPROVED
+        membership.member_number = member_number
+        membership.approved_date = now
+        membership.updated_at = now
+
+        if savings_amount <= Decimal('0'):
+            continue
+
+        saving_key = (membership.pk, savings_type.pk if savings_type else None)
+        if saving_key in savings:
+            saving = savings[saving_key][0]
+            if saving.pk not in new_savings:
+                updated_savings[saving.pk] = saving
+        else:
+            saving = Saving(
+                membership=membership,
+                savings_type=savings_type,
+                amount=Decimal('0.00'),
+                total_contributions=Decimal('0.00'),
+            )
+            savings[saving_key] = [saving]
+            new_savings[saving.pk] = saving
+
+        saving.amount = (saving.amount or Decimal('0.00')) + savings_amount
+        saving.total_contributions = (
+            (saving.total_contributions or Decimal('0.00')) + savings_amount
+        )
+        saving.status = Saving.Status.ACTIVE
+        saving.last_transaction_date = today
+        saving.updated_at = now
+        deposits.append(
+            {
+                'membership': membership,
+                'entry_type': LedgerEntry.EntryType.CREDIT,
+                'category': LedgerEntry.Category.SAVING_DEPOSIT,
+                'amount': savings_amount,
+                'reference': f'IMPORT-{uuid4().hex[:18].upper()}',
+                'description': (
+                    f'Bulk member import by {imported_by.email} '
+                    f'for {sacco.name}.'
+                ),
+            }
+        )
+
+    User.objects.bulk_create(new_users, batch_size=BULK_WRITE_BATCH_SIZE)
+    # Existing memberships first, so numbers they release can be reused.
+    Membership.objects.bulk_update(
+        list(updated_memberships.values()),
+        MEMBERSHIP_IMPORT_FIELDS,
+        batch_size=BULK_WRITE_BATCH_SIZE,
+    )
+    Membership.objects.bulk_create(
+        list(new_memberships.values()),
+        batch_size=BULK_WRITE_BATCH_SIZE,
+    )
+    Saving.objects.bulk_update(
+        list(updated_savings.values()),
+        SAVING_IMPORT_FIELDS,
+        batch_size=BULK_WRITE_BATCH_SIZE,
+    )
+    Saving.objects.bulk_create(
+        list(new_savings.values()),
+        batch_size=BULK_WRITE_BATCH_SIZE,
+    )
+    create_ledger_entries(deposits)
+    schedule_portfolio_refresh(
+        membership_ids=[
+            membership.pk
+            for membership in (
+                *updated_memberships.values(),
+                *new_memberships.values(),
+            )
+        ],
+    )
+    return errors
+
+
+def _import_rows_individually(rows, batch_start, sacco, imported_by):
+    """Import a batch one savepoint per row to attribute database errors."""
+    errors = []
+    for batch_index, row in enumerate(rows, start=1):
+        row_number = batch_start + batch_index
+        try:
+            with transaction.atomic(savepoint=True):
+                _import_single_row(
+                    row=row,
+                    sacco=sacco,
+                    imported_by=imported_by,
+                )
+        except Exception as exc:  # pragma: no cover
+            errors.append(_row_error(row_number, row, str(exc)))
+    return errors
+
+
+def _resolve_savings_types(rows, sacco, savings_types):
+    """Create any savings types a batch needs before the batch is written."""
+    for row in rows:
+        if (row.get('savings_amount') or Decimal('0')) <= Decimal('0'):
+            continue
+        name = (row.get('savings_type') or '').strip().upper()
+        if name and name not in savings_types:
+            savings_types[name], _ = SavingsType.objects.get_or_create(
+                sacco=sacco,
+                name=name,
+                defaults={
+                    'minimum_contribution': Decimal('0.00'),
+                },
+            )
+
+
+def _row_error(row_number, row, error):
+    return {
+        'row_number': row_number,
+        'email': row.get('email'),
+        'error': error,
+    }
+
+
 def _import_single_row(row, sacco, imported_by):
     """Create or update User, Membership, and optional savings for one row."""
     user_defaults = {
@@ -141,7 +400,7 @@ def _import_single_row(row, sacco, imported_by):
             ],
         )
 
-        LedgerEntry.objects.create(
+        create_ledger_entry(
             membership=membership,
             entry_type=LedgerEntry.EntryType.CREDIT,
             category=LedgerEntry.Category.SAVING_DEPOSIT,
@@ -151,5 +410,4 @@ def _import_single_row(row, sacco, imported_by):
                 f'Bulk member import by {imported_by.email} '
                 f'for {sacco.name}.'
             ),
-            balance_after=saving.amount,
         )
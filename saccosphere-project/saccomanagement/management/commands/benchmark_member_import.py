@@ -0,0 +1,102 @@
+"""Benchmark the bulk member import against the per-row path."""
+
+from decimal import Decimal
+from uuid import uuid4
+
+from accounts.models import User
+from config.benchmark import BenchmarkCommand, seed_sacco
+from saccomanagement.data_imports.bulk_operations import (
+    _import_rows_individually,
+    import_members_to_sacco,
+)
+
+
+SAVINGS_TYPE_CYCLE = ('BOSA', 'FOSA', 'SHARE_CAPITAL', '')
+
+
+class Command(BenchmarkCommand):
+    """
+    Time member imports on synthetic validated rows.
+
+    Each scenario imports the requested number of rows into a fresh SACCO,
+    every row carrying an opening savings deposit, then rolls everything
+    back. The per-row savepoint path is timed on a sample in a second SACCO
+    and extrapolated, because running it for 100k rows takes hours.
+
+    Usage:
+        python manage.py benchmark_member_import --rows 10000 100000
+    """
+
+    help = 'Benchmark bulk vs per-row member import throughput.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[10000, 100000],
+            help='Import file sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=500,
+            help='Rows timed on the per-row path.',
+        )
+
+    def handle(self, *args, **options):
+        for row_count in options['rows']:
+            self.run_rolled_back(
+                self._run_scenario,
+                row_count,
+                options['legacy_sample'],
+            )
+
+    def _run_scenario(self, row_count, legacy_sample):
+        timings = {}
+        imported_by = User.objects.create_user(
+            email=f'import-bench-{uuid4().hex[:8]}@saccosphere.test',
+            password=None,
+            first_name='Import',
+            last_name='Benchmark',
+        )
+        rows = self._rows(row_count)
+
+        sacco = seed_sacco('Import Benchmark SACCO')
+        with self.timed(timings, f'bulk import ({row_count:,} rows)'):
+            result = import_members_to_sacco(rows, sacco, imported_by)
+
+        legacy_sacco = seed_sacco('Import Benchmark Legacy SACCO')
+        sample = self._rows(min(legacy_sample, row_count))
+        sample_timings = {}
+        with self.timed(sample_timings, 'sample'):
+            _import_rows_individually(sample, 0, legacy_sacco, imported_by)
+
+        timings['per-row import (extrapolated)'] = (
+            sample_timings['sample'] / max(len(sample), 1) * row_count
+        )
+
+        self.write_timings(f'{row_count:,} rows', timings, rows=row_count)
+        self.stdout.write(
+            f'  imported: '
+            f'{result["success_count"]:,}, failed: {result["fail_count"]:,}, '
+            f'per-row sample: {len(sample):,} rows in '
+            f'{sample_timings["sample"]:.3f}s'
+        )
+
+    def _rows(self, count):
+        run_id = uuid4().hex[:8]
+        return [
+            {
+                'first_name': 'Import',
+                'last_name': f'Member {index}',
+                'email': f'import-{run_id}-{index}@saccosphere.test',
+                'phone': f'07{index % 100000000:08d}',
+                'member_number': f'I{run_id}-{index:06d}',
+                'savings_amount': Decimal(100 + index % 900),
+                'savings_type': SAVINGS_TYPE_CYCLE[
+                    index % len(SAVINGS_TYPE_CYCLE)
+                ],
+            }
+            for index in range(count)
+        ]
@@ -0,0 +1,177 @@
+"""Benchmark the SASRA PAR return against the per-loan classification."""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.benchmark import BenchmarkCommand, seed_members, seed_sacco
+from saccomanagement.sasra_reports import (
+    PAR_UNPAID_STATUSES,
+    _classify_loan_by_days_overdue,
+    build_par_return,
+)
+from services.models import Loan, RepaymentSchedule
+
+
+# Days overdue of the earliest unpaid instalment, cycled across loans so
+# every SASRA category is populated.
+DAYS_OVERDUE_CYCLE = (-10, 0, 15, 45, 120, 200)
+UNPAID_STATUS_CYCLE = (
+    RepaymentSchedule.Status.PENDING,
+    RepaymentSchedule.Status.OVERDUE,
+    RepaymentSchedule.Status.PARTIAL,
+)
+
+
+class Command(BenchmarkCommand):
+    """
+    Time the PAR return on synthetic SACCO loan books.
+
+    Each scenario seeds one SACCO with the requested number of ACTIVE loans
+    and three instalments per loan, then rolls everything back. The per-loan
+    earliest-unpaid lookup the return used to make is timed on a sample and
+    extrapolated, and the sample is checked against the batched categories.
+
+    Usage:
+        python manage.py benchmark_par_return --loans 50000
+    """
+
+    help = 'Benchmark the batched SASRA PAR classifier.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--loans',
+            type=int,
+            nargs='+',
+            default=[50000],
+            help='Synthetic loan book sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=500,
+            help='Loans timed on the per-loan path.',
+        )
+
+    def handle(self, *args, **options):
+        for loan_count in options['loans']:
+            self.run_rolled_back(
+                self._run_scenario,
+                loan_count,
+                options['legacy_sample'],
+            )
+
+    def _run_scenario(self, loan_count, legacy_sample):
+        timings = {}
+        as_of_date = timezone.localdate()
+        with self.timed(timings, 'seed synthetic data'):
+            sacco = self._seed(loan_count, as_of_date)
+
+        with CaptureQueriesContext(connection) as batched_queries:
+            with self.timed(timings, 'build_par_return (all loans)'):
+                report = build_par_return(sacco, as_of_date)
+
+        sample = list(
+            Loan.objects.filter(membership__sacco=sacco)[:legacy_sample],
+        )
+        sample_counts = {}
+        with self.timed(timings, f'per-loan lookups ({len(sample)})'):
+            for loan in sample:
+                earliest_unpaid = loan.schedule.filter(
+                    status__in=PAR_UNPAID_STATUSES,
+                ).order_by('due_date').first()
+                days_overdue = 0
+                if earliest_unpaid:
+                    days_overdue = max(
+                        (as_of_date - earliest_unpaid.due_date).days,
+                        0,
+                    )
+                category = _classify_loan_by_days_overdue(days_overdue)
+                sample_counts[category] = sample_counts.get(category, 0) + 1
+
+        sample_seconds = timings[f'per-loan lookups ({len(sample)})']
+        timings['per-loan lookups (extrapolated)'] = (
+            sample_seconds / max(len(sample), 1) * loan_count
+        )
+
+        expected_counts = self._expected_counts(loan_count)
+        mismatches = sum(
+            1
+            for category, value in report['categories'].items()
+            if value['loan_count'] != expected_counts.get(category, 0)
+        )
+        self.write_timings(f'{loan_count:,} active loans', timings)
+        self.stdout.write(
+            f'  batched queries: {len(batched_queries)}, category '
+            f'mismatches: {mismatches}, sample categories: {sample_counts}, '
+            f'PAR30: {report["par30_ratio"]}%, '
+            f'PAR90: {report["par90_ratio"]}%'
+        )
+
+    def _seed(self, loan_count, as_of_date):
+        sacco = seed_sacco('PAR Benchmark SACCO')
+        memberships = seed_members(sacco, loan_count)
+        loans = Loan.objects.bulk_create(
+            [
+                Loan(
+                    membership=membership,
+                    amount=Decimal('60000.00'),
+                    interest_rate=Decimal('12.00'),
+                    term_months=12,
+                    outstanding_balance=Decimal(10000 + index % 5000),
+                    status=Loan.Status.ACTIVE,
+                )
+                for index, membership in enumerate(memberships)
+            ],
+            batch_size=2000,
+        )
+
+        instalments = []
+        for index, loan in enumerate(loans):
+            days_overdue = DAYS_OVERDUE_CYCLE[index % len(DAYS_OVERDUE_CYCLE)]
+            earliest_due = as_of_date - timedelta(days=days_overdue)
+            instalments.extend([
+                self._instalment(
+                    loan,
+                    1,
+                    earliest_due - timedelta(days=30),
+                    RepaymentSchedule.Status.PAID,
+                ),
+                self._instalment(
+                    loan,
+                    2,
+                    earliest_due,
+                    UNPAID_STATUS_CYCLE[index % len(UNPAID_STATUS_CYCLE)],
+                ),
+                self._instalment(
+                    loan,
+                    3,
+                    earliest_due + timedelta(days=30),
+                    RepaymentSchedule.Status.PENDING,
+                ),
+            ])
+        RepaymentSchedule.objects.bulk_create(instalments, batch_size=5000)
+        return sacco
+
+    def _instalment(self, loan, instalment_number, due_date, status):
+        return RepaymentSchedule(
+            loan=loan,
+            instalment_number=instalment_number,
+            due_date=due_date,
+            amount=Decimal('5000.00'),
+            principal=Decimal('4500.00'),
+            interest=Decimal('500.00'),
+            balance_after=Decimal('0.00'),
+            status=status,
+        )
+
+    def _expected_counts(self, loan_count):
+        counts = {}
+        for index in range(loan_count):
+            days_overdue = DAYS_OVERDUE_CYCLE[index % len(DAYS_OVERDUE_CYCLE)]
+            category = _classify_loan_by_days_overdue(max(days_overdue, 0))
+            counts[category] = counts.get(category, 0) + 1
+        return counts
@@ -3,7 +3,7 @@ import logging
 from django.http import JsonResponse
 from django.utils.deprecation import MiddlewareMixin
 
-from saccomanagement.models import Role
+from saccomanagement.access import get_authorization_context
 
 
 logger = logging.getLogger('saccosphere.access')
@@ -39,11 +39,10 @@ class SaccoContextMiddleware(MiddlewareMixin):
             return None
 
         user = request.user
+        access = get_authorization_context(request)
 
         # SUPER_ADMIN (staff or SUPER_ADMIN role) sees all data
-        if user.is_staff or user.roles.filter(
-            name=Role.SUPER_ADMIN
-        ).exists():
+        if access.is_super_admin:
             logger.info(
                 f'SUPER_ADMIN access: {user.email} | '
                 f'Path: {request.path}'
@@ -51,12 +50,7 @@ class SaccoContextMiddleware(MiddlewareMixin):
             return None
 
         # SACCO_ADMIN needs a specific SACCO context
-        admin_roles = user.roles.filter(
-            name=Role.SACCO_ADMIN,
-            sacco__isnull=False,
-        ).select_related('sacco')
-
-        if not admin_roles.exists():
+        if not access.admin_sacco_ids:
             # Not a SACCO admin, treat as member (no SACCO context)
             return None
 
@@ -65,9 +59,9 @@ class SaccoContextMiddleware(MiddlewareMixin):
 
         if sacco_id:
             # Validate header-specified SACCO
-            role = admin_roles.filter(sacco_id=sacco_id).first()
+            sacco = access.get_admin_sacco(sacco_id)
 
-            if not role:
+            if not sacco:
                 logger.warning(
                     f'SACCO_ADMIN {user.email} attempted access to '
                     f'unauthorized SACCO {sacco_id}'
@@ -81,21 +75,20 @@ class SaccoContextMiddleware(MiddlewareMixin):
                     status=403,
                 )
 
-            request.current_sacco = role.sacco
+            request.current_sacco = sacco
             logger.info(
                 f'SACCO_ADMIN context: {user.email} | '
-                f'SACCO: {role.sacco.name}'
+                f'SACCO: {sacco.name}'
             )
             return None
 
         # No header provided: use first active SACCO_ADMIN role
-        role = admin_roles.first()
-        if role:
-            request.current_sacco = role.sacco
-            logger.info(
-                f'SACCO_ADMIN context (default): {user.email} | '
-                f'SACCO: {role.sacco.name}'
-            )
+        sacco = access.get_admin_sacco()
+        request.current_sacco = sacco
+        logger.info(
+            f'SACCO_ADMIN context (default): {user.email} | '
+            f'SACCO: {sacco.name}'
+        )
 
         return None
 
@@ -147,11 +140,7 @@ class BillingSuspensionMiddleware:
         if not hasattr(request, 'user') or not request.user.is_authenticated:
             return False
 
-        return Role.objects.filter(
-            user=request.user,
-            name=Role.SACCO_ADMIN,
-            sacco__is_billing_suspended=True,
-        ).exists()
+        return get_authorization_context(request).is_billing_suspended
 
     def _is_exempt_path(self, path):
         return path in self.EXEMPT_PATHS
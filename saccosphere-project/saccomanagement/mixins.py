@@ -1,6 +1,6 @@
 from rest_framework.exceptions import PermissionDenied
 
-from saccomanagement.models import Role
+from saccomanagement.access import get_authorization_context
 
 
 class SaccoScopedMixin:
@@ -26,20 +26,14 @@ class SaccoScopedMixin:
         Raises PermissionDenied immediately if a valid sacco context cannot be
         established. SUPER_ADMIN users are allowed without a SACCO context.
         """
-        user = self.request.user
+        access = get_authorization_context(self.request)
 
         # SUPER_ADMIN sees all data - no context needed
-        if user.is_staff or user.roles.filter(name=Role.SUPER_ADMIN).exists():
+        if access.is_super_admin:
             self.request.current_sacco = None
             return
 
-        # Get all SACCO_ADMIN roles
-        admin_roles = user.roles.filter(
-            name=Role.SACCO_ADMIN,
-            sacco__isnull=False,
-        ).select_related('sacco')
-
-        if not admin_roles.exists():
+        if not access.admin_sacco_ids:
             raise PermissionDenied(
                 'Only SACCO admins can access this resource.'
             )
@@ -49,23 +43,16 @@ class SaccoScopedMixin:
 
         if sacco_id:
             # Validate the header-specified SACCO
-            role = admin_roles.filter(sacco_id=sacco_id).first()
-            if not role:
+            sacco = access.get_admin_sacco(sacco_id)
+            if not sacco:
                 raise PermissionDenied(
                     'You do not have access to this SACCO.'
                 )
-            self.request.current_sacco = role.sacco
+            self.request.current_sacco = sacco
             return
 
         # No header: use first SACCO_ADMIN role
-        role = admin_roles.first()
-        if role:
-            self.request.current_sacco = role.sacco
-            return
-
-        # This should not be reached due to the admin_roles.exists() check
-        # above, but raise for safety.
-        raise PermissionDenied('SACCO context is required for this action.')
+        self.request.current_sacco = access.get_admin_sacco()
 
     def get_sacco_context(self):
         """
@@ -90,16 +77,14 @@ class SaccoScopedMixin:
         Raises:
             PermissionDenied: If user is not SACCO_ADMIN or SUPER_ADMIN
         """
-        user = self.request.user
+        access = get_authorization_context(self.request)
 
         # SUPER_ADMIN: return unchanged
-        if user.is_staff or user.roles.filter(
-            name=Role.SUPER_ADMIN
-        ).exists():
+        if access.is_super_admin:
             return queryset
 
         # SACCO_ADMIN: filter by current SACCO
-        if user.roles.filter(name=Role.SACCO_ADMIN).exists():
+        if access.is_sacco_admin:
             current_sacco = self.get_sacco_context()
             if not current_sacco:
                 raise PermissionDenied(
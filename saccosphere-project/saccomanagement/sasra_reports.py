@@ -7,11 +7,21 @@ confirm the column layout still matches the current official SASRA workbook
 and remap headers here if SASRA has revised the template.
 """
 
-from datetime import date
+from datetime import date, timedelta
 from decimal import Decimal
 from io import BytesIO
 
-from django.db.models import Sum
+from django.db.models import (
+    Case,
+    CharField,
+    Count,
+    Min,
+    OuterRef,
+    Subquery,
+    Sum,
+    Value,
+    When,
+)
 from django.http import HttpResponse
 from django.utils import timezone
 from openpyxl import Workbook
@@ -62,6 +72,13 @@ PAR_CATEGORIES = {
 }
 
 
+PAR_UNPAID_STATUSES = (
+    RepaymentSchedule.Status.PENDING,
+    RepaymentSchedule.Status.OVERDUE,
+    RepaymentSchedule.Status.PARTIAL,
+)
+
+
 def build_par_return(sacco, as_of_date):
     """
     Build Portfolio at Risk (PAR) return for SASRA reporting.
@@ -77,71 +94,16 @@ def build_par_return(sacco, as_of_date):
     Returns:
         dict with classification breakdown, totals, and PAR ratios
     """
-    # Get all ACTIVE loans for the SACCO
     active_loans = Loan.objects.filter(
         membership__sacco=sacco,
         status=Loan.Status.ACTIVE,
-    ).select_related('membership')
-
-    total_outstanding = active_loans.aggregate(
-        total=Sum('outstanding_balance')
-    )['total'] or Decimal('0.00')
-
-    # Initialize category buckets
-    categories = {
-        'PERFORMING': {
-            'loan_count': 0,
-            'outstanding_balance': Decimal('0.00'),
-            'provision_required': Decimal('0.00'),
-        },
-        'WATCH': {
-            'loan_count': 0,
-            'outstanding_balance': Decimal('0.00'),
-            'provision_required': Decimal('0.00'),
-        },
-        'SUBSTANDARD': {
-            'loan_count': 0,
-            'outstanding_balance': Decimal('0.00'),
-            'provision_required': Decimal('0.00'),
-        },
-        'DOUBTFUL': {
-            'loan_count': 0,
-            'outstanding_balance': Decimal('0.00'),
-            'provision_required': Decimal('0.00'),
-        },
-        'LOSS': {
-            'loan_count': 0,
-            'outstanding_balance': Decimal('0.00'),
-            'provision_required': Decimal('0.00'),
-        },
-    }
-
-    # Classify each loan
-    for loan in active_loans:
-        # Find earliest unpaid instalment
-        earliest_unpaid = loan.schedule.filter(
-            status=RepaymentSchedule.Status.PENDING
-        ).order_by('due_date').first()
-
-        if earliest_unpaid:
-            days_overdue = earliest_unpaid.days_overdue
-        else:
-            # No unpaid instalments - loan is performing
-            days_overdue = 0
-
-        # Determine category
-        category = _classify_loan_by_days_overdue(days_overdue)
-
-        # Add to bucket
-        categories[category]['loan_count'] += 1
-        categories[category]['outstanding_balance'] += loan.outstanding_balance
+    )
+    categories = classify_par_portfolio(active_loans, as_of_date)
 
-        # Calculate provision
-        provision_rate = PAR_CATEGORIES[category]['provision_rate']
-        provision = (loan.outstanding_balance * provision_rate).quantize(
-            Decimal('0.01')
-        )
-        categories[category]['provision_required'] += provision
+    total_outstanding = sum(
+        (value['outstanding_balance'] for value in categories.values()),
+        Decimal('0.00'),
+    )
 
     # Calculate PAR ratios
     par30_balance = (
@@ -184,6 +146,79 @@ def build_par_return(sacco, as_of_date):
     }
 
 
+def classify_par_portfolio(loans, as_of_date):
+    """
+    Aggregate loans into the five SASRA PAR categories with one query.
+
+    Each loan is annotated with the due date of its earliest unpaid
+    (PENDING, OVERDUE or PARTIAL) instalment. The category is chosen in SQL
+    by comparing that date against the as_of_date cutoffs of each bucket,
+    and loan counts and balances are grouped per category by the database.
+    Provisions are applied to each category's total balance.
+
+    Args:
+        loans: Loan queryset to classify
+        as_of_date: date object the days overdue are measured from
+
+    Returns:
+        dict of {category: {'loan_count', 'outstanding_balance',
+        'provision_required'}} for every category in PAR_CATEGORIES
+    """
+    earliest_unpaid_due = RepaymentSchedule.objects.filter(
+        loan=OuterRef('pk'),
+        status__in=PAR_UNPAID_STATUSES,
+    ).order_by().values('loan').annotate(
+        earliest=Min('due_date'),
+    ).values('earliest')
+
+    category_cases = [
+        When(earliest_unpaid_due__isnull=True, then=Value('PERFORMING')),
+    ]
+    for category in ('PERFORMING', 'WATCH', 'SUBSTANDARD', 'DOUBTFUL'):
+        oldest_due_date = as_of_date - timedelta(
+            days=PAR_CATEGORIES[category]['days_max'],
+        )
+        category_cases.append(
+            When(
+                earliest_unpaid_due__gte=oldest_due_date,
+                then=Value(category),
+            )
+        )
+
+    rows = loans.order_by().annotate(
+        earliest_unpaid_due=Subquery(earliest_unpaid_due[:1]),
+    ).annotate(
+        par_category=Case(
+            *category_cases,
+            default=Value('LOSS'),
+            output_field=CharField(),
+        ),
+    ).values('par_category').annotate(
+        loan_count=Count('id'),
+        outstanding_balance=Sum('outstanding_balance'),
+    )
+
+    totals = {
+        row['par_category']: row
+        for row in rows
+    }
+    categories = {}
+    for category, definition in PAR_CATEGORIES.items():
+        row = totals.get(category, {})
+        outstanding_balance = (
+            row.get('outstanding_balance') or Decimal('0.00')
+        ).quantize(Decimal('0.01'))
+        categories[category] = {
+            'loan_count': row.get('loan_count', 0),
+            'outstanding_balance': outstanding_balance,
+            'provision_required': (
+                outstanding_balance * definition['provision_rate']
+            ).quantize(Decimal('0.01')),
+        }
+
+    return categories
+
+
 def _classify_loan_by_days_overdue(days_overdue):
     """Classify loan into SASRA PAR category based on days overdue."""
     if days_overdue <= PAR_CATEGORIES['PERFORMING']['days_max']:
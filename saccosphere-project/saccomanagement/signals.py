@@ -0,0 +1,36 @@
+"""Signals that keep cached role graphs in sync with role changes."""
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Sacco
+from saccomanagement.access import invalidate_role_graphs
+from saccomanagement.models import Role, RolePermission
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def invalidate_role_graph_on_role_change(sender, instance, **kwargs):
+    invalidate_role_graphs([instance.user_id])
+
+
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def invalidate_role_graph_on_permission_change(sender, instance, **kwargs):
+    invalidate_role_graphs(
+        Role.objects.filter(pk=instance.role_id).values_list(
+            'user_id',
+            flat=True,
+        )
+    )
+
+
+@receiver(post_save, sender=Sacco)
+def invalidate_role_graphs_on_sacco_change(sender, instance, **kwargs):
+    """Refresh admins' cached SACCO, e.g. after a billing suspension."""
+    invalidate_role_graphs(
+        Role.objects.filter(sacco_id=instance.pk).values_list(
+            'user_id',
+            flat=True,
+        )
+    )
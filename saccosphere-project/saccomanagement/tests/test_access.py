@@ -0,0 +1,134 @@
+"""Tests for the request-scoped authorization context."""
+
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.test import RequestFactory, TestCase
+
+from accounts.models import Sacco, User
+from accounts.permissions import IsSaccoAdmin, IsSuperAdmin
+from saccomanagement.access import get_authorization_context
+from saccomanagement.middleware import (
+    BillingSuspensionMiddleware,
+    SaccoContextMiddleware,
+)
+from saccomanagement.models import Role, RolePermission
+
+
+class AuthorizationContextTests(TestCase):
+    """Test role graph caching, invalidation and request reuse."""
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.sacco = Sacco.objects.create(
+            name='Access SACCO',
+            registration_number='ACCESS001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.other_sacco = Sacco.objects.create(
+            name='Other Access SACCO',
+            registration_number='ACCESS002',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.admin = User.objects.create_user(
+            email='access.admin@example.com',
+            password='StrongPass123',
+        )
+        self.role = Role.objects.create(
+            user=self.admin,
+            sacco=self.sacco,
+            name=Role.SACCO_ADMIN,
+        )
+
+    def _request(self, method='get', sacco_id=None):
+        headers = {'X-Sacco-ID': sacco_id} if sacco_id else {}
+        request = getattr(self.factory, method)(
+            '/api/v1/services/savings/',
+            headers=headers,
+        )
+        request.user = self.admin
+        return request
+
+    def _run_access_layers(self, request):
+        BillingSuspensionMiddleware(lambda request: None)(request)
+        SaccoContextMiddleware(lambda request: None).process_request(request)
+        IsSaccoAdmin().has_permission(request, None)
+        IsSaccoAdmin().has_object_permission(request, None, self.role)
+        IsSuperAdmin().has_permission(request, None)
+
+    def test_layers_share_one_cached_role_graph(self):
+        """A warm admin request needs no role queries at all."""
+        with self.assertNumQueries(2):
+            self._run_access_layers(self._request('post'))
+
+        request = self._request('post')
+        with self.assertNumQueries(0):
+            self._run_access_layers(request)
+
+        self.assertEqual(request.current_sacco, self.sacco)
+
+    def test_header_must_name_an_administered_sacco(self):
+        middleware = SaccoContextMiddleware(lambda request: None)
+
+        allowed = self._request(sacco_id=str(self.sacco.id))
+        denied = self._request(sacco_id=str(self.other_sacco.id))
+        invalid = self._request(sacco_id='not-a-uuid')
+
+        self.assertIsNone(middleware.process_request(allowed))
+        self.assertEqual(allowed.current_sacco, self.sacco)
+        self.assertEqual(middleware.process_request(denied).status_code, 403)
+        self.assertEqual(
+            middleware.process_request(invalid).status_code,
+            403,
+        )
+
+    def test_role_changes_invalidate_the_graph(self):
+        self.assertFalse(
+            get_authorization_context(self._request()).is_admin_of(
+                self.other_sacco,
+            )
+        )
+
+        Role.objects.create(
+            user=self.admin,
+            sacco=self.other_sacco,
+            name=Role.SACCO_ADMIN,
+        )
+        access = get_authorization_context(self._request())
+        self.assertTrue(access.is_admin_of(self.other_sacco))
+
+        Role.objects.filter(user=self.admin).delete()
+        access = get_authorization_context(self._request())
+        self.assertFalse(access.is_sacco_admin)
+        self.assertEqual(access.admin_sacco_ids, [])
+
+    def test_permission_matrix_changes_invalidate_the_graph(self):
+        access = get_authorization_context(self._request())
+        self.assertFalse(access.can('loans', 'update', self.sacco))
+
+        permission = RolePermission.objects.create(
+            role=self.role,
+            resource='loans',
+            can_update=True,
+        )
+        access = get_authorization_context(self._request())
+        self.assertTrue(access.can('loans', 'update', self.sacco))
+        self.assertFalse(access.can('loans', 'update', self.other_sacco))
+        self.assertFalse(access.can('loans', 'delete'))
+
+        permission.delete()
+        access = get_authorization_context(self._request())
+        self.assertFalse(access.can('loans', 'update'))
+
+    def test_sacco_suspension_invalidates_the_graph(self):
+        middleware = BillingSuspensionMiddleware(
+            lambda request: JsonResponse({'ok': True}),
+        )
+        self.assertEqual(middleware(self._request('post')).status_code, 200)
+
+        self.sacco.is_billing_suspended = True
+        self.sacco.save(update_fields=['is_billing_suspended'])
+
+        self.assertEqual(middleware(self._request('post')).status_code, 402)
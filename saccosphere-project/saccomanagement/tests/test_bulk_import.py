@@ -0,0 +1,179 @@
+"""Tests for the bulk member import engine."""
+
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import Sacco, User
+from ledger.models import LedgerBalanceHead, LedgerEntry
+from saccomanagement.data_imports.bulk_operations import (
+    ImportAbortError,
+    import_members_to_sacco,
+)
+from saccomembership.models import Membership
+from services.models import Saving, SavingsType
+
+
+class BulkMemberImportTests(TestCase):
+    """Validate set-based member upserts and per-row error reporting."""
+
+    def setUp(self):
+        self.sacco = Sacco.objects.create(
+            name='Import SACCO',
+            registration_number='IMP001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.admin = User.objects.create_user(
+            email='importer@example.com',
+            password='StrongPass123',
+            first_name='Import',
+            last_name='Admin',
+        )
+
+    def test_import_creates_members_savings_and_ledger(self):
+        """New rows create users, memberships, savings and credits."""
+        result = import_members_to_sacco(
+            [
+                self._row(1, savings_amount=Decimal('500')),
+                self._row(2, savings_amount=Decimal('0')),
+                self._row(1, savings_amount=Decimal('250')),
+            ],
+            self.sacco,
+            self.admin,
+        )
+
+        self.assertEqual(result['success_count'], 3)
+        self.assertEqual(result['fail_count'], 0)
+        user = User.objects.get(email='member1@example.com')
+        self.assertFalse(user.has_usable_password())
+        membership = Membership.objects.get(user=user, sacco=self.sacco)
+        self.assertEqual(membership.status, Membership.Status.APPROVED)
+        saving = Saving.objects.get(membership=membership)
+        self.assertEqual(saving.amount, Decimal('750.00'))
+        self.assertEqual(saving.savings_type.name, 'BOSA')
+        balances = list(
+            LedgerEntry.objects.filter(membership=membership).order_by(
+                'created_at',
+                'id',
+            ).values_list('balance_after', flat=True)
+        )
+        self.assertEqual(balances, [Decimal('500.00'), Decimal('750.00')])
+        self.assertEqual(
+            LedgerBalanceHead.objects.get(membership=membership).sequence,
+            2,
+        )
+        self.assertFalse(
+            Saving.objects.filter(
+                membership__user__email='member2@example.com',
+            ).exists()
+        )
+
+    def test_existing_member_is_updated_not_duplicated(self):
+        """Existing users keep their profile; savings are topped up."""
+        user = User.objects.create_user(
+            email='member1@example.com',
+            password='StrongPass123',
+            first_name='Original',
+            last_name='Name',
+        )
+        membership = Membership.objects.create(
+            user=user,
+            sacco=self.sacco,
+            status=Membership.Status.PENDING,
+            member_number='OLD-1',
+        )
+        savings_type = SavingsType.objects.create(
+            sacco=self.sacco,
+            name=SavingsType.Name.BOSA,
+        )
+        Saving.objects.create(
+            membership=membership,
+            savings_type=savings_type,
+            amount=Decimal('100.00'),
+            total_contributions=Decimal('100.00'),
+        )
+
+        result = import_members_to_sacco(
+            [self._row(1, savings_amount=Decimal('50'))],
+            self.sacco,
+            self.admin,
+        )
+
+        self.assertEqual(result['success_count'], 1)
+        user.refresh_from_db()
+        membership.refresh_from_db()
+        self.assertEqual(user.first_name, 'Original')
+        self.assertEqual(membership.status, Membership.Status.APPROVED)
+        self.assertEqual(membership.member_number, 'M1')
+        saving = Saving.objects.get(membership=membership)
+        self.assertEqual(saving.amount, Decimal('150.00'))
+        self.assertEqual(Membership.objects.filter(user=user).count(), 1)
+
+    def test_member_number_conflict_is_reported_per_row(self):
+        """A clashing member number fails only its own row."""
+        other = User.objects.create_user(
+            email='other@example.com',
+            password='StrongPass123',
+            first_name='Other',
+            last_name='Member',
+        )
+        Membership.objects.create(
+            user=other,
+            sacco=self.sacco,
+            member_number='M3',
+        )
+        rows = [self._row(index) for index in range(1, 41)]
+
+        result = import_members_to_sacco(rows, self.sacco, self.admin)
+
+        self.assertEqual(result['success_count'], 39)
+        self.assertEqual(result['fail_count'], 1)
+        self.assertEqual(result['errors'][0]['row_number'], 3)
+        self.assertEqual(result['errors'][0]['email'], 'member3@example.com')
+        self.assertFalse(
+            User.objects.filter(email='member3@example.com').exists()
+        )
+
+    def test_failure_rate_above_five_percent_rolls_back(self):
+        """More than five percent failed rows abort the whole import."""
+        rows = [self._row(index) for index in range(1, 11)]
+        rows[5]['member_number'] = 'M1'
+
+        with self.assertRaises(ImportAbortError):
+            import_members_to_sacco(rows, self.sacco, self.admin)
+
+        self.assertFalse(Membership.objects.filter(sacco=self.sacco).exists())
+        self.assertFalse(
+            User.objects.filter(email='member1@example.com').exists()
+        )
+
+    def test_query_count_does_not_grow_with_rows(self):
+        """A batch costs the same number of queries for 5 or 50 rows."""
+        small = self._count_queries(range(1, 6))
+        large = self._count_queries(range(100, 150))
+
+        self.assertEqual(small, large)
+
+    def _count_queries(self, indexes):
+        rows = [
+            self._row(index, savings_amount=Decimal('10'))
+            for index in indexes
+        ]
+        import_members_to_sacco(rows[:1], self.sacco, self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            import_members_to_sacco(rows[1:], self.sacco, self.admin)
+        return len(queries)
+
+    def _row(self, index, savings_amount=Decimal('100')):
+        return {
+            'first_name': 'Member',
+            'last_name': str(index),
+            'email': f'member{index}@example.com',
+            'phone': '0712345678',
+            'member_number': f'M{index}',
+            'savings_amount': savings_amount,
+            'savings_type': 'BOSA',
+        }
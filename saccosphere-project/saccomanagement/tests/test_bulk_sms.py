@@ -1,11 +1,16 @@
 from decimal import Decimal
 from unittest.mock import patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APIClient
 
 from accounts.models import Sacco, SaccoSettings, User
+from notifications.sms_campaigns import (
+    DISPATCH_LOCK_KEY,
+    dispatch_sms_campaign,
+)
 from saccomanagement.models import (
     Role,
     SMSCampaign,
@@ -17,6 +22,7 @@ from services.models import Saving, SavingsType
 
 class BulkSMSTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.sacco = Sacco.objects.create(
             name='Bulk SMS SACCO',
@@ -199,7 +205,9 @@ class BulkSMSTests(TestCase):
             )
         campaign.total_recipients = 3
         campaign.save(update_fields=['total_recipients'])
-        client_mock.return_value.send_sms.return_value = True
+        client_mock.return_value.send_bulk_sms.side_effect = (
+            self._bulk_results
+        )
 
         result = send_bulk_sms_campaign_task(str(campaign.id))
 
@@ -262,7 +270,172 @@ class BulkSMSTests(TestCase):
         self.assertEqual(result['sent'], 0)
         self.assertEqual(result['failed'], 1)
         self.assertEqual(campaign.status, SMSCampaign.Status.FAILED)
-        client_mock.return_value.send_sms.assert_not_called()
+        client_mock.return_value.send_bulk_sms.assert_not_called()
+
+    @patch('notifications.sms_campaigns.dispatch_sms_campaign')
+    def test_bulk_sms_task_fails_campaign_when_retries_run_out(
+        self,
+        dispatch_mock,
+    ):
+        from notifications.tasks import send_bulk_sms_campaign_task
+
+        campaign = self._campaign_with_recipients(3)
+        sent = campaign.recipients.order_by('id').first()
+        sent.status = SMSCampaignRecipient.Status.SENT
+        sent.save(update_fields=['status'])
+        dispatch_mock.return_value = {
+            'status': SMSCampaign.Status.SENDING,
+            'sent': 1,
+            'failed': 0,
+        }
+
+        result = send_bulk_sms_campaign_task.apply(
+            args=[str(campaign.id)],
+            retries=send_bulk_sms_campaign_task.max_retries,
+        )
+
+        campaign.refresh_from_db()
+        self.assertEqual(result.result['status'], SMSCampaign.Status.FAILED)
+        self.assertEqual(result.result['failed'], 2)
+        self.assertEqual(campaign.status, SMSCampaign.Status.FAILED)
+        self.assertEqual(campaign.failed_count, 2)
+        self.assertEqual(
+            campaign.recipients.filter(
+                status=SMSCampaignRecipient.Status.FAILED,
+                error_message='dispatch retries ran out',
+            ).count(),
+            2,
+        )
+
+    @override_settings(SMS_PROVIDER_RATE_LIMIT=1000.0)
+    @patch('accounts.integrations.otp_service.ATSMSClient')
+    def test_dispatch_groups_recipients_into_bulk_calls(self, client_mock):
+        campaign = self._campaign_with_recipients(5)
+        rejected = campaign.recipients.order_by('id')[1].phone_number
+        client_mock.return_value.send_bulk_sms.side_effect = (
+            lambda numbers, message: self._bulk_results(
+                numbers,
+                message,
+                rejected={rejected},
+            )
+        )
+
+        result = dispatch_sms_campaign(
+            campaign.id,
+            max_workers=2,
+            batch_size=2,
+        )
+
+        send_bulk_sms = client_mock.return_value.send_bulk_sms
+        self.assertEqual(send_bulk_sms.call_count, 3)
+        self.assertEqual(
+            sorted(len(call.args[0]) for call in send_bulk_sms.call_args_list),
+            [1, 2, 2],
+        )
+        self.assertEqual(result['sent'], 4)
+        self.assertEqual(result['failed'], 1)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.status, SMSCampaign.Status.COMPLETED)
+        self.assertEqual(
+            (campaign.sent_count, campaign.failed_count),
+            (4, 1),
+        )
+        failed = campaign.recipients.get(
+            status=SMSCampaignRecipient.Status.FAILED,
+        )
+        self.assertEqual(failed.phone_number, rejected)
+        self.assertEqual(failed.error_message, 'InvalidPhoneNumber')
+
+    @override_settings(SMS_PROVIDER_RATE_LIMIT=1000.0)
+    @patch('accounts.integrations.otp_service.ATSMSClient')
+    def test_dispatch_resumes_pending_recipients(self, client_mock):
+        campaign = self._campaign_with_recipients(3)
+        first = campaign.recipients.order_by('id').first()
+        first.status = SMSCampaignRecipient.Status.SENT
+        first.sent_at = timezone.now()
+        first.save(update_fields=['status', 'sent_at'])
+        campaign.sent_count = 1
+        campaign.save(update_fields=['sent_count'])
+        client_mock.return_value.send_bulk_sms.side_effect = (
+            self._bulk_results
+        )
+
+        result = dispatch_sms_campaign(campaign.id, batch_size=10)
+
+        send_bulk_sms = client_mock.return_value.send_bulk_sms
+        send_bulk_sms.assert_called_once()
+        self.assertNotIn(first.phone_number, send_bulk_sms.call_args.args[0])
+        self.assertEqual(result['sent'], 2)
+        campaign.refresh_from_db()
+        self.assertEqual(campaign.sent_count, 3)
+        self.assertEqual(campaign.status, SMSCampaign.Status.COMPLETED)
+
+    @override_settings(SMS_PROVIDER_RATE_LIMIT=1000.0)
+    @patch('accounts.integrations.otp_service.ATSMSClient')
+    def test_failed_provider_call_fails_its_batch(self, client_mock):
+        from accounts.integrations.otp_service import ATSMSError
+
+        campaign = self._campaign_with_recipients(2)
+        client_mock.return_value.send_bulk_sms.side_effect = ATSMSError(
+            'Provider unavailable.',
+        )
+
+        result = dispatch_sms_campaign(campaign.id)
+
+        self.assertEqual(result['status'], SMSCampaign.Status.FAILED)
+        self.assertEqual(
+            campaign.recipients.filter(
+                status=SMSCampaignRecipient.Status.FAILED,
+                error_message='Provider unavailable.',
+            ).count(),
+            2,
+        )
+
+    @patch('accounts.integrations.otp_service.ATSMSClient')
+    def test_overlapping_dispatches_are_single_flight(self, client_mock):
+        campaign = self._campaign_with_recipients(1)
+        cache.add(DISPATCH_LOCK_KEY.format(campaign_id=campaign.id), True)
+
+        result = dispatch_sms_campaign(campaign.id)
+
+        self.assertIsNone(result['status'])
+        client_mock.return_value.send_bulk_sms.assert_not_called()
+        self.assertTrue(
+            campaign.recipients.filter(
+                status=SMSCampaignRecipient.Status.PENDING,
+            ).exists()
+        )
+
+    def _bulk_results(self, phone_numbers, message, rejected=()):
+        return [
+            {
+                'success': phone_number not in rejected,
+                'status': (
+                    'InvalidPhoneNumber'
+                    if phone_number in rejected
+                    else 'Success'
+                ),
+                'message_id': '',
+            }
+            for phone_number in phone_numbers
+        ]
+
+    def _campaign_with_recipients(self, count):
+        campaign = self._campaign(status=SMSCampaign.Status.SENDING)
+        for index in range(count):
+            member = self._membership(
+                email=f'dispatch-{index}@example.com',
+                phone_number=f'25471234503{index}',
+                member_number=f'SMS-D{index}',
+            )
+            SMSCampaignRecipient.objects.create(
+                campaign=campaign,
+                membership=member,
+                phone_number=member.user.phone_number,
+            )
+        campaign.total_recipients = count
+        campaign.save(update_fields=['total_recipients'])
+        return campaign
 
     def _membership(
         self,
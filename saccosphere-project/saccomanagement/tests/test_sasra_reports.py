@@ -14,6 +14,7 @@ from saccomanagement.sasra_reports import (
     build_par_return,
     build_financial_position_return,
     build_membership_return,
+    classify_par_portfolio,
     _classify_loan_by_days_overdue,
     PAR_CATEGORIES,
 )
@@ -252,6 +253,83 @@ class ProvisioningMathTests(TestCase):
         )
 
 
+    def test_par_portfolio_counts_overdue_and_partial_instalments(self):
+        """Test OVERDUE and PARTIAL rows age a loan like PENDING rows."""
+        today = timezone.localdate()
+        watch_loan = self._active_loan(Decimal('10000'))
+        self._instalment(watch_loan, 1, today - timedelta(days=100), 'PAID')
+        self._instalment(watch_loan, 2, today - timedelta(days=20), 'PARTIAL')
+        doubtful_loan = self._active_loan(Decimal('20000'))
+        self._instalment(
+            doubtful_loan,
+            1,
+            today - timedelta(days=120),
+            'OVERDUE',
+        )
+        self._instalment(doubtful_loan, 2, today + timedelta(days=5), 'PENDING')
+        performing_loan = self._active_loan(Decimal('30000'))
+        self._instalment(performing_loan, 1, today - timedelta(days=5), 'PAID')
+        loss_loan = self._active_loan(Decimal('40000'))
+        self._instalment(loss_loan, 1, today - timedelta(days=181), 'PENDING')
+
+        with self.assertNumQueries(1):
+            categories = classify_par_portfolio(
+                Loan.objects.filter(status=Loan.Status.ACTIVE),
+                today,
+            )
+
+        self.assertEqual(
+            {
+                key: (value['loan_count'], value['outstanding_balance'])
+                for key, value in categories.items()
+            },
+            {
+                'PERFORMING': (1, Decimal('30000.00')),
+                'WATCH': (1, Decimal('10000.00')),
+                'SUBSTANDARD': (0, Decimal('0.00')),
+                'DOUBTFUL': (1, Decimal('20000.00')),
+                'LOSS': (1, Decimal('40000.00')),
+            },
+        )
+        self.assertEqual(
+            categories['DOUBTFUL']['provision_required'],
+            Decimal('10000.00'),
+        )
+
+    def test_par_portfolio_measures_days_overdue_from_as_of_date(self):
+        """Test the report date, not today, decides the PAR bucket."""
+        today = timezone.localdate()
+        loan = self._active_loan(Decimal('10000'))
+        self._instalment(loan, 1, today - timedelta(days=45), 'PENDING')
+
+        result = build_par_return(self.sacco, today - timedelta(days=30))
+
+        self.assertEqual(result['categories']['WATCH']['loan_count'], 1)
+        self.assertEqual(result['categories']['SUBSTANDARD']['loan_count'], 0)
+
+    def _active_loan(self, outstanding_balance):
+        return Loan.objects.create(
+            membership=self.membership,
+            amount=outstanding_balance,
+            interest_rate=Decimal('12.00'),
+            term_months=12,
+            outstanding_balance=outstanding_balance,
+            status=Loan.Status.ACTIVE,
+        )
+
+    def _instalment(self, loan, instalment_number, due_date, status):
+        return RepaymentSchedule.objects.create(
+            loan=loan,
+            instalment_number=instalment_number,
+            due_date=due_date,
+            amount=Decimal('1000'),
+            principal=Decimal('900'),
+            interest=Decimal('100'),
+            balance_after=Decimal('0'),
+            status=status,
+        )
+
+
 class FinancialPositionTests(TestCase):
     """Test financial position return generation."""
 
@@ -20,6 +20,7 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from accounts.permissions import IsSaccoAdmin, IsSuperAdmin
+from config.pagination import SaccoSphereCursorPagination
 from payments.models import Transaction
 from saccomembership.membership_doc_serializers import (
     MembershipDocumentDetailSerializer,
@@ -60,6 +61,7 @@ class AdminMemberListView(SaccoScopedMixin, ListAPIView):
 
     serializer_class = MembershipListSerializer
     permission_classes = [IsAuthenticated, IsSaccoAdmin]
+    pagination_class = SaccoSphereCursorPagination
 
     def get(self, request, *args, **kwargs):
         """Set SACCO context before processing request."""
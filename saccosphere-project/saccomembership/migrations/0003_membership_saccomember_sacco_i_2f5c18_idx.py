@@ -0,0 +1,20 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('saccomembership', '0002_membershipdocument'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='membership',
+            index=models.Index(fields=['sacco', 'created_at'], name='saccomember_sacco_i_2f5c18_idx'),
+        ),
+    ]
@@ -46,6 +46,9 @@ class Membership(models.Model):
 
     class Meta:
         unique_together = ['user', 'sacco']
+        indexes = [
+            models.Index(fields=['sacco', 'created_at']),
+        ]
 
     def __str__(self):
         return f'{self.user.email} — {self.sacco.name} — {self.status}'
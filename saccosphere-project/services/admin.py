@@ -14,6 +14,7 @@ from .models import (
     NPLFlag,
     RepaymentSchedule,
     ReminderLog,
+    SaccoLiquiditySnapshot,
     Saving,
     SavingsType,
 )
@@ -471,3 +472,26 @@ class CRBCheckAdmin(NoChangeAdminMixin, admin.ModelAdmin):
     )
 
 
+@admin.register(SaccoLiquiditySnapshot)
+class SaccoLiquiditySnapshotAdmin(NoChangeAdminMixin, admin.ModelAdmin):
+    list_display = (
+        'sacco',
+        'snapshot_date',
+        'cash_in',
+        'cash_out',
+        'created_at',
+    )
+    list_filter = ('sacco', 'snapshot_date')
+    search_fields = ('sacco__name', 'sacco__registration_number')
+    readonly_fields = (
+        'id',
+        'sacco',
+        'snapshot_date',
+        'cutoff_at',
+        'cash_in',
+        'cash_out',
+        'created_at',
+    )
+    list_select_related = ('sacco',)
+    list_per_page = 50
+    ordering = ('-snapshot_date',)
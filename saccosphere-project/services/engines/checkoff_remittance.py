@@ -0,0 +1,507 @@
+"""Chunked, resumable application of payroll check-off remittances."""
+
+import codecs
+import csv
+import hashlib
+from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from ledger.models import LedgerEntry
+from ledger.utils import create_ledger_entries
+from saccomembership.models import Membership
+from services.models import CheckoffRemittance, Loan, RepaymentSchedule
+
+
+REMITTANCE_CHUNK_SIZE = 2000
+LOAN_UPDATE_BATCH_SIZE = 500
+ALLOWED_EXTENSIONS = ('.csv', '.xlsx')
+MAX_REMITTANCE_FILE_SIZE = 20 * 1024 * 1024
+HEADER_ALIASES = {
+    'member_no': 'member_number',
+    'member': 'member_number',
+    'payroll_number': 'member_number',
+    'deduction': 'amount',
+    'deduction_amount': 'amount',
+    'amount_deducted': 'amount',
+}
+REPAYABLE_LOAN_STATUSES = (
+    Loan.Status.DISBURSED,
+    Loan.Status.ACTIVE,
+    Loan.Status.DEFAULTED,
+)
+UNPAID_INSTALMENT_STATUSES = (
+    RepaymentSchedule.Status.PENDING,
+    RepaymentSchedule.Status.OVERDUE,
+    RepaymentSchedule.Status.PARTIAL,
+)
+MONEY_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+
+class RemittanceParseError(Exception):
+    """Raised when a remittance file cannot be read."""
+
+
+def hash_remittance_file(upload):
+    """Return the SHA-256 hex digest of an uploaded remittance file."""
+    digest = hashlib.sha256()
+    for chunk in upload.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def iter_remittance_rows(file_obj, file_name):
+    """
+    Stream ``(row_number, member_number, amount)`` from a remittance file.
+
+    CSV files are decoded line by line and XLSX files are read in openpyxl
+    read-only mode, so memory use does not grow with the file. Amounts are
+    yielded as read; blank rows are skipped.
+
+    Raises:
+        RemittanceParseError: If the file type or header row is not usable
+    """
+    file_name = (file_name or '').lower()
+    if file_name.endswith('.csv'):
+        rows = _iter_csv(file_obj)
+    elif file_name.endswith('.xlsx'):
+        rows = _iter_xlsx(file_obj)
+    else:
+        raise RemittanceParseError(
+            'Only .csv and .xlsx remittance files are supported.'
+        )
+
+    header = next(rows, None)
+    if header is None:
+        raise RemittanceParseError('Remittance file is empty.')
+
+    columns = [_normalize_header(value) for value in header]
+    if 'member_number' not in columns or 'amount' not in columns:
+        raise RemittanceParseError(
+            'Remittance file must have member_number and amount columns.'
+        )
+
+    member_index = columns.index('member_number')
+    amount_index = columns.index('amount')
+    for row_number, values in enumerate(rows, start=2):
+        if not any(value not in (None, '') for value in values):
+            continue
+
+        yield (
+            row_number,
+            _cell(values, member_index),
+            _cell(values, amount_index),
+        )
+
+
+def start_checkoff_remittance(remittance_id):
+    """
+    Move a remittance to PROCESSING and return it.
+
+    A FAILED remittance is reopened as is, so processing resumes after its
+    last committed chunk.
+
+    Raises:
+        ValueError: If the remittance has already been applied
+    """
+    with transaction.atomic():
+        remittance = CheckoffRemittance.objects.select_for_update().get(
+            pk=remittance_id,
+        )
+        if remittance.status == CheckoffRemittance.Status.COMPLETED:
+            raise ValueError('Remittance has already been applied.')
+
+        remittance.status = CheckoffRemittance.Status.PROCESSING
+        remittance.error_message = ''
+        remittance.completed_at = None
+        remittance.save(
+            update_fields=['status', 'error_message', 'completed_at'],
+        )
+        return remittance
+
+
+def process_checkoff_remittance(
+    remittance_id,
+    chunk_size=REMITTANCE_CHUNK_SIZE,
+):
+    """
+    Apply every remaining row of a remittance, one committed chunk at a time.
+
+    Returns:
+        dict: {
+            'status': str,
+            'processed_rows': int,
+            'matched_rows': int,
+            'unmatched_rows': int,
+            'amount_applied': Decimal,
+        }
+    """
+    remittance = start_checkoff_remittance(remittance_id)
+    offset = remittance.processed_rows
+
+    remittance.file.open('rb')
+    try:
+        rows = islice(
+            iter_remittance_rows(remittance.file, remittance.file_name),
+            offset,
+            None,
+        )
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            apply_remittance_chunk(remittance.pk, chunk, offset)
+            offset += len(chunk)
+    finally:
+        remittance.file.close()
+
+    remittance = finalize_checkoff_remittance(remittance.pk)
+    return {
+        'status': remittance.status,
+        'processed_rows': remittance.processed_rows,
+        'matched_rows': remittance.matched_rows,
+        'unmatched_rows': remittance.unmatched_rows,
+        'amount_applied': remittance.amount_applied,
+    }
+
+
+def apply_remittance_chunk(remittance_id, rows, offset):
+    """
+    Allocate one chunk of remittance rows to loan instalments.
+
+    Members, repayable loans and unpaid instalments for the whole chunk are
+    read in three queries. Each row is allocated in memory, oldest loan and
+    lowest instalment first, then instalments are saved with bulk_update,
+    ledger entries are bulk posted and loan balances are reduced with one
+    CASE update per batch, all in one transaction. ``offset`` must match
+    the remittance's committed row count, so two runs of the same file
+    cannot apply a chunk twice.
+
+    Returns:
+        int: Number of rows applied to at least one instalment
+    """
+    today = timezone.localdate()
+    now = timezone.now()
+
+    with transaction.atomic():
+        remittance = CheckoffRemittance.objects.select_for_update().get(
+            pk=remittance_id,
+        )
+        if remittance.status != CheckoffRemittance.Status.PROCESSING:
+            raise ValueError('Remittance is not being processed.')
+        if remittance.processed_rows != offset:
+            raise ValueError(
+                'Remittance was advanced by another run; restart it.'
+            )
+
+        exceptions = []
+        payments = []
+        for row_number, member_number, raw_amount in rows:
+            member_number = _member_number(member_number)
+            amount = _parse_amount(raw_amount)
+            if not member_number:
+                reason = 'Missing member number.'
+            elif amount is None:
+                reason = 'Invalid amount.'
+            else:
+                payments.append((row_number, member_number, amount))
+                continue
+
+            exceptions.append(
+                _exception(row_number, member_number, raw_amount, reason),
+            )
+
+        membership_ids = dict(
+            Membership.objects.filter(
+                sacco_id=remittance.sacco_id,
+                member_number__in={payment[1] for payment in payments},
+            ).values_list('member_number', 'id')
+        )
+        loans_by_membership = _lock_repayable_loans(membership_ids.values())
+        instalments_by_loan = _unpaid_instalments(loans_by_membership)
+
+        changed_instalments = {}
+        applied_by_loan = defaultdict(Decimal)
+        ledger_entries = []
+        matched_rows = 0
+        amount_applied = Decimal('0.00')
+
+        for row_number, member_number, amount in payments:
+            membership_id = membership_ids.get(member_number)
+            if membership_id is None:
+                exceptions.append(
+                    _exception(
+                        row_number,
+                        member_number,
+                        amount,
+                        'Unknown member number.',
+                    ),
+                )
+                continue
+
+            remaining = amount
+            row_allocations = []
+            for loan in loans_by_membership.get(membership_id, []):
+                applied, remaining = _allocate(
+                    instalments_by_loan[loan.pk],
+                    remaining,
+                    today,
+                    changed_instalments,
+                )
+                if applied:
+                    row_allocations.append((loan, applied))
+                if remaining <= Decimal('0.00'):
+                    break
+
+            if not row_allocations:
+                exceptions.append(
+                    _exception(
+                        row_number,
+                        member_number,
+                        amount,
+                        'No unpaid loan instalments.',
+                    ),
+                )
+                continue
+
+            matched_rows += 1
+            for index, (loan, applied) in enumerate(row_allocations):
+                applied_by_loan[loan.pk] += applied
+                amount_applied += applied
+                ledger_entries.append(
+                    {
+                        'membership': membership_id,
+                        'entry_type': LedgerEntry.EntryType.CREDIT,
+                        'category': LedgerEntry.Category.LOAN_REPAYMENT,
+                        'amount': applied,
+                        'description': (
+                            f'Payroll check-off repayment -- '
+                            f'{remittance.file_name}, row {row_number}.'
+                        )[:255],
+                        'reference': (
+                            f'CHECKOFF-{remittance.pk}-{row_number}-{index}'
+                        ),
+                    }
+                )
+
+            if remaining > Decimal('0.00'):
+                exception = _exception(
+                    row_number,
+                    member_number,
+                    amount,
+                    'Amount exceeds instalments due.',
+                )
+                exception['unapplied_amount'] = str(remaining)
+                exceptions.append(exception)
+
+        RepaymentSchedule.objects.bulk_update(
+            changed_instalments.values(),
+            ['status', 'paid_amount', 'paid_date'],
+            batch_size=LOAN_UPDATE_BATCH_SIZE,
+        )
+        create_ledger_entries(ledger_entries)
+        _reduce_outstanding_balances(applied_by_loan, now)
+
+        remittance.processed_rows += len(rows)
+        remittance.matched_rows += matched_rows
+        remittance.unmatched_rows += len(rows) - matched_rows
+        remittance.amount_received += sum(
+            (payment[2] for payment in payments),
+            Decimal('0.00'),
+        )
+        remittance.amount_applied += amount_applied
+        exceptions.sort(key=lambda exception: exception['row'])
+        remittance.exceptions = remittance.exceptions + exceptions
+        remittance.save(
+            update_fields=[
+                'processed_rows',
+                'matched_rows',
+                'unmatched_rows',
+                'amount_received',
+                'amount_applied',
+                'exceptions',
+            ]
+        )
+        return matched_rows
+
+
+def finalize_checkoff_remittance(remittance_id):
+    """Mark a processing remittance COMPLETED."""
+    with transaction.atomic():
+        remittance = CheckoffRemittance.objects.select_for_update().get(
+            pk=remittance_id,
+        )
+        if remittance.status == CheckoffRemittance.Status.PROCESSING:
+            remittance.status = CheckoffRemittance.Status.COMPLETED
+            remittance.completed_at = timezone.now()
+            remittance.save(update_fields=['status', 'completed_at'])
+        return remittance
+
+
+def fail_checkoff_remittance(remittance_id, error_message):
+    """
+    Mark a remittance as failed without undoing its committed chunks.
+
+    Processing it again resumes after the last committed row.
+    """
+    CheckoffRemittance.objects.filter(
+        pk=remittance_id,
+        status=CheckoffRemittance.Status.PROCESSING,
+    ).update(
+        status=CheckoffRemittance.Status.FAILED,
+        error_message=str(error_message)[:1000],
+        completed_at=timezone.now(),
+    )
+
+
+def _lock_repayable_loans(membership_ids):
+    # Lock in primary-key order so concurrent repayment paths cannot
+    # deadlock, then order each member's loans oldest first.
+    loans = Loan.objects.select_for_update().filter(
+        membership_id__in=list(membership_ids),
+        status__in=REPAYABLE_LOAN_STATUSES,
+    ).order_by('pk').only('pk', 'membership_id', 'created_at')
+
+    loans_by_membership = defaultdict(list)
+    for loan in loans:
+        loans_by_membership[loan.membership_id].append(loan)
+    for member_loans in loans_by_membership.values():
+        member_loans.sort(key=lambda loan: (loan.created_at, loan.pk))
+    return loans_by_membership
+
+
+def _unpaid_instalments(loans_by_membership):
+    loan_ids = [
+        loan.pk
+        for member_loans in loans_by_membership.values()
+        for loan in member_loans
+    ]
+    instalments_by_loan = defaultdict(list)
+    if not loan_ids:
+        return instalments_by_loan
+
+    instalments = RepaymentSchedule.objects.filter(
+        loan_id__in=loan_ids,
+        status__in=UNPAID_INSTALMENT_STATUSES,
+    ).order_by('loan_id', 'instalment_number').only(
+        'pk',
+        'loan_id',
+        'amount',
+        'paid_amount',
+        'paid_date',
+        'status',
+    )
+    for instalment in instalments:
+        instalments_by_loan[instalment.loan_id].append(instalment)
+    return instalments_by_loan
+
+
+def _allocate(instalments, amount, paid_date, changed_instalments):
+    """Apply ``amount`` across instalments in order; return applied, left."""
+    applied = Decimal('0.00')
+    remaining = amount
+    for instalment in instalments:
+        if remaining <= Decimal('0.00'):
+            break
+
+        already_paid = instalment.paid_amount or Decimal('0.00')
+        amount_due = instalment.amount - already_paid
+        if amount_due <= Decimal('0.00'):
+            continue
+
+        payment = min(remaining, amount_due)
+        instalment.paid_amount = already_paid + payment
+        instalment.paid_date = paid_date
+        if instalment.paid_amount < instalment.amount:
+            instalment.status = RepaymentSchedule.Status.PARTIAL
+        else:
+            instalment.status = RepaymentSchedule.Status.PAID
+        changed_instalments[instalment.pk] = instalment
+        remaining -= payment
+        applied += payment
+
+    return applied, remaining
+
+
+def _reduce_outstanding_balances(applied_by_loan, now):
+    loan_ids = list(applied_by_loan)
+    for start in range(0, len(loan_ids), LOAN_UPDATE_BATCH_SIZE):
+        batch = loan_ids[start:start + LOAN_UPDATE_BATCH_SIZE]
+        Loan.objects.filter(pk__in=batch).update(
+            outstanding_balance=Greatest(
+                F('outstanding_balance') - Case(
+                    *[
+                        When(pk=loan_id, then=Value(applied_by_loan[loan_id]))
+                        for loan_id in batch
+                    ],
+                    default=Value(Decimal('0.00')),
+                    output_field=MONEY_FIELD,
+                ),
+                Value(Decimal('0.00')),
+                output_field=MONEY_FIELD,
+            ),
+            updated_at=now,
+        )
+
+
+def _member_number(value):
+    if isinstance(value, float) and value.is_integer():
+        # Spreadsheets store numeric member numbers as floats.
+        value = int(value)
+    return str(value or '').strip()
+
+
+def _parse_amount(value):
+    if value in (None, ''):
+        return None
+
+    try:
+        amount = Decimal(str(value).replace(',', '').strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+    if not amount.is_finite() or amount <= Decimal('0.00'):
+        return None
+    return amount.quantize(Decimal('0.01'))
+
+
+def _exception(row_number, member_number, amount, reason):
+    return {
+        'row': row_number,
+        'member_number': member_number,
+        'amount': '' if amount is None else str(amount),
+        'reason': reason,
+    }
+
+
+def _normalize_header(value):
+    normalized = str(value or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(normalized, normalized)
+
+
+def _cell(values, index):
+    if index >= len(values):
+        return None
+    return values[index]
+
+
+def _iter_csv(file_obj):
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    yield from csv.reader(codecs.iterdecode(file_obj, 'utf-8-sig'))
+
+
+def _iter_xlsx(file_obj):
+    if hasattr(file_obj, 'seek'):
+        file_obj.seek(0)
+    workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    try:
+        yield from workbook.active.iter_rows(values_only=True)
+    finally:
+        workbook.close()
@@ -1,16 +1,37 @@
 """Dividend calculation engine for SACCO dividend declarations."""
 
+import logging
 from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
+from django.conf import settings
 from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    Q,
+    Sum,
+    Value,
+    When,
+)
 from django.utils import timezone
 from dateutil.relativedelta import relativedelta
 
+from ledger.engines.balance_calculator import get_as_of_cutoff
 from ledger.models import LedgerEntry
-from services.models import DividendDeclaration, DividendPayout, Saving
+from services.models import (
+    DividendCalculationRun,
+    DividendDeclaration,
+    DividendPayout,
+    Saving,
+)
 
 
+logger = logging.getLogger('saccosphere.services')
+
+DIVIDEND_CHUNK_SIZE = 1000
 MONEY_QUANTIZER = Decimal('0.01')
 ONE_HUNDRED = Decimal('100')
 TWELVE = Decimal('12')
@@ -40,7 +61,95 @@ def calculate_average_balance(saving, period_start, period_end):
     if period_end < period_start:
         raise ValueError('period_end cannot be before period_start.')
 
-    # Generate month-end dates within the period.
+    month_end_dates = get_month_end_dates(period_start, period_end)
+
+    # Average-monthly-balance method: sample each month-end balance and take
+    # the simple average. This must be reviewed against the SACCO's bylaws
+    # because some SACCOs require a stricter minimum-balance or day-weighted
+    # dividend method.
+    balances = []
+    for month_end_date in month_end_dates:
+        balance = _get_saving_balance_at_date(saving, month_end_date)
+        balances.append(Decimal(balance))
+
+    return _average(balances)
+
+
+def calculate_average_balances(savings, period_start, period_end):
+    """
+    Calculate average monthly balances for many saving accounts at once.
+
+    Produces the same averages as calculate_average_balance, but reads the
+    whole period with one grouped query: every ledger row is bucketed by the
+    first month-end it falls on or before, summed per (saving, bucket), and
+    the month-end balances are rebuilt as running totals in Python.
+
+    Args:
+        savings: Saving queryset
+        period_start: datetime.date - start of calculation period
+        period_end: datetime.date - end of calculation period
+
+    Returns:
+        dict: {saving_id: Decimal average balance}
+    """
+    if period_end < period_start:
+        raise ValueError('period_end cannot be before period_start.')
+
+    month_end_dates = get_month_end_dates(period_start, period_end)
+    cutoffs = [get_as_of_cutoff(month_end) for month_end in month_end_dates]
+    bucket = Case(
+        *(
+            When(created_at__lt=cutoff, then=Value(index))
+            for index, cutoff in enumerate(cutoffs)
+        ),
+        output_field=IntegerField(),
+    )
+    movements = LedgerEntry.objects.filter(
+        transaction__mpesa__related_saving__in=savings.values('pk'),
+        membership_id=F('transaction__mpesa__related_saving__membership_id'),
+        created_at__lt=cutoffs[-1],
+    ).annotate(
+        saving_id=F('transaction__mpesa__related_saving_id'),
+        bucket=bucket,
+    ).values('saving_id', 'bucket').annotate(
+        credits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.CREDIT),
+        ),
+        debits=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.DEBIT),
+        ),
+    ).order_by()
+
+    net_by_saving = {}
+    for row in movements:
+        net_movements = net_by_saving.setdefault(
+            row['saving_id'],
+            [Decimal('0.00')] * len(cutoffs),
+        )
+        net_movements[row['bucket']] += (
+            (row['credits'] or Decimal('0.00'))
+            - (row['debits'] or Decimal('0.00'))
+        )
+
+    averages = {}
+    for saving_id in savings.values_list('pk', flat=True):
+        running_balance = Decimal('0.00')
+        balances = []
+        for net_movement in net_by_saving.get(
+            saving_id,
+            [Decimal('0.00')] * len(cutoffs),
+        ):
+            running_balance += net_movement
+            balances.append(running_balance)
+        averages[saving_id] = _average(balances)
+
+    return averages
+
+
+def get_month_end_dates(period_start, period_end):
+    """Return the month-end sampling dates for a dividend period."""
     month_end_dates = []
     current = (
         period_start.replace(day=1)
@@ -56,15 +165,10 @@ def calculate_average_balance(saving, period_start, period_end):
     if not month_end_dates:
         month_end_dates = [period_end]
 
-    # Average-monthly-balance method: sample each month-end balance and take
-    # the simple average. This must be reviewed against the SACCO's bylaws
-    # because some SACCOs require a stricter minimum-balance or day-weighted
-    # dividend method.
-    balances = []
-    for month_end_date in month_end_dates:
-        balance = _get_saving_balance_at_date(saving, month_end_date)
-        balances.append(Decimal(balance))
+    return month_end_dates
 
+
+def _average(balances):
     if not balances:
         return Decimal('0.00')
 
@@ -118,86 +222,183 @@ def calculate_dividends_for_declaration(declaration):
         }
 
     Raises:
-        ValueError: If declaration status is APPROVED or DISBURSED
+        ValueError: If declaration status is APPROVED, DISBURSED or
+            CALCULATING
     """
     with transaction.atomic():
         declaration = DividendDeclaration.objects.select_for_update().get(
             pk=declaration.pk,
         )
-
-        if declaration.status in [
-            DividendDeclaration.Status.APPROVED,
-            DividendDeclaration.Status.DISBURSED,
-        ]:
-            raise ValueError(
-                'Cannot recalculate dividends for declaration with status '
-                f'{declaration.status}.'
-            )
+        _ensure_can_calculate(declaration)
 
         if declaration.payouts.exists():
             declaration.payouts.all().delete()
 
-        eligible_savings = Saving.objects.filter(
-            membership__sacco=declaration.sacco,
-            savings_type=declaration.savings_type,
-            dividend_eligible=True,
-        ).select_related('membership')
+        payout_records = build_dividend_payouts(
+            declaration,
+            get_eligible_savings(declaration),
+        )
+        total_dividend_amount = sum(
+            (payout.dividend_amount for payout in payout_records),
+            Decimal('0.00'),
+        )
 
-        months_in_period = Decimal(
-            (
-                (
-                    declaration.period_end.year
-                    - declaration.period_start.year
-                )
-                * 12
-            )
-            + (
-                declaration.period_end.month
-                - declaration.period_start.month
-            )
-            + 1
+        DividendPayout.objects.bulk_create(payout_records, batch_size=500)
+
+        declaration.total_dividend_amount = total_dividend_amount.quantize(
+            MONEY_QUANTIZER,
+            rounding=ROUND_HALF_UP,
+        )
+        declaration.status = DividendDeclaration.Status.CALCULATED
+        declaration.calculated_at = timezone.now()
+        declaration.save(
+            update_fields=[
+                'total_dividend_amount',
+                'status',
+                'calculated_at',
+            ]
         )
 
-        payout_records = []
-        total_dividend_amount = Decimal('0.00')
+        return {
+            'total_dividend_amount': declaration.total_dividend_amount,
+            'payout_count': len(payout_records),
+        }
 
-        for saving in eligible_savings:
-            average_balance = calculate_average_balance(
-                saving,
-                declaration.period_start,
-                declaration.period_end,
-            )
 
-            dividend_amount = (
-                average_balance
-                * declaration.declared_rate
-                / ONE_HUNDRED
-                * (months_in_period / TWELVE)
-            )
-            dividend_amount = dividend_amount.quantize(
-                MONEY_QUANTIZER,
-                rounding=ROUND_HALF_UP,
-            )
+def start_dividend_calculation(
+    declaration,
+    requested_by=None,
+    chunk_size=DIVIDEND_CHUNK_SIZE,
+):
+    """
+    Prepare a chunked dividend calculation and return its run.
 
-            payout_records.append(
-                DividendPayout(
-                    declaration=declaration,
-                    membership=saving.membership,
-                    saving=saving,
-                    average_balance=average_balance,
-                    dividend_amount=dividend_amount,
-                    status=DividendPayout.Status.PENDING,
-                )
-            )
+    The declaration row is locked only while its old payouts are cleared and
+    it is moved to CALCULATING. Eligible savings are split into chunks of
+    consecutive primary keys; each chunk is later calculated on its own by
+    calculate_dividend_chunk, and finalize_dividend_calculation sets the
+    declaration total once every chunk has been written.
+
+    Raises:
+        ValueError: If the declaration cannot be recalculated
+    """
+    with transaction.atomic():
+        declaration = DividendDeclaration.objects.select_for_update().get(
+            pk=declaration.pk,
+        )
+        _ensure_can_calculate(declaration)
+
+        declaration.payouts.all().delete()
+        declaration.status = DividendDeclaration.Status.CALCULATING
+        declaration.total_dividend_amount = Decimal('0.00')
+        declaration.calculated_at = None
+        declaration.save(
+            update_fields=[
+                'status',
+                'total_dividend_amount',
+                'calculated_at',
+            ]
+        )
+
+        chunk_bounds = []
+        total_savings = 0
+        saving_ids = get_eligible_savings(declaration).order_by(
+            'pk',
+        ).values_list('pk', flat=True)
+        for saving_id in saving_ids.iterator(chunk_size=chunk_size):
+            if total_savings % chunk_size == 0:
+                chunk_bounds.append([str(saving_id), str(saving_id)])
+            else:
+                chunk_bounds[-1][1] = str(saving_id)
+            total_savings += 1
+
+        return DividendCalculationRun.objects.create(
+            declaration=declaration,
+            requested_by=requested_by,
+            chunk_bounds=chunk_bounds,
+            total_savings=total_savings,
+        )
 
-            total_dividend_amount += dividend_amount
 
+def calculate_dividend_chunk(run_id, chunk_index):
+    """
+    Write the payouts for one chunk of a dividend calculation run.
+
+    Re-running a chunk replaces its payouts, so a retried task never
+    duplicates rows or double counts progress.
+
+    Returns:
+        int: Number of payouts written for the chunk
+    """
+    run = DividendCalculationRun.objects.select_related(
+        'declaration',
+    ).get(pk=run_id)
+    if run.status != DividendCalculationRun.Status.RUNNING:
+        return 0
+
+    first_saving_id, last_saving_id = run.chunk_bounds[chunk_index]
+    declaration = run.declaration
+    savings = get_eligible_savings(declaration).filter(
+        pk__gte=first_saving_id,
+        pk__lte=last_saving_id,
+    )
+    payout_records = build_dividend_payouts(declaration, savings)
+
+    with transaction.atomic():
+        DividendPayout.objects.filter(
+            declaration=declaration,
+            saving__in=savings.values('pk'),
+        ).delete()
         DividendPayout.objects.bulk_create(payout_records, batch_size=500)
 
-        declaration.total_dividend_amount = total_dividend_amount.quantize(
-            MONEY_QUANTIZER,
-            rounding=ROUND_HALF_UP,
+        run = DividendCalculationRun.objects.select_for_update().get(
+            pk=run_id,
+        )
+        if chunk_index not in run.completed_chunk_indexes:
+            run.completed_chunk_indexes.append(chunk_index)
+            run.payouts_written += len(payout_records)
+            run.save(
+                update_fields=['completed_chunk_indexes', 'payouts_written'],
+            )
+
+    return len(payout_records)
+
+
+def finalize_dividend_calculation(run_id):
+    """
+    Set the declaration total once every chunk of a run has been written.
+
+    Returns:
+        dict: {
+            'total_dividend_amount': Decimal,
+            'payout_count': int,
+        }
+    """
+    with transaction.atomic():
+        run = DividendCalculationRun.objects.select_for_update().get(
+            pk=run_id,
+        )
+        declaration = DividendDeclaration.objects.select_for_update().get(
+            pk=run.declaration_id,
         )
+        if run.status != DividendCalculationRun.Status.RUNNING:
+            raise ValueError(
+                f'Cannot finalize dividend calculation run with status '
+                f'{run.status}.'
+            )
+        if run.chunks_done != run.total_chunks:
+            raise ValueError(
+                f'Dividend calculation run has {run.chunks_done} of '
+                f'{run.total_chunks} chunks written.'
+            )
+
+        totals = declaration.payouts.aggregate(
+            total=Sum('dividend_amount'),
+            count=Count('id'),
+        )
+        declaration.total_dividend_amount = (
+            totals['total'] or Decimal('0.00')
+        ).quantize(MONEY_QUANTIZER, rounding=ROUND_HALF_UP)
         declaration.status = DividendDeclaration.Status.CALCULATED
         declaration.calculated_at = timezone.now()
         declaration.save(
@@ -208,7 +409,158 @@ def calculate_dividends_for_declaration(declaration):
             ]
         )
 
+        run.status = DividendCalculationRun.Status.COMPLETED
+        run.payouts_written = totals['count']
+        run.completed_at = declaration.calculated_at
+        run.save(update_fields=['status', 'payouts_written', 'completed_at'])
+
         return {
             'total_dividend_amount': declaration.total_dividend_amount,
-            'payout_count': len(payout_records),
+            'payout_count': totals['count'],
         }
+
+
+def fail_dividend_calculation(run_id, error_message):
+    """
+    Mark a run as failed and return its declaration to DRAFT.
+
+    Payouts written by the chunks that did finish are discarded, so the
+    declaration never shows a partial total.
+    """
+    with transaction.atomic():
+        run = DividendCalculationRun.objects.select_for_update().get(
+            pk=run_id,
+        )
+        if run.status != DividendCalculationRun.Status.RUNNING:
+            return run
+
+        declaration = DividendDeclaration.objects.select_for_update().get(
+            pk=run.declaration_id,
+        )
+        if declaration.status == DividendDeclaration.Status.CALCULATING:
+            declaration.payouts.all().delete()
+            declaration.status = DividendDeclaration.Status.DRAFT
+            declaration.save(update_fields=['status'])
+
+        run.status = DividendCalculationRun.Status.FAILED
+        run.error_message = str(error_message)[:1000]
+        run.completed_at = timezone.now()
+        run.save(update_fields=['status', 'error_message', 'completed_at'])
+        return run
+
+
+def _ensure_can_calculate(declaration):
+    if declaration.status in [
+        DividendDeclaration.Status.APPROVED,
+        DividendDeclaration.Status.DISBURSING,
+        DividendDeclaration.Status.DISBURSED,
+    ]:
+        raise ValueError(
+            'Cannot recalculate dividends for declaration with status '
+            f'{declaration.status}.'
+        )
+    if declaration.status == DividendDeclaration.Status.CALCULATING:
+        _take_over_stale_calculation(declaration)
+
+
+def _take_over_stale_calculation(declaration):
+    """
+    Fail a CALCULATING declaration's run once it has gone stale.
+
+    A run whose chord was never queued, lost its message or lost its
+    worker before the errback fired never leaves RUNNING. Once it is
+    older than DIVIDEND_CALCULATION_STALE_MINUTES it is marked FAILED so
+    the caller can start over; a younger run still blocks recalculation.
+    The caller holds the declaration lock.
+    """
+    run = declaration.calculation_runs.filter(
+        status=DividendCalculationRun.Status.RUNNING,
+    ).first()
+    stale_before = timezone.now() - timedelta(
+        minutes=settings.DIVIDEND_CALCULATION_STALE_MINUTES,
+    )
+    if run is not None and run.started_at >= stale_before:
+        raise ValueError(
+            'Dividends for this declaration are already being calculated.'
+        )
+
+    if run is not None:
+        run.status = DividendCalculationRun.Status.FAILED
+        run.error_message = (
+            f'Calculation did not finish within '
+            f'{settings.DIVIDEND_CALCULATION_STALE_MINUTES} minutes.'
+        )
+        run.completed_at = timezone.now()
+        run.save(update_fields=['status', 'error_message', 'completed_at'])
+    logger.warning(
+        'Taking over stale dividend calculation for declaration %s.',
+        declaration.pk,
+    )
+
+
+def get_eligible_savings(declaration):
+    """Return the dividend-eligible savings covered by a declaration."""
+    return Saving.objects.filter(
+        membership__sacco=declaration.sacco,
+        savings_type=declaration.savings_type,
+        dividend_eligible=True,
+    )
+
+
+def build_dividend_payouts(declaration, savings):
+    """
+    Build unsaved PENDING DividendPayout rows for a batch of savings.
+
+    Average balances for the whole batch come from
+    calculate_average_balances, so the cost is a fixed number of queries
+    regardless of how many savings the batch holds.
+    """
+    average_balances = calculate_average_balances(
+        savings,
+        declaration.period_start,
+        declaration.period_end,
+    )
+    months_in_period = Decimal(
+        (
+            (
+                declaration.period_end.year
+                - declaration.period_start.year
+            )
+            * 12
+        )
+        + (
+            declaration.period_end.month
+            - declaration.period_start.month
+        )
+        + 1
+    )
+
+    payout_records = []
+    for saving_id, membership_id in savings.order_by().values_list(
+        'pk',
+        'membership_id',
+    ):
+        average_balance = average_balances[saving_id]
+        dividend_amount = (
+            average_balance
+            * declaration.declared_rate
+            / ONE_HUNDRED
+            * (months_in_period / TWELVE)
+        )
+        dividend_amount = dividend_amount.quantize(
+            MONEY_QUANTIZER,
+            rounding=ROUND_HALF_UP,
+        )
+
+        payout_records.append(
+            DividendPayout(
+                declaration=declaration,
+                membership_id=membership_id,
+                saving_id=saving_id,
+                average_balance=average_balance,
+                dividend_amount=dividend_amount,
+                status=DividendPayout.Status.PENDING,
+            )
+        )
+
+    return payout_records
@@ -0,0 +1,235 @@
+"""Chunked, resumable disbursement of approved dividend payouts."""
+
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    DecimalField,
+    F,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from ledger.models import LedgerEntry
+from ledger.utils import create_ledger_entries
+from services.models import (
+    DividendDeclaration,
+    DividendDisbursementRun,
+    DividendPayout,
+    Saving,
+)
+
+
+DISBURSEMENT_CHUNK_SIZE = 1000
+SAVING_CREDIT_BATCH_SIZE = 500
+
+
+def start_dividend_disbursement(declaration, requested_by=None):
+    """
+    Move an approved declaration to DISBURSING and return its run.
+
+    Calling this again for a declaration that is already DISBURSING reopens
+    its latest run instead, so a disbursement that crashed part way resumes
+    from the payouts that are still PENDING.
+
+    Raises:
+        ValueError: If the declaration is neither APPROVED nor DISBURSING
+    """
+    with transaction.atomic():
+        declaration = DividendDeclaration.objects.select_for_update().get(
+            pk=declaration.pk,
+        )
+
+        if declaration.status == DividendDeclaration.Status.DISBURSING:
+            run = declaration.disbursement_runs.select_for_update().first()
+            if run is not None:
+                if run.status != DividendDisbursementRun.Status.RUNNING:
+                    run.status = DividendDisbursementRun.Status.RUNNING
+                    run.error_message = ''
+                    run.completed_at = None
+                    run.save(
+                        update_fields=[
+                            'status',
+                            'error_message',
+                            'completed_at',
+                        ]
+                    )
+                return run
+        elif declaration.status != DividendDeclaration.Status.APPROVED:
+            raise ValueError(
+                'Can only disburse declarations in APPROVED status.'
+            )
+
+        declaration.status = DividendDeclaration.Status.DISBURSING
+        declaration.save(update_fields=['status'])
+
+        already_paid = ~Q(status=DividendPayout.Status.PENDING)
+        totals = declaration.payouts.aggregate(
+            total=Count('id'),
+            paid=Count('id', filter=already_paid),
+            amount=Sum('dividend_amount', filter=already_paid),
+        )
+        return DividendDisbursementRun.objects.create(
+            declaration=declaration,
+            requested_by=requested_by,
+            total_payouts=totals['total'],
+            payouts_paid=totals['paid'],
+            amount_paid=totals['amount'] or Decimal('0.00'),
+        )
+
+
+def disburse_dividends(run_id, chunk_size=DISBURSEMENT_CHUNK_SIZE):
+    """
+    Pay every PENDING payout of a run, one committed chunk at a time.
+
+    Returns:
+        dict: {
+            'status': str,
+            'payouts_paid': int,
+            'amount_paid': Decimal,
+        }
+    """
+    while disburse_dividend_chunk(run_id, chunk_size=chunk_size):
+        pass
+
+    run = finalize_dividend_disbursement(run_id)
+    return {
+        'status': run.status,
+        'payouts_paid': run.payouts_paid,
+        'amount_paid': run.amount_paid,
+    }
+
+
+def disburse_dividend_chunk(run_id, chunk_size=DISBURSEMENT_CHUNK_SIZE):
+    """
+    Credit the next chunk of PENDING payouts for a disbursement run.
+
+    Ledger entries are bulk posted with their running balances, savings are
+    credited with one F() update per batch and the payouts are flipped to
+    PAID, all in one transaction. A chunk is therefore either fully paid or
+    not paid at all, and a retried chunk only sees payouts still PENDING.
+
+    Returns:
+        int: Number of payouts paid by this chunk
+    """
+    with transaction.atomic():
+        run = DividendDisbursementRun.objects.select_for_update().select_related(
+            'declaration',
+        ).get(pk=run_id)
+        if run.status != DividendDisbursementRun.Status.RUNNING:
+            return 0
+
+        declaration = run.declaration
+        payouts = list(
+            declaration.payouts.select_for_update().filter(
+                status=DividendPayout.Status.PENDING,
+            ).order_by('pk').values(
+                'pk',
+                'membership_id',
+                'saving_id',
+                'dividend_amount',
+            )[:chunk_size]
+        )
+        if not payouts:
+            return 0
+
+        create_ledger_entries(
+            [
+                {
+                    'membership': payout['membership_id'],
+                    'entry_type': LedgerEntry.EntryType.CREDIT,
+                    'category': LedgerEntry.Category.DIVIDEND_PAYOUT,
+                    'amount': payout['dividend_amount'],
+                    'description': (
+                        f'Dividend payout for {declaration.financial_year}'
+                    ),
+                    'reference': f'DIV-{declaration.id}-{payout["pk"]}',
+                }
+                for payout in payouts
+            ]
+        )
+        _credit_savings(payouts)
+        DividendPayout.objects.filter(
+            pk__in=[payout['pk'] for payout in payouts],
+        ).update(status=DividendPayout.Status.PAID)
+
+        run.payouts_paid += len(payouts)
+        run.amount_paid += sum(
+            (payout['dividend_amount'] for payout in payouts),
+            Decimal('0.00'),
+        )
+        run.chunks_done += 1
+        run.save(update_fields=['payouts_paid', 'amount_paid', 'chunks_done'])
+        return len(payouts)
+
+
+def finalize_dividend_disbursement(run_id):
+    """Mark the declaration DISBURSED once no payout is left PENDING."""
+    with transaction.atomic():
+        run = DividendDisbursementRun.objects.select_for_update().get(
+            pk=run_id,
+        )
+        if run.status != DividendDisbursementRun.Status.RUNNING:
+            return run
+
+        declaration = DividendDeclaration.objects.select_for_update().get(
+            pk=run.declaration_id,
+        )
+        if declaration.payouts.filter(
+            status=DividendPayout.Status.PENDING,
+        ).exists():
+            raise ValueError(
+                'Dividend disbursement still has PENDING payouts.'
+            )
+
+        declaration.status = DividendDeclaration.Status.DISBURSED
+        declaration.save(update_fields=['status'])
+
+        run.status = DividendDisbursementRun.Status.COMPLETED
+        run.completed_at = timezone.now()
+        run.save(update_fields=['status', 'completed_at'])
+        return run
+
+
+def fail_dividend_disbursement(run_id, error_message):
+    """
+    Mark a run as failed without undoing the chunks already paid.
+
+    The declaration stays DISBURSING, so posting to the disburse endpoint
+    again resumes the run from its remaining PENDING payouts.
+    """
+    DividendDisbursementRun.objects.filter(
+        pk=run_id,
+        status=DividendDisbursementRun.Status.RUNNING,
+    ).update(
+        status=DividendDisbursementRun.Status.FAILED,
+        error_message=str(error_message)[:1000],
+        completed_at=timezone.now(),
+    )
+
+
+def _credit_savings(payouts):
+    now = timezone.now()
+    for start in range(0, len(payouts), SAVING_CREDIT_BATCH_SIZE):
+        batch = payouts[start:start + SAVING_CREDIT_BATCH_SIZE]
+        Saving.objects.filter(
+            pk__in=[payout['saving_id'] for payout in batch],
+        ).update(
+            amount=F('amount') + Case(
+                *[
+                    When(
+                        pk=payout['saving_id'],
+                        then=Value(payout['dividend_amount']),
+                    )
+                    for payout in batch
+                ],
+                default=Value(Decimal('0.00')),
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+            updated_at=now,
+        )
@@ -1,12 +1,16 @@
 """Liquidity risk calculations for SACCO loan disbursements."""
 
+from datetime import timedelta
 from decimal import Decimal, ROUND_HALF_UP
 
-from django.db.models import Sum
+from django.db import transaction
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.utils import timezone
 
-from accounts.models import SaccoSettings
+from accounts.models import Sacco, SaccoSettings
+from ledger.engines.balance_calculator import get_as_of_cutoff
 from ledger.models import LedgerEntry
-from services.models import Loan
+from services.models import Loan, SaccoLiquiditySnapshot
 
 
 MONEY_ZERO = Decimal('0.00')
@@ -33,60 +37,243 @@ PENDING_DISBURSEMENT_STATUSES = (
 
 def get_available_liquid_reserves(sacco):
     """Return cash-like ledger credits less cash-like ledger debits."""
-    cash_in = _sum_ledger_amounts(
-        sacco=sacco,
-        categories=CASH_IN_CATEGORIES,
-        entry_type=LedgerEntry.EntryType.CREDIT,
+    return get_available_liquid_reserves_by_sacco([sacco.pk])[sacco.pk]
+
+
+def get_available_liquid_reserves_by_sacco(sacco_ids):
+    """
+    Return liquid reserves for many SACCOs from snapshots plus a delta.
+
+    Each SACCO's latest daily snapshot supplies its totals up to the
+    snapshot cutoff; only ledger entries created after the cutoff are
+    summed. SACCOs without a snapshot fall back to a full-history sum.
+
+    Returns:
+        dict: {sacco_id: Decimal reserves}
+    """
+    sacco_ids = list(sacco_ids)
+    snapshots = get_latest_liquidity_snapshots(sacco_ids)
+
+    reserves = {}
+    sacco_ids_by_cutoff = {}
+    for sacco_id in sacco_ids:
+        snapshot = snapshots.get(sacco_id)
+        reserves[sacco_id] = snapshot.reserves if snapshot else MONEY_ZERO
+        sacco_ids_by_cutoff.setdefault(
+            snapshot.cutoff_at if snapshot else None,
+            [],
+        ).append(sacco_id)
+
+    for cutoff_at, cutoff_sacco_ids in sacco_ids_by_cutoff.items():
+        totals = calculate_liquidity_totals(
+            cutoff_sacco_ids,
+            since=cutoff_at,
+        )
+        for sacco_id, (cash_in, cash_out) in totals.items():
+            reserves[sacco_id] += cash_in - cash_out
+
+    return reserves
+
+
+def get_latest_liquidity_snapshots(sacco_ids, before_date=None):
+    """Return {sacco_id: latest SaccoLiquiditySnapshot} in one query."""
+    latest = SaccoLiquiditySnapshot.objects.filter(sacco=OuterRef('sacco'))
+    if before_date is not None:
+        latest = latest.filter(snapshot_date__lt=before_date)
+
+    snapshots = SaccoLiquiditySnapshot.objects.filter(
+        sacco_id__in=list(sacco_ids),
+        pk=Subquery(latest.order_by('-snapshot_date').values('pk')[:1]),
+    )
+    return {snapshot.sacco_id: snapshot for snapshot in snapshots}
+
+
+def calculate_liquidity_totals(sacco_ids=None, since=None, until=None):
+    """
+    Sum cash-like ledger movements per SACCO with one grouped query.
+
+    Args:
+        sacco_ids: SACCO ids to include, or None for every SACCO
+        since: only include entries created at or after this datetime
+        until: only include entries created before this datetime
+
+    Returns:
+        dict: {sacco_id: (cash_in, cash_out)}
+    """
+    queryset = LedgerEntry.objects.filter(
+        Q(
+            category__in=CASH_IN_CATEGORIES,
+            entry_type=LedgerEntry.EntryType.CREDIT,
+        )
+        | Q(
+            category__in=CASH_OUT_CATEGORIES,
+            entry_type=LedgerEntry.EntryType.DEBIT,
+        )
+    )
+    if sacco_ids is not None:
+        queryset = queryset.filter(membership__sacco_id__in=list(sacco_ids))
+    if since is not None:
+        queryset = queryset.filter(created_at__gte=since)
+    if until is not None:
+        queryset = queryset.filter(created_at__lt=until)
+
+    rows = queryset.order_by().values('membership__sacco_id').annotate(
+        cash_in=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.CREDIT),
+        ),
+        cash_out=Sum(
+            'amount',
+            filter=Q(entry_type=LedgerEntry.EntryType.DEBIT),
+        ),
+    )
+    return {
+        row['membership__sacco_id']: (
+            row['cash_in'] or MONEY_ZERO,
+            row['cash_out'] or MONEY_ZERO,
+        )
+        for row in rows
+    }
+
+
+def roll_up_liquidity_snapshots(snapshot_date=None, sacco_ids=None):
+    """
+    Write one liquidity snapshot per SACCO for a closed calendar day.
+
+    Each new snapshot is the previous snapshot plus the entries created
+    between the two cutoffs, so a nightly run only reads one day of ledger
+    rows. SACCOs without an earlier snapshot are summed from full history.
+
+    Args:
+        snapshot_date: Last day to include, defaults to yesterday
+        sacco_ids: SACCO ids to snapshot, defaults to every active SACCO
+
+    Returns:
+        int: Number of snapshots written
+
+    Raises:
+        ValueError: If snapshot_date is not a closed day
+    """
+    snapshot_date = snapshot_date or (
+        timezone.localdate() - timedelta(days=1)
     )
-    cash_out = _sum_ledger_amounts(
-        sacco=sacco,
-        categories=CASH_OUT_CATEGORIES,
-        entry_type=LedgerEntry.EntryType.DEBIT,
+    if snapshot_date >= timezone.localdate():
+        raise ValueError('Liquidity snapshots can only cover closed days.')
+    cutoff_at = get_as_of_cutoff(snapshot_date)
+    if sacco_ids is None:
+        sacco_ids = Sacco.objects.filter(is_active=True).values_list(
+            'pk',
+            flat=True,
+        )
+    sacco_ids = list(sacco_ids)
+    previous_snapshots = get_latest_liquidity_snapshots(
+        sacco_ids,
+        before_date=snapshot_date,
     )
 
-    return cash_in - cash_out
+    sacco_ids_by_cutoff = {}
+    for sacco_id in sacco_ids:
+        previous = previous_snapshots.get(sacco_id)
+        sacco_ids_by_cutoff.setdefault(
+            previous.cutoff_at if previous else None,
+            [],
+        ).append(sacco_id)
+
+    snapshots = []
+    for previous_cutoff_at, cutoff_sacco_ids in sacco_ids_by_cutoff.items():
+        totals = calculate_liquidity_totals(
+            cutoff_sacco_ids,
+            since=previous_cutoff_at,
+            until=cutoff_at,
+        )
+        for sacco_id in cutoff_sacco_ids:
+            previous = previous_snapshots.get(sacco_id)
+            cash_in, cash_out = totals.get(sacco_id, (MONEY_ZERO, MONEY_ZERO))
+            snapshots.append(
+                SaccoLiquiditySnapshot(
+                    sacco_id=sacco_id,
+                    snapshot_date=snapshot_date,
+                    cutoff_at=cutoff_at,
+                    cash_in=(previous.cash_in if previous else MONEY_ZERO)
+                    + cash_in,
+                    cash_out=(previous.cash_out if previous else MONEY_ZERO)
+                    + cash_out,
+                )
+            )
+
+    with transaction.atomic():
+        SaccoLiquiditySnapshot.objects.filter(
+            sacco_id__in=sacco_ids,
+            snapshot_date=snapshot_date,
+        ).delete()
+        SaccoLiquiditySnapshot.objects.bulk_create(snapshots, batch_size=500)
+
+    return len(snapshots)
 
 
 def get_pending_disbursement_total(sacco):
     """Return approved loan principal that has not yet been disbursed."""
-    total = Loan.objects.filter(
-        membership__sacco=sacco,
-        status__in=PENDING_DISBURSEMENT_STATUSES,
-    ).aggregate(total=Sum('amount'))['total']
+    return get_pending_disbursement_totals([sacco.pk]).get(
+        sacco.pk,
+        MONEY_ZERO,
+    )
+
 
-    return total or MONEY_ZERO
+def get_pending_disbursement_totals(sacco_ids):
+    """Return {sacco_id: pending disbursement total} in one query."""
+    rows = Loan.objects.filter(
+        membership__sacco_id__in=list(sacco_ids),
+        status__in=PENDING_DISBURSEMENT_STATUSES,
+    ).order_by().values('membership__sacco_id').annotate(
+        total=Sum('amount'),
+    )
+    return {
+        row['membership__sacco_id']: row['total'] or MONEY_ZERO
+        for row in rows
+    }
 
 
 def check_liquidity_risk(sacco):
     """Return a point-in-time liquidity risk snapshot for a SACCO."""
-    available_reserves = get_available_liquid_reserves(sacco)
-    pending_disbursements = get_pending_disbursement_total(sacco)
-    utilisation_pct = _calculate_utilisation_pct(
-        available_reserves,
-        pending_disbursements,
-    )
-    threshold = _get_liquidity_threshold(sacco)
+    return check_liquidity_risks([sacco])[sacco.pk]
 
-    return {
-        'available_reserves': available_reserves,
-        'pending_disbursements': pending_disbursements,
-        'utilisation_pct': utilisation_pct,
-        'at_risk': utilisation_pct >= threshold,
-    }
 
+def check_liquidity_risks(saccos):
+    """
+    Return liquidity risk for many SACCOs with a fixed number of queries.
+
+    Returns:
+        dict: {sacco_id: risk dict as returned by check_liquidity_risk}
+    """
+    saccos = list(saccos)
+    sacco_ids = [sacco.pk for sacco in saccos]
+    reserves = get_available_liquid_reserves_by_sacco(sacco_ids)
+    pending = get_pending_disbursement_totals(sacco_ids)
 
-def _sum_ledger_amounts(sacco, categories, entry_type):
-    total = LedgerEntry.objects.filter(
-        membership__sacco=sacco,
-        category__in=categories,
-        entry_type=entry_type,
-    ).aggregate(total=Sum('amount'))['total']
+    risks = {}
+    for sacco in saccos:
+        available_reserves = reserves[sacco.pk]
+        pending_disbursements = pending.get(sacco.pk, MONEY_ZERO)
+        utilisation_pct = _calculate_utilisation_pct(
+            available_reserves,
+            pending_disbursements,
+        )
+        threshold = _get_liquidity_threshold(sacco)
+        risks[sacco.pk] = {
+            'available_reserves': available_reserves,
+            'pending_disbursements': pending_disbursements,
+            'utilisation_pct': utilisation_pct,
+            'at_risk': utilisation_pct >= threshold,
+        }
 
-    return total or MONEY_ZERO
+    return risks
 
 
 def _get_liquidity_threshold(sacco):
-    settings, _created = SaccoSettings.objects.get_or_create(sacco=sacco)
+    try:
+        settings = sacco.settings
+    except SaccoSettings.DoesNotExist:
+        settings, _created = SaccoSettings.objects.get_or_create(sacco=sacco)
     return settings.liquidity_threshold_percentage
 
 
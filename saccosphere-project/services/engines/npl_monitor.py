@@ -1,14 +1,16 @@
 """NPL early-warning calculations for loan arrears."""
 
+from django.db.models import Min, Q
 from django.utils import timezone
 
-from services.models import NPLFlag, RepaymentSchedule
+from services.models import Loan, NPLFlag, RepaymentSchedule
 
 
 UNPAID_STATUSES = (
     RepaymentSchedule.Status.PENDING,
     RepaymentSchedule.Status.OVERDUE,
 )
+NPL_FLAG_BATCH_SIZE = 1000
 
 
 def get_arrears_bucket(loan):
@@ -21,7 +23,11 @@ def get_arrears_bucket(loan):
     if earliest_unpaid is None:
         return None
 
-    days_overdue = earliest_unpaid.days_overdue
+    return get_bucket_for_days_overdue(earliest_unpaid.days_overdue)
+
+
+def get_bucket_for_days_overdue(days_overdue):
+    """Return the highest NPL threshold crossed by a days-overdue count."""
     if days_overdue >= 90:
         return 90
     if days_overdue >= 60:
@@ -32,6 +38,38 @@ def get_arrears_bucket(loan):
     return None
 
 
+def get_active_loan_arrears(loans=None, today=None):
+    """
+    Return days overdue for every active loan with one grouped query.
+
+    The earliest unpaid due date of each loan is read as a MIN over its
+    repayment schedule. Loans with no unpaid instalments map to None, loans
+    that are unpaid but not yet late map to 0.
+
+    Returns:
+        dict: {loan_id: int days overdue or None}
+    """
+    today = today or timezone.localdate()
+    if loans is None:
+        loans = Loan.objects.filter(status=Loan.Status.ACTIVE)
+
+    rows = loans.order_by().annotate(
+        earliest_unpaid_due=Min(
+            'schedule__due_date',
+            filter=Q(schedule__status__in=UNPAID_STATUSES),
+        ),
+    ).values_list('id', 'earliest_unpaid_due')
+
+    arrears = {}
+    for loan_id, earliest_unpaid_due in rows.iterator(chunk_size=2000):
+        if earliest_unpaid_due is None:
+            arrears[loan_id] = None
+        else:
+            arrears[loan_id] = max((today - earliest_unpaid_due).days, 0)
+
+    return arrears
+
+
 def resolve_cleared_npl_flags(loan):
     """Resolve open NPL flags when the loan has fully caught up."""
     has_unpaid_schedules = RepaymentSchedule.objects.filter(
@@ -49,3 +87,73 @@ def resolve_cleared_npl_flags(loan):
         resolved=True,
         resolved_at=timezone.now(),
     )
+
+
+def resolve_cleared_npl_flags_for_loans(loan_ids):
+    """Resolve open NPL flags on many fully caught-up loans at once."""
+    loan_ids = list(loan_ids)
+    resolved_count = 0
+    resolved_at = timezone.now()
+
+    for start in range(0, len(loan_ids), NPL_FLAG_BATCH_SIZE):
+        resolved_count += NPLFlag.objects.filter(
+            loan_id__in=loan_ids[start:start + NPL_FLAG_BATCH_SIZE],
+            resolved=False,
+        ).update(
+            resolved=True,
+            resolved_at=resolved_at,
+        )
+
+    return resolved_count
+
+
+def create_missing_npl_flags(buckets):
+    """
+    Bulk create the NPL flags that do not exist yet.
+
+    Flags an overlapping run inserted after the existence check are
+    skipped by the unique constraint instead of aborting the run, and
+    only the flags this call actually stored are returned, so each new
+    flag is notified once.
+
+    Args:
+        buckets: dict of {loan_id: threshold_days}
+
+    Returns:
+        list: Newly created NPLFlag instances
+    """
+    loan_ids = list(buckets)
+    new_flags = []
+
+    for start in range(0, len(loan_ids), NPL_FLAG_BATCH_SIZE):
+        batch = loan_ids[start:start + NPL_FLAG_BATCH_SIZE]
+        existing = set(
+            NPLFlag.objects.filter(loan_id__in=batch).values_list(
+                'loan_id',
+                'threshold_days',
+            )
+        )
+        new_flags.extend(
+            NPLFlag(loan_id=loan_id, threshold_days=buckets[loan_id])
+            for loan_id in batch
+            if (loan_id, buckets[loan_id]) not in existing
+        )
+
+    NPLFlag.objects.bulk_create(
+        new_flags,
+        batch_size=NPL_FLAG_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+    # Ids are generated here, so a skipped flag's id was never stored.
+    created = []
+    for start in range(0, len(new_flags), NPL_FLAG_BATCH_SIZE):
+        created.extend(
+            NPLFlag.objects.filter(
+                id__in=[
+                    flag.id
+                    for flag in new_flags[start:start + NPL_FLAG_BATCH_SIZE]
+                ],
+            )
+        )
+    return created
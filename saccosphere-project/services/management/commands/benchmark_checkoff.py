@@ -0,0 +1,161 @@
+"""Benchmark bulk payroll check-off remittance processing."""
+
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.base import ContentFile
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.benchmark import BenchmarkCommand, seed_members, seed_sacco
+from services.engines.checkoff_remittance import process_checkoff_remittance
+from services.models import (
+    CheckoffRemittance,
+    Loan,
+    LoanType,
+    RepaymentSchedule,
+)
+
+
+INSTALMENT_AMOUNT = Decimal('1000.00')
+
+
+class Command(BenchmarkCommand):
+    """
+    Time check-off remittance ingestion on synthetic SACCOs.
+
+    Each run seeds one SACCO with one active loan per member and a full
+    repayment schedule, builds a CSV remittance with one row per member
+    (plus a few unknown member numbers), processes it and rolls everything
+    back. The target is a 20k-line remittance in under a minute.
+
+    Usage:
+        python manage.py benchmark_checkoff --rows 20000
+    """
+
+    help = 'Benchmark bulk check-off remittance processing.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows',
+            type=int,
+            nargs='+',
+            default=[20000],
+            help='Remittance sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--instalments',
+            type=int,
+            default=12,
+            help='Repayment schedule length per loan.',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=2000,
+            help='Rows applied per committed chunk.',
+        )
+
+    def handle(self, *args, **options):
+        for row_count in options['rows']:
+            self.run_rolled_back(
+                self._run_scenario,
+                row_count,
+                options['instalments'],
+                options['chunk_size'],
+            )
+
+    def _run_scenario(self, row_count, instalments, chunk_size):
+        timings = {}
+        with self.timed(timings, 'seed synthetic data'):
+            sacco, memberships = self._seed(row_count, instalments)
+
+        with self.timed(timings, 'build remittance file'):
+            lines = ['Member Number,Amount']
+            for index, membership in enumerate(memberships):
+                # Every tenth member pays two instalments at once.
+                multiple = 2 if index % 10 == 0 else 1
+                lines.append(
+                    f'{membership.member_number},'
+                    f'{INSTALMENT_AMOUNT * multiple}'
+                )
+            lines.extend(f'UNKNOWN-{index},500.00' for index in range(10))
+            remittance = CheckoffRemittance.objects.create(
+                sacco=sacco,
+                file=ContentFile(
+                    ('\n'.join(lines) + '\n').encode(),
+                    name='benchmark.csv',
+                ),
+                file_name='benchmark.csv',
+            )
+
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                with self.timed(timings, 'process_checkoff_remittance'):
+                    result = process_checkoff_remittance(
+                        remittance.id,
+                        chunk_size=chunk_size,
+                    )
+        finally:
+            remittance.file.delete(save=False)
+
+        self.write_timings(
+            f'{len(lines) - 1:,} remittance rows',
+            timings,
+            rows=len(lines) - 1,
+        )
+        self.stdout.write(
+            f'  queries: {len(queries)}, matched: '
+            f'{result["matched_rows"]:,}, unmatched: '
+            f'{result["unmatched_rows"]:,}, applied: '
+            f'KES {result["amount_applied"]:,.2f}'
+        )
+
+    def _seed(self, member_count, instalments):
+        sacco = seed_sacco('Check-off Benchmark SACCO')
+        loan_type = LoanType.objects.create(
+            sacco=sacco,
+            name='Check-off Benchmark Loan',
+            interest_rate=Decimal('12.00'),
+            max_term_months=instalments,
+            min_amount=INSTALMENT_AMOUNT,
+        )
+        memberships = seed_members(sacco, member_count)
+        principal = INSTALMENT_AMOUNT * instalments
+        loans = Loan.objects.bulk_create(
+            [
+                Loan(
+                    membership=membership,
+                    loan_type=loan_type,
+                    amount=principal,
+                    interest_rate=Decimal('12.00'),
+                    term_months=instalments,
+                    outstanding_balance=principal,
+                    status=Loan.Status.ACTIVE,
+                )
+                for membership in memberships
+            ],
+            batch_size=2000,
+        )
+
+        first_due_date = timezone.localdate() + timedelta(days=30)
+        RepaymentSchedule.objects.bulk_create(
+            [
+                RepaymentSchedule(
+                    loan=loan,
+                    instalment_number=number,
+                    due_date=first_due_date + timedelta(
+                        days=30 * (number - 1),
+                    ),
+                    amount=INSTALMENT_AMOUNT,
+                    principal=Decimal('900.00'),
+                    interest=Decimal('100.00'),
+                    balance_after=INSTALMENT_AMOUNT * (instalments - number),
+                )
+                for loan in loans
+                for number in range(1, instalments + 1)
+            ],
+            batch_size=5000,
+        )
+        return sacco, memberships
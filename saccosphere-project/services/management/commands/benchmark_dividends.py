@@ -0,0 +1,220 @@
+"""Benchmark batched dividend averages against the per-saving path."""
+
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import uuid4
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from config.benchmark import BenchmarkCommand, seed_members, seed_sacco
+from ledger.models import LedgerEntry
+from payments.models import MpesaTransaction, PaymentProvider, Transaction
+from services.engines.dividend_calculator import (
+    calculate_average_balance,
+    calculate_average_balances,
+    calculate_dividends_for_declaration,
+)
+from services.models import DividendDeclaration, Saving, SavingsType
+
+
+PERIOD_START = date(2025, 1, 1)
+PERIOD_END = date(2025, 12, 31)
+HISTORY_MONTHS = [
+    date(2024, 12, 10),
+    *(date(2025, month, 10) for month in range(1, 13)),
+    date(2026, 1, 10),
+]
+
+
+class Command(BenchmarkCommand):
+    """
+    Time dividend averages on synthetic SACCOs.
+
+    Each run seeds one SACCO with the requested number of members, one
+    dividend-eligible BOSA saving per member and a deposit history spread
+    across the declaration period, then rolls everything back. The
+    per-saving path is timed on a sample and extrapolated, because running
+    it for 50k members takes hours.
+
+    Usage:
+        python manage.py benchmark_dividends --members 10000 50000
+    """
+
+    help = 'Benchmark batched vs per-saving dividend average balances.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--members',
+            type=int,
+            nargs='+',
+            default=[10000, 50000],
+            help='Synthetic SACCO sizes to benchmark.',
+        )
+        parser.add_argument(
+            '--deposits',
+            type=int,
+            default=6,
+            help='Ledger deposits per saving across the period.',
+        )
+        parser.add_argument(
+            '--legacy-sample',
+            type=int,
+            default=200,
+            help='Savings timed on the per-saving path.',
+        )
+
+    def handle(self, *args, **options):
+        for member_count in options['members']:
+            self.run_rolled_back(
+                self._run_scenario,
+                member_count,
+                options['deposits'],
+                options['legacy_sample'],
+            )
+
+    def _run_scenario(self, member_count, deposits, legacy_sample):
+        timings = {}
+        with self.timed(timings, 'seed synthetic data'):
+            sacco, savings_type = self._seed(member_count, deposits)
+
+        savings = Saving.objects.filter(
+            membership__sacco=sacco,
+            savings_type=savings_type,
+            dividend_eligible=True,
+        )
+        with CaptureQueriesContext(connection) as batched_queries:
+            with self.timed(timings, 'batched averages (all savings)'):
+                averages = calculate_average_balances(
+                    savings,
+                    PERIOD_START,
+                    PERIOD_END,
+                )
+
+        sample = list(savings.select_related('membership')[:legacy_sample])
+        mismatches = 0
+        with CaptureQueriesContext(connection) as legacy_queries:
+            with self.timed(timings, f'per-saving averages ({len(sample)})'):
+                for saving in sample:
+                    legacy_average = calculate_average_balance(
+                        saving,
+                        PERIOD_START,
+                        PERIOD_END,
+                    )
+                    if legacy_average != averages[saving.id]:
+                        mismatches += 1
+
+        sample_seconds = timings[f'per-saving averages ({len(sample)})']
+        timings['per-saving averages (extrapolated)'] = (
+            sample_seconds / max(len(sample), 1) * member_count
+        )
+
+        declaration = DividendDeclaration.objects.create(
+            sacco=sacco,
+            savings_type=savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=PERIOD_START,
+            period_end=PERIOD_END,
+        )
+        with self.timed(timings, 'calculate_dividends_for_declaration'):
+            result = calculate_dividends_for_declaration(declaration)
+
+        self.write_timings(f'{member_count:,} members', timings)
+        self.stdout.write(
+            f'  batched queries: {len(batched_queries)}, per-saving queries '
+            f'for sample: {len(legacy_queries)}, sample mismatches: '
+            f'{mismatches}, payouts: {result["payout_count"]:,}, '
+            f'total: KES {result["total_dividend_amount"]:,.2f}'
+        )
+
+    def _seed(self, member_count, deposits):
+        sacco = seed_sacco('Dividend Benchmark SACCO')
+        savings_type = SavingsType.objects.create(
+            sacco=sacco,
+            name=SavingsType.Name.BOSA,
+        )
+        provider = PaymentProvider.objects.create(
+            name='Benchmark M-Pesa',
+            provider_type=PaymentProvider.ProviderType.MPESA,
+        )
+        memberships = seed_members(sacco, member_count)
+        savings = Saving.objects.bulk_create(
+            [
+                Saving(
+                    membership=membership,
+                    savings_type=savings_type,
+                    status=Saving.Status.ACTIVE,
+                    dividend_eligible=True,
+                )
+                for membership in memberships
+            ],
+            batch_size=2000,
+        )
+
+        run_id = uuid4().hex[:8]
+        for deposit_number in range(deposits):
+            month_index = deposit_number * len(HISTORY_MONTHS) // deposits
+            self._seed_deposits(
+                provider,
+                savings,
+                f'{run_id}-{deposit_number}',
+                HISTORY_MONTHS[month_index],
+            )
+
+        return sacco, savings_type
+
+    def _seed_deposits(self, provider, savings, batch_id, created_date):
+        transactions = Transaction.objects.bulk_create(
+            [
+                Transaction(
+                    provider=provider,
+                    user_id=saving.membership.user_id,
+                    reference=f'DIVB-{batch_id}-{index}',
+                    transaction_type=Transaction.TransactionType.DEPOSIT,
+                    amount=Decimal(100 + index % 900),
+                    status=Transaction.Status.COMPLETED,
+                    description='Dividend benchmark deposit',
+                )
+                for index, saving in enumerate(savings)
+            ],
+            batch_size=2000,
+        )
+        MpesaTransaction.objects.bulk_create(
+            [
+                MpesaTransaction(
+                    transaction=transaction,
+                    phone_number='254700000000',
+                    checkout_request_id=f'DIVB-{batch_id}-{index}',
+                    related_saving=saving,
+                )
+                for index, (transaction, saving) in enumerate(
+                    zip(transactions, savings),
+                )
+            ],
+            batch_size=2000,
+        )
+        LedgerEntry.objects.bulk_create(
+            [
+                LedgerEntry(
+                    membership_id=saving.membership_id,
+                    entry_type=LedgerEntry.EntryType.CREDIT,
+                    category=LedgerEntry.Category.SAVING_DEPOSIT,
+                    amount=transaction.amount,
+                    reference=transaction.reference,
+                    description='Dividend benchmark deposit',
+                    balance_after=transaction.amount,
+                    transaction=transaction,
+                )
+                for transaction, saving in zip(transactions, savings)
+            ],
+            batch_size=2000,
+        )
+        LedgerEntry.objects.filter(
+            reference__startswith=f'DIVB-{batch_id}-',
+        ).update(
+            created_at=timezone.make_aware(
+                datetime.combine(created_date, time(hour=12)),
+            ),
+        )
@@ -0,0 +1,106 @@
+"""Verify SACCO liquidity snapshots against a full ledger recompute."""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction as db_transaction
+
+from accounts.models import Sacco
+from services.engines.liquidity_monitor import (
+    MONEY_ZERO,
+    calculate_liquidity_totals,
+    get_latest_liquidity_snapshots,
+)
+from services.models import SaccoLiquiditySnapshot
+
+
+class Command(BaseCommand):
+    """
+    Compare each SACCO's latest liquidity snapshot with its ledger history.
+
+    The cash-in and cash-out totals of every snapshot are recomputed from
+    all LedgerEntry rows created before the snapshot cutoff. By default the
+    command only verifies and exits with an error on drift. With --execute,
+    drifted snapshots are overwritten with the recomputed totals.
+
+    Usage:
+        python manage.py reconcile_liquidity_snapshots
+        python manage.py reconcile_liquidity_snapshots --execute
+    """
+
+    help = 'Verify or repair liquidity snapshots from LedgerEntry rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sacco',
+            type=str,
+            help='Only check this SACCO id.',
+        )
+        parser.add_argument(
+            '--execute',
+            action='store_true',
+            help='Overwrite drifted snapshots (default is verify only).',
+        )
+
+    def handle(self, *args, **options):
+        sacco_ids = Sacco.objects.values_list('pk', flat=True)
+        if options.get('sacco'):
+            sacco_ids = sacco_ids.filter(pk=options['sacco'])
+        snapshots = get_latest_liquidity_snapshots(list(sacco_ids))
+
+        snapshots_by_cutoff = {}
+        for snapshot in snapshots.values():
+            snapshots_by_cutoff.setdefault(snapshot.cutoff_at, []).append(
+                snapshot,
+            )
+
+        drifted = []
+        for cutoff_at, cutoff_snapshots in snapshots_by_cutoff.items():
+            totals = calculate_liquidity_totals(
+                [snapshot.sacco_id for snapshot in cutoff_snapshots],
+                until=cutoff_at,
+            )
+            for snapshot in cutoff_snapshots:
+                expected = totals.get(
+                    snapshot.sacco_id,
+                    (MONEY_ZERO, MONEY_ZERO),
+                )
+                if (snapshot.cash_in, snapshot.cash_out) != expected:
+                    drifted.append((snapshot, expected))
+                    self._report_drift(snapshot, expected)
+
+        self.stdout.write(
+            f'Checked {len(snapshots)} snapshots: '
+            f'{len(drifted)} drifted snapshots.'
+        )
+
+        if not drifted:
+            self.stdout.write(
+                self.style.SUCCESS('All liquidity snapshots match the ledger.')
+            )
+            return
+
+        if not options['execute']:
+            raise CommandError(
+                'Liquidity snapshots are out of date. '
+                'Re-run with --execute to repair them.'
+            )
+
+        with db_transaction.atomic():
+            for snapshot, (cash_in, cash_out) in drifted:
+                SaccoLiquiditySnapshot.objects.filter(pk=snapshot.pk).update(
+                    cash_in=cash_in,
+                    cash_out=cash_out,
+                )
+        self.stdout.write(
+            self.style.SUCCESS(f'Repaired {len(drifted)} liquidity snapshots.')
+        )
+
+    def _report_drift(self, snapshot, expected):
+        cash_in, cash_out = expected
+        self.stdout.write(
+            self.style.WARNING(
+                f'  sacco={snapshot.sacco_id} '
+                f'snapshot_date={snapshot.snapshot_date} '
+                f'snapshot_reserves={snapshot.reserves} '
+                f'ledger_reserves={cash_in - cash_out}'
+            )
+        )
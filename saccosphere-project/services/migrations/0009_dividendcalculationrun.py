@@ -0,0 +1,43 @@
+# Generated by Django 5.2.16 on 2026-10-18 15:18
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0008_disbursement_fraud_prevention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dividenddeclaration',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('CALCULATING', 'Calculating'), ('CALCULATED', 'Calculated'), ('APPROVED', 'Approved'), ('DISBURSED', 'Disbursed')], default='DRAFT', help_text='Declaration status.', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DividendCalculationRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique dividend calculation run identifier.', primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', help_text='Calculation run status.', max_length=20)),
+                ('chunk_bounds', models.JSONField(default=list, help_text='First and last saving id of each chunk.')),
+                ('completed_chunk_indexes', models.JSONField(default=list, help_text='Indexes of chunks whose payouts have been written.')),
+                ('total_savings', models.PositiveIntegerField(default=0, help_text='Eligible savings covered by this run.')),
+                ('payouts_written', models.PositiveIntegerField(default=0, help_text='Dividend payouts written so far.')),
+                ('error_message', models.TextField(blank=True, default='', help_text='Failure reason when the run failed.')),
+                ('started_at', models.DateTimeField(auto_now_add=True, help_text='Date and time this run started.')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='Date and time this run finished or failed.', null=True)),
+                ('declaration', models.ForeignKey(help_text='Dividend declaration being calculated.', on_delete=django.db.models.deletion.CASCADE, related_name='calculation_runs', to='services.dividenddeclaration')),
+                ('requested_by', models.ForeignKey(blank=True, help_text='User who started this calculation.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dividend_calculation_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dividend Calculation Run',
+                'verbose_name_plural': 'Dividend Calculation Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.16 on 2026-10-18 15:37
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('services', '0009_dividendcalculationrun'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaccoLiquiditySnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique liquidity snapshot identifier.', primary_key=True, serialize=False)),
+                ('snapshot_date', models.DateField(help_text='Last calendar day included in this snapshot.')),
+                ('cutoff_at', models.DateTimeField(help_text='Ledger entries created before this time are included.')),
+                ('cash_in', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Cash-like ledger credits up to the cutoff.', max_digits=16)),
+                ('cash_out', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Cash-like ledger debits up to the cutoff.', max_digits=16)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time this snapshot was written.')),
+                ('sacco', models.ForeignKey(help_text='SACCO this snapshot is for.', on_delete=django.db.models.deletion.CASCADE, related_name='liquidity_snapshots', to='accounts.sacco')),
+            ],
+            options={
+                'verbose_name': 'SACCO Liquidity Snapshot',
+                'verbose_name_plural': 'SACCO Liquidity Snapshots',
+                'ordering': ['-snapshot_date'],
+                'unique_together': {('sacco', 'snapshot_date')},
+            },
+        ),
+    ]
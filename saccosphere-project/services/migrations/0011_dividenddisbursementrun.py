@@ -0,0 +1,44 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:04
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('services', '0010_saccoliquiditysnapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='dividenddeclaration',
+            name='status',
+            field=models.CharField(choices=[('DRAFT', 'Draft'), ('CALCULATING', 'Calculating'), ('CALCULATED', 'Calculated'), ('APPROVED', 'Approved'), ('DISBURSING', 'Disbursing'), ('DISBURSED', 'Disbursed')], default='DRAFT', help_text='Declaration status.', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='DividendDisbursementRun',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique dividend disbursement run identifier.', primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('RUNNING', 'Running'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='RUNNING', help_text='Disbursement run status.', max_length=20)),
+                ('total_payouts', models.PositiveIntegerField(default=0, help_text='Payouts to be paid by this declaration.')),
+                ('payouts_paid', models.PositiveIntegerField(default=0, help_text='Payouts credited so far.')),
+                ('amount_paid', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Dividend amount credited so far.', max_digits=14)),
+                ('chunks_done', models.PositiveIntegerField(default=0, help_text='Payout chunks committed so far.')),
+                ('error_message', models.TextField(blank=True, default='', help_text='Failure reason when the run last failed.')),
+                ('started_at', models.DateTimeField(auto_now_add=True, help_text='Date and time this run started.')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='Date and time this run finished or failed.', null=True)),
+                ('declaration', models.ForeignKey(help_text='Dividend declaration being disbursed.', on_delete=django.db.models.deletion.CASCADE, related_name='disbursement_runs', to='services.dividenddeclaration')),
+                ('requested_by', models.ForeignKey(blank=True, help_text='User who started this disbursement.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dividend_disbursement_runs', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Dividend Disbursement Run',
+                'verbose_name_plural': 'Dividend Disbursement Runs',
+                'ordering': ['-started_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.16 on 2026-10-18 16:49
+
+import django.db.models.deletion
+import uuid
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('services', '0011_dividenddisbursementrun'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CheckoffRemittance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unique check-off remittance identifier.', primary_key=True, serialize=False)),
+                ('file', models.FileField(help_text='Uploaded CSV or XLSX remittance file.', upload_to='checkoff_remittances/')),
+                ('file_name', models.CharField(help_text='Original name of the uploaded file.', max_length=255)),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', help_text='Processing status of this remittance.', max_length=20)),
+                ('processed_rows', models.PositiveIntegerField(default=0, help_text='Data rows applied so far; the resume point of a run.')),
+                ('matched_rows', models.PositiveIntegerField(default=0, help_text='Rows applied to at least one loan instalment.')),
+                ('unmatched_rows', models.PositiveIntegerField(default=0, help_text='Rows that could not be applied to any instalment.')),
+                ('amount_received', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Sum of valid row amounts read so far.', max_digits=14)),
+                ('amount_applied', models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Amount applied to loan instalments so far.', max_digits=14)),
+                ('exceptions', models.JSONField(blank=True, default=list, help_text='Unmatched rows and unapplied excess, one item per row.')),
+                ('error_message', models.TextField(blank=True, default='', help_text='Failure reason when the run last failed.')),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Date and time the remittance was uploaded.')),
+                ('completed_at', models.DateTimeField(blank=True, help_text='Date and time processing finished or failed.', null=True)),
+                ('sacco', models.ForeignKey(help_text='SACCO that received this remittance.', on_delete=django.db.models.deletion.CASCADE, related_name='checkoff_remittances', to='accounts.sacco')),
+                ('uploaded_by', models.ForeignKey(blank=True, help_text='User who uploaded the remittance file.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='checkoff_remittances', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Check-off Remittance',
+                'verbose_name_plural': 'Check-off Remittances',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.16 on 2026-10-18 19:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0011_alter_otptoken_code'),
+        ('services', '0012_checkoffremittance'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='checkoffremittance',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', help_text='SHA-256 of the uploaded file, unique per SACCO.', max_length=64),
+        ),
+        migrations.AddConstraint(
+            model_name='checkoffremittance',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('sacco', 'content_hash'), name='unique_checkoff_remittance_file'),
+        ),
+    ]
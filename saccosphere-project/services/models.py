@@ -1381,6 +1381,58 @@ class LiquidityAlert(models.Model):
         )
 
 
+class SaccoLiquiditySnapshot(models.Model):
+    """Daily roll-up of a SACCO's cash-like ledger totals."""
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text='Unique liquidity snapshot identifier.',
+    )
+    sacco = models.ForeignKey(
+        'accounts.Sacco',
+        on_delete=models.CASCADE,
+        related_name='liquidity_snapshots',
+        help_text='SACCO this snapshot is for.',
+    )
+    snapshot_date = models.DateField(
+        help_text='Last calendar day included in this snapshot.',
+    )
+    cutoff_at = models.DateTimeField(
+        help_text='Ledger entries created before this time are included.',
+    )
+    cash_in = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Cash-like ledger credits up to the cutoff.',
+    )
+    cash_out = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Cash-like ledger debits up to the cutoff.',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time this snapshot was written.',
+    )
+
+    class Meta:
+        ordering = ['-snapshot_date']
+        unique_together = ['sacco', 'snapshot_date']
+        verbose_name = 'SACCO Liquidity Snapshot'
+        verbose_name_plural = 'SACCO Liquidity Snapshots'
+
+    @property
+    def reserves(self):
+        return self.cash_in - self.cash_out
+
+    def __str__(self):
+        return f'{self.sacco} - {self.snapshot_date}'
+
+
 class NPLFlag(models.Model):
     """Staged non-performing-loan early warning for arrears."""
 
@@ -1575,8 +1627,10 @@ class DividendDeclaration(models.Model):
 
     class Status(models.TextChoices):
         DRAFT = 'DRAFT', 'Draft'
+        CALCULATING = 'CALCULATING', 'Calculating'
         CALCULATED = 'CALCULATED', 'Calculated'
         APPROVED = 'APPROVED', 'Approved'
+        DISBURSING = 'DISBURSING', 'Disbursing'
         DISBURSED = 'DISBURSED', 'Disbursed'
 
     id = models.UUIDField(
@@ -1718,3 +1772,313 @@ class DividendPayout(models.Model):
 
     def __str__(self):
         return f'{self.membership} - {self.dividend_amount}'
+
+
+class DividendCalculationRun(models.Model):
+    """
+    Progress of one asynchronous, chunked dividend calculation.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text='Unique dividend calculation run identifier.',
+    )
+    declaration = models.ForeignKey(
+        DividendDeclaration,
+        on_delete=models.CASCADE,
+        related_name='calculation_runs',
+        help_text='Dividend declaration being calculated.',
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='dividend_calculation_runs',
+        help_text='User who started this calculation.',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.RUNNING,
+        help_text='Calculation run status.',
+    )
+    chunk_bounds = models.JSONField(
+        default=list,
+        help_text='First and last saving id of each chunk.',
+    )
+    completed_chunk_indexes = models.JSONField(
+        default=list,
+        help_text='Indexes of chunks whose payouts have been written.',
+    )
+    total_savings = models.PositiveIntegerField(
+        default=0,
+        help_text='Eligible savings covered by this run.',
+    )
+    payouts_written = models.PositiveIntegerField(
+        default=0,
+        help_text='Dividend payouts written so far.',
+    )
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        help_text='Failure reason when the run failed.',
+    )
+    started_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time this run started.',
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time this run finished or failed.',
+    )
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Dividend Calculation Run'
+        verbose_name_plural = 'Dividend Calculation Runs'
+
+    @property
+    def total_chunks(self):
+        return len(self.chunk_bounds)
+
+    @property
+    def chunks_done(self):
+        return len(self.completed_chunk_indexes)
+
+    @property
+    def eta_seconds(self):
+        """Estimate seconds remaining from the average time per chunk."""
+        if self.status != self.Status.RUNNING or not self.chunks_done:
+            return None
+
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining_chunks = self.total_chunks - self.chunks_done
+        return round(elapsed / self.chunks_done * remaining_chunks, 1)
+
+    def __str__(self):
+        return (
+            f'{self.declaration} - {self.status} '
+            f'({self.chunks_done}/{self.total_chunks})'
+        )
+
+
+class DividendDisbursementRun(models.Model):
+    """
+    Progress of one background dividend disbursement.
+
+    Payouts are paid in chunks that commit on their own, so a run that dies
+    part way is resumed from the payouts still PENDING.
+    """
+
+    class Status(models.TextChoices):
+        RUNNING = 'RUNNING', 'Running'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text='Unique dividend disbursement run identifier.',
+    )
+    declaration = models.ForeignKey(
+        DividendDeclaration,
+        on_delete=models.CASCADE,
+        related_name='disbursement_runs',
+        help_text='Dividend declaration being disbursed.',
+    )
+    requested_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='dividend_disbursement_runs',
+        help_text='User who started this disbursement.',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.RUNNING,
+        help_text='Disbursement run status.',
+    )
+    total_payouts = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts to be paid by this declaration.',
+    )
+    payouts_paid = models.PositiveIntegerField(
+        default=0,
+        help_text='Payouts credited so far.',
+    )
+    amount_paid = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Dividend amount credited so far.',
+    )
+    chunks_done = models.PositiveIntegerField(
+        default=0,
+        help_text='Payout chunks committed so far.',
+    )
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        help_text='Failure reason when the run last failed.',
+    )
+    started_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time this run started.',
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time this run finished or failed.',
+    )
+
+    class Meta:
+        ordering = ['-started_at']
+        verbose_name = 'Dividend Disbursement Run'
+        verbose_name_plural = 'Dividend Disbursement Runs'
+
+    @property
+    def eta_seconds(self):
+        """Estimate seconds remaining from the average time per payout."""
+        if self.status != self.Status.RUNNING or not self.payouts_paid:
+            return None
+
+        elapsed = (timezone.now() - self.started_at).total_seconds()
+        remaining = max(self.total_payouts - self.payouts_paid, 0)
+        return round(elapsed / self.payouts_paid * remaining, 1)
+
+    def __str__(self):
+        return (
+            f'{self.declaration} - {self.status} '
+            f'({self.payouts_paid}/{self.total_payouts})'
+        )
+
+
+class CheckoffRemittance(models.Model):
+    """
+    An employer payroll check-off file and the progress of applying it.
+
+    Rows are applied to loan instalments in committed chunks, so a run that
+    dies part way resumes after the last committed row.
+    """
+
+    class Status(models.TextChoices):
+        PENDING = 'PENDING', 'Pending'
+        PROCESSING = 'PROCESSING', 'Processing'
+        COMPLETED = 'COMPLETED', 'Completed'
+        FAILED = 'FAILED', 'Failed'
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid4,
+        editable=False,
+        help_text='Unique check-off remittance identifier.',
+    )
+    sacco = models.ForeignKey(
+        'accounts.Sacco',
+        on_delete=models.CASCADE,
+        related_name='checkoff_remittances',
+        help_text='SACCO that received this remittance.',
+    )
+    uploaded_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='checkoff_remittances',
+        help_text='User who uploaded the remittance file.',
+    )
+    file = models.FileField(
+        upload_to='checkoff_remittances/',
+        help_text='Uploaded CSV or XLSX remittance file.',
+    )
+    file_name = models.CharField(
+        max_length=255,
+        help_text='Original name of the uploaded file.',
+    )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        default='',
+        help_text='SHA-256 of the uploaded file, unique per SACCO.',
+    )
+    status = models.CharField(
+        max_length=20,
+        choices=Status.choices,
+        default=Status.PENDING,
+        help_text='Processing status of this remittance.',
+    )
+    processed_rows = models.PositiveIntegerField(
+        default=0,
+        help_text='Data rows applied so far; the resume point of a run.',
+    )
+    matched_rows = models.PositiveIntegerField(
+        default=0,
+        help_text='Rows applied to at least one loan instalment.',
+    )
+    unmatched_rows = models.PositiveIntegerField(
+        default=0,
+        help_text='Rows that could not be applied to any instalment.',
+    )
+    amount_received = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Sum of valid row amounts read so far.',
+    )
+    amount_applied = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=Decimal('0.00'),
+        help_text='Amount applied to loan instalments so far.',
+    )
+    exceptions = models.JSONField(
+        default=list,
+        blank=True,
+        help_text='Unmatched rows and unapplied excess, one item per row.',
+    )
+    error_message = models.TextField(
+        blank=True,
+        default='',
+        help_text='Failure reason when the run last failed.',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        help_text='Date and time the remittance was uploaded.',
+    )
+    completed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text='Date and time processing finished or failed.',
+    )
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = 'Check-off Remittance'
+        verbose_name_plural = 'Check-off Remittances'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['sacco', 'content_hash'],
+                condition=~models.Q(content_hash=''),
+                name='unique_checkoff_remittance_file',
+            ),
+        ]
+
+    @property
+    def amount_unapplied(self):
+        """Amount received that was not applied to any instalment."""
+        return self.amount_received - self.amount_applied
+
+    def __str__(self):
+        return f'{self.file_name} - {self.status} ({self.processed_rows})'
@@ -5,6 +5,9 @@ from rest_framework import serializers
 from saccomembership.models import Membership
 
 from .models import (
+    CheckoffRemittance,
+    DividendCalculationRun,
+    DividendDisbursementRun,
     DividendDeclaration,
     DividendPayout,
     Guarantor,
@@ -336,6 +339,60 @@ class DividendDeclarationSerializer(serializers.ModelSerializer):
         )
 
 
+class DividendCalculationRunSerializer(serializers.ModelSerializer):
+    declaration_status = serializers.CharField(
+        source='declaration.status',
+        read_only=True,
+    )
+    total_chunks = serializers.IntegerField(read_only=True)
+    chunks_done = serializers.IntegerField(read_only=True)
+    eta_seconds = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = DividendCalculationRun
+        fields = (
+            'id',
+            'declaration',
+            'declaration_status',
+            'status',
+            'total_chunks',
+            'chunks_done',
+            'total_savings',
+            'payouts_written',
+            'eta_seconds',
+            'error_message',
+            'started_at',
+            'completed_at',
+        )
+        read_only_fields = fields
+
+
+class DividendDisbursementRunSerializer(serializers.ModelSerializer):
+    declaration_status = serializers.CharField(
+        source='declaration.status',
+        read_only=True,
+    )
+    eta_seconds = serializers.FloatField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = DividendDisbursementRun
+        fields = (
+            'id',
+            'declaration',
+            'declaration_status',
+            'status',
+            'total_payouts',
+            'payouts_paid',
+            'amount_paid',
+            'chunks_done',
+            'eta_seconds',
+            'error_message',
+            'started_at',
+            'completed_at',
+        )
+        read_only_fields = fields
+
+
 class DividendPayoutSerializer(serializers.ModelSerializer):
     declaration_financial_year = serializers.CharField(
         source='declaration.financial_year',
@@ -366,3 +423,30 @@ class DividendPayoutSerializer(serializers.ModelSerializer):
             'created_at',
         )
         read_only_fields = fields
+
+
+class CheckoffRemittanceSerializer(serializers.ModelSerializer):
+    amount_unapplied = serializers.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        read_only=True,
+    )
+
+    class Meta:
+        model = CheckoffRemittance
+        fields = (
+            'id',
+            'file_name',
+            'status',
+            'processed_rows',
+            'matched_rows',
+            'unmatched_rows',
+            'amount_received',
+            'amount_applied',
+            'amount_unapplied',
+            'exceptions',
+            'error_message',
+            'created_at',
+            'completed_at',
+        )
+        read_only_fields = fields
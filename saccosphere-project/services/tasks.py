@@ -1,10 +1,11 @@
 """Celery tasks for SACCO services (loans, guarantors, savings)."""
 
 import logging
+import time
 from datetime import timedelta
 from decimal import Decimal
 
-from celery import shared_task
+from celery import chord, shared_task
 from django.db import DatabaseError, InterfaceError, OperationalError, transaction
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -12,21 +13,38 @@ from django.utils import timezone
 from accounts.models import Sacco
 from notifications.models import Notification
 from notifications.tasks import notify_user_task
-from notifications.utils import create_notification
+from notifications.utils import create_notifications
 from saccomanagement.models import Role
 
-from .engines.liquidity_monitor import check_liquidity_risk
+from .engines.checkoff_remittance import (
+    RemittanceParseError,
+    fail_checkoff_remittance,
+    process_checkoff_remittance,
+)
+from .engines.dividend_calculator import (
+    calculate_dividend_chunk,
+    fail_dividend_calculation,
+    finalize_dividend_calculation,
+)
+from .engines.dividend_disbursement import (
+    disburse_dividends,
+    fail_dividend_disbursement,
+)
+from .engines.liquidity_monitor import (
+    check_liquidity_risks,
+    roll_up_liquidity_snapshots,
+)
 from .engines.npl_monitor import (
-    get_arrears_bucket,
-    resolve_cleared_npl_flags,
+    create_missing_npl_flags,
+    get_active_loan_arrears,
+    get_bucket_for_days_overdue,
+    resolve_cleared_npl_flags_for_loans,
 )
 from .models import (
     DisbursementAuditLog,
     Guarantor,
     LiquidityAlert,
     Loan,
-    NPLFlag,
-    RepaymentSchedule,
 )
 from .reminder_utils import send_sms_notification
 
@@ -189,24 +207,30 @@ def notify_guarantors_task(self, loan_id):
     name='services.tasks.check_all_sacco_liquidity',
 )
 def check_all_sacco_liquidity(self):
-    """Check every active SACCO for loan-disbursement liquidity risk."""
+    """
+    Check every active SACCO for loan-disbursement liquidity risk.
+
+    Reserves come from the daily liquidity snapshots plus the entries
+    posted since, read for all SACCOs in a fixed number of queries.
+    """
     try:
-        saccos = Sacco.objects.filter(is_active=True).select_related(
-            'settings',
+        saccos = list(
+            Sacco.objects.filter(is_active=True).select_related('settings'),
         )
+        risks = check_liquidity_risks(saccos)
         checked_count = 0
         alert_count = 0
         resolved_count = 0
 
         for sacco in saccos:
-            risk = check_liquidity_risk(sacco)
+            risk = risks[sacco.pk]
             checked_count += 1
 
             if risk['at_risk']:
                 alert = _create_liquidity_alert_if_needed(sacco, risk)
                 if alert:
                     alert_count += 1
-                    _notify_sacco_admins(sacco, risk, alert)
+                    _notify_liquidity_admins(sacco, risk, alert)
                 continue
 
             resolved_count += _resolve_open_liquidity_alerts(sacco)
@@ -227,6 +251,26 @@ def check_all_sacco_liquidity(self):
         raise self.retry(exc=exc)
 
 
+@shared_task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    name='services.tasks.roll_up_liquidity_snapshots',
+)
+def roll_up_liquidity_snapshots_task(self):
+    """Write yesterday's liquidity snapshot for every active SACCO."""
+    try:
+        snapshot_count = roll_up_liquidity_snapshots()
+        logger.info(
+            'Liquidity snapshots written. snapshots=%s.',
+            snapshot_count,
+        )
+        return {'snapshots': snapshot_count}
+    except Exception as exc:
+        logger.exception('Liquidity snapshot roll-up failed.')
+        raise self.retry(exc=exc)
+
+
 def _create_liquidity_alert_if_needed(sacco, risk):
     recent_window_start = timezone.now() - timedelta(hours=24)
     recent_alert_exists = LiquidityAlert.objects.filter(
@@ -246,12 +290,11 @@ def _create_liquidity_alert_if_needed(sacco, risk):
     )
 
 
-def _notify_sacco_admins(sacco, risk, alert):
+def _notify_liquidity_admins(sacco, risk, alert):
     admin_roles = Role.objects.filter(
         name=Role.SACCO_ADMIN,
         sacco=sacco,
     ).select_related('user').order_by('created_at')
-    notified_user_ids = set()
 
     title = 'Liquidity warning'
     message = (
@@ -260,23 +303,21 @@ def _notify_sacco_admins(sacco, risk, alert):
         f'{risk["available_reserves"]:,.2f} in liquid reserves. '
         f'Utilisation is {risk["utilisation_pct"]}%.'
     )
-
-    for role in admin_roles:
-        user = role.user
-        if user.id in notified_user_ids:
-            continue
-
-        create_notification(
-            user=user,
-            title=title,
-            message=message,
-            category=Notification.Category.LIQUIDITY_WARNING,
-            action_url='/management/liquidity/',
-            related_object_type='LiquidityAlert',
-            related_object_id=str(alert.id),
-            dispatch_async=False,
+    create_notifications(
+        (
+            role.user,
+            {
+                'title': title,
+                'message': message,
+                'category': Notification.Category.LIQUIDITY_WARNING,
+                'action_url': '/management/liquidity/',
+                'related_object_type': 'LiquidityAlert',
+                'related_object_id': str(alert.id),
+                'dedup_key': f'liquidity-alert:{alert.id}',
+            },
         )
-        notified_user_ids.add(user.id)
+        for role in admin_roles
+    )
 
     if risk['utilisation_pct'] >= Decimal('100.00'):
         primary_role = admin_roles.first()
@@ -307,140 +348,137 @@ def _resolve_open_liquidity_alerts(sacco):
     name='services.tasks.flag_npl_arrears',
 )
 def flag_npl_arrears(self):
-    """Create staged NPL flags for active loans in arrears."""
+    """
+    Create staged NPL flags for active loans in arrears.
+
+    Arrears for every active loan come from one grouped query, cleared
+    loans have their open flags resolved in bulk, missing flags are bulk
+    created and notifications for the new flags are written in batches.
+    """
     try:
-        loans = Loan.objects.filter(
-            status=Loan.Status.ACTIVE,
-        ).select_related(
-            'membership__user',
-            'membership__sacco',
-        )
-        checked_count = 0
-        flags_created = 0
-        flags_resolved = 0
+        timings = {}
 
-        for loan in loans:
-            checked_count += 1
-            flags_resolved += resolve_cleared_npl_flags(loan)
-            bucket = get_arrears_bucket(loan)
+        started = time.perf_counter()
+        arrears = get_active_loan_arrears()
+        timings['scan'] = time.perf_counter() - started
 
-            if bucket is None:
-                continue
+        started = time.perf_counter()
+        flags_resolved = resolve_cleared_npl_flags_for_loans(
+            loan_id
+            for loan_id, days_overdue in arrears.items()
+            if days_overdue is None
+        )
+        timings['resolve'] = time.perf_counter() - started
 
-            flag, created = NPLFlag.objects.get_or_create(
-                loan=loan,
-                threshold_days=bucket,
-            )
-            if not created:
+        started = time.perf_counter()
+        buckets = {}
+        for loan_id, days_overdue in arrears.items():
+            if days_overdue is None:
                 continue
-
-            flags_created += 1
-            _notify_npl_flag(loan, flag)
-
+            bucket = get_bucket_for_days_overdue(days_overdue)
+            if bucket is not None:
+                buckets[loan_id] = bucket
+        new_flags = create_missing_npl_flags(buckets)
+        timings['flag'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        _notify_npl_flags(new_flags, arrears)
+        timings['notify'] = time.perf_counter() - started
+
+        timings = {
+            phase: round(seconds, 3)
+            for phase, seconds in timings.items()
+        }
         logger.info(
-            'NPL arrears check complete. checked=%s flags=%s resolved=%s.',
-            checked_count,
-            flags_created,
+            'NPL arrears check complete. checked=%s flags=%s resolved=%s '
+            'timings=%s.',
+            len(arrears),
+            len(new_flags),
             flags_resolved,
+            timings,
         )
         return {
-            'checked': checked_count,
-            'flags_created': flags_created,
+            'checked': len(arrears),
+            'flags_created': len(new_flags),
             'flags_resolved': flags_resolved,
+            'timings': timings,
         }
     except Exception as exc:
         logger.exception('NPL arrears check failed.')
         raise self.retry(exc=exc)
 
 
-def _notify_npl_flag(loan, flag):
-    member = loan.membership.user
-    sacco = loan.membership.sacco
-    member_name = member.get_full_name() or member.email
-    days_overdue = _get_current_days_overdue(loan) or flag.threshold_days
-
-    _notify_npl_admins(
-        sacco=sacco,
-        member_name=member_name,
-        loan=loan,
-        flag=flag,
-        days_overdue=days_overdue,
-    )
-    _notify_npl_member(
-        member=member,
-        sacco=sacco,
-        loan=loan,
-        flag=flag,
-        days_overdue=days_overdue,
-    )
-
-
-def _get_current_days_overdue(loan):
-    earliest_unpaid = RepaymentSchedule.objects.filter(
-        loan=loan,
-        status__in=[
-            RepaymentSchedule.Status.PENDING,
-            RepaymentSchedule.Status.OVERDUE,
-        ],
-    ).order_by('due_date', 'instalment_number').first()
-
-    if earliest_unpaid is None:
-        return None
-
-    return earliest_unpaid.days_overdue
-
+def _notify_npl_flags(flags, arrears):
+    """Fan out admin and member notifications for new NPL flags."""
+    if not flags:
+        return
 
-def _notify_npl_admins(sacco, member_name, loan, flag, days_overdue):
+    loans = Loan.objects.select_related(
+        'membership__user',
+        'membership__sacco',
+    ).in_bulk([flag.loan_id for flag in flags])
+    admins_by_sacco = {}
     admin_roles = Role.objects.filter(
         name=Role.SACCO_ADMIN,
-        sacco=sacco,
+        sacco_id__in={loan.membership.sacco_id for loan in loans.values()},
     ).select_related('user')
-    notified_user_ids = set()
-    loan_id = str(loan.id)
-    title = f'NPL warning - {days_overdue} days'
-    message = (
-        f'{member_name} has loan {loan_id} at least '
-        f'{days_overdue} days overdue. Please review the account and '
-        f'follow your SACCO arrears process.'
-    )
-
     for role in admin_roles:
-        user = role.user
-        if user.id in notified_user_ids:
-            continue
-
-        create_notification(
-            user=user,
-            title=title,
-            message=message,
-            category=Notification.Category.NPL_WARNING,
-            action_url='/management/npl/',
-            related_object_type='NPLFlag',
-            related_object_id=str(flag.id),
-            dispatch_async=False,
+        admins = admins_by_sacco.setdefault(role.sacco_id, {})
+        admins.setdefault(role.user_id, role.user)
+
+    notifications = []
+    for flag in flags:
+        loan = loans[flag.loan_id]
+        member = loan.membership.user
+        sacco = loan.membership.sacco
+        member_name = member.get_full_name() or member.email
+        days_overdue = arrears.get(loan.id) or flag.threshold_days
+
+        admin_title = f'NPL warning - {days_overdue} days'
+        admin_message = (
+            f'{member_name} has loan {loan.id} at least '
+            f'{days_overdue} days overdue. Please review the account and '
+            f'follow your SACCO arrears process.'
         )
-        notified_user_ids.add(user.id)
-
+        for admin in admins_by_sacco.get(sacco.id, {}).values():
+            notifications.append(
+                (
+                    admin,
+                    {
+                        'title': admin_title,
+                        'message': admin_message,
+                        'category': Notification.Category.NPL_WARNING,
+                        'action_url': '/management/npl/',
+                        'related_object_type': 'NPLFlag',
+                        'related_object_id': str(flag.id),
+                        'dedup_key': f'npl-flag:{flag.id}',
+                    },
+                )
+            )
 
-def _notify_npl_member(member, sacco, loan, flag, days_overdue):
-    title, message = _get_member_npl_message(
-        sacco=sacco,
-        loan=loan,
-        days_overdue=days_overdue,
-    )
-    create_notification(
-        user=member,
-        title=title,
-        message=message,
-        category=Notification.Category.LOAN,
-        action_url=f'/loans/{loan.id}/schedule/',
-        related_object_type='NPLFlag',
-        related_object_id=str(flag.id),
-        dispatch_async=False,
-    )
+        member_title, member_message = _get_member_npl_message(
+            sacco=sacco,
+            loan=loan,
+            days_overdue=days_overdue,
+        )
+        notifications.append(
+            (
+                member,
+                {
+                    'title': member_title,
+                    'message': member_message,
+                    'category': Notification.Category.LOAN,
+                    'action_url': f'/loans/{loan.id}/schedule/',
+                    'related_object_type': 'NPLFlag',
+                    'related_object_id': str(flag.id),
+                    'dedup_key': f'npl-flag:{flag.id}',
+                    'push': False,
+                    'sms_message': member_message,
+                },
+            )
+        )
 
-    if member.phone_number:
-        send_sms_notification(member, message)
+    create_notifications(notifications)
 
 
 def _get_member_npl_message(sacco, loan, days_overdue):
@@ -477,6 +515,196 @@ def _get_member_npl_message(sacco, loan, days_overdue):
     )
 
 
+def dispatch_dividend_calculation(run):
+    """
+    Queue a dividend calculation run as a Celery chord.
+
+    Every chunk is an independent task, so chunks run in parallel across
+    workers; the finalize callback fires once all of them have succeeded.
+    If the workflow cannot be queued the run is failed straight away, so
+    its declaration does not stay CALCULATING.
+    """
+    run_id = str(run.id)
+    try:
+        if not run.total_chunks:
+            return finalize_dividend_calculation_task.delay([], run_id)
+
+        workflow = chord(
+            calculate_dividend_chunk_task.s(run_id, chunk_index)
+            for chunk_index in range(run.total_chunks)
+        )
+        return workflow(
+            finalize_dividend_calculation_task.s(run_id).on_error(
+                fail_dividend_calculation_task.si(run_id),
+            ),
+        )
+    except Exception as exc:
+        logger.exception('Could not queue dividend run %s.', run_id)
+        fail_dividend_calculation(
+            run_id,
+            f'Dividend calculation could not be queued: {exc}',
+        )
+        return None
+
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    name='services.tasks.calculate_dividend_chunk',
+)
+def calculate_dividend_chunk_task(self, run_id, chunk_index):
+    """Write the dividend payouts for one chunk of a calculation run."""
+    try:
+        return calculate_dividend_chunk(run_id, chunk_index)
+    except (DatabaseError, InterfaceError, OperationalError) as exc:
+        if self.request.retries < self.max_retries:
+            countdown = 60 * (2 ** self.request.retries)
+            logger.warning(
+                'Dividend chunk %s of run %s failed. Retrying in %s seconds.',
+                chunk_index,
+                run_id,
+                countdown,
+                exc_info=True,
+            )
+            raise self.retry(exc=exc, countdown=countdown)
+        fail_dividend_calculation(run_id, exc)
+        raise
+    except Exception as exc:
+        logger.exception(
+            'Dividend chunk %s of run %s failed.',
+            chunk_index,
+            run_id,
+        )
+        fail_dividend_calculation(run_id, exc)
+        raise
+
+
+@shared_task(name='services.tasks.finalize_dividend_calculation')
+def finalize_dividend_calculation_task(chunk_results, run_id):
+    """Set the declaration total after every dividend chunk has finished."""
+    try:
+        result = finalize_dividend_calculation(run_id)
+    except Exception as exc:
+        logger.exception('Finalizing dividend run %s failed.', run_id)
+        fail_dividend_calculation(run_id, exc)
+        raise
+
+    logger.info(
+        'Dividend run %s complete. payouts=%s total=%s.',
+        run_id,
+        result['payout_count'],
+        result['total_dividend_amount'],
+    )
+    return {
+        'payout_count': result['payout_count'],
+        'total_dividend_amount': str(result['total_dividend_amount']),
+    }
+
+
+@shared_task(name='services.tasks.fail_dividend_calculation')
+def fail_dividend_calculation_task(run_id):
+    """Mark a dividend run failed when its chord cannot complete."""
+    fail_dividend_calculation(
+        run_id,
+        'Dividend calculation workflow did not complete.',
+    )
+
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    name='services.tasks.disburse_dividends',
+)
+def disburse_dividends_task(self, run_id):
+    """Pay the remaining payouts of a dividend disbursement run."""
+    try:
+        result = disburse_dividends(run_id)
+    except (DatabaseError, InterfaceError, OperationalError) as exc:
+        if self.request.retries < self.max_retries:
+            countdown = 60 * (2 ** self.request.retries)
+            logger.warning(
+                'Dividend disbursement %s failed. Retrying in %s seconds.',
+                run_id,
+                countdown,
+                exc_info=True,
+            )
+            raise self.retry(exc=exc, countdown=countdown)
+        fail_dividend_disbursement(run_id, exc)
+        raise
+    except Exception as exc:
+        logger.exception('Dividend disbursement %s failed.', run_id)
+        fail_dividend_disbursement(run_id, exc)
+        raise
+
+    logger.info(
+        'Dividend disbursement %s finished. status=%s paid=%s amount=%s.',
+        run_id,
+        result['status'],
+        result['payouts_paid'],
+        result['amount_paid'],
+    )
+    return {
+        'status': result['status'],
+        'payouts_paid': result['payouts_paid'],
+        'amount_paid': str(result['amount_paid']),
+    }
+
+
+@shared_task(
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    name='services.tasks.process_checkoff_remittance',
+)
+def process_checkoff_remittance_task(self, remittance_id):
+    """Apply the remaining rows of a payroll check-off remittance."""
+    try:
+        result = process_checkoff_remittance(remittance_id)
+    except (DatabaseError, InterfaceError, OperationalError) as exc:
+        if self.request.retries < self.max_retries:
+            countdown = 60 * (2 ** self.request.retries)
+            logger.warning(
+                'Check-off remittance %s failed. Retrying in %s seconds.',
+                remittance_id,
+                countdown,
+                exc_info=True,
+            )
+            raise self.retry(exc=exc, countdown=countdown)
+        fail_checkoff_remittance(remittance_id, exc)
+        raise
+    except RemittanceParseError as exc:
+        logger.warning(
+            'Check-off remittance %s could not be read: %s',
+            remittance_id,
+            exc,
+        )
+        fail_checkoff_remittance(remittance_id, exc)
+        return {'status': 'FAILED', 'error': str(exc)}
+    except Exception as exc:
+        logger.exception('Check-off remittance %s failed.', remittance_id)
+        fail_checkoff_remittance(remittance_id, exc)
+        raise
+
+    logger.info(
+        'Check-off remittance %s finished. rows=%s matched=%s '
+        'unmatched=%s applied=%s.',
+        remittance_id,
+        result['processed_rows'],
+        result['matched_rows'],
+        result['unmatched_rows'],
+        result['amount_applied'],
+    )
+    return {
+        'status': result['status'],
+        'processed_rows': result['processed_rows'],
+        'matched_rows': result['matched_rows'],
+        'unmatched_rows': result['unmatched_rows'],
+        'amount_applied': str(result['amount_applied']),
+    }
+
+
 def _record_disbursement_invoice_item(loan) -> None:
     """
     Create the SaccoSphere invoice line item after receipt is confirmed.
@@ -812,20 +1040,33 @@ def _get_result_parameter_value(result, key):
 def _notify_superadmins(title, message, related_loan_id=None):
     from notifications.tasks import send_email_task
 
-    superadmin_roles = Role.objects.select_related('user').filter(
-        name=Role.SUPER_ADMIN,
-        sacco__isnull=True,
-    )
-    for role in superadmin_roles:
-        notify_user_task.delay(
-            str(role.user.id),
-            title,
-            message,
-            Notification.Category.LOAN,
-            action_url='/management/disbursement-disputes/',
+    superadmins = [
+        role.user
+        for role in Role.objects.select_related('user').filter(
+            name=Role.SUPER_ADMIN,
+            sacco__isnull=True,
+        )
+    ]
+    create_notifications(
+        (
+            user,
+            {
+                'title': title,
+                'message': message,
+                'category': Notification.Category.LOAN,
+                'action_url': '/management/disbursement-disputes/',
+                'dedup_key': (
+                    f'disbursement-escalation:{related_loan_id}'
+                    if related_loan_id
+                    else None
+                ),
+            },
         )
-        if role.user.email:
-            send_email_task.delay(role.user.email, title, message)
+        for user in superadmins
+    )
+    for user in superadmins:
+        if user.email:
+            send_email_task.delay(user.email, title, message)
 
 
 def _notify_sacco_admins(sacco, title, message):
@@ -833,13 +1074,17 @@ def _notify_sacco_admins(sacco, title, message):
         name=Role.SACCO_ADMIN,
         sacco=sacco,
     )
-    for role in admin_roles:
-        notify_user_task.delay(
-            str(role.user.id),
-            title,
-            message,
-            Notification.Category.LOAN,
-            action_url='/management/disbursements/',
+    create_notifications(
+        (
+            role.user,
+            {
+                'title': title,
+                'message': message,
+                'category': Notification.Category.LOAN,
+                'action_url': '/management/disbursements/',
+            },
         )
+        for role in admin_roles
+    )
 
 
@@ -0,0 +1,343 @@
+"""Tests for bulk payroll check-off repayment ingestion."""
+
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from openpyxl import Workbook
+from rest_framework.test import APIClient
+
+from accounts.models import Sacco, User
+from ledger.models import LedgerBalanceHead, LedgerEntry
+from saccomanagement.models import Role
+from saccomembership.models import Membership
+from services.engines.checkoff_remittance import (
+    RemittanceParseError,
+    apply_remittance_chunk,
+    fail_checkoff_remittance,
+    iter_remittance_rows,
+    process_checkoff_remittance,
+    start_checkoff_remittance,
+)
+from services.models import (
+    CheckoffRemittance,
+    Loan,
+    LoanType,
+    RepaymentSchedule,
+)
+
+
+class CheckoffRemittanceTests(TestCase):
+    """Test streaming, in-memory allocation and resume of remittances."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        media_override = override_settings(MEDIA_ROOT=self.media_root)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, True)
+
+        self.client = APIClient()
+        self.sacco = Sacco.objects.create(
+            name='Check-off SACCO',
+            registration_number='CHECKOFF001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.admin = User.objects.create_user(
+            email='checkoff-admin@example.com',
+            password='secret',
+        )
+        Role.objects.create(
+            user=self.admin,
+            sacco=self.sacco,
+            name=Role.SACCO_ADMIN,
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.loan_type = LoanType.objects.create(
+            sacco=self.sacco,
+            name='Check-off Loan',
+            interest_rate=Decimal('12.00'),
+            max_term_months=12,
+            min_amount=Decimal('100.00'),
+        )
+        self.first_member = self._member('CO-001')
+        self.second_member = self._member('CO-002')
+        self.older_loan = self._loan(self.first_member, instalments=2)
+        self.newer_loan = self._loan(self.first_member, instalments=2)
+        Loan.objects.filter(pk=self.older_loan.pk).update(
+            created_at=timezone.now() - timedelta(days=90),
+        )
+        self.second_loan = self._loan(self.second_member, instalments=3)
+
+    def _member(self, member_number):
+        user = User.objects.create_user(
+            email=f'{member_number.lower()}@example.com',
+            password='secret',
+        )
+        return Membership.objects.create(
+            user=user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number=member_number,
+        )
+
+    def _loan(self, membership, instalments):
+        loan = Loan.objects.create(
+            membership=membership,
+            loan_type=self.loan_type,
+            amount=Decimal('100.00') * instalments,
+            interest_rate=Decimal('12.00'),
+            term_months=instalments,
+            outstanding_balance=Decimal('100.00') * instalments,
+            status=Loan.Status.ACTIVE,
+        )
+        due_date = timezone.localdate() + timedelta(days=30)
+        for number in range(1, instalments + 1):
+            RepaymentSchedule.objects.create(
+                loan=loan,
+                instalment_number=number,
+                due_date=due_date + timedelta(days=30 * (number - 1)),
+                amount=Decimal('100.00'),
+                principal=Decimal('90.00'),
+                interest=Decimal('10.00'),
+                balance_after=Decimal('100.00') * (instalments - number),
+            )
+        return loan
+
+    def _remittance(self, content, file_name='remittance.csv'):
+        return CheckoffRemittance.objects.create(
+            sacco=self.sacco,
+            uploaded_by=self.admin,
+            file=SimpleUploadedFile(file_name, content),
+            file_name=file_name,
+        )
+
+    def _csv(self, *rows):
+        lines = ['Member Number,Amount', *rows]
+        return ('\n'.join(lines) + '\n').encode()
+
+    def test_rows_are_allocated_oldest_loan_first_in_bulk(self):
+        """A payment spills from the older loan's instalments to the next."""
+        remittance = self._remittance(
+            self._csv('CO-001,"250.00"', 'CO-002,150', 'CO-002,50')
+        )
+
+        result = process_checkoff_remittance(remittance.id, chunk_size=2)
+
+        self.assertEqual(
+            result['status'],
+            CheckoffRemittance.Status.COMPLETED,
+        )
+        self.assertEqual(result['processed_rows'], 3)
+        self.assertEqual(result['matched_rows'], 3)
+        self.assertEqual(result['amount_applied'], Decimal('450.00'))
+
+        self.older_loan.refresh_from_db()
+        self.newer_loan.refresh_from_db()
+        self.second_loan.refresh_from_db()
+        self.assertEqual(
+            self.older_loan.outstanding_balance,
+            Decimal('0.00'),
+        )
+        self.assertEqual(
+            self.newer_loan.outstanding_balance,
+            Decimal('150.00'),
+        )
+        self.assertEqual(
+            self.second_loan.outstanding_balance,
+            Decimal('100.00'),
+        )
+        self.assertEqual(
+            list(
+                self.second_loan.schedule.order_by(
+                    'instalment_number',
+                ).values_list('status', 'paid_amount')
+            ),
+            [
+                (RepaymentSchedule.Status.PAID, Decimal('100.00')),
+                (RepaymentSchedule.Status.PAID, Decimal('100.00')),
+                (RepaymentSchedule.Status.PENDING, None),
+            ],
+        )
+        self.assertEqual(
+            LedgerEntry.objects.filter(
+                category=LedgerEntry.Category.LOAN_REPAYMENT,
+                reference__startswith=f'CHECKOFF-{remittance.id}-',
+            ).count(),
+            4,
+        )
+        self.assertEqual(
+            LedgerBalanceHead.objects.get(
+                membership=self.second_member,
+            ).balance,
+            Decimal('200.00'),
+        )
+
+    def test_unmatched_rows_and_excess_are_reported(self):
+        """Unknown members, bad amounts and overpayments are listed."""
+        remittance = self._remittance(
+            self._csv(
+                'CO-404,100',
+                'CO-001,abc',
+                ',100',
+                'CO-002,350',
+            )
+        )
+
+        result = process_checkoff_remittance(remittance.id)
+
+        remittance.refresh_from_db()
+        self.assertEqual(result['matched_rows'], 1)
+        self.assertEqual(result['unmatched_rows'], 3)
+        self.assertEqual(remittance.amount_received, Decimal('450.00'))
+        self.assertEqual(remittance.amount_applied, Decimal('300.00'))
+        self.assertEqual(remittance.amount_unapplied, Decimal('150.00'))
+        self.assertEqual(
+            [
+                (exception['row'], exception['reason'])
+                for exception in remittance.exceptions
+            ],
+            [
+                (2, 'Unknown member number.'),
+                (3, 'Invalid amount.'),
+                (4, 'Missing member number.'),
+                (5, 'Amount exceeds instalments due.'),
+            ],
+        )
+        self.assertEqual(
+            remittance.exceptions[-1]['unapplied_amount'],
+            '50.00',
+        )
+
+    def test_failed_run_resumes_after_last_committed_chunk(self):
+        """Processing again applies only the rows not yet committed."""
+        remittance = self._remittance(
+            self._csv('CO-001,100', 'CO-002,100', 'CO-002,100')
+        )
+        start_checkoff_remittance(remittance.id)
+        rows = list(
+            iter_remittance_rows(
+                io.BytesIO(self._csv('CO-001,100')),
+                'remittance.csv',
+            )
+        )
+        apply_remittance_chunk(remittance.id, rows, offset=0)
+        fail_checkoff_remittance(remittance.id, 'worker lost')
+
+        with self.assertRaises(ValueError):
+            apply_remittance_chunk(remittance.id, rows, offset=0)
+
+        result = process_checkoff_remittance(remittance.id, chunk_size=1)
+
+        self.assertEqual(result['processed_rows'], 3)
+        self.assertEqual(result['amount_applied'], Decimal('300.00'))
+        self.older_loan.refresh_from_db()
+        self.second_loan.refresh_from_db()
+        self.assertEqual(
+            self.older_loan.outstanding_balance,
+            Decimal('100.00'),
+        )
+        self.assertEqual(
+            self.second_loan.outstanding_balance,
+            Decimal('100.00'),
+        )
+        with self.assertRaises(ValueError):
+            start_checkoff_remittance(remittance.id)
+
+    def test_xlsx_remittances_are_streamed(self):
+        """Spreadsheet member numbers stored as numbers still match."""
+        numeric_member = self._member('12345')
+        loan = self._loan(numeric_member, instalments=1)
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(['Payroll Number', 'Deduction'])
+        sheet.append([12345, 100])
+        sheet.append([None, None])
+        content = io.BytesIO()
+        workbook.save(content)
+
+        remittance = self._remittance(
+            content.getvalue(),
+            file_name='remittance.xlsx',
+        )
+        result = process_checkoff_remittance(remittance.id)
+
+        loan.refresh_from_db()
+        self.assertEqual(result['processed_rows'], 1)
+        self.assertEqual(result['matched_rows'], 1)
+        self.assertEqual(loan.outstanding_balance, Decimal('0.00'))
+
+    def test_missing_columns_are_rejected(self):
+        """Files without member_number and amount columns fail to parse."""
+        with self.assertRaises(RemittanceParseError):
+            list(
+                iter_remittance_rows(
+                    io.BytesIO(b'name,value\nx,1\n'),
+                    'remittance.csv',
+                )
+            )
+
+    @patch('services.tasks.process_checkoff_remittance_task.delay')
+    def test_upload_queues_processing(self, delay_mock):
+        """Admins upload a file and poll its progress."""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/v1/services/checkoff/remittances/',
+                {
+                    'file': SimpleUploadedFile(
+                        'march.csv',
+                        self._csv('CO-001,100'),
+                    ),
+                },
+                format='multipart',
+            )
+
+        self.assertEqual(response.status_code, 202)
+        remittance_id = response.data['id']
+        delay_mock.assert_called_once_with(remittance_id)
+
+        detail = self.client.get(
+            f'/api/v1/services/checkoff/remittances/{remittance_id}/',
+        )
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.data['status'], 'PENDING')
+        self.assertEqual(detail.data['file_name'], 'march.csv')
+
+    @patch('services.tasks.process_checkoff_remittance_task.delay')
+    def test_repeat_upload_of_the_same_file_is_refused(self, delay_mock):
+        """A file is applied once; a FAILED upload of it is resumed."""
+        content = self._csv('CO-001,100')
+
+        def upload(name):
+            with self.captureOnCommitCallbacks(execute=True):
+                return self.client.post(
+                    '/api/v1/services/checkoff/remittances/',
+                    {'file': SimpleUploadedFile(name, content)},
+                    format='multipart',
+                )
+
+        first = upload('march.csv')
+        duplicate = upload('march-copy.csv')
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate.data['remittance_id'], first.data['id'])
+        self.assertEqual(CheckoffRemittance.objects.count(), 1)
+        delay_mock.assert_called_once_with(first.data['id'])
+
+        CheckoffRemittance.objects.filter(pk=first.data['id']).update(
+            status=CheckoffRemittance.Status.FAILED,
+        )
+        retried = upload('march.csv')
+
+        self.assertEqual(retried.status_code, 202)
+        self.assertEqual(retried.data['id'], first.data['id'])
+        self.assertEqual(CheckoffRemittance.objects.count(), 1)
+        self.assertEqual(delay_mock.call_count, 2)
@@ -2,6 +2,7 @@
 
 from datetime import date, datetime, time, timedelta
 from decimal import Decimal
+from unittest.mock import patch
 
 from django.test import TestCase
 from django.utils import timezone
@@ -14,15 +15,22 @@ from saccomanagement.models import Role
 from saccomembership.models import Membership
 from services.engines.dividend_calculator import (
     calculate_average_balance,
+    calculate_average_balances,
+    calculate_dividend_chunk,
     calculate_dividends_for_declaration,
+    fail_dividend_calculation,
+    finalize_dividend_calculation,
+    start_dividend_calculation,
 )
 from payments.models import MpesaTransaction, PaymentProvider, Transaction
 from services.models import (
+    DividendCalculationRun,
     DividendDeclaration,
     DividendPayout,
     Saving,
     SavingsType,
 )
+from services.tasks import dispatch_dividend_calculation
 
 
 class DividendCalculatorTests(TestCase):
@@ -117,12 +125,67 @@ class DividendCalculatorTests(TestCase):
 
         self.assertEqual(average, Decimal('100.00'))
 
+    def test_batched_averages_match_per_saving_averages(self):
+        other_savings_type = SavingsType.objects.create(
+            sacco=self.sacco,
+            name=SavingsType.Name.FOSA,
+            minimum_contribution=Decimal('500.00'),
+        )
+        other_saving = Saving.objects.create(
+            membership=self.membership,
+            savings_type=other_savings_type,
+            amount=Decimal('0.00'),
+            status=Saving.Status.ACTIVE,
+            dividend_eligible=True,
+        )
+        provider = PaymentProvider.objects.create(
+            name='M-Pesa',
+            provider_type=PaymentProvider.ProviderType.MPESA,
+            is_active=True,
+        )
+        history = [
+            (self.saving, '1000.00', date(2024, 12, 20), 'CREDIT'),
+            (self.saving, '250.00', date(2025, 2, 28), 'CREDIT'),
+            (self.saving, '100.00', date(2025, 3, 1), 'DEBIT'),
+            (other_saving, '333.33', date(2025, 1, 31), 'CREDIT'),
+            (other_saving, '50.00', date(2025, 6, 30), 'DEBIT'),
+            (self.saving, '75.55', date(2026, 1, 2), 'CREDIT'),
+        ]
+        for index, (saving, amount, created_date, entry_type) in enumerate(
+            history,
+        ):
+            self._create_saving_ledger_entry(
+                provider,
+                saving,
+                Decimal(amount),
+                f'DIV-BATCH-{index:03d}',
+                created_date=created_date,
+                entry_type=entry_type,
+            )
+        period_start = date(2025, 1, 1)
+        period_end = date(2025, 12, 31)
+
+        with self.assertNumQueries(2):
+            averages = calculate_average_balances(
+                Saving.objects.filter(membership=self.membership),
+                period_start,
+                period_end,
+            )
+
+        for saving in (self.saving, other_saving):
+            self.assertEqual(
+                averages[saving.id],
+                calculate_average_balance(saving, period_start, period_end),
+            )
+
     def _create_saving_ledger_entry(
         self,
         provider,
         saving,
         amount,
         reference,
+        created_date=date(2025, 1, 15),
+        entry_type=LedgerEntry.EntryType.CREDIT,
     ):
         transaction = Transaction.objects.create(
             provider=provider,
@@ -140,8 +203,8 @@ class DividendCalculatorTests(TestCase):
             related_saving=saving,
         )
         entry = create_ledger_entry(
-            membership=self.membership,
-            entry_type=LedgerEntry.EntryType.CREDIT,
+            membership=saving.membership,
+            entry_type=entry_type,
             category=LedgerEntry.Category.SAVING_DEPOSIT,
             amount=amount,
             description='Dividend balance history test',
@@ -149,7 +212,7 @@ class DividendCalculatorTests(TestCase):
             transaction=transaction,
         )
         created_at = timezone.make_aware(
-            datetime.combine(date(2025, 1, 15), time(hour=12)),
+            datetime.combine(created_date, time(hour=12)),
         )
         LedgerEntry.objects.filter(id=entry.id).update(created_at=created_at)
         return entry
@@ -176,6 +239,170 @@ class DividendCalculatorTests(TestCase):
         self.assertEqual(payout_count1, payout_count2)
         self.assertEqual(result1['total_dividend_amount'], result2['total_dividend_amount'])
 
+    def test_chunked_calculation_matches_single_pass(self):
+        """Chunk payouts and totals match the synchronous calculation."""
+        provider = PaymentProvider.objects.create(
+            name='M-Pesa',
+            provider_type=PaymentProvider.ProviderType.MPESA,
+            is_active=True,
+        )
+        savings = [self.saving] + [
+            Saving.objects.create(
+                membership=Membership.objects.create(
+                    user=User.objects.create_user(
+                        email=f'chunk-member-{index}@example.com',
+                        password='secret',
+                    ),
+                    sacco=self.sacco,
+                    status=Membership.Status.APPROVED,
+                    member_number=f'DIV-C{index:03d}',
+                ),
+                savings_type=self.savings_type,
+                status=Saving.Status.ACTIVE,
+                dividend_eligible=True,
+            )
+            for index in range(4)
+        ]
+        for index, saving in enumerate(savings):
+            self._create_saving_ledger_entry(
+                provider,
+                saving,
+                Decimal('1000.00') * (index + 1),
+                f'DIV-CHUNK-{index:03d}',
+                created_date=date(2025, index + 1, 10),
+            )
+        declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+        )
+        expected = calculate_dividends_for_declaration(declaration)
+        expected_payouts = dict(
+            declaration.payouts.values_list('saving_id', 'dividend_amount'),
+        )
+
+        run = start_dividend_calculation(declaration, chunk_size=2)
+        declaration.refresh_from_db()
+        self.assertEqual(
+            declaration.status,
+            DividendDeclaration.Status.CALCULATING,
+        )
+        self.assertFalse(declaration.payouts.exists())
+        self.assertEqual(run.total_chunks, 3)
+        self.assertEqual(run.total_savings, 5)
+
+        for chunk_index in range(run.total_chunks):
+            calculate_dividend_chunk(run.id, chunk_index)
+        calculate_dividend_chunk(run.id, 0)
+        result = finalize_dividend_calculation(run.id)
+
+        run.refresh_from_db()
+        declaration.refresh_from_db()
+        self.assertEqual(run.status, DividendCalculationRun.Status.COMPLETED)
+        self.assertEqual(run.chunks_done, 3)
+        self.assertEqual(run.payouts_written, 5)
+        self.assertEqual(result, expected)
+        self.assertEqual(
+            declaration.status,
+            DividendDeclaration.Status.CALCULATED,
+        )
+        self.assertEqual(
+            dict(
+                declaration.payouts.values_list(
+                    'saving_id',
+                    'dividend_amount',
+                ),
+            ),
+            expected_payouts,
+        )
+
+    def test_failed_chunked_calculation_returns_declaration_to_draft(self):
+        """A failed run discards partial payouts and unlocks the draft."""
+        declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+        )
+        run = start_dividend_calculation(declaration)
+        calculate_dividend_chunk(run.id, 0)
+
+        with self.assertRaises(ValueError):
+            calculate_dividends_for_declaration(declaration)
+
+        fail_dividend_calculation(run.id, 'worker lost')
+
+        run.refresh_from_db()
+        declaration.refresh_from_db()
+        self.assertEqual(run.status, DividendCalculationRun.Status.FAILED)
+        self.assertEqual(run.error_message, 'worker lost')
+        self.assertEqual(declaration.status, DividendDeclaration.Status.DRAFT)
+        self.assertFalse(declaration.payouts.exists())
+
+    def test_stale_running_calculation_is_taken_over(self):
+        """A run stuck past the timeout no longer blocks recalculation."""
+        declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+        )
+        stuck_run = start_dividend_calculation(declaration)
+
+        with self.assertRaises(ValueError):
+            start_dividend_calculation(declaration)
+
+        DividendCalculationRun.objects.filter(pk=stuck_run.pk).update(
+            started_at=timezone.now() - timedelta(minutes=61),
+        )
+        with self.settings(DIVIDEND_CALCULATION_STALE_MINUTES=60):
+            calculate_dividends_for_declaration(declaration)
+
+        stuck_run.refresh_from_db()
+        declaration.refresh_from_db()
+        self.assertEqual(
+            stuck_run.status,
+            DividendCalculationRun.Status.FAILED,
+        )
+        self.assertIn('60 minutes', stuck_run.error_message)
+        self.assertEqual(
+            declaration.status,
+            DividendDeclaration.Status.CALCULATED,
+        )
+
+    def test_failed_dispatch_returns_declaration_to_draft(self):
+        """A broker outage while queueing fails the run immediately."""
+        declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+        )
+        run = start_dividend_calculation(declaration)
+
+        self.assertGreater(run.total_chunks, 0)
+        with patch(
+            'services.tasks.chord',
+            side_effect=ConnectionError('broker down'),
+        ):
+            result = dispatch_dividend_calculation(run)
+
+        run.refresh_from_db()
+        declaration.refresh_from_db()
+        self.assertIsNone(result)
+        self.assertEqual(run.status, DividendCalculationRun.Status.FAILED)
+        self.assertIn('broker down', run.error_message)
+        self.assertEqual(declaration.status, DividendDeclaration.Status.DRAFT)
+
     def test_cannot_recalculate_approved_declaration(self):
         declaration = DividendDeclaration.objects.create(
             sacco=self.sacco,
@@ -342,6 +569,47 @@ class DividendDeclarationAPITests(TestCase):
         self.assertEqual(declaration.status, DividendDeclaration.Status.CALCULATED)
         self.assertIsNotNone(declaration.calculated_at)
 
+    def test_async_calculation_reports_progress(self):
+        declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+            status=DividendDeclaration.Status.DRAFT,
+        )
+
+        with patch(
+            'services.tasks.dispatch_dividend_calculation',
+        ) as dispatch:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f'/api/v1/services/dividends/declarations/'
+                    f'{declaration.id}/calculate/',
+                    {'mode': 'async'},
+                    format='json',
+                    HTTP_X_SACCO_ID=str(self.sacco.id),
+                )
+
+        self.assertEqual(response.status_code, 202)
+        run = DividendCalculationRun.objects.get(id=response.data['run_id'])
+        dispatch.assert_called_once_with(run)
+        self.assertEqual(run.requested_by, self.admin)
+
+        finalize_dividend_calculation(run.id)
+        response = self.client.get(
+            f'/api/v1/services/dividends/declarations/'
+            f'{declaration.id}/calculation-progress/',
+            HTTP_X_SACCO_ID=str(self.sacco.id),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        self.assertEqual(response.data['declaration_status'], 'CALCULATED')
+        self.assertEqual(response.data['total_chunks'], 0)
+        self.assertIsNone(response.data['eta_seconds'])
+
     def test_approve_dividend_declaration(self):
         declaration = DividendDeclaration.objects.create(
             sacco=self.sacco,
@@ -426,6 +694,8 @@ class DividendDeclarationAPITests(TestCase):
         
         response = self.client.post(
             f'/api/v1/services/dividends/declarations/{declaration.id}/disburse/',
+            {'mode': 'sync'},
+            format='json',
             HTTP_X_SACCO_ID=str(self.sacco.id),
         )
         
@@ -0,0 +1,215 @@
+"""Tests for chunked, resumable dividend disbursement."""
+
+from datetime import date
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import Sacco, User
+from ledger.models import LedgerBalanceHead, LedgerEntry
+from ledger.utils import create_ledger_entry
+from saccomanagement.models import Role
+from saccomembership.models import Membership
+from services.engines.dividend_disbursement import (
+    disburse_dividend_chunk,
+    disburse_dividends,
+    fail_dividend_disbursement,
+    start_dividend_disbursement,
+)
+from services.models import (
+    DividendDeclaration,
+    DividendDisbursementRun,
+    DividendPayout,
+    Saving,
+    SavingsType,
+)
+
+
+class DividendDisbursementTests(TestCase):
+    """Test bulk crediting, progress and resume of dividend payouts."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.sacco = Sacco.objects.create(
+            name='Disbursement SACCO',
+            registration_number='DISB001',
+            sector=Sacco.Sector.FINANCE,
+            county='Nairobi',
+        )
+        self.savings_type = SavingsType.objects.create(
+            sacco=self.sacco,
+            name=SavingsType.Name.BOSA,
+        )
+        self.admin = User.objects.create_user(
+            email='disburse-admin@example.com',
+            password='secret',
+        )
+        Role.objects.create(
+            user=self.admin,
+            sacco=self.sacco,
+            name=Role.SACCO_ADMIN,
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.declaration = DividendDeclaration.objects.create(
+            sacco=self.sacco,
+            savings_type=self.savings_type,
+            financial_year='2025/2026',
+            declared_rate=Decimal('10.00'),
+            period_start=date(2025, 1, 1),
+            period_end=date(2025, 12, 31),
+            status=DividendDeclaration.Status.APPROVED,
+        )
+        self.payouts = [
+            self._payout(index, Decimal('100.00') * index)
+            for index in range(1, 6)
+        ]
+
+    def test_disbursement_credits_savings_and_ledger_in_chunks(self):
+        """Every payout is credited once with the right running balance."""
+        run = start_dividend_disbursement(self.declaration, self.admin)
+
+        result = disburse_dividends(run.id, chunk_size=2)
+
+        run.refresh_from_db()
+        self.declaration.refresh_from_db()
+        self.assertEqual(result['payouts_paid'], 5)
+        self.assertEqual(run.chunks_done, 3)
+        self.assertEqual(run.amount_paid, Decimal('1500.00'))
+        self.assertEqual(run.status, DividendDisbursementRun.Status.COMPLETED)
+        self.assertEqual(
+            self.declaration.status,
+            DividendDeclaration.Status.DISBURSED,
+        )
+        for index, payout in enumerate(self.payouts, start=1):
+            payout.refresh_from_db()
+            payout.saving.refresh_from_db()
+            self.assertEqual(payout.status, DividendPayout.Status.PAID)
+            self.assertEqual(
+                payout.saving.amount,
+                Decimal('1000.00') + Decimal('100.00') * index,
+            )
+            entry = LedgerEntry.objects.get(
+                reference=f'DIV-{self.declaration.id}-{payout.id}',
+            )
+            self.assertEqual(
+                entry.category,
+                LedgerEntry.Category.DIVIDEND_PAYOUT,
+            )
+            self.assertEqual(entry.balance_after, payout.saving.amount)
+            self.assertEqual(
+                LedgerBalanceHead.objects.get(
+                    membership=payout.membership,
+                ).balance,
+                payout.saving.amount,
+            )
+
+    def test_failed_run_resumes_without_double_paying(self):
+        """Posting again after a crash pays only the remaining payouts."""
+        run = start_dividend_disbursement(self.declaration, self.admin)
+        disburse_dividend_chunk(run.id, chunk_size=2)
+        fail_dividend_disbursement(run.id, 'worker lost')
+        self.declaration.refresh_from_db()
+        self.assertEqual(
+            self.declaration.status,
+            DividendDeclaration.Status.DISBURSING,
+        )
+
+        response = self.client.post(
+            f'/api/v1/services/dividends/declarations/'
+            f'{self.declaration.id}/disburse/',
+            {'mode': 'sync'},
+            format='json',
+            HTTP_X_SACCO_ID=str(self.sacco.id),
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['run_id'], str(run.id))
+        self.assertEqual(response.data['paid_count'], 5)
+        self.assertEqual(
+            LedgerEntry.objects.filter(
+                category=LedgerEntry.Category.DIVIDEND_PAYOUT,
+            ).count(),
+            5,
+        )
+        first_saving = Saving.objects.get(pk=self.payouts[0].saving_id)
+        self.assertEqual(first_saving.amount, Decimal('1100.00'))
+
+    def test_disbursement_runs_in_background_by_default(self):
+        """Posting queues the job and exposes progress."""
+        with patch('services.tasks.disburse_dividends_task.delay') as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = self.client.post(
+                    f'/api/v1/services/dividends/declarations/'
+                    f'{self.declaration.id}/disburse/',
+                    HTTP_X_SACCO_ID=str(self.sacco.id),
+                )
+
+        self.assertEqual(response.status_code, 202)
+        run_id = response.data['run_id']
+        delay.assert_called_once_with(run_id)
+        self.assertEqual(response.data['total_payouts'], 5)
+
+        disburse_dividend_chunk(run_id, chunk_size=3)
+        progress = self.client.get(
+            f'/api/v1/services/dividends/declarations/'
+            f'{self.declaration.id}/disbursement-progress/',
+            HTTP_X_SACCO_ID=str(self.sacco.id),
+        )
+
+        self.assertEqual(progress.status_code, 200)
+        self.assertEqual(progress.data['payouts_paid'], 3)
+        self.assertEqual(progress.data['declaration_status'], 'DISBURSING')
+        self.assertIsNotNone(progress.data['eta_seconds'])
+
+    @override_settings(DIVIDEND_SYNC_DISBURSE_MAX_PAYOUTS=4)
+    def test_sync_mode_refuses_large_declarations(self):
+        """mode=sync is only for declarations within the sync limit."""
+        with patch('services.tasks.disburse_dividends_task.delay') as delay:
+            response = self.client.post(
+                f'/api/v1/services/dividends/declarations/'
+                f'{self.declaration.id}/disburse/',
+                {'mode': 'sync'},
+                format='json',
+                HTTP_X_SACCO_ID=str(self.sacco.id),
+            )
+
+        self.assertEqual(response.status_code, 400)
+        delay.assert_not_called()
+        self.declaration.refresh_from_db()
+        self.assertEqual(
+            self.declaration.status,
+            DividendDeclaration.Status.APPROVED,
+        )
+
+    def _payout(self, index, amount):
+        user = User.objects.create_user(
+            email=f'disburse-{index}@example.com',
+            password='secret',
+        )
+        membership = Membership.objects.create(
+            user=user,
+            sacco=self.sacco,
+            status=Membership.Status.APPROVED,
+            member_number=f'DISB-{index}',
+        )
+        saving = Saving.objects.create(
+            membership=membership,
+            savings_type=self.savings_type,
+            amount=Decimal('1000.00'),
+        )
+        create_ledger_entry(
+            membership=membership,
+            entry_type=LedgerEntry.EntryType.CREDIT,
+            category=LedgerEntry.Category.SAVING_DEPOSIT,
+            amount=Decimal('1000.00'),
+            description='Opening deposit',
+        )
+        return DividendPayout.objects.create(
+            declaration=self.declaration,
+            membership=membership,
+            saving=saving,
+            average_balance=Decimal('1000.00'),
+            dividend_amount=amount,
+        )
@@ -1,7 +1,12 @@
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
+from django.core.management import call_command
+from django.core.management.base import CommandError
 from django.test import TestCase
+from django.utils import timezone
 from rest_framework.test import APIClient
 
 from accounts.models import Sacco, SaccoSettings, User
@@ -9,8 +14,12 @@ from ledger.models import LedgerEntry
 from notifications.models import Notification
 from saccomanagement.models import Role
 from saccomembership.models import Membership
-from services.engines.liquidity_monitor import check_liquidity_risk
-from services.models import LiquidityAlert, Loan
+from services.engines.liquidity_monitor import (
+    check_liquidity_risk,
+    get_available_liquid_reserves,
+    roll_up_liquidity_snapshots,
+)
+from services.models import LiquidityAlert, Loan, SaccoLiquiditySnapshot
 from services.tasks import check_all_sacco_liquidity
 
 
@@ -164,6 +173,68 @@ class LiquidityMonitorTests(TestCase):
         self.assertTrue(data['current']['at_risk'])
         self.assertEqual(data['recent_alerts'], [])
 
+    def test_reserves_read_snapshot_plus_entries_since_cutoff(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        old_deposit = self._ledger(
+            LedgerEntry.EntryType.CREDIT,
+            LedgerEntry.Category.SAVING_DEPOSIT,
+            Decimal('1000.00'),
+            'DEP-OLD',
+        )
+        LedgerEntry.objects.filter(id=old_deposit.id).update(
+            created_at=timezone.now() - timedelta(days=3),
+        )
+
+        self.assertEqual(roll_up_liquidity_snapshots(yesterday), 1)
+        snapshot = SaccoLiquiditySnapshot.objects.get(sacco=self.sacco)
+        self.assertEqual(snapshot.reserves, Decimal('1000.00'))
+
+        self._ledger(
+            LedgerEntry.EntryType.DEBIT,
+            LedgerEntry.Category.SAVING_WITHDRAWAL,
+            Decimal('250.00'),
+            'WDR-NEW',
+        )
+        with self.assertNumQueries(2):
+            reserves = get_available_liquid_reserves(self.sacco)
+
+        self.assertEqual(reserves, Decimal('750.00'))
+        with self.assertRaises(ValueError):
+            roll_up_liquidity_snapshots(timezone.localdate())
+
+    def test_reconcile_command_detects_and_repairs_snapshot_drift(self):
+        yesterday = timezone.localdate() - timedelta(days=1)
+        deposit = self._ledger(
+            LedgerEntry.EntryType.CREDIT,
+            LedgerEntry.Category.SAVING_DEPOSIT,
+            Decimal('500.00'),
+            'DEP-REC',
+        )
+        LedgerEntry.objects.filter(id=deposit.id).update(
+            created_at=timezone.now() - timedelta(days=2),
+        )
+        roll_up_liquidity_snapshots(yesterday)
+        call_command('reconcile_liquidity_snapshots', stdout=StringIO())
+
+        SaccoLiquiditySnapshot.objects.filter(sacco=self.sacco).update(
+            cash_in=Decimal('1.00'),
+        )
+        with self.assertRaises(CommandError):
+            call_command('reconcile_liquidity_snapshots', stdout=StringIO())
+
+        call_command(
+            'reconcile_liquidity_snapshots',
+            '--execute',
+            stdout=StringIO(),
+        )
+
+        snapshot = SaccoLiquiditySnapshot.objects.get(sacco=self.sacco)
+        self.assertEqual(snapshot.cash_in, Decimal('500.00'))
+        self.assertEqual(
+            check_liquidity_risk(self.sacco)['available_reserves'],
+            Decimal('500.00'),
+        )
+
     def _ledger(self, entry_type, category, amount, reference):
         return LedgerEntry.objects.create(
             membership=self.membership,
@@ -4,11 +4,15 @@ from rest_framework.routers import DefaultRouter
 from guarantor.external_views import ExternalGuarantorCollectionView
 
 from .views import (
+    CheckoffRemittanceDetailView,
+    CheckoffRemittanceUploadView,
     CRBCheckView,
     ConfirmDisbursementView,
     DisputeDisbursementView,
     DividendApproveView,
     DividendCalculateView,
+    DividendCalculationProgressView,
+    DividendDisbursementProgressView,
     DividendDeclarationDetailView,
     DividendDeclarationListCreateView,
     DividendDisburseView,
@@ -120,6 +124,11 @@ urlpatterns = [
         DividendCalculateView.as_view(),
         name='dividend-calculate',
     ),
+    path(
+        'dividends/declarations/<uuid:uuid>/calculation-progress/',
+        DividendCalculationProgressView.as_view(),
+        name='dividend-calculation-progress',
+    ),
     path(
         'dividends/declarations/<uuid:uuid>/approve/',
         DividendApproveView.as_view(),
@@ -130,6 +139,21 @@ urlpatterns = [
         DividendDisburseView.as_view(),
         name='dividend-disburse',
     ),
+    path(
+        'dividends/declarations/<uuid:uuid>/disbursement-progress/',
+        DividendDisbursementProgressView.as_view(),
+        name='dividend-disbursement-progress',
+    ),
+    path(
+        'checkoff/remittances/',
+        CheckoffRemittanceUploadView.as_view(),
+        name='checkoff-remittance-upload',
+    ),
+    path(
+        'checkoff/remittances/<uuid:uuid>/',
+        CheckoffRemittanceDetailView.as_view(),
+        name='checkoff-remittance-detail',
+    ),
     path(
         'dividends/payouts/',
         DividendPayoutListView.as_view(),
@@ -1,9 +1,10 @@
 from decimal import Decimal, InvalidOperation
 from datetime import timedelta
 
+from django.conf import settings
 from django.core.cache import cache
 from django.core.signing import BadSignature, SignatureExpired, TimestampSigner
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.db.models import Count, Sum
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
@@ -16,6 +17,7 @@ from rest_framework.generics import (
     RetrieveUpdateDestroyAPIView,
     RetrieveUpdateAPIView,
 )
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -40,8 +42,11 @@ from .engines.guarantor_logic import (
 from .engines.loan_limits import calculate_loan_limit
 from .engines.liquidity_monitor import check_liquidity_risk
 from .models import (
+    CheckoffRemittance,
     CRBCheck,
     DisbursementAuditLog,
+    DividendCalculationRun,
+    DividendDisbursementRun,
     DividendDeclaration,
     DividendPayout,
     GuaranteeCapacity,
@@ -56,6 +61,9 @@ from .models import (
 )
 from .permissions import GuarantorCapacityCheck
 from .serializers import (
+    CheckoffRemittanceSerializer,
+    DividendCalculationRunSerializer,
+    DividendDisbursementRunSerializer,
     DividendDeclarationSerializer,
     DividendPayoutSerializer,
     GuarantorSearchResultSerializer,
@@ -1567,7 +1575,13 @@ class DividendDeclarationDetailView(
 
 
 class DividendCalculateView(SaccoScopedMixin, APIView):
-    """Calculate dividends for a declaration."""
+    """
+    Calculate dividends for a declaration.
+
+    Pass ``mode=async`` in the body or query string to queue a chunked
+    calculation instead; the response carries the run id to poll on the
+    calculation progress endpoint.
+    """
 
     permission_classes = [IsAuthenticated, IsSaccoAdmin]
 
@@ -1586,6 +1600,10 @@ class DividendCalculateView(SaccoScopedMixin, APIView):
             )
         )
 
+        mode = request.data.get('mode') or request.query_params.get('mode')
+        if mode == 'async':
+            return self._start_async_calculation(request, declaration)
+
         try:
             with transaction.atomic():
                 result = calculate_dividends_for_declaration(declaration)
@@ -1602,6 +1620,64 @@ class DividendCalculateView(SaccoScopedMixin, APIView):
             }
         )
 
+    def _start_async_calculation(self, request, declaration):
+        from services.engines.dividend_calculator import (
+            start_dividend_calculation,
+        )
+        from services.tasks import dispatch_dividend_calculation
+
+        try:
+            with transaction.atomic():
+                run = start_dividend_calculation(
+                    declaration,
+                    requested_by=request.user,
+                )
+                transaction.on_commit(
+                    lambda: dispatch_dividend_calculation(run),
+                )
+        except ValueError as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                'run_id': str(run.id),
+                'status': run.status,
+                'total_chunks': run.total_chunks,
+                'total_savings': run.total_savings,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class DividendCalculationProgressView(SaccoScopedMixin, APIView):
+    """Return progress of the latest dividend calculation run."""
+
+    permission_classes = [IsAuthenticated, IsSaccoAdmin]
+
+    def get(self, request, uuid=None, pk=None):
+        response = self._set_sacco_context()
+        if response:
+            return response
+
+        declaration = get_object_or_404(
+            self.apply_sacco_scope(
+                DividendDeclaration.objects.filter(id=uuid or pk)
+            )
+        )
+        run = DividendCalculationRun.objects.select_related(
+            'declaration',
+        ).filter(declaration=declaration).first()
+        if run is None:
+            return Response(
+                {'detail': 'No calculation run found for this declaration.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(DividendCalculationRunSerializer(run).data)
+
 
 class DividendApproveView(SaccoScopedMixin, APIView):
     """Approve a calculated dividend declaration."""
@@ -1647,7 +1723,17 @@ class DividendApproveView(SaccoScopedMixin, APIView):
 
 
 class DividendDisburseView(SaccoScopedMixin, APIView):
-    """Disburse approved dividends to member savings."""
+    """
+    Disburse approved dividends to member savings.
+
+    The disbursement runs as a background job that credits payouts in
+    committed chunks; the response is 202 with the run id, and progress
+    is read from the disbursement progress endpoint. Pass ``mode=sync``
+    in the body or query string to credit a small declaration (up to
+    DIVIDEND_SYNC_DISBURSE_MAX_PAYOUTS unpaid payouts) within the
+    request instead. Posting again for a declaration left DISBURSING by a
+    failed run resumes it.
+    """
 
     permission_classes = [IsAuthenticated, IsSaccoAdmin]
 
@@ -1656,80 +1742,211 @@ class DividendDisburseView(SaccoScopedMixin, APIView):
         if response:
             return response
 
-        from ledger.models import LedgerEntry
-        from ledger.utils import create_ledger_entry
+        from services.engines.dividend_disbursement import (
+            disburse_dividends,
+            fail_dividend_disbursement,
+            start_dividend_disbursement,
+        )
 
-        with transaction.atomic():
-            declaration = get_object_or_404(
-                self.apply_sacco_scope(
-                    DividendDeclaration.objects.select_for_update().filter(
-                        id=uuid or pk,
-                    )
-                )
+        declaration = get_object_or_404(
+            self.apply_sacco_scope(
+                DividendDeclaration.objects.filter(id=uuid or pk)
             )
+        )
 
-            if declaration.status != DividendDeclaration.Status.APPROVED:
-                return Response(
-                    {
-                        'detail': (
-                            'Can only disburse declarations in APPROVED '
-                            'status.'
-                        ),
-                    },
-                    status=status.HTTP_400_BAD_REQUEST,
+        mode = request.data.get('mode') or request.query_params.get('mode')
+        sync = mode == 'sync'
+        try:
+            with transaction.atomic():
+                run = start_dividend_disbursement(
+                    declaration,
+                    requested_by=request.user,
                 )
-
-            payout_ids = list(
-                declaration.payouts.filter(
-                    status=DividendPayout.Status.PENDING,
-                ).values_list('id', flat=True)
-            )
-            paid_count = 0
-
-            for start in range(0, len(payout_ids), 500):
-                batch_ids = payout_ids[start:start + 500]
-                batch_payouts = DividendPayout.objects.select_related(
-                    'membership',
-                    'saving',
-                ).select_for_update().filter(id__in=batch_ids)
-
-                for payout in batch_payouts:
-                    ledger_entry = create_ledger_entry(
-                        membership=payout.membership,
-                        entry_type=LedgerEntry.EntryType.CREDIT,
-                        category=LedgerEntry.Category.DIVIDEND_PAYOUT,
-                        amount=payout.dividend_amount,
-                        description=(
-                            'Dividend payout for '
-                            f'{declaration.financial_year}'
-                        ),
-                        reference=f'DIV-{declaration.id}-{payout.id}',
+                max_sync_payouts = settings.DIVIDEND_SYNC_DISBURSE_MAX_PAYOUTS
+                if (
+                    sync
+                    and run.total_payouts - run.payouts_paid
+                    > max_sync_payouts
+                ):
+                    raise ValueError(
+                        f'Synchronous disbursement is limited to '
+                        f'{max_sync_payouts} payouts; omit mode=sync to '
+                        f'run it in the background.'
                     )
+                if not sync:
+                    from services.tasks import disburse_dividends_task
 
-                    if ledger_entry is None:
-                        raise RuntimeError(
-                            'Failed to create dividend ledger entry.'
-                        )
-
-                    payout.saving.amount += payout.dividend_amount
-                    payout.saving.save(update_fields=['amount', 'updated_at'])
+                    run_id = str(run.id)
+                    transaction.on_commit(
+                        lambda: disburse_dividends_task.delay(run_id),
+                    )
+        except ValueError as exc:
+            return Response(
+                {'detail': str(exc)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-                    payout.status = DividendPayout.Status.PAID
-                    payout.save(update_fields=['status'])
-                    paid_count += 1
+        if not sync:
+            return Response(
+                {
+                    'run_id': str(run.id),
+                    'status': run.status,
+                    'total_payouts': run.total_payouts,
+                    'payouts_paid': run.payouts_paid,
+                },
+                status=status.HTTP_202_ACCEPTED,
+            )
 
-            declaration.status = DividendDeclaration.Status.DISBURSED
-            declaration.save(update_fields=['status'])
+        try:
+            result = disburse_dividends(run.id)
+        except Exception as exc:
+            fail_dividend_disbursement(run.id, exc)
+            raise
 
+        declaration.refresh_from_db(fields=['status'])
         return Response(
             {
                 'id': str(declaration.id),
                 'status': declaration.status,
-                'paid_count': paid_count,
+                'run_id': str(run.id),
+                'paid_count': result['payouts_paid'],
             }
         )
 
 
+class DividendDisbursementProgressView(SaccoScopedMixin, APIView):
+    """Return progress of the latest dividend disbursement run."""
+
+    permission_classes = [IsAuthenticated, IsSaccoAdmin]
+
+    def get(self, request, uuid=None, pk=None):
+        response = self._set_sacco_context()
+        if response:
+            return response
+
+        declaration = get_object_or_404(
+            self.apply_sacco_scope(
+                DividendDeclaration.objects.filter(id=uuid or pk)
+            )
+        )
+        run = DividendDisbursementRun.objects.select_related(
+            'declaration',
+        ).filter(declaration=declaration).first()
+        if run is None:
+            return Response(
+                {'detail': 'No disbursement run found for this declaration.'},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(DividendDisbursementRunSerializer(run).data)
+
+
+class CheckoffRemittanceUploadView(SaccoScopedMixin, APIView):
+    """
+    Upload an employer payroll check-off file for bulk loan repayment.
+
+    The file needs member_number and amount columns. It is stored and
+    applied by a background job; poll the remittance detail endpoint for
+    progress and the rows that could not be matched.
+
+    A file already uploaded to the SACCO is not applied twice. Uploading
+    the file of a FAILED remittance resumes that remittance after its last
+    committed chunk; any other repeat upload is refused with 409.
+    """
+
+    permission_classes = [IsAuthenticated, IsSaccoAdmin]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        response = self._set_sacco_context()
+        if response:
+            return response
+
+        from services.engines.checkoff_remittance import (
+            ALLOWED_EXTENSIONS,
+            MAX_REMITTANCE_FILE_SIZE,
+            hash_remittance_file,
+        )
+        from services.tasks import process_checkoff_remittance_task
+
+        sacco = self.get_sacco_context()
+        if sacco is None:
+            return Response(
+                {'detail': 'SACCO context is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'detail': 'file is required.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not upload.name.lower().endswith(ALLOWED_EXTENSIONS):
+            return Response(
+                {'detail': 'Only .csv and .xlsx files are supported.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if upload.size > MAX_REMITTANCE_FILE_SIZE:
+            return Response(
+                {'detail': 'Remittance file must be smaller than 20MB.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        content_hash = hash_remittance_file(upload)
+        try:
+            with transaction.atomic():
+                remittance = (
+                    CheckoffRemittance.objects.select_for_update()
+                    .filter(sacco=sacco, content_hash=content_hash)
+                    .first()
+                )
+                if remittance is None:
+                    remittance = CheckoffRemittance.objects.create(
+                        sacco=sacco,
+                        uploaded_by=request.user,
+                        file=upload,
+                        file_name=upload.name[:255],
+                        content_hash=content_hash,
+                    )
+                elif remittance.status != CheckoffRemittance.Status.FAILED:
+                    return Response(
+                        {
+                            'detail': 'This file has already been uploaded.',
+                            'remittance_id': str(remittance.id),
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+                remittance_id = str(remittance.id)
+                transaction.on_commit(
+                    lambda: process_checkoff_remittance_task.delay(
+                        remittance_id,
+                    ),
+                )
+        except IntegrityError:
+            return Response(
+                {'detail': 'This file has already been uploaded.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            CheckoffRemittanceSerializer(remittance).data,
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class CheckoffRemittanceDetailView(SaccoScopedMixin, RetrieveAPIView):
+    """Return progress and unmatched rows of a check-off remittance."""
+
+    serializer_class = CheckoffRemittanceSerializer
+    permission_classes = [IsAuthenticated, IsSaccoAdmin]
+    lookup_field = 'id'
+    lookup_url_kwarg = 'uuid'
+
+    def get_queryset(self):
+        return self.apply_sacco_scope(CheckoffRemittance.objects.all())
+
+
 class DividendPayoutListView(SaccoScopedMixin, ListAPIView):
     """List dividend payouts for a SACCO, filterable by declaration."""
 
@@ -15,8 +15,8 @@ from rest_framework.test import APIClient, APITestCase
 from accounts.models import OTPToken, Sacco, User
 from ledger.models import LedgerEntry
 from notifications.models import Notification
+from payments.callback_inbox import drain_callback_inbox
 from payments.models import MpesaTransaction
-from payments.tasks import process_stk_callback_task
 from saccomanagement.models import Role
 from saccomembership.models import Membership, SaccoApplication
 from services.models import Loan, LoanType, Saving, SavingsType
@@ -290,10 +290,10 @@ class MpesaFlowTest(APITestCase):
     @patch('payments.views.is_safaricom_ip', return_value=True)
     @patch('payments.views.is_replay_attack', return_value=False)
     @patch('payments.views.verify_mpesa_signature', return_value=True)
-    @patch('payments.tasks.process_stk_callback_task.delay')
+    @patch('payments.views.schedule_inbox_drain')
     def test_stk_push_to_balance_update(
         self,
-        delay_mock,
+        schedule_mock,
         _signature_mock,
         _replay_mock,
         _ip_mock,
@@ -345,13 +345,9 @@ class MpesaFlowTest(APITestCase):
             format='json',
         )
         self.assertEqual(callback_response.status_code, status.HTTP_200_OK)
-        delay_mock.assert_called_once()
+        schedule_mock.assert_called_once()
 
-        process_stk_callback_task(
-            checkout_request_id='CRID-123',
-            result_code=0,
-            callback_body=callback_payload,
-        )
+        drain_callback_inbox()
 
         mpesa_transaction.refresh_from_db()
         self.saving.refresh_from_db()